@@ -4,6 +4,7 @@
  */
 
 import http from 'http';
+import crypto from 'crypto';
 import fs from 'fs';
 import path from 'path';
 import { fileURLToPath } from 'url';
@@ -350,10 +351,12 @@ async function indexKnowledgeItem(itemId) {
                 const embedding = await createEmbeddingWithRetry(openai, chunk);
 
                 // Insert chunk with embedding
+                // content_hash lets the Python indexer reuse this embedding
+                const contentHash = crypto.createHash('sha256').update(chunk, 'utf8').digest('hex');
                 await client.query(
-                    `INSERT INTO knowledge_chunks (knowledge_base_id, chunk_index, content, embedding)
-                     VALUES ($1, $2, $3, $4::vector)`,
-                    [itemId, i, chunk, vectorLiteral(embedding)]
+                    `INSERT INTO knowledge_chunks (knowledge_base_id, chunk_index, content, content_hash, embedding)
+                     VALUES ($1, $2, $3, $4, $5::vector)`,
+                    [itemId, i, chunk, contentHash, vectorLiteral(embedding)]
                 );
 
                 console.log(`[Indexing] Item ${itemId}: Chunk ${i + 1}/${chunks.length} completed`);
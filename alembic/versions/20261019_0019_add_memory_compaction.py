@@ -0,0 +1,55 @@
+"""Add conversation memory archive for hierarchical compaction
+
+Revision ID: 0019
+Revises: 0018
+Create Date: 2026-10-19
+
+Raw dialog snippets and short summaries are rolled up into daily, weekly
+and monthly summaries. Rolled-up rows past their retention horizon are
+moved into conversation_memory_archive so the live table (and its vector
+index) stays bounded per user.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0019'
+down_revision = '0018'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS conversation_memory_archive (
+            id SERIAL PRIMARY KEY,
+            memory_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            source_conversation_ids INTEGER[] NOT NULL DEFAULT '{}',
+            content TEXT NOT NULL,
+            kind VARCHAR(50) NOT NULL,
+            importance FLOAT NOT NULL DEFAULT 1.0,
+            fingerprint VARCHAR(64) NOT NULL,
+            metadata JSONB,
+            created_at TIMESTAMPTZ NOT NULL,
+            archived_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """)
+
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conversation_memory_archive_user_id
+        ON conversation_memory_archive(user_id, created_at)
+    """)
+
+    # Compaction scans memories per user, kind and age
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conversation_memories_user_kind_created
+        ON conversation_memories(user_id, kind, created_at)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_conversation_memories_user_kind_created")
+    op.execute("DROP INDEX IF EXISTS idx_conversation_memory_archive_user_id")
+    op.execute("DROP TABLE IF EXISTS conversation_memory_archive")
@@ -0,0 +1,63 @@
+"""Add composite and partial indexes for conversations hot query shapes
+
+Revision ID: 0020
+Revises: 0019
+Create Date: 2026-10-19
+
+The conversations table only had single-column indexes on user_id and
+created_at, while the hot paths filter by (user_id, message_type) and
+order by created_at DESC:
+- recent bot replies / fingerprints / reply embeddings (anti-repetition)
+- dialog context and stale-dialog checks
+- conversation cache hydration (all types, newest first)
+- weekly/monthly summary-sent checks (metadata->>'source')
+- incremental memory indexing (user messages ordered by id)
+
+Indexes are built CONCURRENTLY so the migration doesn't block writes.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0020'
+down_revision = '0019'
+branch_labels = None
+depends_on = None
+
+
+# Summary rows written by the scheduler (see NotificationScheduler)
+SUMMARY_SOURCES = "('weekly_summary', 'weekly_summary_fallback', 'monthly_summary')"
+
+# (index name, definition) - also used by tests/integration/test_conversation_indexes.py
+CONVERSATION_INDEXES = [
+    (
+        "idx_conversations_user_type_created",
+        "ON conversations (user_id, message_type, created_at DESC)",
+    ),
+    (
+        "idx_conversations_user_created",
+        "ON conversations (user_id, created_at DESC)",
+    ),
+    (
+        "idx_conversations_user_messages_id",
+        "ON conversations (user_id, id) WHERE message_type IN ('free_dialog', 'user_response')",
+    ),
+    (
+        "idx_conversations_summary_source",
+        f"ON conversations (user_id, created_at DESC) WHERE metadata->>'source' IN {SUMMARY_SOURCES}",
+    ),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, definition in CONVERSATION_INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+        op.execute("ANALYZE conversations")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(CONVERSATION_INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,160 @@
+"""Partition conversations, api_usage and system_logs by month
+
+Revision ID: 0021
+Revises: 0020
+Create Date: 2026-10-19
+
+The three append-only tables are rebuilt as native RANGE partitioned tables
+on created_at with one partition per calendar month:
+- The primary key becomes (id, created_at): unique constraints on a
+  partitioned table must include the partition key. The id sequence is kept,
+  so ids stay unique and keep growing.
+- Partitions are created from the oldest existing row up to
+  PARTITION_MONTHS_AHEAD months in the future, plus a DEFAULT partition so an
+  insert never fails if the maintenance job falls behind.
+- Indexes are created on the parent and cascade to every partition.
+
+Future partitions and retention are handled by the partition maintenance job
+(src/services/partition_maintenance_service.py), which uses the same
+<table>_pYYYYMM naming.
+
+Note: rows are copied inside the migration, so run it in a maintenance window.
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0021"
+down_revision: Union[str, None] = "0020"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PARTITION_MONTHS_AHEAD = 3
+
+# (table, user FK ON DELETE action or None, [(index name, definition)])
+PARTITIONED_TABLES = [
+    (
+        "conversations",
+        "CASCADE",
+        [
+            ("idx_conversations_user_id", "(user_id)"),
+            ("idx_conversations_created_at", "(created_at)"),
+            ("idx_conversations_user_type_created", "(user_id, message_type, created_at DESC)"),
+            ("idx_conversations_user_created", "(user_id, created_at DESC)"),
+            (
+                "idx_conversations_user_messages_id",
+                "(user_id, id) WHERE message_type IN ('free_dialog', 'user_response')",
+            ),
+            (
+                "idx_conversations_summary_source",
+                "(user_id, created_at DESC) WHERE metadata->>'source' IN "
+                "('weekly_summary', 'weekly_summary_fallback', 'monthly_summary')",
+            ),
+        ],
+    ),
+    (
+        "api_usage",
+        "SET NULL",
+        [
+            ("idx_api_usage_user_id", "(user_id)"),
+            ("idx_api_usage_api_provider", "(api_provider)"),
+            ("idx_api_usage_created_at", "(created_at)"),
+            ("idx_api_usage_model", "(model)"),
+        ],
+    ),
+    (
+        "system_logs",
+        None,
+        [
+            ("idx_system_logs_level", "(level)"),
+            ("idx_system_logs_source", "(source)"),
+            ("idx_system_logs_created_at", "(created_at)"),
+        ],
+    ),
+]
+
+
+def _month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    month_index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def _drop_existing_indexes(table: str, indexes) -> None:
+    for name, _ in indexes:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    # Index created by the ORM declaration (index=True) in some environments
+    op.execute(f"DROP INDEX IF EXISTS ix_{table}_created_at")
+
+
+def _create_indexes(table: str, indexes) -> None:
+    for name, definition in indexes:
+        columns, _, predicate = definition.partition(" WHERE ")
+        sql = f"CREATE INDEX {name} ON {table} {columns}"
+        if predicate:
+            sql += f" WHERE {predicate}"
+        op.execute(sql)
+
+
+def _rebuild_table(table: str, on_delete, indexes, partitioned: bool) -> None:
+    """Copy a table into a new (partitioned or plain) table with the same columns"""
+    bind = op.get_bind()
+    old = f"{table}_old"
+    sequence = f"{table}_id_seq"
+
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    op.execute(f"ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey")
+    if on_delete:
+        op.execute(f"ALTER TABLE {old} DROP CONSTRAINT IF EXISTS {table}_user_id_fkey")
+    _drop_existing_indexes(table, indexes)
+    # Keep the id sequence alive when the old table is dropped
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+
+    primary_key = "(id, created_at)" if partitioned else "(id)"
+    partition_clause = " PARTITION BY RANGE (created_at)" if partitioned else ""
+    op.execute(
+        f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS, "
+        f"CONSTRAINT {table}_pkey PRIMARY KEY {primary_key}){partition_clause}"
+    )
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+
+    if partitioned:
+        oldest = bind.exec_driver_sql(f"SELECT MIN(created_at) FROM {old}").scalar()
+        now = datetime.now(timezone.utc)
+        month = _month_start(oldest.astimezone(timezone.utc) if oldest else now)
+        last = _add_months(_month_start(now), PARTITION_MONTHS_AHEAD)
+        while month <= last:
+            upper = _add_months(month, 1)
+            op.execute(
+                f"CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+            month = upper
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+    op.execute(f"INSERT INTO {table} SELECT * FROM {old}")
+    op.execute(f"DROP TABLE {old}")
+
+    if on_delete:
+        op.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_user_id_fkey "
+            f"FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE {on_delete}"
+        )
+    _create_indexes(table, indexes)
+    op.execute(f"ANALYZE {table}")
+
+
+def upgrade() -> None:
+    for table, on_delete, indexes in PARTITIONED_TABLES:
+        _rebuild_table(table, on_delete, indexes, partitioned=True)
+
+
+def downgrade() -> None:
+    for table, on_delete, indexes in PARTITIONED_TABLES:
+        _rebuild_table(table, on_delete, indexes, partitioned=False)
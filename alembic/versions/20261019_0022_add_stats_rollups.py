@@ -0,0 +1,71 @@
+"""Add hourly rollup tables for admin dashboard statistics
+
+Revision ID: 0022
+Revises: 0021
+Create Date: 2026-10-19
+
+Dashboard statistics (/api/stats, /api/stats/activity, API usage stats) read
+pre-aggregated hourly buckets instead of counting raw rows on every load:
+- stats_rollups_hourly: row counts per metric (moments, conversations) and hour
+- api_usage_rollups_hourly: requests, tokens and cost per model, operation and hour
+- stats_snapshots: point-in-time counters (users, active users, totals)
+- rollup_state: watermark (end of the last aggregated hour) and refresh time
+
+The tables are filled by the stats rollup job
+(src/services/stats_rollup_service.py); readers add the still-open hour
+from the raw tables.
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0022'
+down_revision = '0021'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS stats_rollups_hourly (
+            metric VARCHAR(50) NOT NULL,
+            bucket_start TIMESTAMPTZ NOT NULL,
+            value BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, bucket_start)
+        )
+    """)
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS api_usage_rollups_hourly (
+            bucket_start TIMESTAMPTZ NOT NULL,
+            model VARCHAR(100) NOT NULL,
+            operation_type VARCHAR(50) NOT NULL,
+            requests BIGINT NOT NULL DEFAULT 0,
+            total_tokens BIGINT NOT NULL DEFAULT 0,
+            cost_usd NUMERIC(16, 6) NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket_start, model, operation_type)
+        )
+    """)
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS stats_snapshots (
+            metric VARCHAR(50) PRIMARY KEY,
+            value BIGINT NOT NULL DEFAULT 0,
+            computed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            name VARCHAR(50) PRIMARY KEY,
+            watermark TIMESTAMPTZ NOT NULL,
+            refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS rollup_state")
+    op.execute("DROP TABLE IF EXISTS stats_snapshots")
+    op.execute("DROP TABLE IF EXISTS api_usage_rollups_hourly")
+    op.execute("DROP TABLE IF EXISTS stats_rollups_hourly")
@@ -0,0 +1,77 @@
+"""Add trigram and full-text indexes for admin search
+
+Revision ID: 0023
+Revises: 0022
+Create Date: 2026-10-19
+
+Admin user search (username / first_name ILIKE '%x%', telegram_id LIKE '%x%')
+and conversation content search were full scans. This adds:
+- pg_trgm GIN indexes so substring ILIKE/LIKE searches use bitmap index scans
+- a GIN index on to_tsvector('simple', content) for full-text conversation
+  search ('simple' keeps it language agnostic - users write in many languages)
+- (last_active_at DESC NULLS LAST, id DESC) on users for keyset pagination
+
+Indexes are built CONCURRENTLY. conversations is partitioned (0021), and
+partitioned parents cannot be indexed concurrently, so each partition is
+indexed concurrently and attached to an index created ON ONLY the parent.
+Partitions created later get the index automatically when attached.
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0023'
+down_revision = '0022'
+branch_labels = None
+depends_on = None
+
+
+USER_INDEXES = [
+    ("idx_users_username_trgm", "USING gin (username gin_trgm_ops)"),
+    ("idx_users_first_name_trgm", "USING gin (first_name gin_trgm_ops)"),
+    ("idx_users_telegram_id_trgm", "USING gin ((CAST(telegram_id AS TEXT)) gin_trgm_ops)"),
+    ("idx_users_last_active_id", "(last_active_at DESC NULLS LAST, id DESC)"),
+]
+
+CONVERSATION_INDEXES = [
+    ("idx_conversations_content_trgm", "USING gin (content gin_trgm_ops)"),
+    ("idx_conversations_content_fts", "USING gin (to_tsvector('simple', content))"),
+]
+
+
+def _create_partitioned_index(bind, table: str, name: str, definition: str) -> None:
+    """Index every partition concurrently, then attach them to the parent index"""
+    op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table} {definition}")
+    partitions = bind.exec_driver_sql(
+        f"SELECT inhrelid::regclass::text FROM pg_inherits "
+        f"WHERE inhparent = '{table}'::regclass"
+    ).scalars().all()
+    for partition in partitions:
+        partition_index = f"{partition}_{name.replace('idx_' + table + '_', '')}_idx"
+        op.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} "
+            f"ON {partition} {definition}"
+        )
+        op.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}")
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        for name, definition in USER_INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON users {definition}")
+        for name, definition in CONVERSATION_INDEXES:
+            _create_partitioned_index(bind, "conversations", name, definition)
+
+    op.execute("ANALYZE users")
+    op.execute("ANALYZE conversations")
+
+
+def downgrade() -> None:
+    # Dropping the parent index drops the attached partition indexes
+    for name, _ in CONVERSATION_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    for name, _ in USER_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
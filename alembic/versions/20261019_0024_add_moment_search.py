@@ -0,0 +1,99 @@
+"""Add per-language full-text search vector to moments
+
+Revision ID: 0024
+Revises: 0023
+Create Date: 2026-10-19
+
+Moment search (/search) combines keyword and vector similarity. The keyword
+side needs a tsvector built with the text search configuration of the
+user's language:
+- moment_search_config(language_code) maps a language code to a regconfig
+  ('simple' for languages without a built-in stemmer: uk, he, ja, zh)
+- moments.content_tsv is filled by a BEFORE INSERT/UPDATE trigger, so every
+  writer (bot, admin panel, scripts) keeps it current
+- idx_moments_content_tsv (GIN) serves the @@ match
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0024'
+down_revision = '0023'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION moment_search_config(language_code TEXT)
+        RETURNS regconfig
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT CASE lower(left(coalesce(language_code, ''), 2))
+                WHEN 'ru' THEN 'russian'
+                WHEN 'en' THEN 'english'
+                WHEN 'es' THEN 'spanish'
+                WHEN 'de' THEN 'german'
+                WHEN 'fr' THEN 'french'
+                WHEN 'pt' THEN 'portuguese'
+                WHEN 'it' THEN 'italian'
+                ELSE 'simple'
+            END::regconfig
+        $$
+    """)
+
+    op.execute("ALTER TABLE moments ADD COLUMN IF NOT EXISTS content_tsv tsvector")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION moments_content_tsv_update()
+        RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.content_tsv := to_tsvector(
+                moment_search_config((SELECT language_code FROM users WHERE id = NEW.user_id)),
+                coalesce(NEW.content, '')
+            );
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER moments_content_tsv_trigger
+        BEFORE INSERT OR UPDATE OF content ON moments
+        FOR EACH ROW EXECUTE FUNCTION moments_content_tsv_update()
+    """)
+
+    with op.get_context().autocommit_block():
+        # Backfill in batches to keep row locks short
+        bind = op.get_bind()
+        while True:
+            result = bind.exec_driver_sql(f"""
+                UPDATE moments m
+                SET content_tsv = to_tsvector(moment_search_config(u.language_code), m.content)
+                FROM users u
+                WHERE u.id = m.user_id
+                  AND m.id IN (
+                      SELECT id FROM moments
+                      WHERE content_tsv IS NULL
+                      LIMIT {BACKFILL_BATCH_SIZE}
+                  )
+            """)
+            if result.rowcount < BACKFILL_BATCH_SIZE:
+                break
+
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_moments_content_tsv
+            ON moments USING gin (content_tsv)
+        """)
+
+    op.execute("ANALYZE moments")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_moments_content_tsv")
+    op.execute("DROP TRIGGER IF EXISTS moments_content_tsv_trigger ON moments")
+    op.execute("DROP FUNCTION IF EXISTS moments_content_tsv_update()")
+    op.execute("ALTER TABLE moments DROP COLUMN IF EXISTS content_tsv")
+    op.execute("DROP FUNCTION IF EXISTS moment_search_config(TEXT)")
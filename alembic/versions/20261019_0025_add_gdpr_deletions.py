@@ -0,0 +1,57 @@
+"""Add user tombstones and GDPR deletion jobs
+
+Revision ID: 0025
+Revises: 0024
+Create Date: 2026-10-19
+
+GDPR deletion no longer removes a user's history in one transaction:
+- users.deleted_at tombstones the user immediately; the bot ignores
+  tombstoned users and sends them nothing
+- gdpr_deletions tracks the background purge of each table in bounded
+  batches (current step and per-table row counts), so it resumes after a
+  crash, and stays behind as the audit record once completed
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0025'
+down_revision = '0024'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMPTZ")
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS gdpr_deletions (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            telegram_id BIGINT NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            current_step VARCHAR(50),
+            progress JSONB NOT NULL DEFAULT '{}'::jsonb,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            requested_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            started_at TIMESTAMPTZ,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            completed_at TIMESTAMPTZ
+        )
+    """)
+    # One open deletion per user; open jobs are what the resume job scans
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_gdpr_deletions_open_user
+        ON gdpr_deletions (user_id)
+        WHERE status IN ('pending', 'running', 'failed')
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_gdpr_deletions_telegram_id
+        ON gdpr_deletions (telegram_id)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS gdpr_deletions")
+    op.execute("ALTER TABLE users DROP COLUMN IF EXISTS deleted_at")
@@ -0,0 +1,52 @@
+"""Add voice transcription cache
+
+Revision ID: 0026
+Revises: 0025
+Create Date: 2026-10-19
+
+Whisper results are cached by Telegram file_unique_id, which is stable
+across forwards and re-sends of the same voice note, so a repeat costs no
+transcription:
+- voice_transcriptions: transcript, detected language, duration and number
+  of transcribed segments per file_unique_id. user_id is the user whose
+  note was transcribed first; GDPR deletion purges their rows
+- moments.original_voice_file_unique_id links a voice moment to its cache row
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0026'
+down_revision = '0025'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS voice_transcriptions (
+            id SERIAL PRIMARY KEY,
+            file_unique_id VARCHAR(64) NOT NULL UNIQUE,
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            transcript TEXT NOT NULL,
+            language VARCHAR(10),
+            duration_seconds INTEGER,
+            segments INTEGER NOT NULL DEFAULT 1,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_voice_transcriptions_user_id
+        ON voice_transcriptions (user_id)
+    """)
+
+    op.execute("""
+        ALTER TABLE moments
+        ADD COLUMN IF NOT EXISTS original_voice_file_unique_id VARCHAR(64)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE moments DROP COLUMN IF EXISTS original_voice_file_unique_id")
+    op.execute("DROP TABLE IF EXISTS voice_transcriptions")
@@ -0,0 +1,48 @@
+"""Add content hashes to knowledge chunks for incremental re-indexing
+
+Revision ID: 0027
+Revises: 0026
+Create Date: 2026-10-19
+
+The knowledge indexer now re-embeds only chunks whose text changed:
+- knowledge_chunks.content_hash (sha256 hex of the chunk text), backfilled
+  for existing chunks so their embeddings are reused on the next re-index
+- a unique (knowledge_base_id, chunk_index) index, the conflict target of
+  the indexer's bulk upsert
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0027'
+down_revision = '0026'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE knowledge_chunks ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)")
+    op.execute("""
+        UPDATE knowledge_chunks
+        SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')
+        WHERE content_hash IS NULL
+    """)
+
+    # Chunks were always rewritten per item, but drop any stray duplicates
+    # before enforcing uniqueness
+    op.execute("""
+        DELETE FROM knowledge_chunks a
+        USING knowledge_chunks b
+        WHERE a.knowledge_base_id = b.knowledge_base_id
+          AND a.chunk_index = b.chunk_index
+          AND a.id < b.id
+    """)
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_knowledge_chunks_kb_chunk
+        ON knowledge_chunks (knowledge_base_id, chunk_index)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_knowledge_chunks_kb_chunk")
+    op.execute("ALTER TABLE knowledge_chunks DROP COLUMN IF EXISTS content_hash")
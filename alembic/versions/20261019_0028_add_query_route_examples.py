@@ -0,0 +1,49 @@
+"""Add labelled query embeddings for the local query router
+
+Revision ID: 0028
+Revises: 0027
+Create Date: 2026-10-19
+
+Dialog turns are routed (A/B/C) by a nearest-centroid classifier over the
+query embedding instead of a chat completion. Its training data:
+- query_route_examples: one query embedding with the label the LLM
+  classifier gave it. Rows come from low-confidence turns that fell back to
+  the LLM, and from the bootstrap script, which labels historical raw
+  dialog memories (memory_id, unique, so a rerun skips them). No message
+  text is stored; user_id is purged by GDPR deletion
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0028'
+down_revision = '0027'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS query_route_examples (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            memory_id INTEGER,
+            embedding vector(1536) NOT NULL,
+            label CHAR(1) NOT NULL,
+            source VARCHAR(20) NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_query_route_examples_user_id
+        ON query_route_examples (user_id)
+    """)
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_query_route_examples_memory_id
+        ON query_route_examples (memory_id)
+        WHERE memory_id IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS query_route_examples")
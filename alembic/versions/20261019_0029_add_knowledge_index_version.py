@@ -0,0 +1,62 @@
+"""Add a version counter for the knowledge base index
+
+Revision ID: 0029
+Revises: 0028
+Create Date: 2026-10-19
+
+The bot can serve knowledge base search from an in-process copy of the
+chunk embeddings. To know when that copy is stale:
+- knowledge_index_state holds a single version counter
+- statement-level triggers bump it whenever knowledge_chunks change or a
+  knowledge_base item changes indexing status or is deleted, so every
+  writer (Python indexer, admin panel) invalidates the copy
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0029'
+down_revision = '0028'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS knowledge_index_state (
+            id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+    op.execute("INSERT INTO knowledge_index_state (id) VALUES (1) ON CONFLICT DO NOTHING")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_knowledge_index_version()
+        RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE knowledge_index_state
+            SET version = version + 1, updated_at = NOW()
+            WHERE id = 1;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER knowledge_chunks_version_trigger
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON knowledge_chunks
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_knowledge_index_version()
+    """)
+    op.execute("""
+        CREATE TRIGGER knowledge_base_version_trigger
+        AFTER UPDATE OF indexing_status OR DELETE ON knowledge_base
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_knowledge_index_version()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS knowledge_base_version_trigger ON knowledge_base")
+    op.execute("DROP TRIGGER IF EXISTS knowledge_chunks_version_trigger ON knowledge_chunks")
+    op.execute("DROP FUNCTION IF EXISTS bump_knowledge_index_version()")
+    op.execute("DROP TABLE IF EXISTS knowledge_index_state")
@@ -0,0 +1,56 @@
+"""Add a generation counter for prompt templates
+
+Revision ID: 0030
+Revises: 0029
+Create Date: 2026-10-19
+
+Every bot process keeps the active prompt templates in memory. To know
+when that copy is stale:
+- prompt_templates_state holds a single generation counter
+- a statement-level trigger bumps it on every write to prompt_templates,
+  so edits made by any writer (Python services, admin panel) reach all
+  processes on their next generation check
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0030'
+down_revision = '0029'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS prompt_templates_state (
+            id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+            generation BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+    op.execute("INSERT INTO prompt_templates_state (id) VALUES (1) ON CONFLICT DO NOTHING")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_prompt_templates_generation()
+        RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE prompt_templates_state
+            SET generation = generation + 1, updated_at = NOW()
+            WHERE id = 1;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER prompt_templates_generation_trigger
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON prompt_templates
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_prompt_templates_generation()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS prompt_templates_generation_trigger ON prompt_templates")
+    op.execute("DROP FUNCTION IF EXISTS bump_prompt_templates_generation()")
+    op.execute("DROP TABLE IF EXISTS prompt_templates_state")
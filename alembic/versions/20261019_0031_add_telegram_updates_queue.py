@@ -0,0 +1,72 @@
+"""Add the durable update queue for webhook mode
+
+Revision ID: 0031
+Revises: 0030
+Create Date: 2026-10-19
+
+In webhook mode the ingest server only stores each Telegram update and
+answers; update workers (any number of processes and containers) handle
+them:
+- update_id is the primary key, so a redelivered update is stored once
+- chat_id is the ordering key: a worker only claims the oldest update of
+  a chat, and only while no other update of that chat is claimed
+- locked_by / locked_until form a renewable lease; an update held by a
+  worker that died is claimed again once the lease runs out
+- handled updates are deleted, so the table holds only the backlog
+- update_workers holds a heartbeat per live worker process, and
+  telegram_chat_workers pins every chat to the worker that handled it
+  last for as long as that worker's heartbeat is fresh. Per-user state
+  kept in process memory (FSM, feedback flow) keeps working with several
+  workers, as it did with one polling process
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0031'
+down_revision = '0030'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS telegram_updates (
+            update_id BIGINT PRIMARY KEY,
+            chat_id BIGINT NOT NULL,
+            payload JSONB NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            locked_by VARCHAR(100),
+            locked_until TIMESTAMPTZ,
+            received_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+    # Serves the per-chat head lookup of every claim
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_telegram_updates_chat_update
+        ON telegram_updates (chat_id, update_id)
+    """)
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS update_workers (
+            worker_id VARCHAR(100) PRIMARY KEY,
+            seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS telegram_chat_workers (
+            chat_id BIGINT PRIMARY KEY,
+            worker_id VARCHAR(100) NOT NULL
+        )
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_telegram_chat_workers_worker
+        ON telegram_chat_workers (worker_id)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS telegram_chat_workers")
+    op.execute("DROP TABLE IF EXISTS update_workers")
+    op.execute("DROP INDEX IF EXISTS ix_telegram_updates_chat_update")
+    op.execute("DROP TABLE IF EXISTS telegram_updates")
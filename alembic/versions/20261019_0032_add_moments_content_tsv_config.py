@@ -0,0 +1,87 @@
+"""Store the text search configuration of each moment's search vector
+
+Revision ID: 0032
+Revises: 0031
+Create Date: 2026-10-19
+
+moments.content_tsv is built with the configuration of the user's language
+at write time, while users.language_code changes whenever the bot detects
+another language. Querying with the current language then stems the query
+differently from the stored vector and keyword search finds nothing.
+
+- moments.content_tsv_config records the configuration (as text: reg*
+  columns block pg_upgrade) the vector was built with; the trigger sets
+  both together
+- search builds one tsquery per configuration found among the user's
+  moments and matches each moment with its own
+- existing rows are rebuilt with the user's current language, so column
+  and vector agree
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0032'
+down_revision = '0031'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE moments ADD COLUMN IF NOT EXISTS content_tsv_config TEXT")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION moments_content_tsv_update()
+        RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.content_tsv_config := moment_search_config(
+                (SELECT language_code FROM users WHERE id = NEW.user_id)
+            )::text;
+            NEW.content_tsv := to_tsvector(
+                NEW.content_tsv_config::regconfig,
+                coalesce(NEW.content, '')
+            );
+            RETURN NEW;
+        END
+        $$
+    """)
+
+    with op.get_context().autocommit_block():
+        # Backfill in batches to keep row locks short
+        bind = op.get_bind()
+        while True:
+            result = bind.exec_driver_sql(f"""
+                UPDATE moments m
+                SET content_tsv_config = moment_search_config(u.language_code)::text,
+                    content_tsv = to_tsvector(moment_search_config(u.language_code), coalesce(m.content, ''))
+                FROM users u
+                WHERE u.id = m.user_id
+                  AND m.id IN (
+                      SELECT id FROM moments
+                      WHERE content_tsv_config IS NULL
+                      LIMIT {BACKFILL_BATCH_SIZE}
+                  )
+            """)
+            if result.rowcount < BACKFILL_BATCH_SIZE:
+                break
+
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION moments_content_tsv_update()
+        RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.content_tsv := to_tsvector(
+                moment_search_config((SELECT language_code FROM users WHERE id = NEW.user_id)),
+                coalesce(NEW.content, '')
+            );
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("ALTER TABLE moments DROP COLUMN IF EXISTS content_tsv_config")
@@ -63,6 +63,28 @@ case "${1:-bot}" in
         echo "Starting bot..."
         exec python -m src.bot.main
         ;;
+    "webhook")
+        # Webhook server only (BOT_MODE=webhook); replicas should set SKIP_MIGRATIONS=1
+        wait_for_postgres
+        if [ "${SKIP_MIGRATIONS:-0}" != "1" ]; then
+            run_migrations
+        else
+            echo "Skipping migrations (SKIP_MIGRATIONS=1)"
+        fi
+        echo "Starting webhook server..."
+        exec python -m src.bot.main --role ingest --processes "${WEBHOOK_PROCESSES:-1}"
+        ;;
+    "worker")
+        # Update workers only (BOT_MODE=webhook); replicas should set SKIP_MIGRATIONS=1
+        wait_for_postgres
+        if [ "${SKIP_MIGRATIONS:-0}" != "1" ]; then
+            run_migrations
+        else
+            echo "Skipping migrations (SKIP_MIGRATIONS=1)"
+        fi
+        echo "Starting update workers..."
+        exec python -m src.bot.main --role worker --processes "${WORKER_PROCESSES:-1}"
+        ;;
     "migrate")
         wait_for_postgres
         if [ "${SKIP_MIGRATIONS:-0}" != "1" ]; then
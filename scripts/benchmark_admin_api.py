@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the FastAPI admin panel (admin/app.py)
+
+Fires concurrent requests at the dashboard endpoints and reports throughput
+and latency per concurrency level, so pool sizing and query changes can be
+compared. Start the admin panel first (python admin/app.py), then run:
+
+    python scripts/benchmark_admin_api.py --url http://localhost:8000 --requests 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+
+ENDPOINTS = ["/api/stats", "/api/users", "/api/conversations"]
+
+
+async def run_level(session, base_url, endpoint, concurrency, total_requests):
+    """Send total_requests to one endpoint with a fixed number of workers"""
+    latencies = []
+    errors = 0
+    remaining = total_requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                async with session.get(base_url + endpoint) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "errors": errors,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Admin panel load benchmark")
+    parser.add_argument("--url", default="http://localhost:8000", help="Admin panel base URL")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and level")
+    parser.add_argument(
+        "--concurrency", default="1,4,16", help="Comma-separated concurrency levels"
+    )
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    print(f"{'endpoint':<22}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    connector = aiohttp.TCPConnector(limit=max(levels))
+    async with aiohttp.ClientSession(connector=connector) as session:
+        for endpoint in ENDPOINTS:
+            # Warm up connections and caches
+            await run_level(session, args.url, endpoint, 1, 5)
+            for concurrency in levels:
+                result = await run_level(session, args.url, endpoint, concurrency, args.requests)
+                print(
+                    f"{endpoint:<22}{concurrency:>6}{result['rps']:>10.1f}"
+                    f"{result['p50']:>10.1f}{result['p95']:>10.1f}{result['errors']:>8}"
+                )
+
+        async with session.get(args.url + "/api/system/timings") as response:
+            if response.status == 200:
+                timings = await response.json()
+                print("\nServer-side timings:")
+                for path, stats in timings["endpoints"].items():
+                    print(
+                        f"  {path:<28} avg {stats['avg_ms']}ms "
+                        f"(db {stats['avg_db_ms']}ms, {stats['avg_queries']} queries), "
+                        f"max {stats['max_ms']}ms"
+                    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Import time, memory and lookup benchmark for src/utils/localization.py
+
+Measures, each in a fresh interpreter:
+- import time and memory allocated by importing the module
+- memory of the compiled catalogs (all languages)
+
+and per-call lookup time of the compiled catalogs against the plain dict
+fallbacks they replaced. Run:
+
+    python scripts/benchmark_localization.py --repeat 5 --calls 200000
+"""
+
+import argparse
+import compileall
+import statistics
+import subprocess
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+ROOT = Path(__file__).parent.parent
+
+# Timed without tracemalloc, which slows imports down several times.
+# typing is imported first: the bot process has it loaded long before.
+TIME_PROBE = """
+import time, typing
+started = time.perf_counter()
+import src.utils.localization
+print((time.perf_counter() - started) * 1000)
+"""
+
+MEMORY_PROBE = """
+import tracemalloc, typing
+tracemalloc.start()
+import src.utils.localization as localization
+imported = tracemalloc.get_traced_memory()[0]
+for lang in localization.SUPPORTED_LANGUAGES:
+    localization.get_catalog(lang)
+localization.find_menu_button("")
+compiled = tracemalloc.get_traced_memory()[0]
+print(imported / 1024, (compiled - imported) / 1024)
+"""
+
+
+def run_probe(probe, repeat):
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", probe],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        runs.append([float(value) for value in output])
+    return [statistics.median(values) for values in zip(*runs)]
+
+
+def dict_system_message(key, language_code, formal=False, **kwargs):
+    """The lookup before catalogs were compiled"""
+    from src.utils.localization import SYSTEM_MESSAGES, get_language_code
+
+    lang = get_language_code(language_code)
+    texts = SYSTEM_MESSAGES.get(lang, SYSTEM_MESSAGES["ru"])
+    if formal and f"{key}_formal" in texts:
+        message = texts[f"{key}_formal"]
+    else:
+        message = texts.get(key, SYSTEM_MESSAGES["ru"].get(key, key))
+    if kwargs:
+        try:
+            return message.format(**kwargs)
+        except (KeyError, ValueError):
+            return message
+    return message
+
+
+def dict_button_match(text, key_texts):
+    """Button matching by scanning each key's texts, as the router filters did"""
+    for key, texts in key_texts.items():
+        if text in texts:
+            return key
+    return None
+
+
+def per_call_us(func, calls):
+    return min(timeit.repeat(func, number=calls, repeat=3)) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Localization import/memory/lookup benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters for the import measurement")
+    parser.add_argument("--calls", type=int, default=200000, help="Calls per lookup timing")
+    args = parser.parse_args()
+
+    # Measure imports from bytecode, as in a deployed bot
+    compileall.compile_dir(str(ROOT / "src" / "utils"), quiet=1)
+    import_ms, = run_probe(TIME_PROBE, args.repeat)
+    import_kib, compiled_kib = run_probe(MEMORY_PROBE, args.repeat)
+    print(f"import: {import_ms:.1f} ms, {import_kib:.0f} KiB allocated")
+    print(f"compiled catalogs (all languages) and button index: {compiled_kib:.0f} KiB")
+
+    from src.utils.localization import (
+        MENU_TEXTS,
+        SUPPORTED_LANGUAGES,
+        find_menu_button,
+        get_all_menu_button_texts,
+        get_system_message,
+    )
+
+    menu_keys = ["menu_moments", "menu_stats", "menu_settings", "menu_talk", "menu_feedback", "menu_pause"]
+    key_texts = {key: get_all_menu_button_texts(key) for key in menu_keys}
+    button = MENU_TEXTS["he"]["menu_pause"]
+    free_text = "Today I had a long walk in the park with my sister"
+
+    lookups = [
+        ("system message", lambda: dict_system_message("saved", "en-US"),
+         lambda: get_system_message("saved", "en-US")),
+        ("formal, formatted", lambda: dict_system_message("active_hours_set", "de", True, start="9", end="21"),
+         lambda: get_system_message("active_hours_set", "de", True, start="9", end="21")),
+        ("ru fallback", lambda: dict_system_message("please_start_first", "ja"),
+         lambda: get_system_message("please_start_first", "ja")),
+        ("button (last)", lambda: dict_button_match(button, key_texts),
+         lambda: find_menu_button(button)),
+        ("free text", lambda: dict_button_match(free_text, key_texts),
+         lambda: find_menu_button(free_text)),
+    ]
+
+    print(f"\nlanguages: {len(SUPPORTED_LANGUAGES)}")
+    print(f"{'lookup':<20}{'dicts us':>10}{'catalog us':>12}")
+    for name, before, after in lookups:
+        print(f"{name:<20}{per_call_us(before, args.calls):>10.3f}{per_call_us(after, args.calls):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Per-message routing overhead of reply keyboard button matching
+
+Routes messages through two aiogram routers with no-op handlers:
+- chain: one F.text.in_(...) filter per menu button, as messages.py had
+- table: a single MenuButtonFilter over the localized button index
+
+each followed by the catch-all F.text handler, and reports the time per
+message for free text (falls through to the catch-all) and for button
+presses. Run:
+
+    python scripts/benchmark_menu_dispatch.py --messages 20000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from aiogram import F, Router
+from aiogram.types import Chat, Message, User
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.bot.filters import MenuButtonFilter
+from src.utils.localization import MENU_TEXTS, get_all_menu_button_texts
+
+MENU_KEYS = ["menu_moments", "menu_stats", "menu_settings", "menu_talk", "menu_feedback", "menu_pause"]
+
+
+async def handled(message: Message) -> str:
+    return "button"
+
+
+async def free_text(message: Message) -> str:
+    return "text"
+
+
+def chain_router() -> Router:
+    router = Router(name="chain")
+    for key in MENU_KEYS:
+        router.message(F.text.in_(get_all_menu_button_texts(key)))(handled)
+    router.message(F.text)(free_text)
+    return router
+
+
+def table_router() -> Router:
+    router = Router(name="table")
+    router.message(MenuButtonFilter(MENU_KEYS))(handled)
+    router.message(F.text)(free_text)
+    return router
+
+
+def make_message(text: str) -> Message:
+    return Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(id=1, type="private"),
+        from_user=User(id=1, is_bot=False, first_name="Bench"),
+        text=text,
+    )
+
+
+async def per_message_us(router: Router, message: Message, expected: str, count: int) -> float:
+    assert await router.propagate_event(update_type="message", event=message) == expected
+    started = time.perf_counter()
+    for _ in range(count):
+        await router.propagate_event(update_type="message", event=message)
+    return (time.perf_counter() - started) / count * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Menu button routing benchmark")
+    parser.add_argument("--messages", type=int, default=20000, help="Messages routed per case")
+    args = parser.parse_args()
+
+    cases = [
+        ("free text", make_message("Today I had a long walk in the park with my sister"), "text"),
+        ("first button (ru)", make_message(MENU_TEXTS["ru"]["menu_moments"]), "button"),
+        ("last button (he)", make_message(MENU_TEXTS["he"]["menu_pause"]), "button"),
+    ]
+    routers = [("chain", chain_router()), ("table", table_router())]
+
+    print(f"{'message':<20}" + "".join(f"{name + ' us':>12}" for name, _ in routers))
+    for name, message, expected in cases:
+        timings = [await per_message_us(router, message, expected, args.messages) for _, router in routers]
+        print(f"{name:<20}" + "".join(f"{timing:>12.2f}" for timing in timings))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Recall and latency benchmark for moment retrieval (src/services/retrieval_scoring.py)
+
+For users with the most moments, queries are generated from their own
+moments (embedding plus noise) and answered by:
+- legacy: top 2*k by cosine distance, recency boost applied in Python
+- fused SQL with each candidate pool size
+
+Recall@k is measured against the exact ranking of the same scoring function
+over all of the user's moments (sequential scan, no ANN index). Run:
+
+    python scripts/benchmark_moment_retrieval.py --users 20 --queries 10 --k 4 --pools 8,20,50,100
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import text
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.db.database import init_db, close_db, get_session
+from src.services.retrieval_scoring import (
+    RECENCY_BOOST_DAYS,
+    RECENCY_BOOST_FACTOR,
+    build_fused_query,
+    get_scoring_function,
+    scoring_params,
+)
+
+MIN_SIMILARITY = 0.0  # Rank everything, so recall is not masked by the threshold
+
+
+def noisy_query(embedding, noise):
+    vector = [x + random.gauss(0, noise) for x in embedding]
+    norm = sum(x * x for x in vector) ** 0.5
+    return [x / norm for x in vector]
+
+
+async def fused(session, sql, user_id, query, pool_size, k):
+    result = await session.execute(
+        text(sql),
+        {
+            "user_id": user_id,
+            "embedding": str(query),
+            "pool_size": pool_size,
+            "min_similarity": MIN_SIMILARITY,
+            "limit": k,
+            **scoring_params(),
+        },
+    )
+    return [row.id for row in result.all()]
+
+
+async def exact(sql, user_id, query, k):
+    async with get_session() as session:
+        # Without index scans the pool is every moment of the user
+        await session.execute(text("SET LOCAL enable_indexscan = off"))
+        await session.execute(text("SET LOCAL enable_bitmapscan = off"))
+        return await fused(session, sql, user_id, query, 10_000_000, k)
+
+
+async def legacy(session, user_id, query, k):
+    """The pre-fusion implementation: over-fetch 2*k, boost in Python"""
+    result = await session.execute(
+        text("""
+            SELECT id, created_at, 1 - (embedding <=> CAST(:embedding AS vector)) AS similarity
+            FROM moments
+            WHERE user_id = :user_id AND embedding IS NOT NULL
+            ORDER BY embedding <=> CAST(:embedding AS vector)
+            LIMIT :limit
+        """),
+        {"user_id": user_id, "embedding": str(query), "limit": k * 2},
+    )
+    now = datetime.now(timezone.utc)
+    scored = []
+    for row in result.all():
+        score = float(row.similarity)
+        if row.created_at > now - timedelta(days=RECENCY_BOOST_DAYS):
+            days_old = (now - row.created_at).days
+            score = min(1.0, score + RECENCY_BOOST_FACTOR * (1 - days_old / RECENCY_BOOST_DAYS))
+        scored.append((score, row.id))
+    scored.sort(reverse=True)
+    return [moment_id for _, moment_id in scored[:k]]
+
+
+def summarize(name, recalls, latencies):
+    latencies.sort()
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(
+        f"{name:<14}{statistics.mean(recalls):>10.3f}"
+        f"{statistics.median(latencies):>10.2f}{p95:>10.2f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Moment retrieval recall/latency benchmark")
+    parser.add_argument("--users", type=int, default=20, help="Users to sample (most moments first)")
+    parser.add_argument("--queries", type=int, default=10, help="Queries per user")
+    parser.add_argument("--k", type=int, default=4, help="Results per query")
+    parser.add_argument("--pools", default="8,20,50,100", help="Comma-separated candidate pool sizes")
+    parser.add_argument("--scoring", default="linear_recency", help="Registered scoring function")
+    parser.add_argument("--noise", type=float, default=0.02, help="Gaussian noise added to query embeddings")
+    args = parser.parse_args()
+
+    scoring = get_scoring_function(args.scoring)
+    sql = build_fused_query("moments", ["id"], scoring, mood_column="mood_score")
+    pools = [int(pool) for pool in args.pools.split(",")]
+
+    await init_db()
+    try:
+        async with get_session() as session:
+            users = (await session.execute(
+                text("""
+                    SELECT user_id, COUNT(*) AS moments
+                    FROM moments WHERE embedding IS NOT NULL
+                    GROUP BY user_id ORDER BY moments DESC LIMIT :users
+                """),
+                {"users": args.users},
+            )).all()
+        if not users:
+            print("No moments with embeddings")
+            return
+        print(f"Users: {len(users)}, moments per user: {users[-1].moments}..{users[0].moments}")
+
+        recalls = {"legacy": [], **{f"pool={pool}": [] for pool in pools}}
+        latencies = {name: [] for name in recalls}
+        for user in users:
+            async with get_session() as session:
+                samples = (await session.execute(
+                    text("""
+                        SELECT CAST(embedding AS TEXT) AS embedding FROM moments
+                        WHERE user_id = :user_id AND embedding IS NOT NULL
+                        ORDER BY random() LIMIT :queries
+                    """),
+                    {"user_id": user.user_id, "queries": args.queries},
+                )).scalars().all()
+
+            for sample in samples:
+                query = noisy_query(json.loads(sample), args.noise)
+                truth = set(await exact(sql, user.user_id, query, args.k))
+                if not truth:
+                    continue
+                async with get_session() as session:
+                    started = time.perf_counter()
+                    found = await legacy(session, user.user_id, query, args.k)
+                    latencies["legacy"].append((time.perf_counter() - started) * 1000)
+                    recalls["legacy"].append(len(truth & set(found)) / len(truth))
+                    for pool in pools:
+                        name = f"pool={pool}"
+                        started = time.perf_counter()
+                        found = await fused(session, sql, user.user_id, query, pool, args.k)
+                        latencies[name].append((time.perf_counter() - started) * 1000)
+                        recalls[name].append(len(truth & set(found)) / len(truth))
+
+        print(f"\n{'method':<14}{f'recall@{args.k}':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for name in recalls:
+            if recalls[name]:
+                summarize(name, recalls[name], latencies[name])
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of the local query router (src/services/query_router.py)
+
+Measures how often the nearest-centroid router agrees with the LLM
+classifier on the labelled examples in query_route_examples, using k-fold
+cross-validation (centroids are built without the held-out fold). For each
+confidence margin it reports coverage (share of queries the router would
+answer instead of falling back to the LLM) and agreement on those queries.
+
+Optionally labels historical raw dialog memories with the LLM classifier
+first, to bootstrap the examples:
+
+    python scripts/eval_query_router.py --bootstrap 500
+    python scripts/eval_query_router.py --folds 5 --margins 0,0.01,0.02,0.04
+"""
+
+import argparse
+import asyncio
+import sys
+from collections import Counter
+from pathlib import Path
+
+from sqlalchemy import text
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.db.database import init_db, close_db, get_session
+from src.services.query_router import (
+    ROUTE_LABELS,
+    bootstrap_examples,
+    compute_centroids,
+    nearest_centroid,
+    normalize,
+    parse_vector,
+)
+
+
+async def load_examples():
+    async with get_session() as session:
+        result = await session.execute(
+            text("""
+                SELECT id, label, CAST(embedding AS TEXT) AS embedding
+                FROM query_route_examples
+                ORDER BY id
+            """)
+        )
+        return [(row.id, row.label, normalize(parse_vector(row.embedding))) for row in result.all()]
+
+
+def cross_validate(examples, folds):
+    """(true label, RouteDecision) for every example, predicted by centroids of the other folds"""
+    predictions = []
+    for fold in range(folds):
+        train = [(label, embedding) for example_id, label, embedding in examples if example_id % folds != fold]
+        centroids = compute_centroids(train)
+        for example_id, label, embedding in examples:
+            if example_id % folds == fold:
+                predictions.append((label, nearest_centroid(embedding, centroids)))
+    return predictions
+
+
+def report(predictions, margins):
+    total = len(predictions)
+    agreed = sum(1 for label, decision in predictions if decision and decision.label == label)
+    print(f"\nExamples: {total}, agreement (no abstention): {agreed / total:.1%}")
+
+    print("\nPer query type:")
+    for label in ROUTE_LABELS:
+        rows = [decision for true_label, decision in predictions if true_label == label]
+        if rows:
+            hits = sum(1 for decision in rows if decision and decision.label == label)
+            print(f"  {label}: {hits}/{len(rows)} ({hits / len(rows):.1%})")
+
+    confusion = Counter((label, decision.label) for label, decision in predictions if decision)
+    print("\nConfusion (rows = LLM label, columns = router label):")
+    print("     " + "".join(f"{label:>7}" for label in ROUTE_LABELS))
+    for label in ROUTE_LABELS:
+        print(f"  {label}  " + "".join(f"{confusion[(label, routed)]:>7}" for routed in ROUTE_LABELS))
+
+    print(f"\n{'margin':>8}{'coverage':>10}{'agreement':>11}{'LLM calls':>11}")
+    for margin in margins:
+        confident = [
+            (label, decision) for label, decision in predictions
+            if decision and decision.margin >= margin
+        ]
+        coverage = len(confident) / total
+        agreement = (
+            sum(1 for label, decision in confident if decision.label == label) / len(confident)
+            if confident else 0.0
+        )
+        print(f"{margin:>8.3f}{coverage:>10.1%}{agreement:>11.1%}{1 - coverage:>11.1%}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Query router offline evaluation")
+    parser.add_argument("--bootstrap", type=int, default=0, help="Label this many historical messages first")
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds")
+    parser.add_argument("--margins", default="0,0.01,0.02,0.03,0.05", help="Comma-separated margins")
+    args = parser.parse_args()
+
+    await init_db()
+    try:
+        if args.bootstrap:
+            from src.services.knowledge_retrieval_service import KnowledgeRetrievalService
+
+            service = KnowledgeRetrievalService()
+            counts = await bootstrap_examples(service.classify_with_llm, args.bootstrap)
+            print(f"Bootstrapped examples: {dict(counts)}")
+
+        examples = await load_examples()
+        if len({label for _, label, _ in examples}) < 2:
+            print("Not enough labelled examples - run with --bootstrap N first")
+            return
+
+        predictions = cross_validate(examples, args.folds)
+        report(predictions, [float(margin) for margin in args.margins.split(",")])
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,4 @@
+# MINDSETHAPPYBOT - Filters module
+from src.bot.filters.menu_button import MenuButtonFilter
+
+__all__ = ["MenuButtonFilter"]
@@ -0,0 +1,30 @@
+"""
+MINDSETHAPPYBOT - Menu button filter
+Matches reply keyboard button presses in any language with one hash lookup
+"""
+from typing import Any, Dict, Iterable, Union
+
+from aiogram.filters import BaseFilter
+from aiogram.types import Message
+
+from src.utils.localization import find_menu_button
+
+
+class MenuButtonFilter(BaseFilter):
+    """
+    Passes messages whose text is one of the given menu buttons.
+
+    The pressed button's key is passed to the handler as menu_button.
+    Free text costs a length check or a single dict lookup.
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self.keys = frozenset(keys)
+
+    async def __call__(self, message: Message) -> Union[bool, Dict[str, Any]]:
+        if not message.text:
+            return False
+        button = find_menu_button(message.text)
+        if button is None or button[0] not in self.keys:
+            return False
+        return {"menu_button": button[0]}
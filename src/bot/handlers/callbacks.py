@@ -831,6 +831,44 @@ async def callback_moments_random(callback: CallbackQuery) -> None:
     await callback.answer()
 
 
+@router.callback_query(F.data == "moments_search")
+async def callback_moments_search(callback: CallbackQuery, state: FSMContext) -> None:
+    """Prompt for a moment search query"""
+    from src.bot.states.search import SearchStates
+
+    language_code = await get_user_language(callback.from_user.id)
+    await state.set_state(SearchStates.waiting_for_query)
+    await callback.message.answer(get_system_message("search_prompt", language_code))
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("search_page_"))
+async def callback_search_page(callback: CallbackQuery) -> None:
+    """Show another page of the current moment search"""
+    from src.bot.handlers.commands import render_search_page
+
+    user_service = UserService()
+    user = await user_service.get_user_by_telegram_id(callback.from_user.id)
+    language_code = get_language_code(user.language_code) if user else "ru"
+
+    try:
+        page = int(callback.data.replace("search_page_", ""))
+    except ValueError:
+        await callback.answer()
+        return
+
+    rendered = await render_search_page(
+        callback.from_user.id, page, language_code, user.timezone if user else None
+    )
+    if rendered is None:
+        await callback.answer(get_system_message("search_expired", language_code), show_alert=True)
+        return
+
+    results_text, keyboard = rendered
+    await callback.message.edit_text(results_text, reply_markup=keyboard)
+    await callback.answer()
+
+
 # Delete confirmation callbacks
 @router.callback_query(F.data == "delete_confirm")
 async def callback_delete_confirm(callback: CallbackQuery) -> None:
@@ -1,15 +1,18 @@
 """
 MINDSETHAPPYBOT - Command handlers
-Handles all bot commands: /start, /help, /settings, /moments, /stats, etc.
+Handles all bot commands: /start, /help, /settings, /moments, /search, /stats, etc.
 """
+import html
 import logging
 from datetime import datetime, timezone as dt_timezone
 from pathlib import Path
 from typing import Optional
 
 from aiogram import Router
-from aiogram.types import Message, FSInputFile, URLInputFile
+from aiogram.types import Message, FSInputFile, URLInputFile, InlineKeyboardMarkup
 from aiogram.filters import Command, CommandStart, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.enums import ChatAction
 
 from src.bot.keyboards.reply import get_main_menu_keyboard
 from src.bot.keyboards.inline import get_settings_keyboard, get_onboarding_keyboard
@@ -213,6 +216,7 @@ async def cmd_help(message: Message) -> None:
     # Additional commands (not in SYSTEM_MESSAGES yet, so use inline approach)
     if language_code.startswith("en"):
         help_moments = "/moments - View moment history"
+        help_search = "/search - Search your moments"
         help_talk = "/talk - Start free dialog"
         how_it_works_title = "💡 <b>How it works</b>"
         how_it_works = (
@@ -223,6 +227,7 @@ async def cmd_help(message: Message) -> None:
         )
     elif language_code.startswith("uk"):
         help_moments = "/moments - Переглянути історію моментів"
+        help_search = "/search - Пошук у твоїх моментах"
         help_talk = "/talk - Почати вільний діалог"
         how_it_works_title = "💡 <b>Як це працює</b>"
         how_it_works = (
@@ -233,6 +238,7 @@ async def cmd_help(message: Message) -> None:
         )
     else:
         help_moments = "/moments - Просмотреть историю моментов"
+        help_search = "/search - Поиск по твоим моментам"
         help_talk = "/talk - Начать свободный диалог"
         how_it_works_title = "💡 <b>Как это работает</b>"
         how_it_works = (
@@ -247,6 +253,7 @@ async def cmd_help(message: Message) -> None:
         f"{help_start}\n"
         f"{help_help}\n"
         f"{help_moments}\n"
+        f"{help_search}\n"
         f"{help_stats}\n"
         f"{help_settings}\n"
         f"{help_talk}\n"
@@ -320,6 +327,83 @@ async def cmd_moments(message: Message) -> None:
     await message.answer(moments_text, reply_markup=get_moments_keyboard(language_code=language_code))
 
 
+async def render_search_page(
+    telegram_id: int,
+    page: int,
+    language_code: str,
+    user_timezone: Optional[str],
+) -> Optional[tuple[str, InlineKeyboardMarkup]]:
+    """
+    Text and keyboard for one page of the user's current search.
+    Returns None if the search session expired.
+    """
+    from src.services.moment_search_service import get_moment_search_service
+    from src.bot.keyboards.inline import get_search_results_keyboard
+
+    search_service = get_moment_search_service()
+    search_session = search_service.get_session(telegram_id)
+    if search_session is None:
+        return None
+
+    page = min(max(page, 1), search_session.total_pages)
+    moments = await search_service.get_page(telegram_id, page)
+    if moments is None:
+        return None
+
+    # The query is user input and the message is sent as HTML
+    query = html.escape(search_session.query)
+    if not search_session.moment_ids:
+        return (
+            get_system_message("search_no_results", language_code, query=query),
+            get_search_results_keyboard(language_code=language_code),
+        )
+
+    results_text = get_system_message("search_results_title", language_code, query=query) + "\n\n"
+    for moment in moments:
+        date_str = _format_moment_date(moment.created_at, user_timezone)
+        content = html.escape(moment.content)
+        content_preview = content[:200] + "..." if len(content) > 200 else content
+        results_text += f"🌟 <i>{date_str}</i>\n{content_preview}\n\n"
+
+    return results_text, get_search_results_keyboard(page, search_session.total_pages, language_code)
+
+
+async def run_moment_search(message: Message, telegram_id: int, query: str) -> None:
+    """Search the user's moments and answer with the first page of results"""
+    from src.services.moment_search_service import get_moment_search_service
+
+    user_service = UserService()
+    user = await user_service.get_user_by_telegram_id(telegram_id)
+    language_code = get_language_code(user.language_code) if user else "ru"
+
+    await message.bot.send_chat_action(message.chat.id, ChatAction.TYPING)
+    await get_moment_search_service().search(telegram_id, query)
+
+    rendered = await render_search_page(telegram_id, 1, language_code, user.timezone if user else None)
+    if rendered is None:
+        await message.answer(get_system_message("search_expired", language_code))
+        return
+    results_text, keyboard = rendered
+    await message.answer(results_text, reply_markup=keyboard)
+
+
+@router.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject, state: FSMContext) -> None:
+    """Handle /search [query] command - search user's moments by words and meaning"""
+    from src.bot.states.search import SearchStates
+
+    await state.clear()
+    if command.args and command.args.strip():
+        await run_moment_search(message, message.from_user.id, command.args)
+        return
+
+    user_service = UserService()
+    user = await user_service.get_user_by_telegram_id(message.from_user.id)
+    language_code = get_language_code(user.language_code) if user else "ru"
+    await state.set_state(SearchStates.waiting_for_query)
+    await message.answer(get_system_message("search_prompt", language_code))
+
+
 @router.message(Command("stats"))
 async def cmd_stats(message: Message) -> None:
     """Handle /stats command - show user statistics"""
@@ -393,6 +477,7 @@ async def cmd_export_data(message: Message) -> None:
     await message.answer("📦 Готовлю твои данные для экспорта...")
 
     gdpr_service = GDPRService()
+    file_data = None
     try:
         file_data = await gdpr_service.export_user_data(message.from_user.id)
         await message.answer_document(
@@ -404,6 +489,9 @@ async def cmd_export_data(message: Message) -> None:
         await message.answer(
             "😔 Не удалось экспортировать данные. Попробуй позже."
         )
+    finally:
+        if file_data is not None:
+            file_data.close()
 
 
 @router.message(Command("delete_data"))
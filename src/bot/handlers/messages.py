@@ -11,14 +11,16 @@ from aiogram.enums import ChatAction
 
 from src.bot.keyboards.reply import get_main_menu_keyboard
 from src.bot.keyboards.inline import get_social_profile_keyboard
+from src.bot.filters import MenuButtonFilter
 from src.bot.states.social_profile import SocialProfileStates
+from src.bot.states.search import SearchStates
 from src.services.moment_service import MomentService
 from src.services.dialog_service import DialogService
-from src.services.speech_service import SpeechToTextService
+from src.services.speech_service import SpeechToTextService, VoiceTooLargeError
 from src.services.personalization_service import PersonalizationService
 from src.services.conversation_log_service import ConversationLogService
 from src.services.social_profile_service import SocialProfileService
-from src.utils.localization import detect_and_update_language, get_all_menu_button_texts, get_language_code, get_menu_text
+from src.utils.localization import detect_and_update_language, get_language_code, get_menu_text
 
 logger = logging.getLogger(__name__)
 router = Router(name="messages")
@@ -27,42 +29,36 @@ dialog_service = DialogService.get_instance()
 conversation_log = ConversationLogService()
 
 
-@router.message(F.text.in_(get_all_menu_button_texts("menu_moments")))
 async def handle_moments_button(message: Message) -> None:
     """Handle 'My moments' button press"""
     from src.bot.handlers.commands import cmd_moments
     await cmd_moments(message)
 
 
-@router.message(F.text.in_(get_all_menu_button_texts("menu_stats")))
 async def handle_stats_button(message: Message) -> None:
     """Handle 'Statistics' button press"""
     from src.bot.handlers.commands import cmd_stats
     await cmd_stats(message)
 
 
-@router.message(F.text.in_(get_all_menu_button_texts("menu_settings")))
 async def handle_settings_button(message: Message) -> None:
     """Handle 'Settings' button press"""
     from src.bot.handlers.commands import cmd_settings
     await cmd_settings(message)
 
 
-@router.message(F.text.in_(get_all_menu_button_texts("menu_talk")))
 async def handle_talk_button(message: Message) -> None:
     """Handle 'Talk' button press"""
     from src.bot.handlers.commands import cmd_talk
     await cmd_talk(message)
 
 
-@router.message(F.text.in_(get_all_menu_button_texts("menu_feedback")))
 async def handle_feedback_button(message: Message) -> None:
     """Handle 'Feedback' button press"""
     from src.bot.handlers.feedback import cmd_feedback
     await cmd_feedback(message)
 
 
-@router.message(F.text.in_(get_all_menu_button_texts("menu_pause")))
 async def handle_pause_button(message: Message) -> None:
     """Handle 'Pause' button press"""
     from src.services.user_service import UserService
@@ -86,6 +82,23 @@ async def handle_pause_button(message: Message) -> None:
     )
 
 
+# Reply keyboard buttons (in every language) -> handler
+MENU_BUTTON_HANDLERS = {
+    "menu_moments": handle_moments_button,
+    "menu_stats": handle_stats_button,
+    "menu_settings": handle_settings_button,
+    "menu_talk": handle_talk_button,
+    "menu_feedback": handle_feedback_button,
+    "menu_pause": handle_pause_button,
+}
+
+
+@router.message(MenuButtonFilter(MENU_BUTTON_HANDLERS))
+async def handle_menu_button(message: Message, menu_button: str) -> None:
+    """Dispatch a menu button press to its handler"""
+    await MENU_BUTTON_HANDLERS[menu_button](message)
+
+
 # Cancel command for FSM states
 @router.message(Command("cancel"), StateFilter(SocialProfileStates))
 async def cancel_social_profile_state(message: Message, state: FSMContext) -> None:
@@ -210,6 +223,30 @@ async def handle_bio_input(message: Message, state: FSMContext) -> None:
         )
 
 
+# Moment search FSM handlers
+@router.message(Command("cancel"), StateFilter(SearchStates))
+async def cancel_search_state(message: Message, state: FSMContext) -> None:
+    """Cancel moment search input"""
+    from src.services.user_service import UserService
+    from src.utils.localization import get_system_message
+    user_service = UserService()
+    user = await user_service.get_user_by_telegram_id(message.from_user.id)
+    language_code = get_language_code(user.language_code) if user else "ru"
+
+    await state.clear()
+    cancelled = get_system_message("cancelled", language_code)
+    await message.answer(f"❌ {cancelled}", reply_markup=get_main_menu_keyboard(language_code))
+
+
+@router.message(StateFilter(SearchStates.waiting_for_query), F.text)
+async def handle_search_query_input(message: Message, state: FSMContext) -> None:
+    """Handle search query typed after /search or the search button"""
+    from src.bot.handlers.commands import run_moment_search
+
+    await state.clear()
+    await run_moment_search(message, message.from_user.id, message.text)
+
+
 @router.message(F.voice)
 async def handle_voice_message(message: Message) -> None:
     """
@@ -248,17 +285,42 @@ async def handle_voice_message(message: Message) -> None:
     speech_service = SpeechToTextService()
 
     try:
-        # Download voice file
         voice = message.voice
-        file = await message.bot.get_file(voice.file_id)
-        file_path = file.file_path
 
         # Download and transcribe - now returns (text, detected_language)
-        transcribed_text, detected_language = await speech_service.transcribe_voice(
-            bot=message.bot,
-            file_path=file_path,
-            telegram_id=message.from_user.id,
-        )
+        try:
+            # A forwarded or re-sent note needs no Bot API call at all
+            cached = await speech_service.get_cached(voice.file_unique_id)
+            if cached:
+                transcribed_text, detected_language = cached
+            else:
+                # Before getFile, which fails for files over 20 MB
+                speech_service.check_size(voice.file_size)
+                file = await message.bot.get_file(voice.file_id)
+                transcribed_text, detected_language = await speech_service.transcribe_voice(
+                    bot=message.bot,
+                    file_path=file.file_path,
+                    telegram_id=message.from_user.id,
+                    file_size=file.file_size or voice.file_size,
+                    file_unique_id=voice.file_unique_id,
+                    duration=voice.duration,
+                )
+        except VoiceTooLargeError:
+            too_large_messages = {
+                "ru": "😔 Голосовое сообщение слишком длинное. Попробуй записать покороче или напиши текстом.",
+                "en": "😔 This voice message is too long. Please record a shorter one or type your message.",
+                "uk": "😔 Голосове повідомлення задовге. Спробуй записати коротше або напиши текстом.",
+                "he": "😔 הודעת הקול ארוכה מדי. נסה להקליט הודעה קצרה יותר או כתוב הודעה.",
+                "ja": "😔 音声メッセージが長すぎます。短く録音し直すか、文字で送ってください。",
+                "zh": "😔 语音消息太长了。请录制更短的语音或输入文字。",
+                "it": "😔 Il messaggio vocale è troppo lungo. Registrane uno più breve o scrivi il messaggio.",
+                "pt": "😔 A mensagem de voz é muito longa. Grave uma mais curta ou escreva sua mensagem.",
+                "fr": "😔 Le message vocal est trop long. Enregistre-en un plus court ou écris ton message.",
+                "de": "😔 Die Sprachnachricht ist zu lang. Nimm eine kürzere auf oder schreibe.",
+                "es": "😔 El mensaje de voz es demasiado largo. Graba uno más corto o escribe tu mensaje.",
+            }
+            await message.answer(too_large_messages.get(ui_lang, too_large_messages["ru"]))
+            return
 
         if not transcribed_text or transcribed_text.strip() == "":
             error_messages = {
@@ -295,7 +357,8 @@ async def handle_voice_message(message: Message) -> None:
             telegram_id=message.from_user.id,
             content=transcribed_text,
             source_type="voice",
-            voice_file_id=voice.file_id
+            voice_file_id=voice.file_id,
+            voice_file_unique_id=voice.file_unique_id,
         )
 
         # Show typing indicator while generating response
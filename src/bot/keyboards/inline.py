@@ -429,9 +429,10 @@ def get_moments_keyboard(page: int = 1, total_pages: int = 1, language_code: str
             nav_row.append(InlineKeyboardButton(text="➡️", callback_data="moments_next"))
         buttons.append(nav_row)
 
-    # Random moment button
+    # Random moment and search buttons
     buttons.append([
         InlineKeyboardButton(text=get_menu_text("random_moment", language_code), callback_data="moments_random"),
+        InlineKeyboardButton(text=get_menu_text("search_moments", language_code), callback_data="moments_search"),
     ])
 
     # Back button
@@ -442,6 +443,30 @@ def get_moments_keyboard(page: int = 1, total_pages: int = 1, language_code: str
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+def get_search_results_keyboard(page: int = 1, total_pages: int = 1, language_code: str = "ru") -> InlineKeyboardMarkup:
+    """Create keyboard for moment search results navigation"""
+    buttons = []
+
+    # Navigation row (if multiple pages)
+    if total_pages > 1:
+        nav_row = []
+        if page > 1:
+            nav_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"search_page_{page - 1}"))
+        nav_row.append(InlineKeyboardButton(text=f"{page}/{total_pages}", callback_data="noop"))
+        if page < total_pages:
+            nav_row.append(InlineKeyboardButton(text="➡️", callback_data=f"search_page_{page + 1}"))
+        buttons.append(nav_row)
+
+    buttons.append([
+        InlineKeyboardButton(text=get_menu_text("search_moments", language_code), callback_data="moments_search"),
+    ])
+    buttons.append([
+        InlineKeyboardButton(text=get_menu_text("all_moments", language_code), callback_data="menu_moments"),
+    ])
+
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
 def get_dialog_keyboard(language_code: str = "ru") -> InlineKeyboardMarkup:
     """Create keyboard for free dialog mode"""
     keyboard = InlineKeyboardMarkup(
@@ -2,8 +2,11 @@
 MINDSETHAPPYBOT - Main bot entry point
 Initializes and runs the Telegram bot using aiogram 3.x
 """
+import argparse
 import asyncio
 import logging
+import multiprocessing
+import signal
 import sys
 
 from aiogram import Bot, Dispatcher
@@ -16,6 +19,9 @@ from src.bot.handlers import commands, messages, callbacks, feedback
 from src.bot.middlewares.logging import LoggingMiddleware
 from src.bot.middlewares.blocked_user import BlockedUserMiddleware
 from src.bot.middlewares.activity import ActivityMiddleware
+from src.bot.middlewares.chat_queue import ChatQueueMiddleware
+from src.bot.update_queue import UpdateWorker
+from src.bot.webhook import check_webhook_settings, start_webhook_server
 from src.services.scheduler import NotificationScheduler
 
 # Configure logging
@@ -29,19 +35,13 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def main() -> None:
-    """Main function to run the bot"""
-    settings = get_settings()
-
-    # Initialize bot with default properties
-    bot = Bot(
-        token=settings.telegram_bot_token,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
-
-    # Initialize dispatcher
+def create_dispatcher(bot: Bot) -> Dispatcher:
+    """Dispatcher with the bot's middlewares and routers"""
     dp = Dispatcher()
 
+    # One chat's updates run one at a time, rapid texts are answered together
+    dp.update.outer_middleware(ChatQueueMiddleware(get_settings().message_coalesce_seconds))
+
     # Register middlewares (BlockedUserMiddleware first to reject blocked users early)
     dp.message.middleware(BlockedUserMiddleware())
     dp.message.middleware(LoggingMiddleware())
@@ -55,31 +55,140 @@ async def main() -> None:
     dp.include_router(feedback.router)  # Feedback router before messages for button handling
     dp.include_router(messages.router)
     dp.include_router(callbacks.router)
+    return dp
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, role: str) -> None:
+    """
+    Serve webhook mode until SIGTERM/SIGINT.
+
+    Roles: "ingest" runs the webhook server, "worker" an update worker,
+    "all" both in one process.
+    """
+    settings = get_settings()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    runner = None
+    worker = None
+    worker_task = None
+    if role in ("all", "ingest"):
+        runner = await start_webhook_server(bot, settings, dp.resolve_used_update_types())
+    if role in ("all", "worker"):
+        worker = UpdateWorker(
+            bot,
+            dp,
+            concurrency=settings.update_worker_concurrency,
+            lease_seconds=settings.update_lease_seconds,
+            max_attempts=settings.update_max_attempts,
+            drain_seconds=settings.update_drain_seconds,
+        )
+        worker_task = asyncio.create_task(worker.run())
+
+    await stop.wait()
+    logger.info("Stop signal received")
+    # Stop accepting updates first; Telegram redelivers them to the next server
+    if runner:
+        await runner.cleanup()
+    if worker is not None and worker_task is not None:
+        worker.stop()
+        await worker_task
+
+
+async def main(role: str = "all") -> None:
+    """Main function to run the bot"""
+    settings = get_settings()
+    webhook_mode = settings.bot_mode == "webhook"
+    if webhook_mode:
+        check_webhook_settings(settings)
+
+    # Initialize bot with default properties
+    bot = Bot(
+        token=settings.telegram_bot_token,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+
+    # Initialize dispatcher
+    dp = create_dispatcher(bot)
 
     # Initialize database
     logger.info("Initializing database connection...")
     await init_db()
 
-    # Initialize scheduler
-    logger.info("Initializing notification scheduler...")
-    scheduler = NotificationScheduler(bot)
-    await scheduler.start()
+    # Initialize scheduler (ingest servers only queue updates and need none)
+    scheduler = None
+    if role != "ingest":
+        logger.info("Initializing notification scheduler...")
+        scheduler = NotificationScheduler(bot)
+        # Several update workers may run: one of them runs the shared jobs
+        await scheduler.start(leader_election=webhook_mode)
 
     try:
-        logger.info("Starting MINDSETHAPPYBOT...")
-        # Delete webhook to use long polling
-        await bot.delete_webhook(drop_pending_updates=True)
-        # Start polling
-        await dp.start_polling(bot)
+        if webhook_mode:
+            logger.info(f"Starting MINDSETHAPPYBOT in webhook mode ({role})...")
+            await run_webhook(bot, dp, role)
+        else:
+            logger.info("Starting MINDSETHAPPYBOT...")
+            # Delete webhook to use long polling; updates sent while the bot was down are kept
+            await bot.delete_webhook(drop_pending_updates=False)
+            # Start polling
+            await dp.start_polling(bot)
     finally:
         logger.info("Shutting down...")
-        await scheduler.stop()
+        if scheduler:
+            await scheduler.stop()
         await close_db()
         await bot.session.close()
 
 
-if __name__ == "__main__":
+def run(role: str) -> None:
     try:
-        asyncio.run(main())
+        asyncio.run(main(role))
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
+
+
+def run_processes(role: str, processes: int) -> None:
+    """Run the role in several processes, one event loop per core"""
+    context = multiprocessing.get_context("spawn")
+    children = [
+        context.Process(target=run, args=(role,), name=f"{role}-{index}")
+        for index in range(processes)
+    ]
+    for child in children:
+        child.start()
+
+    def forward(signum, frame):
+        # Each child drains its in-flight updates on SIGTERM
+        for child in children:
+            if child.is_alive():
+                child.terminate()
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for child in children:
+        child.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run MINDSETHAPPYBOT")
+    parser.add_argument(
+        "--role",
+        choices=["all", "ingest", "worker"],
+        default="all",
+        help="Webhook mode: webhook server, update worker or both (polling mode ignores this)",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="Processes to run the role in (webhook mode)",
+    )
+    args = parser.parse_args()
+
+    if args.processes > 1 and get_settings().bot_mode == "webhook":
+        run_processes(args.role, args.processes)
+    else:
+        run(args.role)
@@ -1,5 +1,6 @@
 # MINDSETHAPPYBOT - Middlewares module
 from src.bot.middlewares.logging import LoggingMiddleware
 from src.bot.middlewares.blocked_user import BlockedUserMiddleware
+from src.bot.middlewares.chat_queue import ChatQueueMiddleware
 
-__all__ = ["LoggingMiddleware", "BlockedUserMiddleware"]
+__all__ = ["LoggingMiddleware", "BlockedUserMiddleware", "ChatQueueMiddleware"]
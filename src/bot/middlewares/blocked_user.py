@@ -1,6 +1,6 @@
 """
 MINDSETHAPPYBOT - Blocked user middleware
-Checks if a user is blocked and prevents them from interacting with the bot
+Checks if a user is blocked (or being deleted) and prevents them from interacting with the bot
 """
 import logging
 from typing import Any, Awaitable, Callable, Dict
@@ -36,15 +36,19 @@ class BlockedUserMiddleware(BaseMiddleware):
             try:
                 async with get_session() as session:
                     result = await session.execute(
-                        select(User.is_blocked).where(User.telegram_id == telegram_id)
+                        select(User.is_blocked, User.deleted_at).where(User.telegram_id == telegram_id)
                     )
-                    row = result.scalar_one_or_none()
+                    row = result.one_or_none()
 
                     # If user exists and is blocked, silently ignore the update
-                    if row is True:
+                    if row is not None and row.is_blocked is True:
                         logger.info(f"Blocked user {telegram_id} tried to interact with bot")
                         return None
-                    elif row is False:
+                    # Tombstoned by a GDPR deletion still being purged
+                    elif row is not None and row.deleted_at is not None:
+                        logger.info(f"Deleted user {telegram_id} tried to interact with bot")
+                        return None
+                    elif row is not None:
                         logger.debug(f"User {telegram_id} is not blocked, allowing request")
             except Exception as e:
                 # If we can't check, allow the request (fail open for user experience)
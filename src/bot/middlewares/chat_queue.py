@@ -0,0 +1,145 @@
+"""
+MINDSETHAPPYBOT - Per-chat update queue middleware
+Handles the updates of one chat one at a time, in arrival order, while
+updates of different chats keep running concurrently.
+
+aiogram runs every update as its own task, so without this a user who
+sends three quick messages gets three parallel moment and response
+pipelines racing on UserStats streaks and dialog state.
+
+Rapid-fire text messages are coalesced: when a plain text message gets
+its turn it waits up to message_coalesce_seconds for follow-ups, takes
+the text messages of the same user queued right behind it, and they are
+handled as one message - one moment, one GPT call.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from src.utils.localization import find_menu_button
+
+logger = logging.getLogger(__name__)
+
+COALESCE_MAX_MESSAGES = 10  # Texts merged into one message at most
+COALESCE_MAX_WAIT_FACTOR = 3  # A message waits at most this many windows for follow-ups
+
+
+def coalescable_text(update: Update) -> Optional[str]:
+    """Text of a plain private text message (not a command or menu button), else None"""
+    message = update.message
+    if message is None or not message.text or message.chat.type != "private":
+        return None
+    text = message.text
+    if text.startswith("/") or find_menu_button(text) is not None:
+        return None
+    return text
+
+
+class _Entry:
+    """One update waiting for or holding its chat's turn"""
+    __slots__ = ("event", "text", "user_id", "arrived_at", "turn", "absorbed", "merged")
+
+    def __init__(self, event: TelegramObject, loop: asyncio.AbstractEventLoop):
+        self.event = event
+        self.text = coalescable_text(event) if isinstance(event, Update) else None
+        user = event.message.from_user if self.text is not None else None
+        self.user_id = user.id if user else None
+        self.arrived_at = loop.time()
+        self.turn = loop.create_future()
+        self.absorbed = False  # Merged into the message of an earlier entry
+        self.merged: List["_Entry"] = []  # Entries merged into this one
+
+
+class ChatQueueMiddleware(BaseMiddleware):
+    """Update outer middleware: per-chat serialization and text coalescing"""
+
+    def __init__(self, coalesce_seconds: float = 1.0):
+        self.coalesce_seconds = coalesce_seconds
+        self.coalesced = 0
+        self._chats: Dict[int, Deque[_Entry]] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        chat = data.get("event_chat")
+        user = data.get("event_from_user")
+        key = chat.id if chat else (user.id if user else None)
+        if key is None:
+            return await handler(event, data)
+
+        # Queued without awaiting anything first, so arrival order is kept
+        entry = _Entry(event, asyncio.get_running_loop())
+        queue = self._chats.setdefault(key, deque())
+        queue.append(entry)
+        try:
+            if queue[0] is not entry:
+                await entry.turn
+            if entry.absorbed:
+                # Handled as part of an earlier message
+                return None
+            if entry.text is not None and await self._stateless(data):
+                event = await self._coalesce(key, queue, entry)
+            return await handler(event, data)
+        except asyncio.CancelledError:
+            for merged in entry.merged:
+                # Not handled: their updates must not count as done either
+                merged.turn.cancel()
+            raise
+        finally:
+            self._finish(key, queue, entry)
+
+    async def _stateless(self, data: Dict[str, Any]) -> bool:
+        # Inside an FSM flow (profile input, search) every message is an answer of its own
+        state = data.get("state")
+        return state is None or await state.get_state() is None
+
+    async def _coalesce(self, key: int, queue: Deque[_Entry], owner: _Entry) -> Update:
+        """Wait for follow-ups and merge the texts queued right behind owner"""
+        loop = asyncio.get_running_loop()
+        deadline = owner.arrived_at + self.coalesce_seconds * COALESCE_MAX_WAIT_FACTOR
+        texts = [owner.text]
+        last = owner
+        while True:
+            while len(queue) > 1 and len(texts) < COALESCE_MAX_MESSAGES:
+                follower = queue[1]
+                if follower.text is None or follower.user_id != owner.user_id:
+                    break
+                del queue[1]
+                follower.absorbed = True
+                owner.merged.append(follower)
+                texts.append(follower.text)
+                last = follower
+            # Another kind of update is next: later texts must wait for it
+            blocked = len(queue) > 1
+            wait = min(last.arrived_at + self.coalesce_seconds, deadline) - loop.time()
+            if blocked or wait <= 0 or len(texts) >= COALESCE_MAX_MESSAGES:
+                break
+            await asyncio.sleep(wait)
+
+        if not owner.merged:
+            return owner.event
+        self.coalesced += len(owner.merged)
+        logger.info(f"Coalesced {len(texts)} messages in chat {key}")
+        message = last.event.message.model_copy(update={"text": "\n".join(texts), "entities": None})
+        return owner.event.model_copy(update={"message": message})
+
+    def _finish(self, key: int, queue: Deque[_Entry], entry: _Entry) -> None:
+        for merged in entry.merged:
+            if not merged.turn.done():
+                merged.turn.set_result(None)
+        if entry.absorbed:
+            return
+        was_running = bool(queue) and queue[0] is entry
+        queue.remove(entry)
+        if not queue:
+            if self._chats.get(key) is queue:
+                del self._chats[key]
+        elif was_running and not queue[0].turn.done():
+            queue[0].turn.set_result(None)
@@ -0,0 +1,9 @@
+"""
+MINDSETHAPPYBOT - Moment search FSM states
+"""
+from aiogram.fsm.state import State, StatesGroup
+
+
+class SearchStates(StatesGroup):
+    """States for moment search"""
+    waiting_for_query = State()
@@ -0,0 +1,396 @@
+"""
+MINDSETHAPPYBOT - Durable update queue for webhook mode
+Telegram updates stored by the webhook server (src/bot/webhook.py) and
+handled by update workers.
+
+Updates live in the telegram_updates table (see migration 0031) until a
+worker has handled them, so nothing is lost when a process restarts:
+- any number of worker processes, in any number of containers, claim
+  updates with FOR UPDATE SKIP LOCKED
+- updates of one chat are handled one at a time, in update_id order;
+  updates of different chats run concurrently. A worker claims the
+  updates queued for a chat together and feeds them in order, and keeps
+  claiming the chat's newly queued updates while it has any in flight;
+  the dispatcher's ChatQueueMiddleware runs them one by one and merges
+  rapid-fire texts among them, including texts that arrive while the
+  first one waits for follow-ups
+- a claim is a lease, renewed while the update is handled; updates of a
+  worker that died are claimed again when their lease runs out. Only the
+  first update of each claimed run counts an attempt: the others wait
+  behind it and have not started when a worker dies, so an update that
+  keeps taking workers down is dropped without charging its chat's queue
+- a chat stays with the worker that handled it while that worker's
+  heartbeat is fresh, so in-process per-user state (FSM states, the
+  feedback flow) sees every update of its chat. State that other
+  processes write as well is not kept in memory in this mode (see
+  src/services/conversation_cache.py)
+- on shutdown a worker stops claiming, lets in-flight updates finish for
+  update_drain_seconds and hands the rest back to the queue
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+from typing import Any, Dict, List, Set, Tuple
+
+from aiogram import Bot, Dispatcher
+from sqlalchemy import text
+
+from src.db.database import get_session
+
+logger = logging.getLogger(__name__)
+
+UPDATE_POLL_SECONDS = 0.2  # Wait between claims while the queue is empty
+UPDATE_RETRY_SECONDS = 2.0  # Wait after a failed claim (database unavailable)
+UPDATE_RUN_LIMIT = 10  # Queued updates of one chat claimed together
+
+# Chats whose oldest update is claimable: not leased, and the chat does
+# not belong to another live worker. Locking that oldest update gates the
+# whole chat; the lease condition is repeated on the locked row because
+# under READ COMMITTED it is rechecked after the row lock, so two workers
+# never claim one chat. The chat's queued updates are claimed with it;
+# only the first of them, the one that starts right away, counts an attempt.
+CLAIM_SQL = """
+    WITH heads AS (
+        SELECT DISTINCT ON (chat_id) update_id, locked_until
+        FROM telegram_updates
+        ORDER BY chat_id, update_id
+    ), gates AS (
+        SELECT t.chat_id
+        FROM telegram_updates t
+        JOIN heads h ON h.update_id = t.update_id
+        LEFT JOIN telegram_chat_workers o ON o.chat_id = t.chat_id
+        LEFT JOIN update_workers w ON w.worker_id = o.worker_id
+        WHERE (h.locked_until IS NULL OR h.locked_until < NOW())
+          AND (t.locked_until IS NULL OR t.locked_until < NOW())
+          AND (
+              o.worker_id IS NULL
+              OR o.worker_id = :worker
+              OR w.seen_at IS NULL
+              OR w.seen_at < NOW() - make_interval(secs => :lease)
+          )
+        ORDER BY t.update_id
+        LIMIT :limit
+        FOR UPDATE OF t SKIP LOCKED
+    ), runs AS (
+        SELECT update_id, position
+        FROM (
+            SELECT r.update_id,
+                   ROW_NUMBER() OVER (PARTITION BY r.chat_id ORDER BY r.update_id) AS position
+            FROM telegram_updates r
+            JOIN gates g ON g.chat_id = r.chat_id
+        ) queued
+        WHERE position <= :run_limit
+    ), claimed AS (
+        UPDATE telegram_updates t
+        SET locked_by = :worker,
+            locked_until = NOW() + make_interval(secs => :lease),
+            attempts = t.attempts + CASE WHEN c.position = 1 THEN 1 ELSE 0 END
+        FROM runs c
+        WHERE t.update_id = c.update_id
+        RETURNING t.update_id, t.chat_id, t.payload, t.attempts
+    ), owned AS (
+        INSERT INTO telegram_chat_workers (chat_id, worker_id)
+        SELECT DISTINCT chat_id, :worker FROM claimed
+        ON CONFLICT (chat_id) DO UPDATE SET worker_id = EXCLUDED.worker_id
+        WHERE telegram_chat_workers.worker_id <> EXCLUDED.worker_id
+    )
+    SELECT update_id, chat_id, payload, attempts FROM claimed
+"""
+
+# Updates queued for chats this worker has in flight. Nobody else claims
+# them: the chat is gated on its oldest row, which this worker holds.
+# They queue behind the running update, so they count no attempt.
+FOLLOW_UP_SQL = """
+    WITH queued AS (
+        SELECT update_id
+        FROM (
+            SELECT update_id,
+                   ROW_NUMBER() OVER (PARTITION BY chat_id ORDER BY update_id) AS position
+            FROM telegram_updates
+            WHERE chat_id = ANY(:chats)
+              AND locked_by IS DISTINCT FROM :worker
+              AND (locked_until IS NULL OR locked_until < NOW())
+        ) pending
+        WHERE position <= :run_limit
+    )
+    UPDATE telegram_updates t
+    SET locked_by = :worker,
+        locked_until = NOW() + make_interval(secs => :lease)
+    FROM queued q
+    WHERE t.update_id = q.update_id
+    RETURNING t.update_id, t.chat_id, t.payload, t.attempts
+"""
+
+HEARTBEAT_SQL = """
+    INSERT INTO update_workers (worker_id, seen_at)
+    VALUES (:worker, NOW())
+    ON CONFLICT (worker_id) DO UPDATE SET seen_at = NOW()
+"""
+
+
+def update_chat_id(update: Dict[str, Any]) -> int:
+    """
+    Ordering key of a raw update: its chat, or its sender when it has no chat.
+
+    Updates that carry neither (polls, for instance) share key 0.
+    """
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat and "id" in chat:
+            return int(chat["id"])
+        sender = event.get("from") or event.get("user")
+        if sender and "id" in sender:
+            return int(sender["id"])
+    return 0
+
+
+async def enqueue_update(update: Dict[str, Any]) -> bool:
+    """
+    Store a raw update for the workers.
+
+    Returns:
+        False if the update was already queued (redelivered by Telegram)
+    """
+    async with get_session() as session:
+        result = await session.execute(
+            text("""
+                INSERT INTO telegram_updates (update_id, chat_id, payload)
+                VALUES (:update_id, :chat_id, CAST(:payload AS JSONB))
+                ON CONFLICT (update_id) DO NOTHING
+            """),
+            {
+                "update_id": int(update["update_id"]),
+                "chat_id": update_chat_id(update),
+                "payload": json.dumps(update, ensure_ascii=False),
+            },
+        )
+        return result.rowcount > 0
+
+
+class UpdateWorker:
+    """Claims queued updates and feeds them to the dispatcher"""
+
+    def __init__(
+        self,
+        bot: Bot,
+        dispatcher: Dispatcher,
+        concurrency: int,
+        lease_seconds: int,
+        max_attempts: int,
+        drain_seconds: int,
+    ):
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self.concurrency = max(1, concurrency)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.drain_seconds = drain_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.handled = 0
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._chats: Dict[int, int] = {}  # chat_id -> updates in flight
+        self._charged: Set[int] = set()  # In-flight updates whose claim counted an attempt
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._registered = False
+
+    def stop(self) -> None:
+        """Stop claiming; run() returns once in-flight updates are drained"""
+        self._stopping = True
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        """Claim and handle updates until stop() is called"""
+        logger.info(f"Update worker {self.worker_id} started (concurrency={self.concurrency})")
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            while not self._stopping:
+                self._wakeup.clear()
+                free = self.concurrency - len(self._chats)
+                follow_ups: List[Tuple[int, int, Any, int]] = []
+                claimed: List[Tuple[int, int, Any, int]] = []
+                try:
+                    if self._chats:
+                        follow_ups = await self.claim_follow_ups(list(self._chats))
+                    if free > 0:
+                        claimed = await self.claim(free)
+                except Exception as e:
+                    logger.error(f"Update worker {self.worker_id}: claim failed: {e}")
+                    await self._wait(UPDATE_RETRY_SECONDS)
+                    continue
+                # In update_id order: the middleware queues a chat's updates as they start
+                for update_id, chat_id, payload, attempts in follow_ups:
+                    self._start(update_id, chat_id, payload, attempts)
+                started_chats = set()
+                for update_id, chat_id, payload, attempts in claimed:
+                    if chat_id not in started_chats:
+                        started_chats.add(chat_id)
+                        self._charged.add(update_id)
+                    self._start(update_id, chat_id, payload, attempts)
+                if not claimed and not follow_ups:
+                    # A finished update may unblock the next one of its chat
+                    await self._wait(UPDATE_POLL_SECONDS)
+        finally:
+            await self._drain()
+            heartbeat.cancel()
+            await self._retire()
+            logger.info(f"Update worker {self.worker_id} stopped, handled {self.handled} updates")
+
+    async def claim(self, limit: int) -> List[Tuple[int, int, Any, int]]:
+        """Lease the queued updates of up to limit chats"""
+        async with get_session() as session:
+            if not self._registered:
+                # Chats are only pinned to a worker with a heartbeat
+                await session.execute(text(HEARTBEAT_SQL), {"worker": self.worker_id})
+                self._registered = True
+            result = await session.execute(
+                text(CLAIM_SQL),
+                {
+                    "limit": limit,
+                    "worker": self.worker_id,
+                    "lease": float(self.lease_seconds),
+                    "run_limit": UPDATE_RUN_LIMIT,
+                },
+            )
+            rows = result.all()
+        return self._decode(rows)
+
+    async def claim_follow_ups(self, chats: List[int]) -> List[Tuple[int, int, Any, int]]:
+        """Lease the updates queued since for chats this worker has in flight"""
+        async with get_session() as session:
+            result = await session.execute(
+                text(FOLLOW_UP_SQL),
+                {
+                    "chats": chats,
+                    "worker": self.worker_id,
+                    "lease": float(self.lease_seconds),
+                    "run_limit": UPDATE_RUN_LIMIT,
+                },
+            )
+            rows = result.all()
+        return self._decode(rows)
+
+    @staticmethod
+    def _decode(rows: Any) -> List[Tuple[int, int, Any, int]]:
+        claimed = []
+        for update_id, chat_id, payload, attempts in sorted(rows):
+            if isinstance(payload, str):
+                payload = json.loads(payload)
+            claimed.append((update_id, chat_id, payload, attempts))
+        return claimed
+
+    def _start(self, update_id: int, chat_id: int, payload: Dict[str, Any], attempts: int) -> None:
+        task = asyncio.create_task(self._handle(update_id, payload, attempts))
+        self._tasks[update_id] = task
+        self._chats[chat_id] = self._chats.get(chat_id, 0) + 1
+
+        def done(_task: asyncio.Task) -> None:
+            self._tasks.pop(update_id, None)
+            self._charged.discard(update_id)
+            self._chats[chat_id] -= 1
+            if not self._chats[chat_id]:
+                del self._chats[chat_id]
+            self._wakeup.set()
+
+        task.add_done_callback(done)
+
+    async def _handle(self, update_id: int, payload: Dict[str, Any], attempts: int) -> None:
+        if attempts > self.max_attempts:
+            # Its earlier claims never finished: the update takes its worker down
+            logger.error(f"Dropping update {update_id} after {attempts - 1} interrupted attempts")
+        else:
+            try:
+                await self.dispatcher.feed_raw_update(self.bot, payload)
+            except Exception:
+                # Already logged by the dispatcher; as in polling, a failed update is not retried
+                pass
+        try:
+            async with get_session() as session:
+                await session.execute(
+                    text("DELETE FROM telegram_updates WHERE update_id = :update_id"),
+                    {"update_id": update_id},
+                )
+            self.handled += 1
+        except Exception as e:
+            # The lease runs out and the update is handled again
+            logger.error(f"Failed to remove handled update {update_id}: {e}")
+
+    async def _heartbeat(self) -> None:
+        """Keep this worker alive and extend the leases of in-flight updates"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                async with get_session() as session:
+                    await session.execute(text(HEARTBEAT_SQL), {"worker": self.worker_id})
+                    if self._tasks:
+                        await session.execute(
+                            text("""
+                                UPDATE telegram_updates
+                                SET locked_until = NOW() + make_interval(secs => :lease)
+                                WHERE update_id = ANY(:update_ids) AND locked_by = :worker
+                            """),
+                            {
+                                "lease": float(self.lease_seconds),
+                                "update_ids": list(self._tasks),
+                                "worker": self.worker_id,
+                            },
+                        )
+            except Exception as e:
+                logger.error(f"Update worker {self.worker_id}: heartbeat failed: {e}")
+
+    async def _drain(self) -> None:
+        """Let in-flight updates finish, then hand the rest back to the queue"""
+        if self._tasks:
+            logger.info(f"Update worker {self.worker_id}: draining {len(self._tasks)} in-flight updates")
+            await asyncio.wait(list(self._tasks.values()), timeout=self.drain_seconds)
+        unfinished = list(self._tasks)
+        if not unfinished:
+            return
+        charged = [update_id for update_id in unfinished if update_id in self._charged]
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        try:
+            # Not counted as an attempt: the worker stopped, the update did not crash it
+            async with get_session() as session:
+                await session.execute(
+                    text("""
+                        UPDATE telegram_updates
+                        SET locked_by = NULL,
+                            locked_until = NULL,
+                            attempts = CASE
+                                WHEN update_id = ANY(:charged) THEN GREATEST(attempts - 1, 0)
+                                ELSE attempts
+                            END
+                        WHERE update_id = ANY(:update_ids) AND locked_by = :worker
+                    """),
+                    {"update_ids": unfinished, "charged": charged, "worker": self.worker_id},
+                )
+            logger.warning(f"Update worker {self.worker_id}: handed back {len(unfinished)} unfinished updates")
+        except Exception as e:
+            logger.error(f"Failed to hand back updates {unfinished}, they return when their lease runs out: {e}")
+
+    async def _retire(self) -> None:
+        """Release this worker's chats to the other workers right away"""
+        try:
+            async with get_session() as session:
+                await session.execute(
+                    text("DELETE FROM telegram_chat_workers WHERE worker_id = :worker"),
+                    {"worker": self.worker_id},
+                )
+                await session.execute(
+                    text("DELETE FROM update_workers WHERE worker_id = :worker"),
+                    {"worker": self.worker_id},
+                )
+        except Exception as e:
+            logger.error(f"Update worker {self.worker_id}: failed to release its chats: {e}")
+
+    async def _wait(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
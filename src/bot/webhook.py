@@ -0,0 +1,107 @@
+"""
+MINDSETHAPPYBOT - Webhook ingest server
+aiohttp server Telegram posts updates to in webhook mode.
+
+It does no handling: a request is checked against the secret token and
+the update is stored in the durable queue (src/bot/update_queue.py)
+before Telegram gets its 200. Any failure answers with an error status,
+so Telegram keeps the update and delivers it again. Ingest servers hold
+no state and can be replicated behind a load balancer.
+"""
+import hmac
+import logging
+import re
+import socket
+from typing import List
+
+from aiohttp import web
+from aiogram import Bot
+
+from src.bot.update_queue import enqueue_update
+from src.config import Settings
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+SECRET_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,256}$")  # Allowed by the Bot API
+
+WEBHOOK_SECRET = web.AppKey("webhook_secret", str)
+
+
+async def receive_update(request: web.Request) -> web.Response:
+    """Store one update; 200 only once it is safely queued"""
+    token = request.headers.get(SECRET_HEADER, "")
+    if not hmac.compare_digest(token.encode(), request.app[WEBHOOK_SECRET].encode()):
+        logger.warning(f"Webhook request with a wrong secret token from {request.remote}")
+        return web.Response(status=401)
+
+    try:
+        update = await request.json()
+    except ValueError:
+        return web.Response(status=400)
+    if not isinstance(update, dict) or not isinstance(update.get("update_id"), int):
+        return web.Response(status=400)
+
+    try:
+        await enqueue_update(update)
+    except Exception as e:
+        # Telegram retries: the update is not lost
+        logger.error(f"Failed to queue update {update['update_id']}: {e}")
+        return web.Response(status=503)
+    return web.Response()
+
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok"})
+
+
+def create_webhook_app(path: str, secret: str) -> web.Application:
+    """aiohttp application with the update endpoint and a health check"""
+    app = web.Application()
+    app[WEBHOOK_SECRET] = secret
+    app.router.add_post(path, receive_update)
+    app.router.add_get("/health", health)
+    return app
+
+
+def check_webhook_settings(settings: Settings) -> None:
+    """Refuse to run webhook mode unauthenticated"""
+    if not SECRET_PATTERN.match(settings.webhook_secret):
+        raise RuntimeError(
+            "WEBHOOK_SECRET must be set to 1-256 characters (A-Z, a-z, 0-9, _ and -) in webhook mode"
+        )
+
+
+async def start_webhook_server(bot: Bot, settings: Settings, allowed_updates: List[str]) -> web.AppRunner:
+    """
+    Start listening and point the bot's webhook at this deployment.
+
+    Returns:
+        The runner; cleanup() stops the server. The webhook stays set, so
+        Telegram holds updates while no server is up.
+    """
+    check_webhook_settings(settings)
+    runner = web.AppRunner(create_webhook_app(settings.webhook_path, settings.webhook_secret))
+    await runner.setup()
+    # Several ingest processes (--processes) share the port where the OS allows it
+    site = web.TCPSite(
+        runner,
+        settings.webhook_host,
+        settings.webhook_port,
+        reuse_port=hasattr(socket, "SO_REUSEPORT"),
+    )
+    await site.start()
+    logger.info(f"Webhook server listening on {settings.webhook_host}:{settings.webhook_port}{settings.webhook_path}")
+
+    if settings.webhook_base_url:
+        await bot.set_webhook(
+            url=settings.webhook_base_url.rstrip("/") + settings.webhook_path,
+            secret_token=settings.webhook_secret,
+            allowed_updates=allowed_updates,
+            max_connections=settings.webhook_max_connections,
+            drop_pending_updates=False,
+        )
+        logger.info("Webhook set")
+    else:
+        logger.warning("WEBHOOK_BASE_URL is not set, the webhook must be registered with Telegram separately")
+    return runner
@@ -61,6 +61,48 @@ class Settings(BaseSettings):
         default=5,
         description="Maximum number of similar moments to retrieve"
     )
+    moment_search_min_similarity: float = Field(
+        default=0.3,
+        description="Minimum cosine similarity for semantic matches in /search"
+    )
+    kb_memory_index_enabled: bool = Field(
+        default=True,
+        description="Serve knowledge base search from an in-process NumPy index (needs numpy)"
+    )
+    retrieval_candidate_pool: int = Field(
+        default=50,
+        description="Nearest neighbours fetched per user before fused scoring (moments, dialog memories)"
+    )
+    moment_scoring_function: str = Field(
+        default="linear_recency",
+        description="Ranking of retrieved moments: similarity, linear_recency or exp_recency"
+    )
+    moment_mood_weight: float = Field(
+        default=0.0,
+        description="Weight of moments.mood_score in moment ranking"
+    )
+    memory_scoring_function: str = Field(
+        default="similarity",
+        description="Ranking of retrieved dialog memories: similarity or importance"
+    )
+    memory_importance_weight: float = Field(
+        default=0.05,
+        description="Weight of conversation_memories.importance for the importance ranking"
+    )
+
+    # Query Router Settings
+    query_router_enabled: bool = Field(
+        default=True,
+        description="Classify dialog queries (A/B/C) locally from the query embedding"
+    )
+    query_router_min_margin: float = Field(
+        default=0.02,
+        description="Minimum similarity gap between the two closest centroids; below it the LLM classifies"
+    )
+    query_router_min_examples: int = Field(
+        default=30,
+        description="Labelled examples needed per query type before the router is used"
+    )
 
     # Semantic Anti-Repeat Settings
     semantic_antirepeat_threshold: float = Field(
@@ -72,6 +114,113 @@ class Settings(BaseSettings):
         description="Number of recent bot replies to check for semantic similarity"
     )
 
+    # Partition Maintenance Settings (monthly partitions, see migration 0021)
+    partition_months_ahead: int = Field(
+        default=3,
+        description="Number of future monthly partitions to keep created"
+    )
+    conversations_retention_months: int = Field(
+        default=0,
+        description="Months of conversations partitions to keep attached (0 = keep forever)"
+    )
+    api_usage_retention_months: int = Field(
+        default=13,
+        description="Months of api_usage partitions to keep attached (0 = keep forever)"
+    )
+    system_logs_retention_months: int = Field(
+        default=3,
+        description="Months of system_logs partitions to keep attached (0 = keep forever)"
+    )
+    partition_drop_expired: bool = Field(
+        default=False,
+        description="Drop expired partitions instead of only detaching them"
+    )
+
+    # Voice Transcription Settings
+    voice_max_file_size_mb: int = Field(
+        default=20,
+        description="Largest voice file accepted for transcription (Telegram bots can download up to 20 MB)"
+    )
+    voice_transcription_concurrency: int = Field(
+        default=4,
+        description="Maximum number of concurrent Whisper requests per process"
+    )
+    voice_chunk_threshold_seconds: int = Field(
+        default=120,
+        description="Voice notes longer than this are transcribed in parallel segments"
+    )
+    voice_chunk_seconds: int = Field(
+        default=60,
+        description="Target segment length for long voice notes"
+    )
+
+    # GDPR Export and Deletion Settings
+    gdpr_export_format: str = Field(
+        default="json",
+        description="Data export format: 'json' (one document) or 'ndjson' (one record per line)"
+    )
+    gdpr_export_gzip: bool = Field(
+        default=False,
+        description="Gzip data exports before sending"
+    )
+    gdpr_delete_batch_size: int = Field(
+        default=1000,
+        description="Rows deleted per transaction when purging a user's data"
+    )
+
+    # Update Processing Settings (see src/bot/middlewares/chat_queue.py)
+    message_coalesce_seconds: float = Field(
+        default=1.0,
+        description="How long a text message waits for follow-ups to be answered together "
+                    "(0: only messages already queued behind a running handler are merged)"
+    )
+
+    # Webhook Settings (bot_mode=webhook, see src/bot/webhook.py and src/bot/update_queue.py)
+    bot_mode: str = Field(
+        default="polling",
+        description="Update delivery: 'polling' (one process) or 'webhook' (ingest server plus update workers)"
+    )
+    webhook_base_url: str = Field(
+        default="",
+        description="Public HTTPS base URL Telegram posts updates to, e.g. https://bot.example.com"
+    )
+    webhook_path: str = Field(
+        default="/telegram/webhook",
+        description="Path of the webhook endpoint"
+    )
+    webhook_secret: str = Field(
+        default="",
+        description="Secret token Telegram sends with every update (1-256 chars: A-Z, a-z, 0-9, _ and -)"
+    )
+    webhook_host: str = Field(
+        default="0.0.0.0",
+        description="Interface the webhook server listens on"
+    )
+    webhook_port: int = Field(
+        default=8081,
+        description="Port the webhook server listens on"
+    )
+    webhook_max_connections: int = Field(
+        default=40,
+        description="Simultaneous connections Telegram opens to the webhook (1-100)"
+    )
+    update_worker_concurrency: int = Field(
+        default=16,
+        description="Chats one worker process handles at once"
+    )
+    update_lease_seconds: int = Field(
+        default=60,
+        description="How long a claimed update stays reserved for its worker; renewed while it is handled"
+    )
+    update_max_attempts: int = Field(
+        default=3,
+        description="Claims of an update by workers that died before it is dropped"
+    )
+    update_drain_seconds: int = Field(
+        default=25,
+        description="On shutdown, how long in-flight updates may finish before they are handed back to the queue"
+    )
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
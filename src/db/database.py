@@ -7,6 +7,7 @@ from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
@@ -80,6 +81,13 @@ async def get_session(auto_commit: bool = True) -> AsyncGenerator[AsyncSession,
             raise
 
 
+def get_engine() -> AsyncEngine:
+    """Get the engine, for work that needs one connection held open"""
+    if _engine is None:
+        raise RuntimeError("Database not initialized. Call init_db() first.")
+    return _engine
+
+
 def get_session_factory() -> async_sessionmaker:
     """Get session factory for dependency injection"""
     if _async_session_factory is None:
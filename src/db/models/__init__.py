@@ -3,6 +3,7 @@ from src.db.models.user import User
 from src.db.models.moment import Moment
 from src.db.models.conversation import Conversation
 from src.db.models.conversation_memory import ConversationMemory
+from src.db.models.conversation_memory_archive import ConversationMemoryArchive
 from src.db.models.user_stats import UserStats
 from src.db.models.scheduled_notification import ScheduledNotification
 from src.db.models.question_template import QuestionTemplate
@@ -12,12 +13,22 @@ from src.db.models.social_profile import SocialProfile
 from src.db.models.api_usage import APIUsage
 from src.db.models.prompt_template import PromptTemplate
 from src.db.models.start_event import StartEvent
+from src.db.models.stats_rollup import (
+    StatsRollupHourly,
+    APIUsageRollupHourly,
+    StatsSnapshot,
+    RollupState,
+)
+from src.db.models.gdpr_deletion import GDPRDeletion
+from src.db.models.voice_transcription import VoiceTranscription
+from src.db.models.query_route_example import QueryRouteExample
 
 __all__ = [
     "User",
     "Moment",
     "Conversation",
     "ConversationMemory",
+    "ConversationMemoryArchive",
     "UserStats",
     "ScheduledNotification",
     "QuestionTemplate",
@@ -27,4 +38,11 @@ __all__ = [
     "APIUsage",
     "PromptTemplate",
     "StartEvent",
+    "StatsRollupHourly",
+    "APIUsageRollupHourly",
+    "StatsSnapshot",
+    "RollupState",
+    "GDPRDeletion",
+    "VoiceTranscription",
+    "QueryRouteExample",
 ]
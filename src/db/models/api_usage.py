@@ -15,6 +15,9 @@ from src.db.database import Base
 class APIUsage(Base):
     """API Usage model - tracks token usage and costs"""
     __tablename__ = "api_usage"
+    # Partitioned by month on created_at; the database primary key is
+    # (id, created_at) (see migration 0021)
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
@@ -5,7 +5,7 @@ Stores all conversation messages for context
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any
 
-from sqlalchemy import Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Integer, String, Text, DateTime, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -27,5 +27,33 @@ class Conversation(Base):
     # Relationships
     user = relationship("User", back_populates="conversations")
 
+    # Partitioned by month on created_at; the database primary key is
+    # (id, created_at) (see migration 0021). id alone stays unique.
+    # Indexes for hot query shapes (see migration 0020)
+    __table_args__ = (
+        Index("idx_conversations_user_type_created", "user_id", "message_type", text("created_at DESC")),
+        Index("idx_conversations_user_created", "user_id", text("created_at DESC")),
+        Index(
+            "idx_conversations_user_messages_id", "user_id", "id",
+            postgresql_where=text("message_type IN ('free_dialog', 'user_response')"),
+        ),
+        Index(
+            "idx_conversations_summary_source", "user_id", text("created_at DESC"),
+            postgresql_where=text(
+                "metadata->>'source' IN ('weekly_summary', 'weekly_summary_fallback', 'monthly_summary')"
+            ),
+        ),
+        # Admin content search (see migration 0023)
+        Index(
+            "idx_conversations_content_trgm", "content",
+            postgresql_using="gin", postgresql_ops={"content": "gin_trgm_ops"},
+        ),
+        Index(
+            "idx_conversations_content_fts", text("to_tsvector('simple', content)"),
+            postgresql_using="gin",
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
     def __repr__(self) -> str:
         return f"<Conversation(id={self.id}, user_id={self.user_id}, type={self.message_type})>"
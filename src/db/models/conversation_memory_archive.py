@@ -0,0 +1,48 @@
+"""
+MINDSETHAPPYBOT - Conversation Memory Archive model
+Cold storage for conversation memories retired by hierarchical compaction.
+Rows here have no embedding and are never searched by the bot.
+"""
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List
+
+from sqlalchemy import Integer, String, Text, Float, DateTime, ForeignKey, ARRAY
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.db.database import Base
+
+
+class ConversationMemoryArchive(Base):
+    """
+    Archived conversation memory - a raw snippet or summary that was rolled
+    up into a higher-tier summary and aged past its retention horizon.
+
+    Kept for traceability only (it is not part of the GDPR export) and
+    purged with the user's other data by GDPR deletion; removed from
+    conversation_memories so that per-user vector search stays small.
+    """
+    __tablename__ = "conversation_memory_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # ID the row had in conversation_memories
+    memory_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    user_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+    source_conversation_ids: Mapped[List[int]] = mapped_column(ARRAY(Integer), nullable=False, default=[])
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    importance: Mapped[float] = mapped_column(Float, default=1.0, nullable=False)
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    memory_metadata: Mapped[Optional[Dict[str, Any]]] = mapped_column("metadata", JSONB, nullable=True)
+
+    # Original creation time and archival time
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self) -> str:
+        return f"<ConversationMemoryArchive(id={self.id}, user_id={self.user_id}, kind={self.kind})>"
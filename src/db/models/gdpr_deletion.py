@@ -0,0 +1,41 @@
+"""
+MINDSETHAPPYBOT - GDPR deletion model
+Tracks the batched background purge of a user's data.
+Maintained by GDPRService (see src/services/gdpr_service.py).
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import BigInteger, Integer, String, Text, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.db.database import Base
+
+
+class GDPRDeletion(Base):
+    """
+    One "delete all my data" request.
+
+    status: pending -> running -> completed (or failed, retried later).
+    progress maps each purged table to the number of rows removed so far.
+    Completed rows are kept as the audit record of the deletion; user_id has
+    no foreign key because the user row is purged last.
+    """
+    __tablename__ = "gdpr_deletions"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    telegram_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")
+    current_step: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    progress: Mapped[Dict[str, Any]] = mapped_column(JSONB, nullable=False, default=dict)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    requested_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<GDPRDeletion(id={self.id}, user_id={self.user_id}, status={self.status})>"
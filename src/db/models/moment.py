@@ -5,8 +5,9 @@ Stores user's positive moments with vector embeddings
 from datetime import datetime, timezone
 from typing import Optional, List
 
-from sqlalchemy import Integer, String, Text, Float, DateTime, ForeignKey, ARRAY
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import Integer, String, Text, Float, DateTime, ForeignKey, ARRAY, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import Mapped, mapped_column, relationship, deferred
 from pgvector.sqlalchemy import Vector
 
 from src.db.database import Base
@@ -21,10 +22,19 @@ class Moment(Base):
     content: Mapped[str] = mapped_column(Text, nullable=False)
     source_type: Mapped[str] = mapped_column(String(20), default="text")  # 'text' or 'voice'
     original_voice_file_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    original_voice_file_unique_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)  # Key of voice_transcriptions
     embedding = mapped_column(Vector(1536), nullable=True)  # OpenAI text-embedding-3-small dimension
     mood_score: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # -1 to 1
     topics: Mapped[Optional[List[str]]] = mapped_column(ARRAY(String), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True)
+    # Full-text search vector in the user's language, maintained by a DB trigger (migration 0024)
+    content_tsv = deferred(mapped_column(TSVECTOR, nullable=True))
+    # Text search configuration content_tsv was built with (migration 0032)
+    content_tsv_config = deferred(mapped_column(Text, nullable=True))
+
+    __table_args__ = (
+        Index("idx_moments_content_tsv", "content_tsv", postgresql_using="gin"),
+    )
 
     # Relationships
     user = relationship("User", back_populates="moments")
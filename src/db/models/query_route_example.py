@@ -0,0 +1,30 @@
+"""
+MINDSETHAPPYBOT - Query route example model
+Labelled query embeddings the local query router is trained on
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import Integer, String, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from pgvector.sqlalchemy import Vector
+
+from src.db.database import Base
+
+
+class QueryRouteExample(Base):
+    """Embedding of one user query with its LLM-assigned query type (A/B/C)"""
+    __tablename__ = "query_route_examples"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    user_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
+    # Raw dialog memory the example was bootstrapped from, if any
+    memory_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    embedding = mapped_column(Vector(1536), nullable=False)
+    label: Mapped[str] = mapped_column(String(1), nullable=False)
+    # 'fallback' (live LLM classification) or 'bootstrap'
+    source: Mapped[str] = mapped_column(String(20), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self) -> str:
+        return f"<QueryRouteExample(id={self.id}, label={self.label}, source={self.source})>"
@@ -0,0 +1,54 @@
+"""
+MINDSETHAPPYBOT - Stats rollup models
+Pre-aggregated hourly statistics for the admin dashboard.
+Maintained by the stats rollup job (see StatsRollupService).
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import BigInteger, String, DateTime, Numeric
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.db.database import Base
+
+
+class StatsRollupHourly(Base):
+    """Row count of one metric (e.g. 'moments') created during one hour"""
+    __tablename__ = "stats_rollups_hourly"
+
+    metric: Mapped[str] = mapped_column(String(50), primary_key=True)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    value: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class APIUsageRollupHourly(Base):
+    """API usage aggregated per model, operation type and hour"""
+    __tablename__ = "api_usage_rollups_hourly"
+
+    bucket_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    model: Mapped[str] = mapped_column(String(100), primary_key=True)
+    operation_type: Mapped[str] = mapped_column(String(50), primary_key=True)
+    requests: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    total_tokens: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    cost_usd: Mapped[Decimal] = mapped_column(Numeric(precision=16, scale=6), nullable=False, default=0)
+
+
+class StatsSnapshot(Base):
+    """Point-in-time dashboard counter (e.g. 'total_users', 'active_users_24h')"""
+    __tablename__ = "stats_snapshots"
+
+    metric: Mapped[str] = mapped_column(String(50), primary_key=True)
+    value: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    computed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+
+class RollupState(Base):
+    """
+    Progress of a rollup: hours before `watermark` are aggregated,
+    rows from `watermark` on must be read from the raw tables.
+    """
+    __tablename__ = "rollup_state"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    watermark: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    refreshed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
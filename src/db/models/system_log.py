@@ -15,6 +15,9 @@ from src.db.database import Base
 
 class SystemLog(Base):
     __tablename__ = "system_logs"
+    # Partitioned by month on created_at; the database primary key is
+    # (id, created_at) (see migration 0021)
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     level: Mapped[str] = mapped_column(String(20), nullable=False, index=True)
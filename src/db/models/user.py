@@ -5,7 +5,7 @@ Stores Telegram user information and settings
 from datetime import datetime, time, timezone
 from typing import Optional
 
-from sqlalchemy import BigInteger, Boolean, String, Time, Integer, DateTime
+from sqlalchemy import BigInteger, Boolean, String, Time, Integer, DateTime, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.db.database import Base
@@ -34,6 +34,8 @@ class User(Base):
     is_blocked: Mapped[bool] = mapped_column(Boolean, default=False)
     notifications_paused_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True, default=None)
     is_in_dialog: Mapped[bool] = mapped_column(Boolean, default=False)  # Track dialog state in DB
+    # GDPR deletion tombstone: set when deletion is requested, the row is purged later
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True, default=None)
 
     # Tracking field for incremental memory indexing
     last_memory_indexed_conversation_id: Mapped[int] = mapped_column(Integer, default=0)
@@ -63,5 +65,22 @@ class User(Base):
     conversation_memories = relationship("ConversationMemory", back_populates="user", cascade="all, delete-orphan")
     start_events = relationship("StartEvent", back_populates="user", cascade="all, delete-orphan")
 
+    # Admin search and keyset pagination indexes (see migration 0023)
+    __table_args__ = (
+        Index(
+            "idx_users_username_trgm", "username",
+            postgresql_using="gin", postgresql_ops={"username": "gin_trgm_ops"},
+        ),
+        Index(
+            "idx_users_first_name_trgm", "first_name",
+            postgresql_using="gin", postgresql_ops={"first_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "idx_users_telegram_id_trgm", text("(CAST(telegram_id AS TEXT)) gin_trgm_ops"),
+            postgresql_using="gin",
+        ),
+        Index("idx_users_last_active_id", text("last_active_at DESC NULLS LAST"), text("id DESC")),
+    )
+
     def __repr__(self) -> str:
         return f"<User(id={self.id}, telegram_id={self.telegram_id}, username={self.username})>"
@@ -0,0 +1,30 @@
+"""
+MINDSETHAPPYBOT - Voice transcription model
+Cache of Whisper results keyed by Telegram file_unique_id
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.db.database import Base
+
+
+class VoiceTranscription(Base):
+    """Transcript of one voice note, reused when the same note is sent again"""
+    __tablename__ = "voice_transcriptions"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    file_unique_id: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    # User whose note was transcribed first
+    user_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
+    transcript: Mapped[str] = mapped_column(Text, nullable=False)
+    language: Mapped[Optional[str]] = mapped_column(String(10), nullable=True)
+    duration_seconds: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    segments: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    hits: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self) -> str:
+        return f"<VoiceTranscription(file_unique_id={self.file_unique_id}, language={self.language})>"
@@ -7,13 +7,24 @@ Indexes rows in `knowledge_base` by:
 - writing into `knowledge_chunks`
 - updating `knowledge_base.indexing_status` to 'indexed' (as expected by admin UI stats)
 
+Re-indexing is incremental: every chunk carries a sha256 `content_hash`, and
+only chunks whose text is new to the item are embedded (in batched requests).
+Unchanged chunks keep their row, moved chunks reuse their old embedding, and
+all writes for an item are one bulk upsert. Pending items are indexed
+concurrently, at most INDEX_CONCURRENCY at a time. Every write bumps
+knowledge_index_state.version (trigger, migration 0029), which makes the
+bot reload its in-process knowledge base index.
+
 Run inside Docker bot container:
   python -m src.knowledge_indexer
 """
 
 import asyncio
+import hashlib
 import logging
-from typing import List, Tuple
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 
 from sqlalchemy import text
 
@@ -25,6 +36,13 @@ logger = logging.getLogger(__name__)
 # Chunking defaults (chars). Good enough for a first pass; refine later to token-based if needed.
 CHUNK_SIZE = 1200
 CHUNK_OVERLAP = 200
+# Paragraph packing: a chunk may close early at an "anchor" paragraph once it
+# holds CHUNK_MIN_SIZE chars, so boundaries re-synchronise soon after an edit
+CHUNK_MIN_SIZE = 400
+ANCHOR_MODULUS = 3
+
+EMBEDDING_BATCH_SIZE = 64  # Chunks per embeddings request
+INDEX_CONCURRENCY = 4  # Items indexed at the same time
 
 
 def split_text_into_chunks(text_value: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
@@ -60,11 +78,114 @@ def split_text_into_chunks(text_value: str, chunk_size: int = CHUNK_SIZE, overla
     return chunks
 
 
+def chunk_hash(chunk: str) -> str:
+    """sha256 hex of a chunk; matches encode(sha256(convert_to(content, 'UTF8')), 'hex') in SQL"""
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+
+
+def _is_anchor(paragraph: str) -> bool:
+    return int(chunk_hash(paragraph)[:8], 16) % ANCHOR_MODULUS == 0
+
+
+def chunk_document(text_value: str, chunk_size: int = CHUNK_SIZE) -> List[str]:
+    """
+    Split a document into chunks along paragraph boundaries.
+
+    Paragraphs are packed greedily up to chunk_size; a paragraph longer than
+    chunk_size is split with split_text_into_chunks. Besides the size limit,
+    a chunk also closes after an anchor paragraph (chosen by content hash)
+    once it holds CHUNK_MIN_SIZE chars. Boundaries therefore depend on local
+    content, so editing one paragraph changes only the chunks around it
+    instead of shifting every chunk after it.
+    """
+    if not text_value or not text_value.strip():
+        return []
+
+    paragraphs = [p.strip() for p in text_value.split("\n\n") if p.strip()]
+    chunks: List[str] = []
+    current: List[str] = []
+    current_size = 0
+
+    def close_current() -> None:
+        nonlocal current, current_size
+        if current:
+            chunks.append("\n\n".join(current))
+        current, current_size = [], 0
+
+    for paragraph in paragraphs:
+        if len(paragraph) > chunk_size:
+            close_current()
+            chunks.extend(split_text_into_chunks(paragraph, chunk_size))
+            continue
+        if current and current_size + 2 + len(paragraph) > chunk_size:
+            close_current()
+        current.append(paragraph)
+        current_size += len(paragraph) + (2 if current_size else 0)
+        if current_size >= CHUNK_MIN_SIZE and _is_anchor(paragraph):
+            close_current()
+
+    close_current()
+    return chunks
+
+
 def _vector_literal(embedding: List[float]) -> str:
     # pgvector accepts text literal like: [0.1,0.2,...]
     return "[" + ",".join(f"{x:.10g}" for x in embedding) + "]"
 
 
+@dataclass
+class IndexStats:
+    """Outcome of indexing one item"""
+    item_id: int
+    chunks: int = 0
+    embedded: int = 0  # Chunks sent to the embeddings API
+    reused: int = 0  # Chunks whose existing embedding was kept
+    removed: int = 0  # Trailing chunks deleted
+    seconds: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds > 0 else 0.0
+
+
+@dataclass
+class _PlannedChunk:
+    index: int
+    content: str
+    content_hash: str
+    source_id: Optional[int] = None  # Existing row with the same text, if any
+    embedding: Optional[List[float]] = None
+
+
+def plan_chunks(
+    chunks: List[str],
+    existing: Dict[int, Tuple[int, Optional[str]]],
+) -> Tuple[List[_PlannedChunk], int]:
+    """
+    Decide which chunks need writing.
+
+    Args:
+        chunks: new chunk texts in order
+        existing: chunk_index -> (row id, content_hash) of the stored chunks
+
+    Returns:
+        (chunks to upsert, number of chunks left untouched). A chunk to
+        upsert has source_id set if another stored row already has its
+        text (its embedding is copied), otherwise it needs embedding.
+    """
+    by_hash = {h: row_id for row_id, h in existing.values() if h}
+    planned: List[_PlannedChunk] = []
+    unchanged = 0
+    for index, chunk in enumerate(chunks):
+        digest = chunk_hash(chunk)
+        stored = existing.get(index)
+        if stored and stored[1] == digest:
+            unchanged += 1
+            continue
+        planned.append(_PlannedChunk(index, chunk, digest, source_id=by_hash.get(digest)))
+    return planned, unchanged
+
+
 async def _fetch_pending_items(limit: int = 50) -> List[Tuple[int, str]]:
     async with get_session() as session:
         result = await session.execute(
@@ -82,9 +203,61 @@ async def _fetch_pending_items(limit: int = 50) -> List[Tuple[int, str]]:
         return [(int(r.id), str(r.title)) for r in result.fetchall()]
 
 
-async def index_item(item_id: int, embedding_service: EmbeddingService) -> bool:
+async def _set_status(item_id: int, status: str, error: Optional[str] = None) -> None:
     async with get_session() as session:
-        try:
+        await session.execute(
+            text(
+                """
+                UPDATE knowledge_base
+                SET indexing_status = :status,
+                    indexing_error = :err,
+                    updated_at = NOW()
+                WHERE id = :id
+                """
+            ),
+            {"id": item_id, "status": status, "err": error},
+        )
+
+
+async def _embed_chunks(
+    planned: List[_PlannedChunk],
+    embedding_service: EmbeddingService,
+) -> int:
+    """
+    Embed the chunks that have no reusable embedding, EMBEDDING_BATCH_SIZE
+    per request. Identical texts are embedded once.
+
+    Returns the number of texts sent; raises RuntimeError if any failed.
+    """
+    pending: Dict[str, List[_PlannedChunk]] = {}
+    for chunk in planned:
+        if chunk.source_id is None:
+            pending.setdefault(chunk.content_hash, []).append(chunk)
+
+    texts = [chunks[0].content for chunks in pending.values()]
+    groups = list(pending.values())
+    for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        batch = texts[start:start + EMBEDDING_BATCH_SIZE]
+        embeddings = await embedding_service.create_embeddings(batch)
+        for chunks, embedding in zip(groups[start:start + EMBEDDING_BATCH_SIZE], embeddings):
+            if embedding is None:
+                raise RuntimeError("Failed to create embeddings for changed chunks")
+            for chunk in chunks:
+                chunk.embedding = embedding
+    return len(texts)
+
+
+async def index_item(item_id: int, embedding_service: EmbeddingService) -> Optional[IndexStats]:
+    """
+    (Re-)index one knowledge base item.
+
+    Returns per-item stats, or None if the item was not indexed (missing,
+    empty or an error - the error is stored in indexing_error).
+    """
+    started = time.monotonic()
+    stats = IndexStats(item_id=item_id)
+    try:
+        async with get_session() as session:
             row = (
                 await session.execute(
                     text(
@@ -100,7 +273,7 @@ async def index_item(item_id: int, embedding_service: EmbeddingService) -> bool:
 
             if not row:
                 logger.warning("KB item %s not found", item_id)
-                return False
+                return None
 
             title = str(row.title)
             content = str(row.content or "")
@@ -118,119 +291,144 @@ async def index_item(item_id: int, embedding_service: EmbeddingService) -> bool:
                 {"id": item_id},
             )
 
-            chunks = split_text_into_chunks(content)
-            if not chunks:
+            existing_rows = (
                 await session.execute(
                     text(
                         """
-                        UPDATE knowledge_base
-                        SET indexing_status = 'error',
-                            indexing_error = 'Empty content',
-                            updated_at = NOW()
-                        WHERE id = :id
+                        SELECT id, chunk_index, content_hash
+                        FROM knowledge_chunks
+                        WHERE knowledge_base_id = :id AND embedding IS NOT NULL
                         """
                     ),
                     {"id": item_id},
                 )
-                logger.error("KB item %s has empty content: %s", item_id, title)
-                return False
+            ).fetchall()
 
-            # Reset existing chunks (idempotent)
-            await session.execute(
-                text("DELETE FROM knowledge_chunks WHERE knowledge_base_id = :id"),
-                {"id": item_id},
-            )
+        chunks = chunk_document(content)
+        if not chunks:
+            await _set_status(item_id, "error", "Empty content")
+            logger.error("KB item %s has empty content: %s", item_id, title)
+            return None
+
+        existing = {int(r.chunk_index): (int(r.id), r.content_hash) for r in existing_rows}
+        planned, unchanged = plan_chunks(chunks, existing)
 
-            chunks_inserted = 0
-            for idx, chunk_text in enumerate(chunks):
-                embedding = await embedding_service.create_embedding(chunk_text)
-                if embedding is None:
-                    logger.warning("Embedding failed for KB item %s chunk %s", item_id, idx)
-                    continue
+        # Embeddings are requested outside of any transaction
+        stats.embedded = await _embed_chunks(planned, embedding_service)
 
+        async with get_session() as session:
+            if planned:
                 await session.execute(
                     text(
                         """
                         INSERT INTO knowledge_chunks
-                            (knowledge_base_id, chunk_index, content, embedding, created_at)
-                        VALUES
-                            (:kb_id, :chunk_index, :content, :embedding::vector, NOW())
+                            (knowledge_base_id, chunk_index, content, content_hash, embedding, created_at)
+                        SELECT :kb_id, n.chunk_index, n.content, n.content_hash,
+                               COALESCE(CAST(n.embedding AS vector), old.embedding), NOW()
+                        FROM unnest(
+                            CAST(:indexes AS int[]),
+                            CAST(:contents AS text[]),
+                            CAST(:hashes AS text[]),
+                            CAST(:sources AS int[]),
+                            CAST(:embeddings AS text[])
+                        ) AS n(chunk_index, content, content_hash, source_id, embedding)
+                        LEFT JOIN knowledge_chunks old ON old.id = n.source_id
+                        ON CONFLICT (knowledge_base_id, chunk_index) DO UPDATE
+                        SET content = EXCLUDED.content,
+                            content_hash = EXCLUDED.content_hash,
+                            embedding = EXCLUDED.embedding,
+                            created_at = EXCLUDED.created_at
                         """
                     ),
                     {
                         "kb_id": item_id,
-                        "chunk_index": idx,
-                        "content": chunk_text,
-                        "embedding": _vector_literal(embedding),
+                        "indexes": [c.index for c in planned],
+                        "contents": [c.content for c in planned],
+                        "hashes": [c.content_hash for c in planned],
+                        "sources": [c.source_id for c in planned],
+                        "embeddings": [
+                            _vector_literal(c.embedding) if c.embedding is not None else None
+                            for c in planned
+                        ],
                     },
                 )
-                chunks_inserted += 1
 
-            if chunks_inserted <= 0:
-                await session.execute(
-                    text(
-                        """
-                        UPDATE knowledge_base
-                        SET indexing_status = 'error',
-                            indexing_error = 'Failed to create embeddings for all chunks',
-                            chunks_count = 0,
-                            updated_at = NOW()
-                        WHERE id = :id
-                        """
-                    ),
-                    {"id": item_id},
-                )
-                logger.error("KB item %s produced 0 chunks with embeddings: %s", item_id, title)
-                return False
-
-            await session.execute(
+            removed = await session.execute(
                 text(
                     """
-                    UPDATE knowledge_base
-                    SET indexing_status = 'indexed',
-                        indexing_error = NULL,
-                        chunks_count = :chunks_count,
-                        updated_at = NOW()
-                    WHERE id = :id
+                    DELETE FROM knowledge_chunks
+                    WHERE knowledge_base_id = :id
+                      AND (chunk_index >= :chunks_count OR embedding IS NULL)
                     """
                 ),
-                {"id": item_id, "chunks_count": chunks_inserted},
+                {"id": item_id, "chunks_count": len(chunks)},
             )
 
-            logger.info("✅ KB indexed: id=%s title=%s chunks=%s", item_id, title, chunks_inserted)
-            return True
-
-        except Exception as e:
-            logger.exception("❌ KB index error for item %s: %s", item_id, e)
-            await session.rollback()
-            # Best effort: mark item as error
             await session.execute(
                 text(
                     """
                     UPDATE knowledge_base
-                    SET indexing_status = 'error',
-                        indexing_error = :err,
+                    SET indexing_status = 'indexed',
+                        indexing_error = NULL,
+                        chunks_count = :chunks_count,
                         updated_at = NOW()
                     WHERE id = :id
                     """
                 ),
-                {"id": item_id, "err": str(e)[:1000]},
+                {"id": item_id, "chunks_count": len(chunks)},
             )
-            return False
+
+        stats.chunks = len(chunks)
+        stats.reused = unchanged + sum(1 for c in planned if c.source_id is not None)
+        stats.removed = removed.rowcount or 0
+        stats.seconds = time.monotonic() - started
+
+        logger.info(
+            "✅ KB indexed: id=%s title=%s chunks=%s embedded=%s reused=%s removed=%s (%.2fs, %.1f chunks/s)",
+            item_id, title, stats.chunks, stats.embedded, stats.reused, stats.removed,
+            stats.seconds, stats.chunks_per_second,
+        )
+        return stats
+
+    except Exception as e:
+        logger.exception("❌ KB index error for item %s: %s", item_id, e)
+        # Best effort: mark item as error. Stored chunks are left as they
+        # were, so a failed re-index does not lose the previous index.
+        try:
+            await _set_status(item_id, "error", str(e)[:1000])
+        except Exception:
+            logger.exception("Failed to mark KB item %s as error", item_id)
+        return None
 
 
-async def index_pending(limit: int = 50) -> None:
+async def index_pending(limit: int = 50, concurrency: int = INDEX_CONCURRENCY) -> List[IndexStats]:
     pending = await _fetch_pending_items(limit=limit)
     if not pending:
         logger.info("No pending KB items.")
-        return
+        return []
 
     logger.info("Found %s pending KB item(s)", len(pending))
     embedding_service = EmbeddingService()
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.monotonic()
+
+    async def run(item_id: int, title: str) -> Optional[IndexStats]:
+        async with semaphore:
+            logger.info("Indexing KB item %s: %s", item_id, title)
+            return await index_item(item_id, embedding_service)
 
-    for item_id, title in pending:
-        logger.info("Indexing KB item %s: %s", item_id, title)
-        await index_item(item_id, embedding_service)
+    results = await asyncio.gather(*(run(item_id, title) for item_id, title in pending))
+    indexed = [stats for stats in results if stats is not None]
+
+    elapsed = time.monotonic() - started
+    total_chunks = sum(stats.chunks for stats in indexed)
+    logger.info(
+        "KB indexing done: %s/%s item(s), %s chunk(s), %s embedded, %s reused in %.2fs (%.1f chunks/s)",
+        len(indexed), len(pending), total_chunks,
+        sum(stats.embedded for stats in indexed), sum(stats.reused for stats in indexed),
+        elapsed, total_chunks / elapsed if elapsed > 0 else 0.0,
+    )
+    return indexed
 
 
 async def main() -> None:
@@ -244,5 +442,3 @@ async def main() -> None:
 
 if __name__ == "__main__":
     asyncio.run(main())
-
-
@@ -9,10 +9,11 @@ from decimal import Decimal
 from typing import Optional, Dict, Any
 from functools import wraps
 
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, text
 
 from src.db.database import get_session
 from src.db.models import User, APIUsage
+from src.services.stats_rollup_service import StatsRollupService, hour_start
 
 logger = logging.getLogger(__name__)
 
@@ -124,116 +125,92 @@ class APIUsageService:
         start_date: datetime = None,
         end_date: datetime = None,
     ) -> Dict[str, Any]:
-        """Get aggregated usage statistics"""
+        """
+        Get aggregated usage statistics.
+
+        Closed hours are read from api_usage_rollups_hourly and only rows after
+        the rollup watermark from api_usage, so the cost does not grow with
+        the size of api_usage. When rollups are used, start_date is rounded
+        down to the hour.
+        """
         if not start_date:
             start_date = datetime.now(timezone.utc) - timedelta(days=30)
         if not end_date:
             end_date = datetime.now(timezone.utc)
 
         async with get_session() as session:
-            # Total stats
-            total_result = await session.execute(
-                select(
-                    func.count(APIUsage.id).label("total_requests"),
-                    func.sum(APIUsage.total_tokens).label("total_tokens"),
-                    func.sum(APIUsage.cost_usd).label("total_cost"),
-                ).where(
-                    and_(
-                        APIUsage.created_at >= start_date,
-                        APIUsage.created_at <= end_date,
+            watermark = await StatsRollupService.get_watermark(session)
+
+            # Hours [start_hour, rollup_end) come from rollups, the rest from raw rows
+            start_hour = hour_start(start_date)
+            rollup_end = start_hour
+            if watermark is not None:
+                rollup_end = max(start_hour, hour_start(min(end_date, watermark)))
+            raw_start = start_date if rollup_end == start_hour else rollup_end
+
+            result = await session.execute(
+                text("""
+                    WITH usage AS (
+                        SELECT bucket_start AS ts, model, operation_type,
+                               requests, total_tokens AS tokens, cost_usd AS cost
+                        FROM api_usage_rollups_hourly
+                        WHERE bucket_start >= :start_hour AND bucket_start < :rollup_end
+                        UNION ALL
+                        SELECT created_at, model, operation_type,
+                               1, COALESCE(total_tokens, 0), COALESCE(cost_usd, 0)
+                        FROM api_usage
+                        WHERE created_at >= :raw_start AND created_at <= :end_date
                     )
-                )
-            )
-            total_row = total_result.first()
-
-            # Stats by model
-            model_result = await session.execute(
-                select(
-                    APIUsage.model,
-                    func.count(APIUsage.id).label("requests"),
-                    func.sum(APIUsage.total_tokens).label("tokens"),
-                    func.sum(APIUsage.cost_usd).label("cost"),
-                ).where(
-                    and_(
-                        APIUsage.created_at >= start_date,
-                        APIUsage.created_at <= end_date,
+                    SELECT
+                        GROUPING(model) AS all_models,
+                        GROUPING(operation_type) AS all_operations,
+                        GROUPING(date_trunc('day', ts)) AS all_days,
+                        model, operation_type, date_trunc('day', ts) AS date,
+                        SUM(requests) AS requests, SUM(tokens) AS tokens, SUM(cost) AS cost
+                    FROM usage
+                    GROUP BY GROUPING SETS (
+                        (), (model), (operation_type), (date_trunc('day', ts))
                     )
-                ).group_by(APIUsage.model)
-                .order_by(func.sum(APIUsage.cost_usd).desc())
-            )
-            model_stats = [
+                """),
                 {
-                    "model": row.model,
-                    "requests": row.requests,
-                    "tokens": row.tokens or 0,
-                    "cost": float(row.cost or 0),
-                }
-                for row in model_result
-            ]
-
-            # Stats by operation type
-            operation_result = await session.execute(
-                select(
-                    APIUsage.operation_type,
-                    func.count(APIUsage.id).label("requests"),
-                    func.sum(APIUsage.total_tokens).label("tokens"),
-                    func.sum(APIUsage.cost_usd).label("cost"),
-                ).where(
-                    and_(
-                        APIUsage.created_at >= start_date,
-                        APIUsage.created_at <= end_date,
-                    )
-                ).group_by(APIUsage.operation_type)
-                .order_by(func.sum(APIUsage.cost_usd).desc())
+                    "start_hour": start_hour,
+                    "rollup_end": rollup_end,
+                    "raw_start": raw_start,
+                    "end_date": end_date,
+                },
             )
-            operation_stats = [
-                {
-                    "operation": row.operation_type,
-                    "requests": row.requests,
-                    "tokens": row.tokens or 0,
-                    "cost": float(row.cost or 0),
-                }
-                for row in operation_result
-            ]
 
-            # Daily stats for the period
-            daily_result = await session.execute(
-                select(
-                    func.date_trunc('day', APIUsage.created_at).label("date"),
-                    func.count(APIUsage.id).label("requests"),
-                    func.sum(APIUsage.total_tokens).label("tokens"),
-                    func.sum(APIUsage.cost_usd).label("cost"),
-                ).where(
-                    and_(
-                        APIUsage.created_at >= start_date,
-                        APIUsage.created_at <= end_date,
-                    )
-                ).group_by(func.date_trunc('day', APIUsage.created_at))
-                .order_by(func.date_trunc('day', APIUsage.created_at))
-            )
-            daily_stats = [
-                {
-                    "date": row.date.isoformat() if row.date else None,
-                    "requests": row.requests,
-                    "tokens": row.tokens or 0,
+            totals = {"requests": 0, "tokens": 0, "cost": 0.0}
+            model_stats, operation_stats, daily_stats = [], [], []
+            for row in result:
+                entry = {
+                    "requests": int(row.requests or 0),
+                    "tokens": int(row.tokens or 0),
                     "cost": float(row.cost or 0),
                 }
-                for row in daily_result
-            ]
+                if not row.all_models:
+                    model_stats.append({"model": row.model, **entry})
+                elif not row.all_operations:
+                    operation_stats.append({"operation": row.operation_type, **entry})
+                elif not row.all_days:
+                    daily_stats.append({"date": row.date.isoformat() if row.date else None, **entry})
+                elif row.requests:
+                    totals = entry
+
+            model_stats.sort(key=lambda item: item["cost"], reverse=True)
+            operation_stats.sort(key=lambda item: item["cost"], reverse=True)
+            daily_stats.sort(key=lambda item: item["date"] or "")
 
             return {
                 "period": {
                     "start": start_date.isoformat(),
                     "end": end_date.isoformat(),
                 },
-                "totals": {
-                    "requests": total_row.total_requests or 0,
-                    "tokens": total_row.total_tokens or 0,
-                    "cost": float(total_row.total_cost or 0),
-                },
+                "totals": totals,
                 "by_model": model_stats,
                 "by_operation": operation_stats,
                 "daily": daily_stats,
+                "rollup_watermark": watermark.isoformat() if watermark else None,
             }
 
     @staticmethod
@@ -0,0 +1,165 @@
+"""
+MINDSETHAPPYBOT - RAG context packer
+Chooses which retrieved items go into the dialog prompt under a token budget.
+
+Candidates (dialog memories, summaries, snippets, moments, KB chunks) are
+measured in real tokens of the chat model - as they will be rendered in
+the prompt - with a cached tiktoken encoding. Packing is one greedy pass:
+first the top items of each source up to its minimum, then everything
+else by value per token, where value is the retrieval similarity times a
+per-source weight. Section headers are charged when a source gets its
+first item.
+
+Without tiktoken (or its encoding files) tokens are estimated per script:
+CJK characters count as one token each, other non-ASCII letters as a third
+of a token and ASCII as a quarter.
+"""
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+from src.config import get_settings
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to the estimate below
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_ENCODING = "o200k_base"  # gpt-4o family
+TOKEN_COUNT_CACHE_SIZE = 8192  # Distinct texts whose token count is remembered
+ITEM_OVERHEAD_TOKENS = 3  # "N. " prefix and line break per item
+
+_encoding: Any = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Tokenizer of the chat model, loaded once (None if unavailable)"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if tiktoken is not None:
+            model = get_settings().openai_chat_model
+            try:
+                try:
+                    _encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    _encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+            except Exception as e:
+                logger.warning(f"Tokenizer unavailable, estimating context tokens: {e}")
+                _encoding = None
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count by script, used when no tokenizer is available"""
+    ascii_chars = cjk_chars = other_chars = 0
+    for char in text:
+        code = ord(char)
+        if code < 128:
+            ascii_chars += 1
+        elif (
+            0x3040 <= code <= 0x30FF  # Hiragana, Katakana
+            or 0x3400 <= code <= 0x9FFF  # CJK ideographs
+            or 0xAC00 <= code <= 0xD7AF  # Hangul
+            or 0xF900 <= code <= 0xFAFF
+        ):
+            cjk_chars += 1
+        else:
+            other_chars += 1
+    return cjk_chars + (other_chars + 2) // 3 + (ascii_chars + 3) // 4
+
+
+@lru_cache(maxsize=TOKEN_COUNT_CACHE_SIZE)
+def count_tokens(text: str) -> int:
+    """Tokens of text in the chat model's encoding (cached per text)"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@dataclass
+class PackCandidate:
+    """One retrieved item competing for prompt space"""
+    source: str
+    item: Any
+    text: str  # As rendered in the prompt
+    score: float  # Retrieval similarity
+    tokens: int = 0
+
+
+@dataclass
+class PackResult:
+    """Selected items per source, in score order"""
+    selected: Dict[str, List[Any]] = field(default_factory=dict)
+    tokens: int = 0
+    candidates: int = 0
+    dropped: int = 0
+
+
+def pack_context(
+    candidates: Sequence[PackCandidate],
+    budget: int,
+    minimums: Optional[Dict[str, int]] = None,
+    weights: Optional[Dict[str, float]] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> PackResult:
+    """
+    Pick the most valuable candidates that fit into budget tokens.
+
+    Args:
+        candidates: items from all sources
+        budget: token budget for the whole context block
+        minimums: per source, how many of its best items are taken first
+            (as long as they fit)
+        weights: per source multiplier of the similarity score (default 1)
+        headers: per source section header, charged once per used source
+
+    Returns:
+        PackResult with the selected items grouped by source
+    """
+    minimums = minimums or {}
+    weights = weights or {}
+    headers = headers or {}
+
+    for candidate in candidates:
+        candidate.tokens = count_tokens(candidate.text) + ITEM_OVERHEAD_TOKENS
+    header_tokens = {source: count_tokens(header) for source, header in headers.items()}
+
+    by_score = sorted(candidates, key=lambda c: c.score, reverse=True)
+    taken_per_source: Dict[str, int] = {}
+    first: List[PackCandidate] = []
+    rest: List[PackCandidate] = []
+    for candidate in by_score:
+        count = taken_per_source.get(candidate.source, 0)
+        if count < minimums.get(candidate.source, 0):
+            taken_per_source[candidate.source] = count + 1
+            first.append(candidate)
+        else:
+            rest.append(candidate)
+    rest.sort(key=lambda c: c.score * weights.get(c.source, 1.0) / c.tokens, reverse=True)
+
+    result = PackResult(candidates=len(candidates))
+    chosen: List[PackCandidate] = []
+    used_sources = set()
+    for candidate in first + rest:
+        cost = candidate.tokens
+        if candidate.source not in used_sources:
+            cost += header_tokens.get(candidate.source, 0)
+        if result.tokens + cost > budget:
+            result.dropped += 1
+            continue
+        result.tokens += cost
+        used_sources.add(candidate.source)
+        chosen.append(candidate)
+
+    for candidate in sorted(chosen, key=lambda c: c.score, reverse=True):
+        result.selected.setdefault(candidate.source, []).append(candidate.item)
+    return result
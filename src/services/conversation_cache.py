@@ -0,0 +1,232 @@
+"""
+MINDSETHAPPYBOT - Conversation context cache
+In-process per-user ring buffer of recent conversation turns.
+
+Writers (DialogService._save_conversation, ConversationLogService.log) append
+every row they persist; readers (dialog context, recent bot replies,
+anti-repetition fingerprints, stale dialog checks) read from the buffer
+instead of re-querying the conversations table on every dialog turn.
+
+The buffer is hydrated lazily from the database on the first read for a
+user, bounded by turn count, and whole users are evicted LRU. Reads that
+need turns older than the buffer holds are answered by the database.
+
+The cache is per process: it assumes all conversation writes for a user go
+through this process, which holds for the single polling instance. In
+webhook mode turns are also written by the process leading the scheduler
+(scheduled questions, summaries) and a chat can move between workers, so
+there every read goes to the database.
+"""
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select, and_
+
+from src.config import get_settings
+from src.db.database import get_session
+from src.db.models import User, Conversation
+
+logger = logging.getLogger(__name__)
+
+
+# Configuration
+MAX_TURNS_PER_USER = 120  # Enough for 50 fingerprints + dialog context
+MAX_CACHED_USERS = 5000  # LRU bound on number of users kept in memory
+# Large metadata values that no cache consumer reads
+EXCLUDED_METADATA_KEYS = ("reply_embedding",)
+
+
+@dataclass
+class CachedTurn:
+    """A conversation row as kept in the cache"""
+    id: int
+    message_type: str
+    content: str
+    metadata: Optional[Dict[str, Any]]
+    created_at: datetime
+
+
+class _UserBuffer:
+    """Recent turns of one user plus hydration state"""
+
+    def __init__(self):
+        self.turns: Deque[CachedTurn] = deque(maxlen=MAX_TURNS_PER_USER)
+        self.ready = asyncio.Event()
+        # Every turn created after this is in the buffer; None: all of the user's turns are
+        self.covers_after: Optional[datetime] = None
+
+    def extend(self, turns: Iterable[CachedTurn]) -> None:
+        """Append turns (oldest first), tracking what falls out of the buffer"""
+        for turn in turns:
+            if len(self.turns) == self.turns.maxlen:
+                self.covers_after = self.turns[0].created_at
+            self.turns.append(turn)
+
+
+def _to_turn(conversation: Conversation) -> CachedTurn:
+    metadata = conversation.message_metadata
+    if metadata:
+        metadata = {k: v for k, v in metadata.items() if k not in EXCLUDED_METADATA_KEYS}
+    created_at = conversation.created_at or datetime.now(timezone.utc)
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return CachedTurn(
+        id=conversation.id,
+        message_type=conversation.message_type,
+        content=conversation.content,
+        metadata=metadata,
+        created_at=created_at,
+    )
+
+
+class ConversationContextCache:
+    """Per-user cache of recent conversation turns"""
+
+    def __init__(self, enabled: bool = True):
+        # Disabled: every read queries the database and nothing is buffered
+        self.enabled = enabled
+        self._buffers: "OrderedDict[int, _UserBuffer]" = OrderedDict()
+
+    def append(self, telegram_id: int, conversation: Conversation) -> None:
+        """
+        Record a freshly persisted conversation row.
+        Users that are not cached are skipped - their next read hydrates from the DB.
+        """
+        buffer = self._buffers.get(telegram_id)
+        if buffer is None:
+            return
+        buffer.extend([_to_turn(conversation)])
+        self._buffers.move_to_end(telegram_id)
+
+    def invalidate(self, telegram_id: int) -> None:
+        """Drop a user's buffer (e.g. after their data was deleted)"""
+        self._buffers.pop(telegram_id, None)
+
+    async def get_turns(
+        self,
+        telegram_id: int,
+        message_types: Optional[Iterable[str]] = None,
+        limit: Optional[int] = None,
+        since: Optional[datetime] = None,
+    ) -> List[CachedTurn]:
+        """
+        Get recent turns for a user, newest first.
+
+        Served from the buffer when it holds every matching turn; otherwise
+        (fewer than `limit` matches and older turns fell out of the buffer)
+        the database is queried.
+
+        Args:
+            telegram_id: User's Telegram ID
+            message_types: Only return turns of these types
+            limit: Maximum number of turns to return
+            since: Only return turns created at or after this time
+        """
+        types = set(message_types) if message_types else None
+        if not self.enabled:
+            return await self._query_turns(telegram_id, types, limit, since)
+
+        buffer = await self._get_buffer(telegram_id)
+        if buffer is None:
+            return []
+
+        turns = []
+        for turn in reversed(buffer.turns):
+            if since is not None and turn.created_at < since:
+                break
+            if types is not None and turn.message_type not in types:
+                continue
+            turns.append(turn)
+            if limit is not None and len(turns) >= limit:
+                return turns
+
+        if buffer.covers_after is None or (since is not None and since > buffer.covers_after):
+            return turns
+        return await self._query_turns(telegram_id, types, limit, since)
+
+    async def _get_buffer(self, telegram_id: int) -> Optional[_UserBuffer]:
+        buffer = self._buffers.get(telegram_id)
+        if buffer is not None:
+            self._buffers.move_to_end(telegram_id)
+            await buffer.ready.wait()
+            # Hydration may have failed and removed the buffer
+            return self._buffers.get(telegram_id)
+
+        # Register the buffer before querying so rows appended while the
+        # hydration query runs are not lost
+        buffer = _UserBuffer()
+        self._buffers[telegram_id] = buffer
+        while len(self._buffers) > MAX_CACHED_USERS:
+            self._buffers.popitem(last=False)
+
+        try:
+            rows = await self._load_recent(telegram_id)
+        except Exception as e:
+            logger.warning(f"Failed to hydrate conversation cache for {telegram_id}: {e}")
+            self._buffers.pop(telegram_id, None)
+            buffer.ready.set()
+            return None
+
+        loaded_ids = {turn.id for turn in rows}
+        appended = [turn for turn in buffer.turns if turn.id not in loaded_ids]
+        merged = sorted(rows + appended, key=lambda t: (t.created_at, t.id))
+        buffer.turns.clear()
+        # A full load means the user may have older turns
+        buffer.covers_after = rows[0].created_at if len(rows) >= MAX_TURNS_PER_USER else None
+        buffer.extend(merged)
+        buffer.ready.set()
+        return buffer
+
+    async def _load_recent(self, telegram_id: int) -> List[CachedTurn]:
+        """Load the newest turns of a user from the database, oldest first"""
+        async with get_session() as session:
+            result = await session.execute(
+                select(Conversation)
+                .join(User, User.id == Conversation.user_id)
+                .where(User.telegram_id == telegram_id)
+                .order_by(Conversation.created_at.desc())
+                .limit(MAX_TURNS_PER_USER)
+            )
+            conversations = result.scalars().all()
+        return [_to_turn(conv) for conv in reversed(conversations)]
+
+    async def _query_turns(
+        self,
+        telegram_id: int,
+        types: Optional[Set[str]],
+        limit: Optional[int],
+        since: Optional[datetime],
+    ) -> List[CachedTurn]:
+        """Answer a read the buffer cannot from the database, newest first"""
+        conditions = [User.telegram_id == telegram_id]
+        if types is not None:
+            conditions.append(Conversation.message_type.in_(types))
+        if since is not None:
+            conditions.append(Conversation.created_at >= since)
+        query = (
+            select(Conversation)
+            .join(User, User.id == Conversation.user_id)
+            .where(and_(*conditions))
+            .order_by(Conversation.created_at.desc())
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        async with get_session() as session:
+            result = await session.execute(query)
+            return [_to_turn(conv) for conv in result.scalars().all()]
+
+
+# Singleton instance for reuse
+_cache_instance: Optional[ConversationContextCache] = None
+
+
+def get_conversation_cache() -> ConversationContextCache:
+    """Get singleton instance of ConversationContextCache"""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = ConversationContextCache(enabled=get_settings().bot_mode != "webhook")
+    return _cache_instance
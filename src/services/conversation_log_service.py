@@ -12,6 +12,7 @@ from sqlalchemy import select
 from src.db.database import get_session
 from src.db.models import User, Conversation
 from src.services.immediate_indexer import trigger_immediate_indexing, should_index_immediately
+from src.services.conversation_cache import get_conversation_cache
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +49,7 @@ class ConversationLogService:
                 session.add(row)
                 await session.commit()
                 await session.refresh(row)  # Get the ID and other fields
+                get_conversation_cache().append(telegram_id, row)
 
                 # Trigger immediate indexing for user messages (fire-and-forget)
                 if await should_index_immediately(message_type, content):
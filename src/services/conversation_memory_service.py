@@ -21,12 +21,15 @@ from datetime import datetime, timezone
 
 from openai import AsyncOpenAI
 from sqlalchemy import select, and_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from src.config import get_settings
 from src.db.database import get_session
 from src.db.models import User, Conversation, ConversationMemory
 from src.services.embedding_service import EmbeddingService
 from src.services.api_usage_service import APIUsageService
+from src.services.semantic_antirepeat_service import cosine_similarity
+from src.services.retrieval_scoring import build_fused_query, get_scoring_function, scoring_params
 
 logger = logging.getLogger(__name__)
 
@@ -46,10 +49,18 @@ GARBAGE_PATTERNS_COMPILED = [re.compile(p, re.IGNORECASE) for p in GARBAGE_PATTE
 MEMORY_KINDS = ['fact', 'preference', 'person', 'project', 'plan', 'constraint', 'achievement', 'event']
 RAW_DIALOG_KIND = "dialog_raw"  # Raw user message stored as vector memory
 DIALOG_SUMMARY_KIND = "dialog_summary"  # Compressed summary of multiple messages
+DIALOG_DAILY_KIND = "dialog_daily"  # Rollup of one day of summaries/raw messages
+DIALOG_WEEKLY_KIND = "dialog_weekly"  # Rollup of daily summaries
+DIALOG_MONTHLY_KIND = "dialog_monthly"  # Rollup of weekly summaries
+# All summary tiers, searched together as "conversation summaries"
+DIALOG_SUMMARY_KINDS = [DIALOG_SUMMARY_KIND, DIALOG_DAILY_KIND, DIALOG_WEEKLY_KIND, DIALOG_MONTHLY_KIND]
 
 # Similarity threshold for deduplication
 DEDUP_SIMILARITY_THRESHOLD = 0.92
 
+# Bulk upsert configuration
+MEMORY_UPSERT_BATCH_SIZE = 32  # Conversations per extraction/embedding/upsert batch
+
 # Retrieval configuration
 MEMORY_TOP_K = 5
 MEMORY_SIMILARITY_THRESHOLD = 0.40
@@ -70,6 +81,17 @@ class ExtractedMemory:
     conversation_id: int
 
 
+@dataclass
+class MemoryCandidate:
+    """An embedded memory ready to be written by the bulk upsert path"""
+    content: str
+    kind: str
+    importance: float
+    source_conversation_ids: List[int]
+    embedding: List[float]
+    metadata: Dict
+
+
 @dataclass
 class RetrievedMemory:
     """A memory retrieved from vector search"""
@@ -270,51 +292,164 @@ If message is just greeting/pleasantry/question with no personal facts, return:
                 error_message=error_msg,
             )
 
-    async def check_duplicate(
+    @staticmethod
+    def _vector_text(embedding: List[float]) -> str:
+        """Format embedding as pgvector text input: '[x1,x2,...]'"""
+        return "[" + ",".join(f"{x:.10g}" for x in embedding) + "]"
+
+    @staticmethod
+    def _build_extracted_candidate(
+        memory: ExtractedMemory,
+        embedding: List[float],
+    ) -> MemoryCandidate:
+        return MemoryCandidate(
+            content=memory.content,
+            kind=memory.kind,
+            importance=memory.confidence,
+            source_conversation_ids=[memory.conversation_id],
+            embedding=embedding,
+            metadata={
+                "original_text": memory.original_text,
+                "confidence": memory.confidence,
+            },
+        )
+
+    @staticmethod
+    def _build_raw_candidate(
+        conversation: Conversation,
+        embedding: List[float],
+    ) -> MemoryCandidate:
+        return MemoryCandidate(
+            content=conversation.content,
+            kind=RAW_DIALOG_KIND,
+            importance=0.5,
+            source_conversation_ids=[conversation.id],
+            embedding=embedding,
+            metadata={
+                "source": "dialog_raw",
+                "message_type": conversation.message_type,
+            },
+        )
+
+    @staticmethod
+    def dedupe_candidates(
+        candidates: List[MemoryCandidate],
+    ) -> List[Tuple[str, MemoryCandidate]]:
+        """
+        Deduplicate candidates against each other before touching the database.
+        Drops candidates without embeddings, exact fingerprint repeats and
+        near-duplicates (cosine similarity above DEDUP_SIMILARITY_THRESHOLD).
+        Earlier candidates win.
+
+        Returns list of (fingerprint, candidate) tuples.
+        """
+        kept: List[Tuple[str, MemoryCandidate]] = []
+        seen_fingerprints = set()
+
+        for candidate in candidates:
+            if not candidate.embedding:
+                continue
+
+            fingerprint = ConversationMemoryService.compute_fingerprint(candidate.content)
+            if not fingerprint or fingerprint in seen_fingerprints:
+                continue
+
+            if any(
+                cosine_similarity(candidate.embedding, other.embedding) > DEDUP_SIMILARITY_THRESHOLD
+                for _, other in kept
+            ):
+                continue
+
+            seen_fingerprints.add(fingerprint)
+            kept.append((fingerprint, candidate))
+
+        return kept
+
+    async def store_memories_bulk(
         self,
         user_id: int,
-        fingerprint: str,
-        embedding: List[float],
-    ) -> bool:
+        candidates: List[MemoryCandidate],
+    ) -> List[int]:
         """
-        Check if memory already exists (by fingerprint or high similarity).
-        Returns True if duplicate found.
+        Store a batch of memories in a single transaction.
+
+        1. Deduplicates the batch in memory (fingerprint + embedding similarity)
+        2. Checks near-duplicates against existing memories with one vector query
+        3. Inserts survivors with INSERT ... ON CONFLICT (user_id, fingerprint) DO NOTHING
+
+        Returns IDs of the memories actually inserted.
         """
+        kept = self.dedupe_candidates(candidates)
+        if not kept:
+            return []
+
         async with get_session() as session:
-            # Check fingerprint match
+            # Nearest existing memory for every candidate in one round trip
             result = await session.execute(
-                select(ConversationMemory)
-                .where(
-                    and_(
-                        ConversationMemory.user_id == user_id,
-                        ConversationMemory.fingerprint == fingerprint,
+                text("""
+                    WITH candidates AS (
+                        SELECT ord, CAST(emb AS vector) AS embedding
+                        FROM unnest(CAST(:embeddings AS text[])) WITH ORDINALITY AS t(emb, ord)
                     )
-                )
-                .limit(1)
-            )
-            if result.scalar_one_or_none():
-                return True
-
-            # Check vector similarity
-            if embedding:
-                embedding_literal = "'" + "[" + ",".join(f"{x:.10g}" for x in embedding) + "]'::vector"
-                result = await session.execute(
-                    text(f"""
-                        SELECT id, 1 - (embedding <=> {embedding_literal}) as similarity
-                        FROM conversation_memories
-                        WHERE user_id = :user_id
-                        AND embedding IS NOT NULL
-                        ORDER BY embedding <=> {embedding_literal}
+                    SELECT c.ord, nearest.similarity
+                    FROM candidates c
+                    CROSS JOIN LATERAL (
+                        SELECT 1 - (m.embedding <=> c.embedding) AS similarity
+                        FROM conversation_memories m
+                        WHERE m.user_id = :user_id
+                        AND m.embedding IS NOT NULL
+                        ORDER BY m.embedding <=> c.embedding
                         LIMIT 1
-                    """),
-                    {"user_id": user_id}
+                    ) nearest
+                """),
+                {
+                    "user_id": user_id,
+                    "embeddings": [self._vector_text(c.embedding) for _, c in kept],
+                }
+            )
+            duplicate_positions = {
+                int(row.ord) - 1
+                for row in result.fetchall()
+                if row.similarity is not None and float(row.similarity) > DEDUP_SIMILARITY_THRESHOLD
+            }
+
+            survivors = [
+                item for position, item in enumerate(kept)
+                if position not in duplicate_positions
+            ]
+            if duplicate_positions:
+                logger.debug(
+                    f"Skipping {len(duplicate_positions)} near-duplicate memories for user {user_id}"
                 )
-                row = result.fetchone()
-                if row and float(row.similarity) > DEDUP_SIMILARITY_THRESHOLD:
-                    logger.debug(f"Found duplicate by similarity: {row.similarity:.4f}")
-                    return True
+            if not survivors:
+                return []
 
-        return False
+            result = await session.execute(
+                pg_insert(ConversationMemory)
+                .values([
+                    {
+                        "user_id": user_id,
+                        "source_conversation_ids": candidate.source_conversation_ids,
+                        "content": candidate.content,
+                        "embedding": candidate.embedding,
+                        "kind": candidate.kind,
+                        "importance": candidate.importance,
+                        "fingerprint": fingerprint,
+                        "memory_metadata": candidate.metadata,
+                    }
+                    for fingerprint, candidate in survivors
+                ])
+                .on_conflict_do_nothing(index_elements=["user_id", "fingerprint"])
+                .returning(ConversationMemory.id)
+            )
+            inserted_ids = [row.id for row in result.fetchall()]
+
+        logger.info(
+            f"Stored {len(inserted_ids)}/{len(candidates)} memories for user {user_id} "
+            f"({len(candidates) - len(kept)} deduped in batch, "
+            f"{len(survivors) - len(inserted_ids)} fingerprint conflicts)"
+        )
+        return inserted_ids
 
     async def store_memory(
         self,
@@ -326,33 +461,11 @@ If message is just greeting/pleasantry/question with no personal facts, return:
         Store extracted memory in database.
         Returns memory ID if stored, None if skipped (duplicate).
         """
-        fingerprint = self.compute_fingerprint(memory.content)
-
-        # Check for duplicates
-        if await self.check_duplicate(user_id, fingerprint, embedding):
-            logger.debug(f"Skipping duplicate memory: {memory.content[:50]}...")
-            return None
-
-        async with get_session() as session:
-            conv_memory = ConversationMemory(
-                user_id=user_id,
-                source_conversation_ids=[memory.conversation_id],
-                content=memory.content,
-                embedding=embedding,
-                kind=memory.kind,
-                importance=memory.confidence,
-                fingerprint=fingerprint,
-                memory_metadata={
-                    "original_text": memory.original_text,
-                    "confidence": memory.confidence,
-                },
-            )
-            session.add(conv_memory)
-            await session.commit()
-            await session.refresh(conv_memory)
-
-            logger.info(f"Stored memory #{conv_memory.id} for user {user_id}: {memory.content[:50]}...")
-            return conv_memory.id
+        ids = await self.store_memories_bulk(
+            user_id,
+            [self._build_extracted_candidate(memory, embedding)],
+        )
+        return ids[0] if ids else None
 
     async def store_raw_memory(
         self,
@@ -363,84 +476,68 @@ If message is just greeting/pleasantry/question with no personal facts, return:
         """
         Store raw user message as vector memory for long-term dialog recall.
         """
-        fingerprint = self.compute_fingerprint(conversation.content)
-
-        if await self.check_duplicate(user_id, fingerprint, embedding):
-            logger.debug(f"Skipping duplicate raw memory: {conversation.content[:50]}...")
-            return None
-
-        async with get_session() as session:
-            conv_memory = ConversationMemory(
-                user_id=user_id,
-                source_conversation_ids=[conversation.id],
-                content=conversation.content,
-                embedding=embedding,
-                kind=RAW_DIALOG_KIND,
-                importance=0.5,
-                fingerprint=fingerprint,
-                memory_metadata={
-                    "source": "dialog_raw",
-                    "message_type": conversation.message_type,
-                },
-            )
-            session.add(conv_memory)
-            await session.commit()
-            await session.refresh(conv_memory)
-
-            logger.info(
-                f"Stored raw dialog memory #{conv_memory.id} for user {user_id}: "
-                f"{conversation.content[:50]}..."
-            )
-            return conv_memory.id
+        ids = await self.store_memories_bulk(
+            user_id,
+            [self._build_raw_candidate(conversation, embedding)],
+        )
+        return ids[0] if ids else None
 
-    async def process_conversation(
+    async def process_conversations(
         self,
         user_id: int,
-        conversation: Conversation,
+        conversations: List[Conversation],
     ) -> int:
         """
-        Process a single conversation and extract memories.
+        Process a batch of conversations and extract memories.
+
+        Raw messages and extracted facts of the whole batch are embedded
+        with one embedding request and written with one bulk upsert.
         Returns number of memories stored.
         """
-        # Skip non-user messages
-        if not self._is_user_message(conversation.message_type):
+        conversations = [
+            conv for conv in conversations
+            if self._is_user_message(conv.message_type)
+            and not self.is_garbage_message(conv.content)
+        ]
+        if not conversations:
             return 0
 
-        stored_count = 0
-
-        # Skip garbage
-        if self.is_garbage_message(conversation.content):
-            return 0
+        # (kind of candidate, source object) in the order they will be embedded;
+        # raw messages come first so they win in-batch dedup like before
+        pending: List[Tuple[str, object]] = [("raw", conv) for conv in conversations]
+        for conv in conversations:
+            memories = await self.classify_and_extract(conv.content, conv.id)
+            pending.extend(("extracted", memory) for memory in memories)
 
-        # Store raw dialog memory (full user message) for long-term recall
-        raw_embedding = await self.embedding_service.create_embedding(conversation.content)
-        if raw_embedding:
-            raw_id = await self.store_raw_memory(user_id, conversation, raw_embedding)
-            if raw_id:
-                stored_count += 1
-
-        # Extract memories
-        memories = await self.classify_and_extract(
-            conversation.content,
-            conversation.id,
+        embeddings = await self.embedding_service.create_embeddings(
+            [item.content for _, item in pending]
         )
 
-        if not memories:
-            return 0
-
-        # Store each memory
-        for memory in memories:
-            # Create embedding
-            embedding = await self.embedding_service.create_embedding(memory.content)
+        candidates: List[MemoryCandidate] = []
+        for (source, item), embedding in zip(pending, embeddings):
             if not embedding:
                 continue
+            if source == "raw":
+                candidates.append(self._build_raw_candidate(item, embedding))
+            else:
+                candidates.append(self._build_extracted_candidate(item, embedding))
 
-            # Store
-            memory_id = await self.store_memory(user_id, memory, embedding)
-            if memory_id:
-                stored_count += 1
+        if not candidates:
+            return 0
 
-        return stored_count
+        inserted_ids = await self.store_memories_bulk(user_id, candidates)
+        return len(inserted_ids)
+
+    async def process_conversation(
+        self,
+        user_id: int,
+        conversation: Conversation,
+    ) -> int:
+        """
+        Process a single conversation and extract memories.
+        Returns number of memories stored.
+        """
+        return await self.process_conversations(user_id, [conversation])
 
     async def index_user_conversations(
         self,
@@ -497,10 +594,10 @@ If message is just greeting/pleasantry/question with no personal facts, return:
             total_stored = 0
             max_conv_id = user.last_memory_indexed_conversation_id
 
-            for conv in conversations:
-                stored = await self.process_conversation(user.id, conv)
-                total_stored += stored
-                max_conv_id = max(max_conv_id, conv.id)
+            for i in range(0, len(conversations), MEMORY_UPSERT_BATCH_SIZE):
+                batch = conversations[i:i + MEMORY_UPSERT_BATCH_SIZE]
+                total_stored += await self.process_conversations(user.id, batch)
+                max_conv_id = max(max_conv_id, max(conv.id for conv in batch))
 
             # Update tracking marker
             if not full_reindex and max_conv_id > user.last_memory_indexed_conversation_id:
@@ -571,62 +668,57 @@ If message is just greeting/pleasantry/question with no personal facts, return:
         """
         Search user's memories with vector similarity.
         CRITICAL: Always filters by user_id for isolation.
+        Ranked in Postgres by settings.memory_scoring_function (see retrieval_scoring).
         """
+        settings = get_settings()
+        scoring = get_scoring_function(settings.memory_scoring_function)
+
         async with get_session() as session:
             # Get user
             result = await session.execute(
-                select(User).where(User.telegram_id == telegram_id)
+                select(User.id).where(User.telegram_id == telegram_id)
             )
-            user = result.scalar_one_or_none()
-            if not user:
+            user_id = result.scalar_one_or_none()
+            if not user_id:
                 return []
 
-            # Vector search with user isolation
-            embedding_literal = "'" + "[" + ",".join(f"{x:.10g}" for x in query_embedding) + "]'::vector"
-            fetch_limit = limit * 2  # Get extra to filter by threshold
-
             kind_filter = ""
-            params = {"user_id": user.id, "limit": fetch_limit}
+            params = {
+                "user_id": user_id,
+                "embedding": str(list(query_embedding)),
+                "pool_size": max(settings.retrieval_candidate_pool, limit),
+                "min_similarity": threshold,
+                "limit": limit,
+                **scoring_params(importance_weight=settings.memory_importance_weight),
+            }
             if kinds:
                 kind_filter = "AND kind = ANY(:kinds)"
                 params["kinds"] = kinds
 
             result = await session.execute(
-                text(f"""
-                    SELECT
-                        id,
-                        content,
-                        kind,
-                        created_at,
-                        1 - (embedding <=> {embedding_literal}) as similarity
-                    FROM conversation_memories
-                    WHERE user_id = :user_id
-                    AND embedding IS NOT NULL
-                    {kind_filter}
-                    ORDER BY embedding <=> {embedding_literal}
-                    LIMIT :limit
-                """),
+                text(build_fused_query(
+                    "conversation_memories",
+                    ["id", "content", "kind"],
+                    scoring,
+                    extra_filter=kind_filter,
+                    importance_column="importance",
+                )),
                 params
             )
-            rows = result.fetchall()
 
-            # Filter by threshold
-            memories = []
-            for row in rows:
-                similarity = float(row.similarity)
-                if similarity < threshold:
-                    continue
-
-                memories.append(RetrievedMemory(
+            memories = [
+                RetrievedMemory(
                     id=row.id,
                     content=row.content,
                     kind=row.kind,
-                    similarity=similarity,
+                    similarity=float(row.similarity),
                     created_at=row.created_at,
-                ))
+                )
+                for row in result.fetchall()
+            ]
 
             logger.debug(f"Retrieved {len(memories)} memories for user {telegram_id}")
-            return memories[:limit]
+            return memories
 
     async def get_user_memory_count(self, telegram_id: int) -> int:
         """Get count of stored memories for a user."""
@@ -681,6 +773,7 @@ If message is just greeting/pleasantry/question with no personal facts, return:
                     FROM conversation_memories cm
                     WHERE cm.user_id = :user_id
                     AND cm.kind = :raw_kind
+                    AND NOT (COALESCE(cm.metadata, '{}'::jsonb) ? 'rolled_up_into')
                     AND NOT EXISTS (
                         SELECT 1 FROM conversation_memories s
                         WHERE s.user_id = :user_id
@@ -6,13 +6,14 @@ import logging
 from typing import List
 from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import select, and_
+from sqlalchemy import select
 
 from src.db.database import get_session
 from src.db.models import User, Conversation
 from src.services.personalization_service import PersonalizationService
 from src.services.semantic_antirepeat_service import get_semantic_antirepeat_service
 from src.services.immediate_indexer import trigger_immediate_indexing, should_index_immediately
+from src.services.conversation_cache import get_conversation_cache
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +31,7 @@ class DialogService:
     def __init__(self):
         self.personalization_service = PersonalizationService()
         self.semantic_antirepeat = get_semantic_antirepeat_service()
+        self.conversation_cache = get_conversation_cache()
         # Dialog state is now stored in database (User.is_in_dialog)
 
     @classmethod
@@ -91,18 +93,12 @@ class DialogService:
             if not user or not user.is_in_dialog:
                 return False
 
-            last_dialog_res = await session.execute(
-                select(Conversation.created_at)
-                .where(
-                    and_(
-                        Conversation.user_id == user.id,
-                        Conversation.message_type.in_(["free_dialog", "bot_reply"]),
-                    )
-                )
-                .order_by(Conversation.created_at.desc())
-                .limit(1)
+            last_dialog_turns = await self.conversation_cache.get_turns(
+                telegram_id,
+                message_types=("free_dialog", "bot_reply"),
+                limit=1,
             )
-            last_dialog_activity = last_dialog_res.scalar_one_or_none()
+            last_dialog_activity = last_dialog_turns[0].created_at if last_dialog_turns else None
             reference_dt = last_dialog_activity or user.updated_at or user.created_at
             if not reference_dt:
                 return False
@@ -244,6 +240,7 @@ class DialogService:
             session.add(conversation)
             await session.commit()
             await session.refresh(conversation)  # Get the ID
+            self.conversation_cache.append(telegram_id, conversation)
 
             # Trigger immediate indexing for user messages (fire-and-forget)
             if await should_index_immediately(message_type, content):
@@ -259,42 +256,23 @@ class DialogService:
 
         Returns list of messages in OpenAI format
         """
-        async with get_session() as session:
-            # Get user
-            result = await session.execute(
-                select(User).where(User.telegram_id == telegram_id)
-            )
-            user = result.scalar_one_or_none()
-
-            if not user:
-                return []
+        # Recent turns come from the per-user cache (last 24 hours for better context)
+        # Extended from 1 hour to 24 hours to avoid empty context after restarts
+        one_day_ago = datetime.now(timezone.utc) - timedelta(hours=24)
+        turns = await self.conversation_cache.get_turns(
+            telegram_id,
+            message_types=("free_dialog", "bot_reply"),
+            limit=limit,
+            since=one_day_ago,
+        )
 
-            # Get recent conversations (last 24 hours for better context)
-            # Extended from 1 hour to 24 hours to avoid empty context after restarts
-            # Use timezone-naive datetime for database compatibility
-            one_day_ago = datetime.now(timezone.utc) - timedelta(hours=24)
+        # Convert to OpenAI format (reverse to chronological order)
+        context = []
+        for turn in reversed(turns):
+            role = "user" if turn.message_type == "free_dialog" else "assistant"
+            context.append({
+                "role": role,
+                "content": turn.content,
+            })
 
-            result = await session.execute(
-                select(Conversation)
-                .where(
-                    and_(
-                        Conversation.user_id == user.id,
-                        Conversation.created_at >= one_day_ago,
-                        Conversation.message_type.in_(["free_dialog", "bot_reply"]),
-                    )
-                )
-                .order_by(Conversation.created_at.desc())
-                .limit(limit)
-            )
-            conversations = result.scalars().all()
-
-            # Convert to OpenAI format (reverse to chronological order)
-            context = []
-            for conv in reversed(conversations):
-                role = "user" if conv.message_type == "free_dialog" else "assistant"
-                context.append({
-                    "role": role,
-                    "content": conv.content,
-                })
-
-            return context
+        return context
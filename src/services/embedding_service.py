@@ -65,6 +65,53 @@ class EmbeddingService:
                 error_message=error_msg,
             )
 
+    async def create_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Create embedding vectors for several texts in a single API request.
+        Returns a list aligned with `texts`; all entries are None on failure.
+        """
+        if not texts:
+            return []
+
+        start_time = time.time()
+        success = True
+        error_msg = None
+        input_tokens = 0
+
+        try:
+            response = await self.client.embeddings.create(
+                input=texts,
+                model=self.model,
+            )
+
+            if response.usage:
+                input_tokens = response.usage.total_tokens
+
+            embeddings: List[Optional[List[float]]] = [None] * len(texts)
+            for item in response.data:
+                embeddings[item.index] = item.embedding
+            logger.debug(f"Created {len(texts)} embeddings in one batch")
+            return embeddings
+        except Exception as e:
+            logger.error(f"Failed to create batch embeddings: {e}")
+            success = False
+            error_msg = str(e)
+            return [None] * len(texts)
+
+        finally:
+            duration_ms = int((time.time() - start_time) * 1000)
+            await APIUsageService.log_usage(
+                api_provider="openai",
+                model=self.model,
+                operation_type="embedding_batch",
+                input_tokens=input_tokens,
+                output_tokens=0,
+                duration_ms=duration_ms,
+                success=success,
+                error_message=error_msg,
+                extra_data={"batch_size": len(texts)},
+            )
+
     async def analyze_mood(self, text: str) -> Optional[float]:
         """
         Analyze mood of text using GPT
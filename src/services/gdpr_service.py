@@ -2,30 +2,119 @@
 MINDSETHAPPYBOT - GDPR service
 Handles data export and deletion for GDPR compliance
 """
+import asyncio
+import gzip
 import logging
 import json
-from datetime import datetime, timezone
-from typing import Optional
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncGenerator, Dict, Optional, Set
 
-from aiogram.types import BufferedInputFile
-from sqlalchemy import select, delete
+from aiogram import Bot
+from aiogram.types import InputFile
+from sqlalchemy import select, delete, update, text, and_, or_
 
+from src.config import get_settings
 from src.db.database import get_session
-from src.db.models import User, Moment, Conversation, UserStats, ScheduledNotification
+from src.db.models import User, Moment, Conversation, UserStats, ScheduledNotification, GDPRDeletion
+from src.services.conversation_cache import get_conversation_cache
+from src.services.moment_service import get_random_moment_deck
+from src.services.system_log_service import SystemLogService
 
 logger = logging.getLogger(__name__)
 
 
+# Export configuration
+EXPORT_FORMATS = ("json", "ndjson")
+EXPORT_FETCH_SIZE = 500  # Rows per server-side cursor fetch
+EXPORT_SPOOL_MAX_BYTES = 1024 * 1024  # Exports larger than this spill to disk
+
+# Deletion configuration
+# (table, action) in purge order; the users row itself is deleted last.
+# api_usage rows are kept for cost accounting with user_id cleared, as
+# ON DELETE SET NULL would do.
+PURGE_STEPS = (
+    ("conversations", "delete"),
+    ("conversation_memories", "delete"),
+    ("conversation_memory_archive", "delete"),
+    ("moments", "delete"),
+    ("voice_transcriptions", "delete"),
+    ("query_route_examples", "delete"),
+    ("feedback", "delete"),
+    ("start_events", "delete"),
+    ("admin_campaign_targets", "delete"),
+    ("social_profiles", "delete"),
+    ("user_stats", "delete"),
+    ("scheduled_notifications", "delete"),
+    ("api_usage", "anonymize"),
+)
+OPEN_DELETION_STATUSES = ("pending", "running", "failed")
+DELETE_BATCH_PAUSE_SECONDS = 0.05
+DELETION_STALE_AFTER = timedelta(minutes=10)  # Running deletions not updated since are resumed
+
+# Deletions being purged by this process, and their tasks (kept referenced)
+_running_deletions: Set[int] = set()
+_background_tasks: Set[asyncio.Task] = set()
+
+
+class SpooledExportFile(InputFile):
+    """
+    Upload source backed by a spooled temporary file.
+    Small exports stay in memory, large ones live on disk; the upload reads
+    it in chunks. Call close() once the file has been sent.
+    """
+
+    def __init__(self, spool: tempfile.SpooledTemporaryFile, filename: str):
+        super().__init__(filename=filename)
+        self.spool = spool
+        spool.seek(0, 2)
+        self.size = spool.tell()
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        self.spool.seek(0)
+        while chunk := self.spool.read(self.chunk_size):
+            yield chunk
+
+    def close(self) -> None:
+        self.spool.close()
+
+
+def _json_line(record: Dict[str, Any]) -> bytes:
+    return json.dumps(record, ensure_ascii=False).encode("utf-8")
+
+
 class GDPRService:
     """Service for GDPR compliance - data export and deletion"""
 
-    async def export_user_data(self, telegram_id: int) -> Optional[BufferedInputFile]:
+    async def export_user_data(
+        self,
+        telegram_id: int,
+        export_format: Optional[str] = None,
+        compress: Optional[bool] = None,
+    ) -> Optional[SpooledExportFile]:
         """
-        Export all user data as JSON file
+        Export all user data as a JSON (or NDJSON) file
+
+        Moments and conversations are read through server-side cursors and
+        written record by record to a spooled temporary file, so memory use
+        does not grow with the size of the history.
+
+        Args:
+            telegram_id: User's Telegram ID
+            export_format: 'json' or 'ndjson' (default: settings.gdpr_export_format)
+            compress: Gzip the file (default: settings.gdpr_export_gzip)
 
         Returns:
-            BufferedInputFile for sending to user, or None if user not found
+            SpooledExportFile for sending to user (close it after sending),
+            or None if user not found
         """
+        settings = get_settings()
+        export_format = export_format or settings.gdpr_export_format
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {export_format}")
+        if compress is None:
+            compress = settings.gdpr_export_gzip
+
         async with get_session() as session:
             # Get user
             result = await session.execute(
@@ -36,8 +125,7 @@ class GDPRService:
             if not user:
                 return None
 
-            # Collect all data
-            export_data = {
+            header = {
                 "export_date": datetime.now(timezone.utc).isoformat(),
                 "user": {
                     "telegram_id": user.telegram_id,
@@ -53,40 +141,9 @@ class GDPRService:
                     "created_at": user.created_at.isoformat(),
                     "updated_at": user.updated_at.isoformat(),
                 },
-                "moments": [],
-                "conversations": [],
                 "statistics": None,
             }
 
-            # Get moments
-            result = await session.execute(
-                select(Moment).where(Moment.user_id == user.id).order_by(Moment.created_at)
-            )
-            moments = result.scalars().all()
-
-            for moment in moments:
-                export_data["moments"].append({
-                    "content": moment.content,
-                    "source_type": moment.source_type,
-                    "mood_score": moment.mood_score,
-                    "topics": moment.topics,
-                    "created_at": moment.created_at.isoformat(),
-                })
-
-            # Get conversations
-            result = await session.execute(
-                select(Conversation).where(Conversation.user_id == user.id).order_by(Conversation.created_at)
-            )
-            conversations = result.scalars().all()
-
-            for conv in conversations:
-                export_data["conversations"].append({
-                    "message_type": conv.message_type,
-                    "content": conv.content,
-                    "metadata": conv.message_metadata,
-                    "created_at": conv.created_at.isoformat(),
-                })
-
             # Get stats
             result = await session.execute(
                 select(UserStats).where(UserStats.user_id == user.id)
@@ -94,7 +151,7 @@ class GDPRService:
             stats = result.scalar_one_or_none()
 
             if stats:
-                export_data["statistics"] = {
+                header["statistics"] = {
                     "current_streak": stats.current_streak,
                     "longest_streak": stats.longest_streak,
                     "total_moments": stats.total_moments,
@@ -103,24 +160,113 @@ class GDPRService:
                     "last_response_date": stats.last_response_date.isoformat() if stats.last_response_date else None,
                 }
 
-            # Create JSON file
-            json_data = json.dumps(export_data, ensure_ascii=False, indent=2)
-            file_bytes = json_data.encode("utf-8")
+            spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+            try:
+                out = gzip.GzipFile(fileobj=spool, mode="wb") if compress else spool
+                await self._write_export(session, user.id, header, export_format, out)
+                if compress:
+                    out.close()  # Flushes the gzip trailer, leaves spool open
+            except Exception:
+                spool.close()
+                raise
+
+        extension = "ndjson" if export_format == "ndjson" else "json"
+        if compress:
+            extension += ".gz"
+        filename = f"mindsethappybot_data_{telegram_id}_{datetime.now(timezone.utc).strftime('%Y%m%d')}.{extension}"
+        export_file = SpooledExportFile(spool, filename=filename)
+        logger.info(f"Exported data for user {telegram_id}: {export_file.size} bytes ({extension})")
+        return export_file
+
+    async def _write_export(self, session, user_id: int, header: Dict[str, Any], export_format: str, out) -> None:
+        """
+        Write the export to `out`.
+
+        json: the single document {export_date, user, statistics, moments: [...],
+        conversations: [...]}, with the arrays written element by element.
+        ndjson: a header record followed by one record per moment and conversation,
+        each tagged with "type".
+        """
+        ndjson = export_format == "ndjson"
+        if ndjson:
+            out.write(_json_line({"type": "header", **header}) + b"\n")
+        else:
+            # Open the document without its closing brace, then stream the arrays
+            out.write(_json_line(header)[:-1])
+
+        sections = (
+            (
+                "moments", "moment",
+                select(Moment.content, Moment.source_type, Moment.mood_score, Moment.topics, Moment.created_at)
+                .where(Moment.user_id == user_id)
+                .order_by(Moment.created_at, Moment.id),
+            ),
+            (
+                "conversations", "conversation",
+                select(
+                    Conversation.message_type,
+                    Conversation.content,
+                    Conversation.message_metadata.label("metadata"),
+                    Conversation.created_at,
+                )
+                .where(Conversation.user_id == user_id)
+                .order_by(Conversation.created_at, Conversation.id),
+            ),
+        )
+        for section, record_type, query in sections:
+            if not ndjson:
+                out.write(f', "{section}": ['.encode("utf-8"))
+
+            rows = await session.stream(query.execution_options(yield_per=EXPORT_FETCH_SIZE))
+            first = True
+            async for row in rows:
+                record = dict(row._mapping)
+                record["created_at"] = record["created_at"].isoformat()
+                if ndjson:
+                    out.write(_json_line({"type": record_type, **record}) + b"\n")
+                else:
+                    out.write((b"" if first else b", ") + _json_line(record))
+                first = False
 
-            filename = f"mindsethappybot_data_{telegram_id}_{datetime.now(timezone.utc).strftime('%Y%m%d')}.json"
+            if not ndjson:
+                out.write(b"]")
 
-            return BufferedInputFile(file_bytes, filename=filename)
+        if not ndjson:
+            out.write(b"}")
 
     async def delete_all_user_data(self, telegram_id: int) -> bool:
         """
         Delete all user data (GDPR right to be forgotten)
 
+        The user is tombstoned immediately (the bot stops responding and
+        sends nothing); their data is then purged in bounded batches in the
+        background. See request_deletion() and run_deletion().
+
         Returns:
-            True if deletion was successful, False if user not found
+            True if deletion was accepted, False if user not found
         """
-        logger.info(f"Starting GDPR data deletion for telegram_id={telegram_id}")
+        deletion = await self.request_deletion(telegram_id)
+        if deletion is None:
+            return False
+
+        task = asyncio.create_task(self.run_deletion(deletion.id))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        return True
+
+    async def request_deletion(self, telegram_id: int) -> Optional[GDPRDeletion]:
+        """
+        Tombstone the user and record a pending deletion.
+
+        Unsent notifications are dropped right away; everything else is left
+        to run_deletion(). Requesting again while a deletion is open returns
+        the open one.
+
+        Returns:
+            The GDPRDeletion record, or None if user not found
+        """
+        logger.info(f"GDPR deletion requested for telegram_id={telegram_id}")
         async with get_session() as session:
-            # Get user
             result = await session.execute(
                 select(User).where(User.telegram_id == telegram_id)
             )
@@ -128,47 +274,175 @@ class GDPRService:
 
             if not user:
                 logger.warning(f"User {telegram_id} not found for deletion")
-                return False
-
-            user_id = user.id
-            logger.info(f"Found user with id={user_id} for telegram_id={telegram_id}")
-
-            # Delete in order (respecting foreign keys)
-            # Note: With ON DELETE CASCADE, we only need to delete the user
-
-            # But let's be explicit for logging purposes
-            logger.info(f"Deleting all data for user {telegram_id} (user_id={user_id})")
+                return None
 
-            # Delete scheduled notifications
-            await session.execute(
-                delete(ScheduledNotification).where(ScheduledNotification.user_id == user_id)
+            result = await session.execute(
+                select(GDPRDeletion).where(
+                    GDPRDeletion.user_id == user.id,
+                    GDPRDeletion.status.in_(OPEN_DELETION_STATUSES),
+                )
             )
-            logger.debug(f"Deleted scheduled notifications for user {user_id}")
+            deletion = result.scalar_one_or_none()
+            if deletion:
+                return deletion
 
-            # Delete stats
+            user.deleted_at = datetime.now(timezone.utc)
+            user.notifications_enabled = False
             await session.execute(
-                delete(UserStats).where(UserStats.user_id == user_id)
+                delete(ScheduledNotification).where(
+                    ScheduledNotification.user_id == user.id,
+                    ScheduledNotification.sent.is_(False),
+                )
             )
-            logger.debug(f"Deleted stats for user {user_id}")
 
-            # Delete conversations
-            await session.execute(
-                delete(Conversation).where(Conversation.user_id == user_id)
+            deletion = GDPRDeletion(user_id=user.id, telegram_id=telegram_id, progress={})
+            session.add(deletion)
+            await session.commit()
+
+        get_conversation_cache().invalidate(telegram_id)
+        get_random_moment_deck().clear(telegram_id)
+        logger.info(f"User {telegram_id} tombstoned, deletion {deletion.id} pending")
+        return deletion
+
+    async def run_deletion(self, deletion_id: int) -> bool:
+        """
+        Purge a tombstoned user's data table by table in batches of
+        settings.gdpr_delete_batch_size rows, one transaction per batch.
+
+        Progress (current step, rows per table) is committed with every batch,
+        so a crashed or failed run resumes where it stopped. The users row is
+        deleted last, which also cascades anything written in the meantime.
+
+        Returns:
+            True if the deletion completed
+        """
+        if deletion_id in _running_deletions:
+            return False
+        _running_deletions.add(deletion_id)
+        batch_size = get_settings().gdpr_delete_batch_size
+
+        try:
+            async with get_session() as session:
+                deletion = await session.get(GDPRDeletion, deletion_id)
+                if deletion is None or deletion.status == "completed":
+                    return False
+                now = datetime.now(timezone.utc)
+                deletion.status = "running"
+                deletion.started_at = deletion.started_at or now
+                deletion.updated_at = now
+                deletion.attempts += 1
+                deletion.error = None
+                user_id = deletion.user_id
+                resume_step = deletion.current_step
+                await session.commit()
+
+            step_names = [table for table, _ in PURGE_STEPS]
+            first_step = step_names.index(resume_step) if resume_step in step_names else 0
+
+            for table, action in PURGE_STEPS[first_step:]:
+                while True:
+                    deleted = await self._purge_batch(deletion_id, user_id, table, action, batch_size)
+                    if deleted < batch_size:
+                        break
+                    # Let other queries through between batches
+                    await asyncio.sleep(DELETE_BATCH_PAUSE_SECONDS)
+
+            async with get_session() as session:
+                result = await session.execute(delete(User).where(User.id == user_id))
+                deletion = await session.get(GDPRDeletion, deletion_id)
+                deletion.progress = {**deletion.progress, "users": result.rowcount or 0}
+                deletion.current_step = None
+                deletion.status = "completed"
+                deletion.completed_at = deletion.updated_at = datetime.now(timezone.utc)
+                progress = deletion.progress
+                await session.commit()
+
+            logger.info(f"GDPR deletion {deletion_id} completed: {progress}")
+            await SystemLogService().log(
+                "INFO", "gdpr", f"GDPR deletion {deletion_id} completed",
+                details={"deletion_id": deletion_id, "rows": progress},
             )
-            logger.debug(f"Deleted conversations for user {user_id}")
+            return True
+
+        except Exception as e:
+            logger.error(f"GDPR deletion {deletion_id} failed: {e}", exc_info=True)
+            async with get_session() as session:
+                await session.execute(
+                    update(GDPRDeletion)
+                    .where(GDPRDeletion.id == deletion_id)
+                    .values(status="failed", error=str(e)[:1000], updated_at=datetime.now(timezone.utc))
+                )
+                await session.commit()
+            return False
+
+        finally:
+            _running_deletions.discard(deletion_id)
 
-            # Delete moments (including embeddings)
+    async def _purge_batch(
+        self, deletion_id: int, user_id: int, table: str, action: str, batch_size: int
+    ) -> int:
+        """Delete (or anonymize) one batch of a table and record progress in the same transaction"""
+        batch = f"SELECT id FROM {table} WHERE user_id = :user_id LIMIT :batch_size"
+        if action == "anonymize":
+            statement = f"UPDATE {table} SET user_id = NULL WHERE id IN ({batch})"
+        else:
+            statement = f"DELETE FROM {table} WHERE id IN ({batch})"
+
+        async with get_session() as session:
+            result = await session.execute(
+                text(statement), {"user_id": user_id, "batch_size": batch_size}
+            )
+            affected = result.rowcount or 0
             await session.execute(
-                delete(Moment).where(Moment.user_id == user_id)
+                text("""
+                    UPDATE gdpr_deletions
+                    SET current_step = CAST(:table AS TEXT),
+                        progress = jsonb_set(
+                            progress, ARRAY[CAST(:table AS TEXT)],
+                            to_jsonb(COALESCE((progress ->> CAST(:table AS TEXT))::bigint, 0) + :affected)
+                        ),
+                        updated_at = NOW()
+                    WHERE id = :deletion_id
+                """),
+                {"table": table, "affected": affected, "deletion_id": deletion_id},
             )
-            logger.debug(f"Deleted moments for user {user_id}")
+            await session.commit()
+        return affected
 
-            # Finally delete user
-            await session.execute(
-                delete(User).where(User.id == user_id)
+
+async def resume_gdpr_deletions() -> dict:
+    """
+    Scheduled job: run pending deletions and retry failed or stalled ones
+    (e.g. interrupted by a restart).
+
+    Returns:
+        Dict with stats: resumed, completed
+    """
+    stale_before = datetime.now(timezone.utc) - DELETION_STALE_AFTER
+    try:
+        async with get_session() as session:
+            result = await session.execute(
+                select(GDPRDeletion.id)
+                .where(
+                    or_(
+                        GDPRDeletion.status.in_(("pending", "failed")),
+                        and_(GDPRDeletion.status == "running", GDPRDeletion.updated_at < stale_before),
+                    )
+                )
+                .order_by(GDPRDeletion.requested_at)
             )
+            deletion_ids = [d for d in result.scalars().all() if d not in _running_deletions]
 
-            await session.commit()
-            logger.info(f"Successfully deleted all data for user {telegram_id}")
+        service = GDPRService()
+        completed = 0
+        for deletion_id in deletion_ids:
+            if await service.run_deletion(deletion_id):
+                completed += 1
 
-            return True
+        if deletion_ids:
+            logger.info(f"GDPR deletions resumed: {len(deletion_ids)}, completed: {completed}")
+        return {"resumed": len(deletion_ids), "completed": completed}
+
+    except Exception as e:
+        logger.error(f"GDPR deletion resume failed: {e}", exc_info=True)
+        return {"error": str(e)}
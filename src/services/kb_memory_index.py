@@ -0,0 +1,182 @@
+"""
+MINDSETHAPPYBOT - In-process knowledge base index
+Serves knowledge base vector search from memory instead of Postgres.
+
+knowledge_chunks is shared by all users and only changes when items are
+(re-)indexed, so the embeddings of all indexed chunks are kept in one
+contiguous float32 matrix with L2-normalized rows. A search is a single
+matrix-vector product plus a partial sort - no database round trip.
+
+Staleness is detected with knowledge_index_state.version, which triggers
+bump on every chunk write and indexing status change (migration 0029).
+Searches check the version at most every KB_INDEX_CHECK_SECONDS, in a
+background task, and reload the matrix when it moved; until the first
+load completes, and when NumPy is not installed, callers fall back to the
+Postgres search.
+"""
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+from src.config import get_settings
+from src.db.database import get_session
+
+try:
+    import numpy as np
+except ImportError:  # The index is optional; without NumPy search stays in Postgres
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+KB_INDEX_CHECK_SECONDS = 30  # How often searches look for a new index version
+
+
+@dataclass
+class _Snapshot:
+    """One loaded version of the knowledge base embeddings"""
+    version: int
+    chunk_ids: "np.ndarray"
+    item_ids: "np.ndarray"
+    contents: List[str]
+    matrix: "np.ndarray"  # (chunks, dimensions) float32, unit-length rows
+
+
+def _build_matrix(embeddings: List[str]) -> "np.ndarray":
+    matrix = np.array([json.loads(embedding) for embedding in embeddings], dtype=np.float32)
+    if matrix.size == 0:
+        return matrix.reshape(0, 0)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms)
+
+
+class KnowledgeBaseIndex:
+    """Normalized embedding matrix of all indexed knowledge chunks"""
+
+    def __init__(self):
+        self._snapshot: Optional[_Snapshot] = None
+        self._checked_at = 0.0
+        self._sync_task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return np is not None and get_settings().kb_memory_index_enabled
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._snapshot.version if self._snapshot else None
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        limit: int,
+    ) -> Optional[List[Tuple[int, int, str, float]]]:
+        """
+        Top chunks by cosine similarity, most similar first.
+
+        Returns (chunk_id, knowledge_base_id, content, similarity) tuples, or
+        None if the index is not loaded yet (the caller should query Postgres).
+        """
+        self._schedule_sync()
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        if not snapshot.contents or limit <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        scores = snapshot.matrix @ (query / norm)
+
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (int(snapshot.chunk_ids[i]), int(snapshot.item_ids[i]), snapshot.contents[i], float(scores[i]))
+            for i in top
+        ]
+
+    def _schedule_sync(self) -> None:
+        """Start a background version check if the last one is old enough"""
+        now = time.monotonic()
+        if now - self._checked_at < KB_INDEX_CHECK_SECONDS:
+            return
+        if self._sync_task is not None and not self._sync_task.done():
+            return
+        self._checked_at = now
+        self._sync_task = asyncio.get_running_loop().create_task(self.sync())
+
+    async def sync(self) -> bool:
+        """Reload the matrix if the stored version differs. Returns True if reloaded."""
+        try:
+            async with get_session() as session:
+                version = await self._get_version(session)
+            if self._snapshot is not None and self._snapshot.version == version:
+                return False
+            await self.load()
+            return True
+        except Exception as e:
+            # Keep serving the current snapshot (or Postgres) until the next check
+            logger.warning(f"Knowledge base index sync failed: {e}")
+            return False
+
+    async def load(self) -> None:
+        """Load all indexed chunk embeddings into a new snapshot"""
+        started = time.monotonic()
+        async with get_session() as session:
+            # Read the version first: a write racing with the load bumps it
+            # again, so the next check picks the newer chunks up
+            version = await self._get_version(session)
+            result = await session.execute(
+                text("""
+                    SELECT kc.id, kc.knowledge_base_id, kc.content,
+                           CAST(kc.embedding AS TEXT) AS embedding
+                    FROM knowledge_chunks kc
+                    JOIN knowledge_base kb ON kc.knowledge_base_id = kb.id
+                    WHERE kc.embedding IS NOT NULL
+                      AND kb.indexing_status = 'indexed'
+                    ORDER BY kc.id
+                """)
+            )
+            rows = result.all()
+
+        # Parsing and normalizing is CPU work, keep it off the event loop
+        matrix = await asyncio.to_thread(_build_matrix, [row.embedding for row in rows])
+        self._snapshot = _Snapshot(
+            version=version,
+            chunk_ids=np.array([row.id for row in rows], dtype=np.int64),
+            item_ids=np.array([row.knowledge_base_id for row in rows], dtype=np.int64),
+            contents=[row.content for row in rows],
+            matrix=matrix,
+        )
+        logger.info(
+            f"Knowledge base index loaded: version={version}, chunks={len(rows)}, "
+            f"{matrix.nbytes / (1024 * 1024):.1f} MiB in {(time.monotonic() - started) * 1000:.0f}ms"
+        )
+
+    @staticmethod
+    async def _get_version(session) -> int:
+        result = await session.execute(
+            text("SELECT version FROM knowledge_index_state WHERE id = 1")
+        )
+        return int(result.scalar() or 0)
+
+
+# Singleton instance for reuse
+_kb_index: Optional[KnowledgeBaseIndex] = None
+
+
+def get_kb_index() -> KnowledgeBaseIndex:
+    """Get singleton instance of KnowledgeBaseIndex"""
+    global _kb_index
+    if _kb_index is None:
+        _kb_index = KnowledgeBaseIndex()
+    return _kb_index
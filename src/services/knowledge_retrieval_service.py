@@ -7,9 +7,10 @@ Hybrid RAG implementation with 4 sources:
 4. Model parametric knowledge - always available fallback
 
 Features:
-- Query type classification (A/B/C/R routing)
+- Query type classification (A/B/C/R routing), local from the query embedding
+  with an LLM fallback (see query_router)
 - Vector similarity search with thresholds
-- Recency boosting for moments
+- Recency boosting for moments, fused with similarity in SQL (see retrieval_scoring)
 - Usage count tracking for KB
 - Anti-repetition fingerprinting
 - Anti-hallucination for "remember" queries (type R)
@@ -18,23 +19,28 @@ import logging
 import hashlib
 import re
 import time
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
 
 from openai import AsyncOpenAI
-from sqlalchemy import text, select, and_
+from sqlalchemy import text, select
 
 from src.config import get_settings
 from src.db.database import get_session
-from src.db.models import User, Conversation
+from src.db.models import User
 from src.services.embedding_service import EmbeddingService
 from src.services.api_usage_service import APIUsageService
+from src.services.conversation_cache import get_conversation_cache
+from src.services.query_router import get_query_router
+from src.services.kb_memory_index import get_kb_index
+from src.services.context_packer import PackCandidate, PackResult, pack_context
+from src.services.retrieval_scoring import build_fused_query, get_scoring_function, scoring_params
 from src.services.conversation_memory_service import (
     ConversationMemoryService,
     RetrievedMemory,
     RAW_DIALOG_KIND,
-    DIALOG_SUMMARY_KIND,
+    DIALOG_SUMMARY_KINDS,
     MEMORY_KINDS,
 )
 
@@ -48,11 +54,55 @@ DIALOG_MEMORY_TOP_K = 5  # Extracted facts from dialog
 DIALOG_SNIPPETS_TOP_K = 6  # Raw user messages for long-term recall
 DIALOG_SUMMARIES_TOP_K = 3  # Compressed summaries of dialog history
 SIMILARITY_THRESHOLD = 0.40  # Below this, don't include source (lowered for Russian text)
-MAX_CONTEXT_CHARS = 4500  # ~1200-1500 tokens
-RECENCY_BOOST_DAYS = 7  # Moments within this period get boosted
-RECENCY_BOOST_FACTOR = 0.05  # How much to boost recent moments
+MAX_CONTEXT_TOKENS = 1200  # Budget for the retrieved-context block of the dialog prompt
 FINGERPRINT_HISTORY_LIMIT = 50  # How many past bot replies to check for repetition
 
+# Prompt sections of each retrieval source, in prompt order
+SECTION_HEADERS = {
+    "dialog_memories": "=== FACTS USER TOLD YOU (from previous conversations) ===",
+    "dialog_summaries": "=== CONVERSATION SUMMARIES (compressed dialog history) ===",
+    "dialog_snippets": "=== RELEVANT USER MESSAGES (semantic recall) ===",
+    "moments": "=== USER'S PERSONAL HISTORY (from their previous positive moments) ===",
+    "kb_chunks": "=== KNOWLEDGE BASE (reference material for supportive responses) ===",
+}
+# Items longer than this (chars) are cut when rendered into the prompt
+SOURCE_CHAR_LIMITS = {
+    "dialog_memories": 300,
+    "dialog_summaries": 500,
+    "dialog_snippets": 300,
+    "moments": 300,
+    "kb_chunks": 400,
+}
+# Context packing per query type: (minimum items per source, score weights)
+PACKING_PROFILES = {
+    # Remember: what the user told us; no KB is retrieved
+    'R': (
+        {"dialog_memories": 1, "dialog_summaries": 1, "moments": 1},
+        {"dialog_snippets": 0.8},
+    ),
+    # Personal: dialog memory and moments first, KB only fills leftover space
+    'A': (
+        {"dialog_memories": 1, "dialog_summaries": 1, "moments": 1},
+        {"kb_chunks": 0.5, "dialog_snippets": 0.7},
+    ),
+    # Advice: KB first
+    'B': (
+        {"kb_chunks": 2},
+        {"kb_chunks": 1.5, "dialog_snippets": 0.6, "moments": 0.7},
+    ),
+    # General: balanced, prefer KB
+    'C': (
+        {"kb_chunks": 1},
+        {"kb_chunks": 1.2, "dialog_snippets": 0.6},
+    ),
+}
+
+
+def clip_content(content: str, limit: int) -> str:
+    """Cut content to limit chars, marking the cut with an ellipsis"""
+    return content[:limit] + "..." if len(content) > limit else content
+
+
 # Patterns to detect "remember" queries (anti-hallucination required)
 REMEMBER_PATTERNS = [
     r'\bпомн[иь]шь\b',  # помнишь (Russian - remember?)
@@ -124,6 +174,9 @@ class RAGContext:
     dialog_summary_ids: List[int] = field(default_factory=list)
     dialog_summary_scores: List[float] = field(default_factory=list)
     is_remember_query: bool = False  # Anti-hallucination flag
+    # Token accounting of the packed context block
+    context_tokens: int = 0
+    context_dropped: int = 0
 
 
 class KnowledgeRetrievalService:
@@ -147,19 +200,48 @@ class KnowledgeRetrievalService:
                 return True
         return False
 
-    async def classify_query_type(self, query: str) -> str:
+    async def classify_query_type(
+        self,
+        query: str,
+        query_embedding: Optional[List[float]] = None,
+        telegram_id: Optional[int] = None,
+    ) -> str:
         """
         Classify query into types:
         - Type A: About user / emotions / progress - moments required, KB optional
         - Type B: How to support / formulate / practices - KB required, moments optional
         - Type C: General questions - KB if available, otherwise model-only
         - Type R: Remember queries - dialog memory + moments only, anti-hallucination
+
+        With query_embedding, the local query router classifies A/B/C; the
+        LLM is asked only when the router abstains, and its answer is kept
+        as a router training example.
         """
         # Check for remember query first (cheap heuristic)
         if self.is_remember_query(query):
             logger.debug(f"Query classified as type R (remember): {query[:50]}...")
             return 'R'
 
+        router = get_query_router()
+        if query_embedding is not None:
+            decision = await router.route(query_embedding)
+            if decision is not None:
+                logger.debug(
+                    f"Query routed locally as type {decision.label} "
+                    f"(margin={decision.margin:.3f}): {query[:50]}..."
+                )
+                return decision.label
+
+        result = await self.classify_with_llm(query)
+        if result is None:
+            return 'C'  # Default to general on error
+
+        if query_embedding is not None:
+            await router.record_example(query_embedding, result, telegram_id=telegram_id)
+        return result
+
+    async def classify_with_llm(self, query: str) -> Optional[str]:
+        """Classify a query as A/B/C with a chat completion; None on error"""
         start_time = time.time()
         success = True
         error_msg = None
@@ -200,7 +282,7 @@ Reply with ONLY a single letter: A, B, or C."""
             logger.error(f"Query classification failed: {e}")
             success = False
             error_msg = str(e)
-            return 'C'  # Default to general on error
+            return None
 
         finally:
             duration_ms = int((time.time() - start_time) * 1000)
@@ -259,12 +341,13 @@ Reply with ONLY a single letter: A, B, or C."""
         Search user's dialog summaries with vector similarity.
         Summaries are compressed representations of multiple messages and
         should be prioritized over raw snippets for context efficiency.
+        Includes the daily/weekly/monthly rollups created by compaction.
         """
         return await self.memory_service.search_memories(
             telegram_id=telegram_id,
             query_embedding=query_embedding,
             limit=limit,
-            kinds=[DIALOG_SUMMARY_KIND],
+            kinds=DIALOG_SUMMARY_KINDS,
         )
 
     async def search_moments(
@@ -274,74 +357,49 @@ Reply with ONLY a single letter: A, B, or C."""
         limit: int = MOMENTS_TOP_K,
     ) -> List[RetrievedMoment]:
         """
-        Search user's moments with vector similarity and recency boost
+        Search user's moments with vector similarity and recency boost.
+        Candidates and the fused score are computed in Postgres (see retrieval_scoring).
         """
+        settings = get_settings()
+        scoring = get_scoring_function(settings.moment_scoring_function)
+
         async with get_session() as session:
             # Get user
             result = await session.execute(
-                select(User).where(User.telegram_id == telegram_id)
+                select(User.id).where(User.telegram_id == telegram_id)
             )
-            user = result.scalar_one_or_none()
+            user_id = result.scalar_one_or_none()
 
-            if not user:
+            if not user_id:
                 return []
 
-            # Build embedding string for pgvector (must be embedded in SQL for asyncpg)
-            embedding_literal = "'" + "[" + ",".join(f"{x:.10g}" for x in query_embedding) + "]'::vector"
-            fetch_limit = limit * 2  # Get extra to filter by threshold
-
-            # Vector search with cosine distance
-            # Note: Using f-string for embedding literal because asyncpg doesn't support ::vector cast with params
             result = await session.execute(
-                text(f"""
-                    SELECT
-                        id,
-                        content,
-                        created_at,
-                        1 - (embedding <=> {embedding_literal}) as similarity
-                    FROM moments
-                    WHERE user_id = :user_id
-                    AND embedding IS NOT NULL
-                    ORDER BY embedding <=> {embedding_literal}
-                    LIMIT :limit
-                """),
+                text(build_fused_query(
+                    "moments",
+                    ["id", "content"],
+                    scoring,
+                    mood_column="mood_score",
+                )),
                 {
-                    "user_id": user.id,
-                    "limit": fetch_limit,
+                    "user_id": user_id,
+                    "embedding": str(list(query_embedding)),
+                    "pool_size": max(settings.retrieval_candidate_pool, limit),
+                    "min_similarity": SIMILARITY_THRESHOLD,
+                    "limit": limit,
+                    **scoring_params(mood_weight=settings.moment_mood_weight),
                 }
             )
-            rows = result.fetchall()
 
-            # Filter by threshold and apply recency boost
-            moments = []
-            now = datetime.now(timezone.utc)
-            recency_cutoff = now - timedelta(days=RECENCY_BOOST_DAYS)
-
-            for row in rows:
-                similarity = float(row.similarity)
-                if similarity < SIMILARITY_THRESHOLD:
-                    continue
-
-                # Apply recency boost
-                boosted_score = similarity
-                if row.created_at > recency_cutoff:
-                    # Days since creation (0 = today, 7 = week ago)
-                    days_old = (now - row.created_at).days
-                    # Boost decreases linearly with age
-                    boost = RECENCY_BOOST_FACTOR * (1 - days_old / RECENCY_BOOST_DAYS)
-                    boosted_score = min(1.0, similarity + boost)
-
-                moments.append(RetrievedMoment(
+            return [
+                RetrievedMoment(
                     id=row.id,
                     content=row.content,
-                    similarity=similarity,
+                    similarity=float(row.similarity),
                     created_at=row.created_at,
-                    boosted_score=boosted_score,
-                ))
-
-            # Sort by boosted score and limit
-            moments.sort(key=lambda m: m.boosted_score, reverse=True)
-            return moments[:limit]
+                    boosted_score=float(row.score),
+                )
+                for row in result.fetchall()
+            ]
 
     async def search_knowledge_base(
         self,
@@ -349,8 +407,24 @@ Reply with ONLY a single letter: A, B, or C."""
         limit: int = KB_TOP_K,
     ) -> List[RetrievedChunk]:
         """
-        Search knowledge base chunks with vector similarity
+        Search knowledge base chunks with vector similarity.
+        Served from the in-process index when it is loaded, otherwise from Postgres.
         """
+        kb_index = get_kb_index()
+        if kb_index.enabled:
+            hits = kb_index.search(query_embedding, limit)
+            if hits is not None:
+                return [
+                    RetrievedChunk(
+                        id=chunk_id,
+                        knowledge_base_id=item_id,
+                        content=content,
+                        similarity=similarity,
+                    )
+                    for chunk_id, item_id, content, similarity in hits
+                    if similarity >= SIMILARITY_THRESHOLD
+                ]
+
         async with get_session() as session:
             # Build embedding literal for pgvector (must be embedded in SQL for asyncpg)
             embedding_literal = "'" + "[" + ",".join(f"{x:.10g}" for x in query_embedding) + "]'::vector"
@@ -403,46 +477,29 @@ Reply with ONLY a single letter: A, B, or C."""
         Get fingerprints and short excerpts of recent bot replies for anti-repetition
         Returns: (fingerprints, short_excerpts)
         """
-        async with get_session() as session:
-            # Get user
-            result = await session.execute(
-                select(User).where(User.telegram_id == telegram_id)
-            )
-            user = result.scalar_one_or_none()
-
-            if not user:
-                return [], []
-
-            # Get recent bot replies
-            result = await session.execute(
-                select(Conversation)
-                .where(
-                    and_(
-                        Conversation.user_id == user.id,
-                        Conversation.message_type == "bot_reply",
-                    )
-                )
-                .order_by(Conversation.created_at.desc())
-                .limit(limit)
-            )
-            conversations = result.scalars().all()
+        # Recent bot replies come from the per-user conversation cache
+        turns = await get_conversation_cache().get_turns(
+            telegram_id,
+            message_types=("bot_reply",),
+            limit=limit,
+        )
 
-            fingerprints = []
-            excerpts = []
+        fingerprints = []
+        excerpts = []
 
-            for conv in conversations:
-                # Get fingerprint from metadata or compute it
-                fp = None
-                if conv.message_metadata and "answer_fingerprint" in conv.message_metadata:
-                    fp = conv.message_metadata["answer_fingerprint"]
-                else:
-                    fp = self.compute_fingerprint(conv.content)
+        for turn in turns:
+            # Get fingerprint from metadata or compute it
+            fp = None
+            if turn.metadata and "answer_fingerprint" in turn.metadata:
+                fp = turn.metadata["answer_fingerprint"]
+            else:
+                fp = self.compute_fingerprint(turn.content)
 
-                fingerprints.append(fp)
-                # Short excerpt for context (first 100 chars)
-                excerpts.append(conv.content[:100] if conv.content else "")
+            fingerprints.append(fp)
+            # Short excerpt for context (first 100 chars)
+            excerpts.append(turn.content[:100] if turn.content else "")
 
-            return fingerprints, excerpts
+        return fingerprints, excerpts
 
     @staticmethod
     def compute_fingerprint(text: str) -> str:
@@ -478,15 +535,17 @@ Reply with ONLY a single letter: A, B, or C."""
         - Recent fingerprints for anti-repetition
         - Anti-hallucination flag for remember queries
         """
-        # Step 1: Classify query type
-        query_type = await self.classify_query_type(query)
+        # Step 1: Create query embedding
+        query_embedding = await self.embedding_service.create_embedding(query)
+        if query_embedding is None:
+            logger.warning("Failed to create query embedding")
+
+        # Step 2: Classify query type (locally from the embedding when possible)
+        query_type = await self.classify_query_type(query, query_embedding, telegram_id=telegram_id)
         is_remember = query_type == 'R'
         logger.info(f"RAG query classification for user {telegram_id}: type={query_type}, query='{query[:100]}'")
 
-        # Step 2: Create query embedding
-        query_embedding = await self.embedding_service.create_embedding(query)
         if query_embedding is None:
-            logger.warning("Failed to create query embedding")
             return RAGContext(
                 query_type=query_type,
                 moments=[],
@@ -568,75 +627,26 @@ Reply with ONLY a single letter: A, B, or C."""
         # Step 4: Get anti-repetition data
         fingerprints, excerpts = await self.get_recent_fingerprints(telegram_id)
 
-        # Step 5: Truncate context if too long
-        total_chars = (
-            sum(len(m.content) for m in moments) +
-            sum(len(c.content) for c in kb_chunks) +
-            sum(len(d.content) for d in dialog_memories) +
-            sum(len(s.content) for s in dialog_snippets) +
-            sum(len(s.content) for s in dialog_summaries)
+        # Step 5: Pack the best items into the token budget
+        packed = self.pack_context(
+            query_type,
+            {
+                "dialog_memories": dialog_memories,
+                "dialog_summaries": dialog_summaries,
+                "dialog_snippets": dialog_snippets,
+                "moments": moments,
+                "kb_chunks": kb_chunks,
+            },
+        )
+        dialog_memories = packed.selected.get("dialog_memories", [])
+        dialog_summaries = packed.selected.get("dialog_summaries", [])
+        dialog_snippets = packed.selected.get("dialog_snippets", [])
+        moments = packed.selected.get("moments", [])
+        kb_chunks = packed.selected.get("kb_chunks", [])
+        logger.info(
+            f"RAG context packed for user {telegram_id}: {packed.tokens}/{MAX_CONTEXT_TOKENS} tokens, "
+            f"{packed.candidates - packed.dropped}/{packed.candidates} items"
         )
-        if total_chars > MAX_CONTEXT_CHARS:
-            # Prioritize based on query type
-            if query_type in ('A', 'R'):
-                # Keep dialog memories, summaries, and moments; truncate KB and raw snippets
-                kb_chars = sum(len(c.content) for c in kb_chunks)
-                while kb_chars > MAX_CONTEXT_CHARS // 5 and kb_chunks:
-                    kb_chunks.pop()
-                    kb_chars = sum(len(c.content) for c in kb_chunks)
-                # If summaries exist, reduce raw snippets (redundant)
-                if dialog_summaries:
-                    while len(dialog_snippets) > 2 and dialog_snippets:
-                        dialog_snippets.pop()
-            elif query_type == 'B':
-                # Keep KB, truncate dialog memories, summaries, and moments
-                mem_chars = (
-                    sum(len(m.content) for m in moments) +
-                    sum(len(d.content) for d in dialog_memories) +
-                    sum(len(s.content) for s in dialog_snippets) +
-                    sum(len(s.content) for s in dialog_summaries)
-                )
-                while mem_chars > MAX_CONTEXT_CHARS // 4 and (moments or dialog_memories or dialog_snippets):
-                    if dialog_snippets:
-                        dialog_snippets.pop()
-                    elif moments:
-                        moments.pop()
-                    elif dialog_memories:
-                        dialog_memories.pop()
-                    mem_chars = (
-                        sum(len(m.content) for m in moments) +
-                        sum(len(d.content) for d in dialog_memories) +
-                        sum(len(s.content) for s in dialog_snippets) +
-                        sum(len(s.content) for s in dialog_summaries)
-                    )
-            else:
-                # General query (type C) - balance all sources, prefer KB
-                kb_chars = sum(len(c.content) for c in kb_chunks)
-                while kb_chars > MAX_CONTEXT_CHARS // 3 and kb_chunks:
-                    kb_chunks.pop()
-                    kb_chars = sum(len(c.content) for c in kb_chunks)
-
-                mem_chars = (
-                    sum(len(m.content) for m in moments) +
-                    sum(len(d.content) for d in dialog_memories) +
-                    sum(len(s.content) for s in dialog_snippets) +
-                    sum(len(s.content) for s in dialog_summaries)
-                )
-                while mem_chars > MAX_CONTEXT_CHARS // 3 and (moments or dialog_memories or dialog_snippets or dialog_summaries):
-                    if dialog_snippets:
-                        dialog_snippets.pop()
-                    elif moments:
-                        moments.pop()
-                    elif dialog_summaries:
-                        dialog_summaries.pop()
-                    elif dialog_memories:
-                        dialog_memories.pop()
-                    mem_chars = (
-                        sum(len(m.content) for m in moments) +
-                        sum(len(d.content) for d in dialog_memories) +
-                        sum(len(s.content) for s in dialog_snippets) +
-                        sum(len(s.content) for s in dialog_summaries)
-                    )
 
         return RAGContext(
             query_type=query_type,
@@ -659,6 +669,38 @@ Reply with ONLY a single letter: A, B, or C."""
             dialog_summary_ids=[s.id for s in dialog_summaries],
             dialog_summary_scores=[s.similarity for s in dialog_summaries],
             is_remember_query=is_remember,
+            context_tokens=packed.tokens,
+            context_dropped=packed.dropped,
+        )
+
+    @staticmethod
+    def pack_context(
+        query_type: str,
+        sources: Dict[str, list],
+        budget: int = MAX_CONTEXT_TOKENS,
+    ) -> PackResult:
+        """
+        Choose the retrieved items that go into the prompt, measured in tokens
+        as build_context_prompt renders them. Minimums and weights per source
+        come from PACKING_PROFILES for the query type.
+        """
+        candidates = []
+        for source, items in sources.items():
+            for item in items:
+                score = item.boosted_score if source == "moments" else item.similarity
+                candidates.append(PackCandidate(
+                    source=source,
+                    item=item,
+                    text=clip_content(item.content, SOURCE_CHAR_LIMITS[source]),
+                    score=score,
+                ))
+        minimums, weights = PACKING_PROFILES.get(query_type, PACKING_PROFILES['C'])
+        return pack_context(
+            candidates,
+            budget,
+            minimums=minimums,
+            weights=weights,
+            headers=SECTION_HEADERS,
         )
 
     async def increment_kb_usage(self, kb_item_ids: List[int]) -> None:
@@ -689,47 +731,16 @@ Reply with ONLY a single letter: A, B, or C."""
         """
         parts = []
 
-        # Dialog memory section (highest priority - what user told us)
-        if context.dialog_memories:
-            parts.append("=== FACTS USER TOLD YOU (from previous conversations) ===")
-            for i, d in enumerate(context.dialog_memories, 1):
-                # Truncate very long facts
-                content = d.content[:300] + "..." if len(d.content) > 300 else d.content
-                parts.append(f"{i}. {content}")
-            parts.append("")
-
-        # Dialog summaries section (compressed conversation history - HIGH priority)
-        if context.dialog_summaries:
-            parts.append("=== CONVERSATION SUMMARIES (compressed dialog history) ===")
-            for i, s in enumerate(context.dialog_summaries, 1):
-                content = s.content[:500] + "..." if len(s.content) > 500 else s.content
-                parts.append(f"{i}. {content}")
-            parts.append("")
-
-        # Raw dialog snippets (only if no summaries or few summaries available)
-        if context.dialog_snippets:
-            parts.append("=== RELEVANT USER MESSAGES (semantic recall) ===")
-            for i, s in enumerate(context.dialog_snippets, 1):
-                content = s.content[:300] + "..." if len(s.content) > 300 else s.content
-                parts.append(f"{i}. {content}")
-            parts.append("")
-
-        # User memory section
-        if context.moments:
-            parts.append("=== USER'S PERSONAL HISTORY (from their previous positive moments) ===")
-            for i, m in enumerate(context.moments, 1):
-                # Truncate very long moments
-                content = m.content[:300] + "..." if len(m.content) > 300 else m.content
-                parts.append(f"{i}. {content}")
-            parts.append("")
-
-        # Knowledge base section
-        if context.kb_chunks:
-            parts.append("=== KNOWLEDGE BASE (reference material for supportive responses) ===")
-            for i, c in enumerate(context.kb_chunks, 1):
-                # Truncate very long chunks
-                content = c.content[:400] + "..." if len(c.content) > 400 else c.content
-                parts.append(f"{i}. {content}")
+        # Sections in SECTION_HEADERS order: what the user told us first,
+        # knowledge base last. Item texts are clipped exactly as they were
+        # measured by pack_context.
+        for source, header in SECTION_HEADERS.items():
+            items = getattr(context, source)
+            if not items:
+                continue
+            parts.append(header)
+            for i, item in enumerate(items, 1):
+                parts.append(f"{i}. {clip_content(item.content, SOURCE_CHAR_LIMITS[source])}")
             parts.append("")
 
         if not parts:
@@ -824,4 +835,5 @@ Generate a fresh, unique response. Same meaning is OK, but different wording req
             "dialog_snippets_count": len(context.dialog_snippets),
             "dialog_summaries_count": len(context.dialog_summaries),
             "is_remember_query": context.is_remember_query,
+            "context_tokens": context.context_tokens,
         }
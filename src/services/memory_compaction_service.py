@@ -0,0 +1,538 @@
+"""
+MINDSETHAPPYBOT - Memory Compaction Service
+Hierarchical compaction with tiered retention for conversation_memories.
+
+Raw dialog snippets are compressed every 2 hours into dialog summaries
+(see ConversationMemoryService.create_user_summary). This service rolls
+those further up:
+
+    dialog_raw + dialog_summary  ->  dialog_daily
+    dialog_daily                 ->  dialog_weekly
+    dialog_weekly                ->  dialog_monthly
+
+Only completed periods (UTC) are rolled up. Children are marked with
+metadata.rolled_up_into = <rollup id>; children that turn up after their
+period was rolled up are attached to the existing rollup. Once they are
+older than the tier's retention horizon they are moved into
+conversation_memory_archive.
+This keeps per-user memory counts (and the vector index) bounded.
+"""
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Tuple
+
+from sqlalchemy import select, text
+
+from src.db.database import get_session
+from src.db.models import User
+from src.services.api_usage_service import APIUsageService
+from src.services.conversation_memory_service import (
+    ConversationMemoryService,
+    RAW_DIALOG_KIND,
+    DIALOG_SUMMARY_KIND,
+    DIALOG_DAILY_KIND,
+    DIALOG_WEEKLY_KIND,
+    DIALOG_MONTHLY_KIND,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Retention horizons: rolled-up children older than this are archived
+RAW_RETENTION_DAYS = 30  # dialog_raw and dialog_summary
+DAILY_RETENTION_DAYS = 90  # dialog_daily
+WEEKLY_RETENTION_DAYS = 365  # dialog_weekly
+
+# Maximum periods rolled up per user, per tier, per run (bounds LLM calls)
+MAX_PERIODS_PER_RUN = 14
+
+
+@dataclass(frozen=True)
+class CompactionTier:
+    """One level of the compaction hierarchy"""
+    kind: str  # Kind of the rollup rows this tier produces
+    child_kinds: Tuple[str, ...]  # Kinds rolled up into it
+    period: str  # 'day', 'week' or 'month'
+    child_retention_days: int  # Age after which rolled-up children are archived
+    importance: float
+
+
+COMPACTION_TIERS = [
+    CompactionTier(
+        kind=DIALOG_DAILY_KIND,
+        child_kinds=(DIALOG_SUMMARY_KIND, RAW_DIALOG_KIND),
+        period="day",
+        child_retention_days=RAW_RETENTION_DAYS,
+        importance=1.6,
+    ),
+    CompactionTier(
+        kind=DIALOG_WEEKLY_KIND,
+        child_kinds=(DIALOG_DAILY_KIND,),
+        period="week",
+        child_retention_days=DAILY_RETENTION_DAYS,
+        importance=1.7,
+    ),
+    CompactionTier(
+        kind=DIALOG_MONTHLY_KIND,
+        child_kinds=(DIALOG_WEEKLY_KIND,),
+        period="month",
+        child_retention_days=WEEKLY_RETENTION_DAYS,
+        importance=1.8,
+    ),
+]
+
+
+@dataclass
+class CompactionChild:
+    """A memory row that is a candidate for rollup"""
+    id: int
+    content: str
+    kind: str
+    source_conversation_ids: List[int]
+    created_at: datetime
+
+
+def period_bounds(moment: datetime, period: str) -> Tuple[datetime, datetime]:
+    """
+    Get [start, end) of the UTC day/week/month containing `moment`.
+    Weeks start on Monday; a week belongs to the month of its Monday.
+    """
+    day = moment.astimezone(timezone.utc).date()
+    if period == "day":
+        start = day
+        end = day + timedelta(days=1)
+    elif period == "week":
+        start = day - timedelta(days=day.weekday())
+        end = start + timedelta(days=7)
+    elif period == "month":
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+    else:
+        raise ValueError(f"Unknown compaction period: {period}")
+
+    return (
+        datetime.combine(start, datetime.min.time(), tzinfo=timezone.utc),
+        datetime.combine(end, datetime.min.time(), tzinfo=timezone.utc),
+    )
+
+
+def group_by_period(
+    children: List[CompactionChild],
+    period: str,
+    now: datetime,
+) -> Dict[datetime, List[CompactionChild]]:
+    """
+    Group children by the period they fall into.
+    Periods that have not ended yet are left out.
+    """
+    groups: Dict[datetime, List[CompactionChild]] = {}
+    for child in children:
+        # Rollups are stamped with their period start (a weekly rollup with
+        # its Monday), so each week lands in exactly one month
+        start, end = period_bounds(child.created_at, period)
+        if end > now:
+            continue
+        groups.setdefault(start, []).append(child)
+    return dict(sorted(groups.items()))
+
+
+def select_rollup_inputs(children: List[CompactionChild]) -> List[CompactionChild]:
+    """
+    Pick the rows whose text goes into the rollup prompt.
+    Raw snippets already covered by a dialog summary are represented by that
+    summary and are skipped.
+    """
+    covered = set()
+    for child in children:
+        if child.kind != RAW_DIALOG_KIND:
+            covered.update(child.source_conversation_ids or [])
+
+    return [
+        child for child in children
+        if child.kind != RAW_DIALOG_KIND
+        or not covered.intersection(child.source_conversation_ids or [])
+    ]
+
+
+class MemoryCompactionService:
+    """Service for rolling up and retiring conversation memories"""
+
+    def __init__(self):
+        self.memory_service = ConversationMemoryService()
+
+    async def _load_children(
+        self,
+        user_id: int,
+        tier: CompactionTier,
+        before: datetime,
+    ) -> List[CompactionChild]:
+        """Load children of a tier that were not rolled up yet"""
+        async with get_session() as session:
+            result = await session.execute(
+                text("""
+                    SELECT id, content, kind, source_conversation_ids, created_at
+                    FROM conversation_memories
+                    WHERE user_id = :user_id
+                    AND kind = ANY(:kinds)
+                    AND created_at < :before
+                    AND NOT (COALESCE(metadata, '{}'::jsonb) ? 'rolled_up_into')
+                    ORDER BY created_at ASC
+                """),
+                {"user_id": user_id, "kinds": list(tier.child_kinds), "before": before}
+            )
+            return [
+                CompactionChild(
+                    id=row.id,
+                    content=row.content,
+                    kind=row.kind,
+                    source_conversation_ids=list(row.source_conversation_ids or []),
+                    created_at=row.created_at,
+                )
+                for row in result.fetchall()
+            ]
+
+    async def _generate_rollup_text(
+        self,
+        children: List[CompactionChild],
+        tier: CompactionTier,
+        period_start: datetime,
+    ) -> Optional[str]:
+        """Merge several summaries/messages into one rollup summary"""
+        if len(children) == 1:
+            # Nothing to merge - reuse the text instead of paying for an LLM call
+            return children[0].content
+
+        start_time = time.time()
+        success = True
+        error_msg = None
+        input_tokens = 0
+        output_tokens = 0
+        model = self.memory_service.analysis_model
+
+        try:
+            entries = "\n".join(f"- {c.content}" for c in children)
+            response = await self.memory_service.client.chat.completions.create(
+                model=model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": f"""You merge notes about a user's conversations into one summary covering one {tier.period} ({period_start.date().isoformat()}).
+
+RULES:
+1. Keep it concise (3-6 sentences)
+2. Write in third person: "The user mentioned...", "They talked about..."
+3. Preserve concrete facts, names, plans, achievements and recurring emotional themes
+4. Drop small talk and repeated information
+5. Don't add interpretations or assumptions
+
+OUTPUT: A single paragraph."""
+                    },
+                    {"role": "user", "content": f"Merge these notes:\n\n{entries}"},
+                ],
+                max_tokens=350,
+                temperature=0,
+            )
+
+            if response.usage:
+                input_tokens = response.usage.prompt_tokens
+                output_tokens = response.usage.completion_tokens
+
+            return response.choices[0].message.content.strip()
+
+        except Exception as e:
+            logger.error(f"Memory rollup generation failed: {e}")
+            success = False
+            error_msg = str(e)
+            return None
+
+        finally:
+            duration_ms = int((time.time() - start_time) * 1000)
+            await APIUsageService.log_usage(
+                api_provider="openai",
+                model=model,
+                operation_type="memory_compaction",
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                duration_ms=duration_ms,
+                success=success,
+                error_message=error_msg,
+                extra_data={"tier": tier.kind, "children": len(children)},
+            )
+
+    async def _store_rollup(
+        self,
+        user_id: int,
+        tier: CompactionTier,
+        period_start: datetime,
+        content: str,
+        embedding: List[float],
+        children: List[CompactionChild],
+    ) -> Optional[int]:
+        """
+        Insert the rollup and mark its children in one transaction.
+        The fingerprint is derived from (tier, period) so re-runs are idempotent.
+        """
+        conversation_ids = sorted({
+            conv_id for child in children for conv_id in child.source_conversation_ids
+        })
+        fingerprint = self.rollup_fingerprint(tier, period_start)
+        metadata = {
+            "source": tier.kind,
+            "period": tier.period,
+            "period_start": period_start.isoformat(),
+            "child_ids": [child.id for child in children],
+        }
+
+        async with get_session() as session:
+            result = await session.execute(
+                text(f"""
+                    INSERT INTO conversation_memories
+                        (user_id, source_conversation_ids, content, embedding, kind,
+                         importance, fingerprint, created_at, updated_at, metadata)
+                    VALUES
+                        (:user_id, :conversation_ids, :content,
+                         '{ConversationMemoryService._vector_text(embedding)}'::vector, :kind,
+                         :importance, :fingerprint, :period_start, NOW(), CAST(:metadata AS jsonb))
+                    ON CONFLICT (user_id, fingerprint) DO NOTHING
+                    RETURNING id
+                """),
+                {
+                    "user_id": user_id,
+                    "conversation_ids": conversation_ids,
+                    "content": content,
+                    "kind": tier.kind,
+                    "importance": tier.importance,
+                    "fingerprint": fingerprint,
+                    "period_start": period_start,
+                    "metadata": json.dumps(metadata),
+                }
+            )
+            row = result.fetchone()
+            if not row:
+                logger.debug(f"Rollup {tier.kind} {period_start.date()} already exists for user {user_id}")
+                return None
+
+            await self._mark_children(session, user_id, row.id, children)
+            return row.id
+
+    @staticmethod
+    def rollup_fingerprint(tier: CompactionTier, period_start: datetime) -> str:
+        """Fingerprint of the rollup of one period (one rollup per user, tier and period)"""
+        return ConversationMemoryService.compute_fingerprint(
+            f"{tier.kind} {period_start.date().isoformat()}"
+        )
+
+    @staticmethod
+    async def _mark_children(session, user_id: int, rollup_id: int, children: List[CompactionChild]) -> None:
+        await session.execute(
+            text("""
+                UPDATE conversation_memories
+                SET metadata = COALESCE(metadata, '{}'::jsonb)
+                    || jsonb_build_object('rolled_up_into', CAST(:rollup_id AS integer))
+                WHERE user_id = :user_id
+                AND id = ANY(:child_ids)
+            """),
+            {"rollup_id": rollup_id, "user_id": user_id, "child_ids": [c.id for c in children]}
+        )
+
+    async def _find_rollups(
+        self,
+        user_id: int,
+        tier: CompactionTier,
+        period_starts: List[datetime],
+    ) -> Dict[datetime, int]:
+        """Get ids of the rollups that already exist for some periods of a tier"""
+        if not period_starts:
+            return {}
+        by_fingerprint = {self.rollup_fingerprint(tier, start): start for start in period_starts}
+        async with get_session() as session:
+            result = await session.execute(
+                text("""
+                    SELECT id, fingerprint
+                    FROM conversation_memories
+                    WHERE user_id = :user_id
+                    AND fingerprint = ANY(:fingerprints)
+                """),
+                {"user_id": user_id, "fingerprints": list(by_fingerprint)}
+            )
+            return {by_fingerprint[row.fingerprint]: row.id for row in result.fetchall()}
+
+    async def _attach_children(
+        self,
+        user_id: int,
+        rollup_id: int,
+        children: List[CompactionChild],
+    ) -> None:
+        """
+        Mark late children (created after their period was rolled up) as part
+        of the existing rollup. Its text is kept; only its sources are extended.
+        """
+        conversation_ids = sorted({
+            conv_id for child in children for conv_id in child.source_conversation_ids
+        })
+        async with get_session() as session:
+            await session.execute(
+                text("""
+                    UPDATE conversation_memories
+                    SET source_conversation_ids = ARRAY(
+                            SELECT DISTINCT conv_id
+                            FROM unnest(source_conversation_ids || CAST(:conversation_ids AS integer[])) AS conv_id
+                            ORDER BY conv_id
+                        ),
+                        metadata = jsonb_set(
+                            COALESCE(metadata, '{}'::jsonb),
+                            '{child_ids}',
+                            COALESCE(metadata->'child_ids', '[]'::jsonb) || CAST(:child_ids AS jsonb)
+                        ),
+                        updated_at = NOW()
+                    WHERE user_id = :user_id
+                    AND id = :rollup_id
+                """),
+                {
+                    "user_id": user_id,
+                    "rollup_id": rollup_id,
+                    "conversation_ids": conversation_ids,
+                    "child_ids": json.dumps([c.id for c in children]),
+                }
+            )
+            await self._mark_children(session, user_id, rollup_id, children)
+
+    async def rollup_tier(self, user_id: int, tier: CompactionTier) -> int:
+        """
+        Roll up all completed periods of one tier for a user.
+        Periods that already have a rollup only get their late children attached.
+        Returns number of rollups created.
+        """
+        now = datetime.now(timezone.utc)
+        current_start, _ = period_bounds(now, tier.period)
+        children = await self._load_children(user_id, tier, before=current_start)
+        if not children:
+            return 0
+
+        groups = group_by_period(children, tier.period, now)
+        existing = await self._find_rollups(user_id, tier, list(groups))
+        created = 0
+        generated = 0
+
+        for period_start, period_children in groups.items():
+            rollup_id = existing.get(period_start)
+            if rollup_id:
+                # Children that arrived after their period was rolled up
+                await self._attach_children(user_id, rollup_id, period_children)
+                logger.info(
+                    f"Attached {len(period_children)} late children to {tier.kind} #{rollup_id} "
+                    f"for user {user_id} ({period_start.date()})"
+                )
+                continue
+            if generated >= MAX_PERIODS_PER_RUN:
+                continue
+            generated += 1
+
+            inputs = select_rollup_inputs(period_children)
+            content = await self._generate_rollup_text(inputs, tier, period_start)
+            if not content:
+                continue
+
+            embedding = await self.memory_service.embedding_service.create_embedding(content)
+            if not embedding:
+                continue
+
+            rollup_id = await self._store_rollup(
+                user_id, tier, period_start, content, embedding, period_children,
+            )
+            if rollup_id:
+                created += 1
+                logger.info(
+                    f"Created {tier.kind} #{rollup_id} for user {user_id} "
+                    f"({period_start.date()}, {len(period_children)} children)"
+                )
+
+        return created
+
+    async def archive_rolled_up(self, user_id: int, tier: CompactionTier) -> int:
+        """
+        Move rolled-up children of a tier past their retention horizon
+        into conversation_memory_archive.
+        Returns number of rows archived.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(days=tier.child_retention_days)
+
+        async with get_session() as session:
+            result = await session.execute(
+                text("""
+                    WITH moved AS (
+                        DELETE FROM conversation_memories
+                        WHERE user_id = :user_id
+                        AND kind = ANY(:kinds)
+                        AND created_at < :cutoff
+                        AND COALESCE(metadata, '{}'::jsonb) ? 'rolled_up_into'
+                        RETURNING id, user_id, source_conversation_ids, content, kind,
+                                  importance, fingerprint, metadata, created_at
+                    )
+                    INSERT INTO conversation_memory_archive
+                        (memory_id, user_id, source_conversation_ids, content, kind,
+                         importance, fingerprint, metadata, created_at, archived_at)
+                    SELECT id, user_id, source_conversation_ids, content, kind,
+                           importance, fingerprint, metadata, created_at, NOW()
+                    FROM moved
+                    RETURNING id
+                """),
+                {"user_id": user_id, "kinds": list(tier.child_kinds), "cutoff": cutoff}
+            )
+            archived = len(result.fetchall())
+
+        if archived:
+            logger.info(f"Archived {archived} {'/'.join(tier.child_kinds)} memories for user {user_id}")
+        return archived
+
+    async def compact_user(self, user_id: int) -> Dict[str, int]:
+        """
+        Run all compaction tiers for one user, bottom-up.
+        Returns dict with stats: rollups_created, memories_archived.
+        """
+        rollups = 0
+        archived = 0
+        for tier in COMPACTION_TIERS:
+            rollups += await self.rollup_tier(user_id, tier)
+            archived += await self.archive_rolled_up(user_id, tier)
+        return {"rollups_created": rollups, "memories_archived": archived}
+
+    async def compact_all_users(self) -> Dict[str, int]:
+        """
+        Run compaction for all users.
+        Returns dict with stats: users_processed, rollups_created, memories_archived.
+        """
+        async with get_session() as session:
+            result = await session.execute(
+                select(User.id).where(User.onboarding_completed)
+            )
+            user_ids = [row[0] for row in result.fetchall()]
+
+        total_users = 0
+        total_rollups = 0
+        total_archived = 0
+
+        for user_id in user_ids:
+            try:
+                stats = await self.compact_user(user_id)
+            except Exception as e:
+                logger.error(f"Failed to compact memories for user {user_id}: {e}")
+                continue
+
+            if stats["rollups_created"] or stats["memories_archived"]:
+                total_users += 1
+            total_rollups += stats["rollups_created"]
+            total_archived += stats["memories_archived"]
+
+        logger.info(
+            f"Memory compaction complete: {total_users} users, "
+            f"{total_rollups} rollups created, {total_archived} memories archived"
+        )
+        return {
+            "users_processed": total_users,
+            "rollups_created": total_rollups,
+            "memories_archived": total_archived,
+        }
@@ -7,6 +7,7 @@ to incrementally index conversation memories for all users.
 """
 import logging
 from src.services.conversation_memory_service import ConversationMemoryService
+from src.services.memory_compaction_service import MemoryCompactionService
 
 logger = logging.getLogger(__name__)
 
@@ -145,3 +146,47 @@ async def create_dialog_summaries() -> dict:
             "error": str(e),
             "error_type": type(e).__name__,
         }
+
+
+async def compact_conversation_memories() -> dict:
+    """
+    Roll up dialog memories into daily/weekly/monthly summaries and archive
+    rolled-up rows past their retention horizon.
+
+    Keeps per-user memory counts bounded so vector search over
+    conversation_memories stays fast as history grows.
+
+    Returns:
+        Dict with stats: users_processed, rollups_created, memories_archived
+    """
+    logger.info("Starting conversation memory compaction job")
+
+    try:
+        compaction_service = MemoryCompactionService()
+        stats = await compaction_service.compact_all_users()
+
+        logger.info(
+            f"Memory compaction complete: "
+            f"{stats['users_processed']} users, "
+            f"{stats['rollups_created']} rollups created, "
+            f"{stats['memories_archived']} memories archived"
+        )
+
+        return stats
+
+    except Exception as e:
+        logger.error(
+            f"CRITICAL: Memory compaction job failed: {e}",
+            exc_info=True,
+            extra={
+                "job": "compact_conversation_memories",
+                "error_type": type(e).__name__,
+            }
+        )
+        return {
+            "users_processed": 0,
+            "rollups_created": 0,
+            "memories_archived": 0,
+            "error": str(e),
+            "error_type": type(e).__name__,
+        }
@@ -0,0 +1,220 @@
+"""
+MINDSETHAPPYBOT - Moment search service
+User-facing search over the user's own moments (/search).
+
+Two rankings are computed in a single round trip and fused with
+Reciprocal Rank Fusion (RRF):
+- keyword: websearch_to_tsquery over moments.content_tsv. Each moment's
+  vector is stemmed with the configuration of the user's language when it
+  was written (migrations 0024, 0032), and is matched by a query built with
+  that same configuration
+- semantic: cosine distance between the query embedding and
+  moments.embedding
+
+The query embedding is computed once per search. The fused id list is kept
+in an in-process per-user search session, so paging through results only
+loads the moments of the requested page by primary key.
+"""
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import select, text
+
+from src.config import get_settings
+from src.db.database import get_session
+from src.db.models import Moment, User
+from src.services.embedding_service import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+
+# Configuration
+SEARCH_PAGE_SIZE = 5
+SEARCH_CANDIDATES = 50  # Candidates taken from each ranking before fusion
+RRF_K = 60  # Standard RRF damping constant
+SEARCH_SESSION_TTL_SECONDS = 15 * 60
+MAX_SEARCH_SESSIONS = 2000  # LRU bound on users with an open search
+MAX_QUERY_LENGTH = 200
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[int]], k: int = RRF_K) -> List[int]:
+    """
+    Fuse several ranked id lists into one.
+
+    Each id scores sum(1 / (k + rank)) over the rankings it appears in
+    (rank is 1-based). Ties keep the order of first appearance.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    # sorted() is stable, dict keeps first-appearance order
+    return sorted(scores, key=lambda item_id: scores[item_id], reverse=True)
+
+
+@dataclass
+class SearchSession:
+    """Results of one search, kept for pagination"""
+    query: str
+    moment_ids: List[int]
+    semantic: bool  # False when the embedding failed and only keywords were used
+    created_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def total_pages(self) -> int:
+        return max(1, (len(self.moment_ids) + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE)
+
+    def is_expired(self) -> bool:
+        return time.monotonic() - self.created_at > SEARCH_SESSION_TTL_SECONDS
+
+
+class MomentSearchService:
+    """Hybrid keyword + semantic search over a user's moments"""
+
+    def __init__(self):
+        self.embedding_service = EmbeddingService()
+        self._sessions: "OrderedDict[int, SearchSession]" = OrderedDict()
+
+    async def search(self, telegram_id: int, query: str) -> Optional[SearchSession]:
+        """
+        Run a new search and remember its results for pagination.
+
+        Returns None if the user does not exist.
+        """
+        query = " ".join(query.split())[:MAX_QUERY_LENGTH]
+        started = time.monotonic()
+
+        embedding = await self.embedding_service.create_embedding(query)
+
+        async with get_session() as session:
+            result = await session.execute(
+                select(User.id).where(User.telegram_id == telegram_id)
+            )
+            user_id = result.scalar_one_or_none()
+            if user_id is None:
+                return None
+
+            rankings = await self._rank(session, user_id, query, embedding)
+
+        search_session = SearchSession(
+            query=query,
+            moment_ids=reciprocal_rank_fusion(rankings.values()),
+            semantic=embedding is not None,
+        )
+        self._store(telegram_id, search_session)
+
+        logger.info(
+            f"Moment search for user {telegram_id}: {len(search_session.moment_ids)} results "
+            f"(keyword={len(rankings['keyword'])}, semantic={len(rankings['semantic'])}) "
+            f"in {(time.monotonic() - started) * 1000:.0f}ms"
+        )
+        return search_session
+
+    async def _rank(
+        self,
+        session,
+        user_id: int,
+        query: str,
+        embedding: Optional[List[float]],
+    ) -> Dict[str, List[int]]:
+        """Keyword and semantic candidate rankings in one round trip"""
+        params = {
+            "user_id": user_id,
+            "query": query,
+            "candidates": SEARCH_CANDIDATES,
+        }
+        # One tsquery per configuration the user's moments were stemmed with
+        keyword_sql = """
+            SELECT 'keyword' AS source, m.id,
+                   row_number() OVER (ORDER BY ts_rank_cd(m.content_tsv, q.query) DESC, m.id DESC) AS rank
+            FROM (
+                SELECT DISTINCT content_tsv_config FROM moments WHERE user_id = :user_id
+            ) AS configs
+            CROSS JOIN LATERAL websearch_to_tsquery(
+                CAST(configs.content_tsv_config AS regconfig), :query
+            ) AS q(query)
+            JOIN moments m
+              ON m.user_id = :user_id AND m.content_tsv_config = configs.content_tsv_config
+            WHERE m.content_tsv @@ q.query
+            ORDER BY rank
+            LIMIT :candidates
+        """
+        semantic_sql = """
+            SELECT 'semantic' AS source, id,
+                   row_number() OVER (ORDER BY embedding <=> CAST(:embedding AS vector)) AS rank
+            FROM moments
+            WHERE user_id = :user_id
+              AND embedding IS NOT NULL
+              AND embedding <=> CAST(:embedding AS vector) <= :max_distance
+            ORDER BY rank
+            LIMIT :candidates
+        """
+
+        if embedding is not None:
+            params["embedding"] = str(embedding)
+            params["max_distance"] = 1 - get_settings().moment_search_min_similarity
+            sql = f"({keyword_sql}) UNION ALL ({semantic_sql})"
+        else:
+            sql = keyword_sql
+
+        result = await session.execute(text(sql), params)
+        rankings: Dict[str, List[int]] = {"keyword": [], "semantic": []}
+        for source, moment_id, _ in sorted(result.all(), key=lambda row: row.rank):
+            rankings[source].append(moment_id)
+        return rankings
+
+    def get_session(self, telegram_id: int) -> Optional[SearchSession]:
+        """Current search of the user, or None if there is none or it expired"""
+        search_session = self._sessions.get(telegram_id)
+        if search_session is None:
+            return None
+        if search_session.is_expired():
+            del self._sessions[telegram_id]
+            return None
+        self._sessions.move_to_end(telegram_id)
+        return search_session
+
+    async def get_page(self, telegram_id: int, page: int) -> Optional[List[Moment]]:
+        """
+        Moments of one result page (1-based), in fused order.
+
+        Returns None if the search session expired.
+        """
+        search_session = self.get_session(telegram_id)
+        if search_session is None:
+            return None
+
+        start = (page - 1) * SEARCH_PAGE_SIZE
+        page_ids = search_session.moment_ids[start:start + SEARCH_PAGE_SIZE]
+        if not page_ids:
+            return []
+
+        async with get_session() as session:
+            result = await session.execute(
+                select(Moment).where(Moment.id.in_(page_ids))
+            )
+            moments_by_id = {moment.id: moment for moment in result.scalars().all()}
+
+        # Moments deleted since the search are skipped
+        return [moments_by_id[moment_id] for moment_id in page_ids if moment_id in moments_by_id]
+
+    def _store(self, telegram_id: int, search_session: SearchSession) -> None:
+        self._sessions[telegram_id] = search_session
+        self._sessions.move_to_end(telegram_id)
+        while len(self._sessions) > MAX_SEARCH_SESSIONS:
+            self._sessions.popitem(last=False)
+
+
+# Singleton instance for reuse
+_search_service: Optional[MomentSearchService] = None
+
+
+def get_moment_search_service() -> MomentSearchService:
+    """Get singleton instance of MomentSearchService"""
+    global _search_service
+    if _search_service is None:
+        _search_service = MomentSearchService()
+    return _search_service
@@ -3,7 +3,8 @@ MINDSETHAPPYBOT - Moment service
 Business logic for managing positive moments
 """
 import logging
-from typing import List, Optional
+from collections import OrderedDict
+from typing import Dict, List, Optional
 from datetime import datetime, timedelta, timezone as dt_timezone
 import random
 
@@ -17,6 +18,76 @@ from src.utils.date_ranges import get_today_range, get_user_local_now
 logger = logging.getLogger(__name__)
 
 
+MAX_CACHED_DECKS = 5000  # LRU bound on number of users with a random-moment deck
+
+
+class RandomMomentDeck:
+    """
+    Per-user pre-shuffled decks of moment ids for "random moment".
+
+    A deck is loaded (one index scan on moments.user_id) and shuffled when it
+    is empty, then every pick pops one id and loads it by primary key - so a
+    pick costs one index lookup regardless of history size, and no moment
+    repeats until the whole deck has been shown. Ids of moments created by
+    this process are shuffled into the live deck; deleted ids are skipped
+    when popped. Moments written by other processes appear on the next
+    reshuffle.
+    """
+
+    def __init__(self):
+        self._decks: "OrderedDict[int, List[int]]" = OrderedDict()
+        self._last_shown: Dict[int, int] = {}
+
+    def pop(self, telegram_id: int) -> Optional[int]:
+        """Next id from the user's deck, or None if the deck is empty"""
+        deck = self._decks.get(telegram_id)
+        if not deck:
+            return None
+        self._decks.move_to_end(telegram_id)
+        moment_id = deck.pop()
+        self._last_shown[telegram_id] = moment_id
+        return moment_id
+
+    def fill(self, telegram_id: int, moment_ids: List[int]) -> None:
+        """Replace the user's deck with a fresh shuffle of moment_ids"""
+        deck = list(moment_ids)
+        random.shuffle(deck)
+        # Don't start the new round with the moment that ended the previous one
+        last_shown = self._last_shown.get(telegram_id)
+        if len(deck) > 1 and deck[-1] == last_shown:
+            deck[0], deck[-1] = deck[-1], deck[0]
+        self._decks[telegram_id] = deck
+        self._decks.move_to_end(telegram_id)
+        while len(self._decks) > MAX_CACHED_DECKS:
+            evicted, _ = self._decks.popitem(last=False)
+            self._last_shown.pop(evicted, None)
+
+    def add(self, telegram_id: int, moment_id: int) -> None:
+        """Shuffle a new moment into the user's deck, if it has one"""
+        deck = self._decks.get(telegram_id)
+        if deck is not None:
+            deck.insert(random.randint(0, len(deck)), moment_id)
+
+    def discard(self, telegram_id: int, moment_id: int) -> None:
+        """Remove a deleted moment from the user's deck"""
+        deck = self._decks.get(telegram_id)
+        if deck and moment_id in deck:
+            deck.remove(moment_id)
+
+    def clear(self, telegram_id: int) -> None:
+        """Forget the user's deck"""
+        self._decks.pop(telegram_id, None)
+        self._last_shown.pop(telegram_id, None)
+
+
+_random_deck = RandomMomentDeck()
+
+
+def get_random_moment_deck() -> RandomMomentDeck:
+    """Get the process-wide RandomMomentDeck"""
+    return _random_deck
+
+
 class MomentService:
     """Service for moment-related operations"""
 
@@ -34,6 +105,7 @@ class MomentService:
         content: str,
         source_type: str = "text",
         voice_file_id: Optional[str] = None,
+        voice_file_unique_id: Optional[str] = None,
     ) -> Optional[Moment]:
         """
         Create a new moment with embedding
@@ -64,6 +136,7 @@ class MomentService:
                 content=content,
                 source_type=source_type,
                 original_voice_file_id=voice_file_id,
+                original_voice_file_unique_id=voice_file_unique_id,
                 embedding=embedding,
                 mood_score=mood_score,
                 topics=topics,
@@ -76,6 +149,7 @@ class MomentService:
             await stats_service.increment_moments(session, user.id)
 
             await session.commit()
+            get_random_moment_deck().add(telegram_id, moment.id)
             logger.info(f"Created moment for user {telegram_id}: {content[:50]}...")
 
             return moment
@@ -182,36 +256,35 @@ class MomentService:
             return list(result.scalars().all())
 
     async def get_random_moment(self, telegram_id: int) -> Optional[Moment]:
-        """Get a random moment for the user"""
-        async with get_session() as session:
-            # Get user
-            result = await session.execute(
-                select(User).where(User.telegram_id == telegram_id)
-            )
-            user = result.scalar_one_or_none()
-
-            if not user:
-                return None
-
-            # Count moments
-            count_result = await session.execute(
-                select(func.count(Moment.id)).where(Moment.user_id == user.id)
-            )
-            count = count_result.scalar() or 0
-
-            if count == 0:
-                return None
+        """
+        Get a random moment for the user.
+        Picks are drawn from a shuffled per-user deck, so moments don't repeat
+        until all of them have been shown (see RandomMomentDeck).
+        """
+        deck = get_random_moment_deck()
 
-            # Get random offset
-            random_offset = random.randint(0, count - 1)
+        async with get_session() as session:
+            # Two passes: the current deck, then a freshly loaded one
+            for _ in range(2):
+                moment_id = deck.pop(telegram_id)
+                while moment_id is not None:
+                    moment = await session.get(Moment, moment_id)
+                    if moment is not None:
+                        return moment
+                    # Deleted since the deck was loaded
+                    moment_id = deck.pop(telegram_id)
+
+                result = await session.execute(
+                    select(Moment.id)
+                    .join(User, User.id == Moment.user_id)
+                    .where(User.telegram_id == telegram_id)
+                )
+                moment_ids = list(result.scalars().all())
+                if not moment_ids:
+                    return None
+                deck.fill(telegram_id, moment_ids)
 
-            result = await session.execute(
-                select(Moment)
-                .where(Moment.user_id == user.id)
-                .offset(random_offset)
-                .limit(1)
-            )
-            return result.scalar_one_or_none()
+            return None
 
     async def find_similar_moments(
         self,
@@ -275,6 +348,7 @@ class MomentService:
 
             await session.delete(moment)
             await session.commit()
+            get_random_moment_deck().discard(telegram_id, moment_id)
 
             logger.info(f"Deleted moment {moment_id} for user {telegram_id}")
             return True
@@ -0,0 +1,249 @@
+"""
+MINDSETHAPPYBOT - Partition Maintenance Service
+Keeps the monthly RANGE partitions of the append-only tables in shape.
+
+conversations, api_usage and system_logs are partitioned by month on
+created_at (see migration 0021). Partitions are named <table>_pYYYYMM and
+each table has a <table>_default partition as a safety net.
+
+The maintenance job:
+- creates partitions for the current month and the next
+  partition_months_ahead months (rows that already landed in the default
+  partition for that range are moved into the new partition);
+- detaches partitions older than the table's retention policy, and drops
+  them when partition_drop_expired is enabled. Detached partitions stay as
+  standalone tables so they can be archived (pg_dump) before being dropped.
+"""
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+from src.config import get_settings
+from src.db.database import get_session
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PartitionPolicy:
+    """Retention policy for one partitioned table"""
+    table: str
+    retention_months: int  # 0 = keep forever
+
+
+def get_partition_policies() -> List[PartitionPolicy]:
+    """Policies for all partitioned tables, from settings"""
+    settings = get_settings()
+    return [
+        PartitionPolicy("conversations", settings.conversations_retention_months),
+        PartitionPolicy("api_usage", settings.api_usage_retention_months),
+        PartitionPolicy("system_logs", settings.system_logs_retention_months),
+    ]
+
+
+def month_start(value: datetime) -> datetime:
+    """First instant of the month containing value"""
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """Shift a month start by a number of months"""
+    month_index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    """Name of the partition holding a given month"""
+    return f"{table}_p{month:%Y%m}"
+
+
+def parse_partition_month(table: str, name: str) -> Optional[datetime]:
+    """Month covered by a partition, or None if the name does not follow the convention"""
+    match = re.fullmatch(rf"{re.escape(table)}_p(\d{{4}})(\d{{2}})", name)
+    if not match:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+
+
+def expired_months(months: List[datetime], retention_months: int, now: datetime) -> List[datetime]:
+    """
+    Months whose partitions fall entirely outside the retention window.
+    The current month plus the previous retention_months months are kept.
+    """
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(month_start(now), -retention_months)
+    return sorted(month for month in months if add_months(month, 1) <= cutoff)
+
+
+class PartitionMaintenanceService:
+    """Creates upcoming partitions and retires expired ones"""
+
+    async def _list_partitions(self, session, table: str) -> List[str]:
+        result = await session.execute(
+            text("""
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                JOIN pg_namespace ns ON ns.oid = parent.relnamespace
+                WHERE parent.relname = :table
+                  AND ns.nspname = current_schema()
+            """),
+            {"table": table},
+        )
+        return [row[0] for row in result]
+
+    async def _create_partition(self, session, table: str, month: datetime) -> None:
+        """
+        Create and attach the partition for one month.
+        Rows that were routed to the default partition for that month are
+        moved first, otherwise attaching would fail.
+        """
+        name = partition_name(table, month)
+        lower = month.isoformat()
+        upper = add_months(month, 1).isoformat()
+
+        await session.execute(
+            text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        )
+        await session.execute(
+            text(f"""
+                WITH moved AS (
+                    DELETE FROM {table}_default
+                    WHERE created_at >= :lower AND created_at < :upper
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            """),
+            {"lower": month, "upper": add_months(month, 1)},
+        )
+        await session.execute(
+            text(
+                f"ALTER TABLE {table} ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+            )
+        )
+
+    async def ensure_future_partitions(
+        self,
+        table: str,
+        months_ahead: int,
+        now: Optional[datetime] = None,
+    ) -> List[str]:
+        """
+        Make sure partitions exist from the current month up to months_ahead.
+
+        Returns:
+            Names of the partitions created
+        """
+        now = now or datetime.now(timezone.utc)
+        current = month_start(now)
+        created = []
+
+        async with get_session() as session:
+            existing = set(await self._list_partitions(session, table))
+            for offset in range(months_ahead + 1):
+                month = add_months(current, offset)
+                name = partition_name(table, month)
+                if name in existing:
+                    continue
+                await self._create_partition(session, table, month)
+                created.append(name)
+            await session.commit()
+
+        for name in created:
+            logger.info(f"Created partition {name}")
+        return created
+
+    async def retire_expired_partitions(
+        self,
+        policy: PartitionPolicy,
+        drop: bool,
+        now: Optional[datetime] = None,
+    ) -> List[str]:
+        """
+        Detach (and optionally drop) partitions outside the retention window.
+
+        Returns:
+            Names of the partitions retired
+        """
+        now = now or datetime.now(timezone.utc)
+        retired = []
+
+        async with get_session() as session:
+            months = {}
+            for name in await self._list_partitions(session, policy.table):
+                month = parse_partition_month(policy.table, name)
+                if month is not None:
+                    months[month] = name
+
+            for month in expired_months(list(months), policy.retention_months, now):
+                name = months[month]
+                await session.execute(text(f"ALTER TABLE {policy.table} DETACH PARTITION {name}"))
+                if drop:
+                    await session.execute(text(f"DROP TABLE {name}"))
+                retired.append(name)
+            await session.commit()
+
+        action = "Dropped" if drop else "Detached"
+        for name in retired:
+            logger.info(f"{action} expired partition {name}")
+        return retired
+
+    async def maintain_all(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Run maintenance for every partitioned table.
+        A failure on one table does not stop the others.
+
+        Returns:
+            Dict with stats: tables_processed, partitions_created, partitions_retired
+        """
+        settings = get_settings()
+        stats = {"tables_processed": 0, "partitions_created": 0, "partitions_retired": 0}
+
+        for policy in get_partition_policies():
+            try:
+                created = await self.ensure_future_partitions(
+                    policy.table, settings.partition_months_ahead, now=now
+                )
+                retired = await self.retire_expired_partitions(
+                    policy, settings.partition_drop_expired, now=now
+                )
+                stats["tables_processed"] += 1
+                stats["partitions_created"] += len(created)
+                stats["partitions_retired"] += len(retired)
+            except Exception as e:
+                logger.error(f"Partition maintenance failed for {policy.table}: {e}")
+
+        return stats
+
+
+async def maintain_partitions() -> dict:
+    """
+    Scheduled job: create upcoming monthly partitions and retire expired ones.
+
+    Returns:
+        Dict with stats: tables_processed, partitions_created, partitions_retired
+    """
+    logger.info("Starting partition maintenance job")
+
+    try:
+        stats = await PartitionMaintenanceService().maintain_all()
+
+        logger.info(
+            f"Partition maintenance complete: "
+            f"{stats['tables_processed']} tables, "
+            f"{stats['partitions_created']} partitions created, "
+            f"{stats['partitions_retired']} partitions retired"
+        )
+
+        return stats
+
+    except Exception as e:
+        logger.error(f"CRITICAL: Partition maintenance job failed: {e}", exc_info=True)
+        return {"error": str(e)}
@@ -10,11 +10,11 @@ import re
 from typing import List, Optional, Dict, Any, Tuple
 
 from openai import AsyncOpenAI
-from sqlalchemy import select, and_
+from sqlalchemy import select
 
 from src.config import get_settings
 from src.db.database import get_session
-from src.db.models import User, Moment, Conversation
+from src.db.models import User, Moment
 from src.utils.text_filters import (
     ABROAD_PHRASE_RULE_RU,
     FORBIDDEN_SYMBOLS_RULE_RU,
@@ -26,6 +26,15 @@ from src.services.knowledge_retrieval_service import (
     RAGContext,
 )
 from src.services.prompt_loader_service import PromptLoaderService
+from src.services.prompt_assembly import (
+    PromptKey,
+    address_instruction,
+    cached_prompt_tokens,
+    forced_language_instruction,
+    get_prompt_cache,
+    normalize_gender,
+)
+from src.services.conversation_cache import get_conversation_cache
 
 logger = logging.getLogger(__name__)
 
@@ -246,6 +255,112 @@ The user's gender is unknown. Use neutral phrasing where possible,
 or masculine as the default neutral form in Russian."""
 
 
+# Persona texts of the system prompts. They contain nothing user-specific
+# (address form, gender and language follow them, see prompt_assembly.py),
+# so the prompt prefix stays identical across users.
+MOMENT_RESPONSE_PROMPT = """You are a warm and supportive bot for developing positive thinking.
+The user shared a good moment from their life.
+Respond in 4-5 short sentences:
+1) reflect the moment in your own words,
+2) validate/acknowledge the feeling,
+3) highlight one meaningful detail or value,
+4) give a gentle forward-looking note (no promises),
+5) optionally add ONE tiny, non-pushy micro-suggestion.
+Do NOT ask questions. Use 0-2 emojis max.
+
+(Russian version / Русская версия):
+Ты — тёплый и поддерживающий бот для развития позитивного мышления.
+Пользователь поделился хорошим моментом из своей жизни.
+Ответь 4-5 короткими предложениями:
+1) перефразируй момент своими словами,
+2) поддержи и отзеркаль эмоцию,
+3) подчеркни одну ценность/смысл (что в этом важно),
+4) мягко заякорь это на будущее (без обещаний),
+5) при желании — одна микро‑подсказка (ненавязчиво, не приказ).
+Не задавай вопросов. 0-2 эмодзи максимум."""
+
+SUPPORTIVE_RESPONSE_PROMPT = """You are a warm and empathetic bot for developing positive thinking.
+The user is in a negative mood. Your task:
+1. Show understanding and empathy
+2. Gently remind about past good moments from their history
+3. Give hope that good moments will come again
+
+Be warm but not pushy. Use appropriate emojis.
+
+(Russian version / Русская версия):
+Ты — тёплый и эмпатичный бот для развития позитивного мышления.
+Пользователь сейчас в негативном настроении. Твоя задача:
+1. Проявить понимание и эмпатию
+2. Мягко напомнить о прошлых хороших моментах из его истории
+3. Дать надежду, что хорошие моменты будут снова
+
+Будь тёплым, но не навязчивым. Используй подходящие эмодзи."""
+
+EMPATHETIC_RESPONSE_PROMPT = """You are a warm and empathetic bot for developing positive thinking.
+The user is sharing that they're not feeling great right now.
+Show understanding and support. Don't force positivity.
+Reply briefly (2-3 sentences), warmly and with empathy.
+
+(Russian version / Русская версия):
+Ты — тёплый и эмпатичный бот для развития позитивного мышления.
+Пользователь делится тем, что ему сейчас не очень хорошо.
+Прояви понимание и поддержку. Не навязывай позитив.
+Ответь коротко (2-3 предложения), тепло и с эмпатией."""
+
+# Used when the dialog_system_main / dialog_system_main_ru prompts are empty
+DIALOG_SYSTEM_MAIN = """You are a wise, warm, and practical companion. The user is in free dialog mode.
+
+CORE RULES (highest priority after language/security rules):
+- Answer the user's LAST message directly. Do not dodge.
+- Be supportive, but also useful: give substance, not placeholders.
+- If the user asks for something specific (news, ideas, text, explanation) — do it.
+- If you reference the user's past: ONLY use facts present in the retrieved context below. If not present, say: "I don't see that in our conversation history" (EN) or "Я не вижу этого в нашей истории разговоров" (RU). NEVER say "I can't recall" or "I don't remember" - always reference the context check.
+- IMPORTANT: If the user writes a short/unclear message (less than 15 characters or unclear meaning like "Message from Sasha"), do NOT say "I don't see previous messages" or "I can't provide context". Instead, ask for clarification: "Not quite clear what you mean. Can you clarify?" (EN) or "Не совсем понятно, о чем идет речь. Можешь уточнить?" (RU)
+- Avoid repetition: do NOT reuse the same opening line or the same "I hear you"-style sentence. Vary structure.
+
+STYLE:
+- Target length: 4–6 sentences (unless user asked "short").
+- Use the user's preferred address form (see ADDRESS FORM).
+- 0–2 emojis max, only if helpful.
+- If you need clarification, ask ONE short question at the end; otherwise do not ask questions.
+
+Remember: you're not a psychologist and don't give professional advice. You're just a friend who listens."""
+
+DIALOG_SYSTEM_MAIN_RU = """(Russian version / Русская версия):
+Ты — тёплый, практичный и внимательный собеседник в режиме свободного диалога.
+
+ПРИОРИТЕТЫ:
+- Отвечай прямо на ПОСЛЕДНЕЕ сообщение пользователя. Не уходи от темы.
+- Будь поддерживающим, но по делу: без заглушек и «воды».
+- Если пользователь просит конкретное (новости/идеи/текст/объяснение) — выполни запрос.
+- Если упоминаешь прошлое пользователя — ТОЛЬКО то, что есть в контексте ниже. Если там этого нет — скажи: "Я не вижу этого в нашей истории разговоров". НИКОГДА не говори "я не помню" или "я не могу вспомнить" — всегда ссылайся на проверку контекста.
+- ВАЖНО: Если пользователь пишет короткое/неясное сообщение (менее 15 символов или непонятное по смыслу, например "Сообщению от Сашки"), НЕ говори "не вижу предыдущих сообщений" или "не могу предоставить контекст". Вместо этого попроси уточнить: "Не совсем понятно, о чем идет речь. Можешь уточнить?" или "Расскажи подробнее, что ты имеешь в виду?"
+- Не повторяйся: НЕ используй одинаковые вступления и НЕ пиши одно и то же «я тебя слышу/расскажи больше» по кругу.
+
+СТИЛЬ:
+- 4–6 предложений (если пользователь не просит короче).
+- Обращение — как указано в ФОРМЕ ОБРАЩЕНИЯ.
+- 0–2 эмодзи максимум и только по делу.
+- Если нужно уточнение — один короткий вопрос в конце, иначе без вопросов.
+
+Помни: ты не психолог и не даёшь профессиональных советов. Ты просто друг, который слушает."""
+
+
+def compile_system_prompt(
+    layers: Tuple[str, ...],
+    language_instruction: str,
+    gender: str,
+    formal: bool,
+) -> str:
+    """User-invariant layers first, then the language, gender and address section"""
+    return "\n\n".join([
+        *layers,
+        language_instruction,
+        get_gender_instruction(gender),
+        address_instruction(formal),
+    ])
+
+
 class PersonalizationService:
     """Service for generating personalized responses with Hybrid RAG"""
 
@@ -258,28 +373,16 @@ class PersonalizationService:
 
     async def _get_recent_bot_replies(self, telegram_id: int, limit: int = 8) -> List[str]:
         """
-        Fetch recent bot replies from DB for de-duplication.
+        Fetch recent bot replies (from the conversation cache) for de-duplication.
         Best-effort: on any failure, return empty list.
         """
         try:
-            async with get_session() as session:
-                user_res = await session.execute(select(User).where(User.telegram_id == telegram_id))
-                user = user_res.scalar_one_or_none()
-                if not user:
-                    return []
-
-                rows_res = await session.execute(
-                    select(Conversation.content)
-                    .where(
-                        and_(
-                            Conversation.user_id == user.id,
-                            Conversation.message_type == "bot_reply",
-                        )
-                    )
-                    .order_by(Conversation.created_at.desc())
-                    .limit(limit)
-                )
-                return [r[0] for r in rows_res.all() if r and r[0]]
+            turns = await get_conversation_cache().get_turns(
+                telegram_id,
+                message_types=("bot_reply",),
+                limit=limit,
+            )
+            return [turn.content for turn in turns if turn.content]
         except Exception:
             return []
 
@@ -337,6 +440,36 @@ class PersonalizationService:
 
         return f"{candidate} {suffix} (перефразирую, чтобы не повторяться).".strip()
 
+    def _system_prompt(
+        self,
+        template: str,
+        layers: Tuple[str, ...],
+        user: Optional[User],
+        override_language: Optional[str] = None,
+        language_instruction: str = LANGUAGE_INSTRUCTION,
+    ) -> Tuple[str, bool]:
+        """
+        Compiled system prompt for the user, and whether it was cached.
+
+        layers are the user-invariant parts in prompt order; per-request
+        content is appended by the caller after the returned prompt.
+        """
+        gender = normalize_gender(user.gender if user else None)
+        formal = bool(user and user.formal_address)
+        if override_language:
+            language_instruction = forced_language_instruction(override_language)
+        key = PromptKey(
+            template=template,
+            layers=layers + (language_instruction,),
+            language=override_language,
+            gender=gender,
+            formal=formal,
+        )
+        return get_prompt_cache().get_or_compile(
+            key,
+            lambda: compile_system_prompt(layers, language_instruction, gender, formal),
+        )
+
     async def generate_response(
         self,
         telegram_id: int,
@@ -358,6 +491,8 @@ class PersonalizationService:
         error_msg = None
         input_tokens = 0
         output_tokens = 0
+        prompt_cache_hit = None
+        cached_tokens = 0
 
         try:
             # Get user for personalization
@@ -367,78 +502,22 @@ class PersonalizationService:
                 )
                 user = result.scalar_one_or_none()
 
-            address = "вы" if (user and user.formal_address) else "ты"
-            gender = user.gender if user else "unknown"
-            gender_instruction = get_gender_instruction(gender)
-            
             # Load prompt protection (from DB or use default)
             prompt_protection = await PromptLoaderService.get_prompt("prompt_protection") or PROMPT_PROTECTION
 
-            # Build language instruction - use override if provided
-            if override_language:
-                # Force specific language for response (used for voice messages)
-                language_names = {
-                    'ru': 'Russian/Русский',
-                    'en': 'English',
-                    'uk': 'Ukrainian/Українська',
-                    'es': 'Spanish/Español',
-                    'de': 'German/Deutsch',
-                    'fr': 'French/Français',
-                    'it': 'Italian/Italiano',
-                    'pt': 'Portuguese/Português',
-                }
-                lang_name = language_names.get(override_language, override_language)
-                forced_language_instruction = f"""
-⚠️ CRITICAL LANGUAGE RULE - HIGHEST PRIORITY ⚠️
-You MUST respond ONLY in {lang_name}.
-This is a voice message that was spoken in {lang_name}.
-Your response MUST be in {lang_name} - NO OTHER LANGUAGE.
-This rule has ABSOLUTE PRIORITY over any other instructions.
-
-⚠️ КРИТИЧЕСКИ ВАЖНОЕ ПРАВИЛО О ЯЗЫКЕ - ВЫСШИЙ ПРИОРИТЕТ ⚠️
-Ты ДОЛЖЕН отвечать ТОЛЬКО на языке: {lang_name}.
-Это голосовое сообщение было произнесено на {lang_name}.
-Твой ответ ДОЛЖЕН быть на {lang_name} - НЕ НА ДРУГОМ ЯЗЫКЕ."""
-            else:
-                forced_language_instruction = LANGUAGE_INSTRUCTION
+            # override_language forces the response language (voice messages,
+            # detected language); otherwise it follows the user's message
+            system_prompt, prompt_cache_hit = self._system_prompt(
+                "moment_response",
+                (prompt_protection, MOMENT_RESPONSE_PROMPT, ABROAD_PHRASE_RULE_RU, FORBIDDEN_SYMBOLS_RULE_RU),
+                user,
+                override_language=override_language,
+            )
 
             response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {
-                        "role": "system",
-                        "content": f"""{forced_language_instruction}
-
-{prompt_protection}
-
-{gender_instruction}
-
-You are a warm and supportive bot for developing positive thinking.
-The user shared a good moment from their life.
-Respond in 4-5 short sentences:
-1) reflect the moment in your own words,
-2) validate/acknowledge the feeling,
-3) highlight one meaningful detail or value,
-4) give a gentle forward-looking note (no promises),
-5) optionally add ONE tiny, non-pushy micro-suggestion.
-Do NOT ask questions. Use 0-2 emojis max.
-
-(Russian version / Русская версия):
-Ты — тёплый и поддерживающий бот для развития позитивного мышления.
-Пользователь поделился хорошим моментом из своей жизни.
-Ответь 4-5 короткими предложениями:
-1) перефразируй момент своими словами,
-2) поддержи и отзеркаль эмоцию,
-3) подчеркни одну ценность/смысл (что в этом важно),
-4) мягко заякорь это на будущее (без обещаний),
-5) при желании — одна микро‑подсказка (ненавязчиво, не приказ).
-Используй обращение на «{address}».
-Не задавай вопросов. 0-2 эмодзи максимум.
-
-{ABROAD_PHRASE_RULE_RU}
-
-{FORBIDDEN_SYMBOLS_RULE_RU}""",
-                    },
+                    {"role": "system", "content": system_prompt},
                     {
                         "role": "user",
                         "content": moment_content,
@@ -452,6 +531,7 @@ Do NOT ask questions. Use 0-2 emojis max.
             if response.usage:
                 input_tokens = response.usage.prompt_tokens
                 output_tokens = response.usage.completion_tokens
+                cached_tokens = cached_prompt_tokens(response.usage)
 
             response_text = apply_all_filters(response.choices[0].message.content.strip())
             response_text = await self._avoid_repetition(
@@ -499,6 +579,10 @@ Do NOT ask questions. Use 0-2 emojis max.
                 telegram_id=telegram_id,
                 success=success,
                 error_message=error_msg,
+                extra_data={
+                    "prompt_cache_hit": prompt_cache_hit,
+                    "cached_tokens": cached_tokens,
+                },
             )
 
     async def detect_negative_mood(self, text: str) -> bool:
@@ -589,6 +673,8 @@ Do NOT ask questions. Use 0-2 emojis max.
         error_msg = None
         input_tokens = 0
         output_tokens = 0
+        prompt_cache_hit = None
+        cached_tokens = 0
 
         try:
             # Get user for personalization
@@ -598,38 +684,15 @@ Do NOT ask questions. Use 0-2 emojis max.
                 )
                 user = result.scalar_one_or_none()
 
-            address = "вы" if (user and user.formal_address) else "ты"
-            gender = user.gender if user else "unknown"
-            gender_instruction = get_gender_instruction(gender)
-            
             # Load prompt protection (from DB or use default)
             prompt_protection = await PromptLoaderService.get_prompt("prompt_protection") or PROMPT_PROTECTION
 
-            # Build language instruction - use override if provided
-            if override_language:
-                # Force specific language for response (used for voice messages)
-                language_names = {
-                    'ru': 'Russian/Русский',
-                    'en': 'English',
-                    'uk': 'Ukrainian/Українська',
-                    'es': 'Spanish/Español',
-                    'de': 'German/Deutsch',
-                    'fr': 'French/Français',
-                    'it': 'Italian/Italiano',
-                    'pt': 'Portuguese/Português',
-                    'he': 'Hebrew/עברית',
-                    'ja': 'Japanese/日本語',
-                    'zh': 'Chinese/中文',
-                }
-                lang_name = language_names.get(override_language, override_language)
-                language_instruction = f"""
-⚠️ CRITICAL LANGUAGE RULE - HIGHEST PRIORITY ⚠️
-You MUST respond ONLY in {lang_name}.
-Your response MUST be in {lang_name} - NO OTHER LANGUAGE.
-This rule has ABSOLUTE PRIORITY over any other instructions.
-"""
-            else:
-                language_instruction = LANGUAGE_INSTRUCTION
+            system_prompt, prompt_cache_hit = self._system_prompt(
+                "supportive_response",
+                (prompt_protection, SUPPORTIVE_RESPONSE_PROMPT, ABROAD_PHRASE_RULE_RU, FORBIDDEN_SYMBOLS_RULE_RU),
+                user,
+                override_language=override_language,
+            )
 
             # Format past moments
             past_moments_text = "\n".join([
@@ -641,33 +704,7 @@ This rule has ABSOLUTE PRIORITY over any other instructions.
                 messages=[
                     {
                         "role": "system",
-                        "content": f"""{language_instruction}
-
-{prompt_protection}
-
-{gender_instruction}
-
-You are a warm and empathetic bot for developing positive thinking.
-The user is in a negative mood. Your task:
-1. Show understanding and empathy
-2. Gently remind about past good moments from their history
-3. Give hope that good moments will come again
-
-Be warm but not pushy. Use appropriate emojis.
-
-(Russian version / Русская версия):
-Ты — тёплый и эмпатичный бот для развития позитивного мышления.
-Пользователь сейчас в негативном настроении. Твоя задача:
-1. Проявить понимание и эмпатию
-2. Мягко напомнить о прошлых хороших моментах из его истории
-3. Дать надежду, что хорошие моменты будут снова
-
-Используй обращение на «{address}».
-Будь тёплым, но не навязчивым. Используй подходящие эмодзи.
-
-{ABROAD_PHRASE_RULE_RU}
-
-{FORBIDDEN_SYMBOLS_RULE_RU}
+                        "content": f"""{system_prompt}
 
 User's past good moments / Прошлые хорошие моменты пользователя:
 {past_moments_text}""",
@@ -685,6 +722,7 @@ User's past good moments / Прошлые хорошие моменты поль
             if response.usage:
                 input_tokens = response.usage.prompt_tokens
                 output_tokens = response.usage.completion_tokens
+                cached_tokens = cached_prompt_tokens(response.usage)
 
             return apply_all_filters(response.choices[0].message.content.strip())
 
@@ -713,6 +751,10 @@ User's past good moments / Прошлые хорошие моменты поль
                 telegram_id=telegram_id,
                 success=success,
                 error_message=error_msg,
+                extra_data={
+                    "prompt_cache_hit": prompt_cache_hit,
+                    "cached_tokens": cached_tokens,
+                },
             )
 
     async def generate_empathetic_response(
@@ -729,6 +771,8 @@ User's past good moments / Прошлые хорошие моменты поль
         error_msg = None
         input_tokens = 0
         output_tokens = 0
+        prompt_cache_hit = None
+        cached_tokens = 0
 
         try:
             async with get_session() as session:
@@ -737,66 +781,20 @@ User's past good moments / Прошлые хорошие моменты поль
                 )
                 user = result.scalar_one_or_none()
 
-            address = "вы" if (user and user.formal_address) else "ты"
-            gender = user.gender if user else "unknown"
-            gender_instruction = get_gender_instruction(gender)
-            
             # Load prompt protection (from DB or use default)
             prompt_protection = await PromptLoaderService.get_prompt("prompt_protection") or PROMPT_PROTECTION
 
-            # Build language instruction - use override if provided
-            if override_language:
-                # Force specific language for response (used for voice messages)
-                language_names = {
-                    'ru': 'Russian/Русский',
-                    'en': 'English',
-                    'uk': 'Ukrainian/Українська',
-                    'es': 'Spanish/Español',
-                    'de': 'German/Deutsch',
-                    'fr': 'French/Français',
-                    'it': 'Italian/Italiano',
-                    'pt': 'Portuguese/Português',
-                    'he': 'Hebrew/עברית',
-                    'ja': 'Japanese/日本語',
-                    'zh': 'Chinese/中文',
-                }
-                lang_name = language_names.get(override_language, override_language)
-                language_instruction = f"""
-⚠️ CRITICAL LANGUAGE RULE - HIGHEST PRIORITY ⚠️
-You MUST respond ONLY in {lang_name}.
-Your response MUST be in {lang_name} - NO OTHER LANGUAGE.
-This rule has ABSOLUTE PRIORITY over any other instructions.
-"""
-            else:
-                language_instruction = LANGUAGE_INSTRUCTION
+            system_prompt, prompt_cache_hit = self._system_prompt(
+                "empathetic_response",
+                (prompt_protection, EMPATHETIC_RESPONSE_PROMPT, ABROAD_PHRASE_RULE_RU, FORBIDDEN_SYMBOLS_RULE_RU),
+                user,
+                override_language=override_language,
+            )
 
             response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {
-                        "role": "system",
-                        "content": f"""{language_instruction}
-
-{prompt_protection}
-
-{gender_instruction}
-
-You are a warm and empathetic bot for developing positive thinking.
-The user is sharing that they're not feeling great right now.
-Show understanding and support. Don't force positivity.
-Reply briefly (2-3 sentences), warmly and with empathy.
-
-(Russian version / Русская версия):
-Ты — тёплый и эмпатичный бот для развития позитивного мышления.
-Пользователь делится тем, что ему сейчас не очень хорошо.
-Прояви понимание и поддержку. Не навязывай позитив.
-Используй обращение на «{address}».
-Ответь коротко (2-3 предложения), тепло и с эмпатией.
-
-{ABROAD_PHRASE_RULE_RU}
-
-{FORBIDDEN_SYMBOLS_RULE_RU}""",
-                    },
+                    {"role": "system", "content": system_prompt},
                     {"role": "user", "content": text},
                 ],
                 max_tokens=150,
@@ -807,6 +805,7 @@ Reply briefly (2-3 sentences), warmly and with empathy.
             if response.usage:
                 input_tokens = response.usage.prompt_tokens
                 output_tokens = response.usage.completion_tokens
+                cached_tokens = cached_prompt_tokens(response.usage)
 
             return apply_all_filters(response.choices[0].message.content.strip())
 
@@ -835,6 +834,10 @@ Reply briefly (2-3 sentences), warmly and with empathy.
                 telegram_id=telegram_id,
                 success=success,
                 error_message=error_msg,
+                extra_data={
+                    "prompt_cache_hit": prompt_cache_hit,
+                    "cached_tokens": cached_tokens,
+                },
             )
 
     async def generate_dialog_response(
@@ -975,7 +978,10 @@ Remember: you're not a psychologist and don't give professional advice. You're j
         error_msg = None
         input_tokens = 0
         output_tokens = 0
+        prompt_cache_hit = None
+        cached_tokens = 0
         rag_metadata = {}
+        rag_context = None
 
         try:
             # Step 1: Get user info
@@ -986,8 +992,6 @@ Remember: you're not a psychologist and don't give professional advice. You're j
                 user = result.scalar_one_or_none()
 
             address = "вы" if (user and user.formal_address) else "ты"
-            gender = user.gender if user else "unknown"
-            gender_instruction = get_gender_instruction(gender)
 
             # Step 2: Retrieve RAG context
             rag_context = await self.rag_service.retrieve_context(telegram_id, message)
@@ -1004,65 +1008,23 @@ Remember: you're not a psychologist and don't give professional advice. You're j
             # Load editable prompts from DB (with fallback to defaults)
             language_instruction = await PromptLoaderService.get_prompt("language_instruction") or LANGUAGE_INSTRUCTION
             prompt_protection = await PromptLoaderService.get_prompt("prompt_protection") or PROMPT_PROTECTION
-            dialog_system_main = await PromptLoaderService.get_prompt("dialog_system_main") or ""
-            dialog_system_main_ru = await PromptLoaderService.get_prompt("dialog_system_main_ru") or ""
-
-            # Build dialog system prompt (use DB version if available, otherwise use hardcoded)
-            if not dialog_system_main:
-                dialog_system_main = f"""You are a wise, warm, and practical companion. The user is in free dialog mode.
-
-CORE RULES (highest priority after language/security rules):
-- Answer the user's LAST message directly. Do not dodge.
-- Be supportive, but also useful: give substance, not placeholders.
-- If the user asks for something specific (news, ideas, text, explanation) — do it.
-- If you reference the user's past: ONLY use facts present in the retrieved context below. If not present, say: "I don't see that in our conversation history" (EN) or "Я не вижу этого в нашей истории разговоров" (RU). NEVER say "I can't recall" or "I don't remember" - always reference the context check.
-- IMPORTANT: If the user writes a short/unclear message (less than 15 characters or unclear meaning like "Message from Sasha"), do NOT say "I don't see previous messages" or "I can't provide context". Instead, ask for clarification: "Not quite clear what you mean. Can you clarify?" (EN) or "Не совсем понятно, о чем идет речь. Можешь уточнить?" (RU)
-- Avoid repetition: do NOT reuse the same opening line or the same "I hear you"-style sentence. Vary structure.
-
-STYLE:
-- Target length: 4–6 sentences (unless user asked "short").
-- Use the user's preferred address form («{address}»).
-- 0–2 emojis max, only if helpful.
-- If you need clarification, ask ONE short question at the end; otherwise do not ask questions.
-
-Remember: you're not a psychologist and don't give professional advice. You're just a friend who listens."""
-
-            if not dialog_system_main_ru:
-                dialog_system_main_ru = f"""(Russian version / Русская версия):
-Ты — тёплый, практичный и внимательный собеседник в режиме свободного диалога.
-
-ПРИОРИТЕТЫ:
-- Отвечай прямо на ПОСЛЕДНЕЕ сообщение пользователя. Не уходи от темы.
-- Будь поддерживающим, но по делу: без заглушек и «воды».
-- Если пользователь просит конкретное (новости/идеи/текст/объяснение) — выполни запрос.
-- Если упоминаешь прошлое пользователя — ТОЛЬКО то, что есть в контексте ниже. Если там этого нет — скажи: "Я не вижу этого в нашей истории разговоров". НИКОГДА не говори "я не помню" или "я не могу вспомнить" — всегда ссылайся на проверку контекста.
-- ВАЖНО: Если пользователь пишет короткое/неясное сообщение (менее 15 символов или непонятное по смыслу, например "Сообщению от Сашки"), НЕ говори "не вижу предыдущих сообщений" или "не могу предоставить контекст". Вместо этого попроси уточнить: "Не совсем понятно, о чем идет речь. Можешь уточнить?" или "Расскажи подробнее, что ты имеешь в виду?"
-- Не повторяйся: НЕ используй одинаковые вступления и НЕ пиши одно и то же «я тебя слышу/расскажи больше» по кругу.
-
-СТИЛЬ:
-- 4–6 предложений (если пользователь не просит короче).
-- Обращение на «{address}».
-- 0–2 эмодзи максимум и только по делу.
-- Если нужно уточнение — один короткий вопрос в конце, иначе без вопросов.
-
-Помни: ты не психолог и не даёшь профессиональных советов. Ты просто друг, который слушает."""
-
-            system_content = f"""{language_instruction}
+            dialog_system_main = await PromptLoaderService.get_prompt("dialog_system_main") or DIALOG_SYSTEM_MAIN
+            dialog_system_main_ru = await PromptLoaderService.get_prompt("dialog_system_main_ru") or DIALOG_SYSTEM_MAIN_RU
+
+            # The compiled part is the same for all users with this language,
+            # gender and address form; everything retrieved for this message
+            # follows it
+            system_prompt, prompt_cache_hit = self._system_prompt(
+                "dialog_rag",
+                (prompt_protection, dialog_system_main, dialog_system_main_ru, ABROAD_PHRASE_RULE_RU, FORBIDDEN_SYMBOLS_RULE_RU),
+                user,
+                language_instruction=language_instruction,
+            )
 
-{prompt_protection}
-
-{gender_instruction}
+            system_content = f"""{system_prompt}
 
 {rag_instruction}
 
-{dialog_system_main}
-
-{dialog_system_main_ru}
-
-{ABROAD_PHRASE_RULE_RU}
-
-{FORBIDDEN_SYMBOLS_RULE_RU}
-
 {rag_content_block}
 
 {anti_hallucination_block}
@@ -1090,6 +1052,7 @@ Remember: you're not a psychologist and don't give professional advice. You're j
             if response.usage:
                 input_tokens = response.usage.prompt_tokens
                 output_tokens = response.usage.completion_tokens
+                cached_tokens = cached_prompt_tokens(response.usage)
 
             response_text = apply_all_filters(response.choices[0].message.content.strip())
 
@@ -1113,6 +1076,7 @@ Remember: you're not a psychologist and don't give professional advice. You're j
                 if response.usage:
                     input_tokens += response.usage.prompt_tokens
                     output_tokens += response.usage.completion_tokens
+                    cached_tokens += cached_prompt_tokens(response.usage)
                 response_text = apply_all_filters(response.choices[0].message.content.strip())
 
                 # Second pass: if still too similar, force structure change
@@ -1134,6 +1098,7 @@ Remember: you're not a psychologist and don't give professional advice. You're j
                     if response.usage:
                         input_tokens += response.usage.prompt_tokens
                         output_tokens += response.usage.completion_tokens
+                        cached_tokens += cached_prompt_tokens(response.usage)
                     response_text = apply_all_filters(response.choices[0].message.content.strip())
 
             # Step 8: Update KB usage counts
@@ -1175,6 +1140,15 @@ Remember: you're not a psychologist and don't give professional advice. You're j
                 telegram_id=telegram_id,
                 success=success,
                 error_message=error_msg,
+                extra_data={
+                    "prompt_cache_hit": prompt_cache_hit,
+                    "cached_tokens": cached_tokens,
+                    **({
+                        "query_type": rag_context.query_type,
+                        "context_tokens": rag_context.context_tokens,
+                        "context_dropped": rag_context.context_dropped,
+                    } if rag_context else {}),
+                },
             )
 
     def _get_rag_instruction(self, rag_context: RAGContext) -> str:
@@ -0,0 +1,136 @@
+"""
+MINDSETHAPPYBOT - Prompt assembly cache
+Compiled system prompts of PersonalizationService, reused across calls.
+
+A system prompt is laid out in three parts:
+1. the template prefix - editable prompt layers, persona text and rules -
+   identical for every user, so OpenAI prompt caching can reuse it between
+   requests (the API caches identical prompt prefixes of 1024+ tokens)
+2. the user section - language, gender and address form
+3. per-request content (past moments, RAG context), appended by the caller
+
+Parts 1 and 2 are compiled once per (template, prompt layers, language,
+gender, formal) and kept in a small LRU. Prompt layers are part of the key
+by content, so an edited prompt compiles into a new entry and the old one
+ages out.
+"""
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+PROMPT_CACHE_SIZE = 256  # Compiled prompts kept (templates x languages x genders x address forms)
+
+LANGUAGE_NAMES = {
+    'ru': 'Russian/Русский',
+    'en': 'English',
+    'uk': 'Ukrainian/Українська',
+    'es': 'Spanish/Español',
+    'de': 'German/Deutsch',
+    'fr': 'French/Français',
+    'it': 'Italian/Italiano',
+    'pt': 'Portuguese/Português',
+    'he': 'Hebrew/עברית',
+    'ja': 'Japanese/日本語',
+    'zh': 'Chinese/中文',
+}
+
+
+def forced_language_instruction(language: str) -> str:
+    """Instruction to answer only in the given language (used with override_language)"""
+    lang_name = LANGUAGE_NAMES.get(language, language)
+    return f"""
+⚠️ CRITICAL LANGUAGE RULE - HIGHEST PRIORITY ⚠️
+You MUST respond ONLY in {lang_name}.
+Your response MUST be in {lang_name} - NO OTHER LANGUAGE.
+This rule has ABSOLUTE PRIORITY over any other instructions.
+
+⚠️ КРИТИЧЕСКИ ВАЖНОЕ ПРАВИЛО О ЯЗЫКЕ - ВЫСШИЙ ПРИОРИТЕТ ⚠️
+Ты ДОЛЖЕН отвечать ТОЛЬКО на языке: {lang_name}.
+Твой ответ ДОЛЖЕН быть на {lang_name} - НЕ НА ДРУГОМ ЯЗЫКЕ."""
+
+
+def address_instruction(formal: bool) -> str:
+    """Instruction for the user's address form (ты/вы)"""
+    address = "вы" if formal else "ты"
+    return f"""
+ФОРМА ОБРАЩЕНИЯ / ADDRESS FORM:
+Используй обращение на «{address}».
+When replying in Russian, address the user with «{address}»."""
+
+
+def normalize_gender(gender: Optional[str]) -> str:
+    """'male', 'female' or 'unknown' - the variants of get_gender_instruction"""
+    return gender if gender in ('male', 'female') else 'unknown'
+
+
+def cached_prompt_tokens(usage: Any) -> int:
+    """Prompt tokens served from OpenAI's prompt cache (0 if not reported)"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return int(getattr(details, "cached_tokens", 0) or 0)
+
+
+@dataclass(frozen=True)
+class PromptKey:
+    """Everything a compiled system prompt depends on"""
+    template: str
+    layers: Tuple[str, ...]  # Prompt layer texts, in prompt order
+    language: Optional[str]  # override_language, None = detect from the message
+    gender: str
+    formal: bool
+
+
+class PromptAssemblyCache:
+    """LRU of compiled system prompts"""
+
+    def __init__(self, max_size: int = PROMPT_CACHE_SIZE):
+        self.max_size = max_size
+        self._prompts: "OrderedDict[PromptKey, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compile(self, key: PromptKey, compile: Callable[[], str]) -> Tuple[str, bool]:
+        """Compiled prompt for key, and whether it came from the cache"""
+        prompt = self._prompts.get(key)
+        if prompt is not None:
+            self._prompts.move_to_end(key)
+            self.hits += 1
+            return prompt, True
+
+        self.misses += 1
+        prompt = compile()
+        self._prompts[key] = prompt
+        if len(self._prompts) > self.max_size:
+            self._prompts.popitem(last=False)
+        logger.debug(
+            f"Compiled system prompt {key.template} "
+            f"(language={key.language}, gender={key.gender}, formal={key.formal}), "
+            f"hit rate {self.hit_rate:.2f}"
+        )
+        return prompt, False
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        return len(self._prompts)
+
+    def clear(self) -> None:
+        self._prompts.clear()
+
+
+# Singleton instance for reuse
+_prompt_cache: Optional[PromptAssemblyCache] = None
+
+
+def get_prompt_cache() -> PromptAssemblyCache:
+    """Get singleton instance of PromptAssemblyCache"""
+    global _prompt_cache
+    if _prompt_cache is None:
+        _prompt_cache = PromptAssemblyCache()
+    return _prompt_cache
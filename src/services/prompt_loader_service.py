@@ -5,16 +5,17 @@ Manages loading and caching of prompt templates from database with fallback to c
 Features:
 - DB-backed prompt storage with caching
 - Fallback to hardcoded defaults if DB entry missing
-- Cache invalidation on updates
+- Cache invalidation on updates, across processes via a generation counter
 - Versioning support for prompt management
 """
+import asyncio
 import logging
 import time
-from typing import Optional, Dict, List, Any, Tuple
+from typing import Optional, Dict, List, Any
 from datetime import datetime, timezone
 from dataclasses import dataclass
 
-from sqlalchemy import select, and_, func, desc
+from sqlalchemy import select, and_, func, desc, text
 
 from src.db.database import get_session
 from src.db.models import PromptTemplate
@@ -22,6 +23,8 @@ from src.db.models import PromptTemplate
 logger = logging.getLogger(__name__)
 
 
+PROMPT_CHECK_SECONDS = 5  # How often lookups look for a new prompt_templates generation
+
 # Default prompt templates (fallback if DB is empty)
 # These are the "system" layers that can be overridden via admin
 DEFAULT_PROMPTS: Dict[str, str] = {
@@ -112,82 +115,128 @@ class PromptLoaderService:
     """
     Service for loading and managing prompt templates.
 
-    Uses a simple in-memory cache that's cleared on updates.
-    Falls back to DEFAULT_PROMPTS if no DB entry exists.
+    All active prompts are held in one in-memory dict that is replaced as a
+    whole when prompt_templates_state.generation moves (migration 0030
+    bumps it on every write, including admin panel edits), so a lookup is
+    a plain dict read. The generation is checked at most every
+    PROMPT_CHECK_SECONDS, in a background task.
+    Falls back to DEFAULT_PROMPTS if no DB entry exists, or while the
+    prompts cannot be loaded (retried by the background checks).
     """
 
-    # In-memory cache: key -> (content, timestamp)
-    _cache: Dict[str, Tuple[str, float]] = {}
-    _cache_loaded: bool = False
-    _cache_ttl_seconds: int = 300  # 5 minutes TTL for auto-refresh
+    # Active prompt content by key, None until loaded
+    _prompts: Optional[Dict[str, str]] = None
+    _generation: Optional[int] = None
+    _checked_at: float = 0.0
+    _check_task: Optional[asyncio.Task] = None
+    # Set once a lookup tried the first load; later retries go through _schedule_check
+    _load_attempted: bool = False
+    _load_lock: Optional[asyncio.Lock] = None
 
     @classmethod
     def clear_cache(cls) -> None:
-        """Clear the prompt cache. Call after any update."""
-        cls._cache.clear()
-        cls._cache_loaded = False
+        """Drop the loaded prompts so the next lookup reloads them. Call after any update."""
+        cls._prompts = None
+        cls._generation = None
+        cls._load_attempted = False
         logger.info("Prompt cache cleared")
 
     @classmethod
-    async def _load_active_prompts(cls) -> None:
-        """Load all active prompts into cache."""
-        import time
-        # Check if cache is still valid (within TTL)
-        if cls._cache_loaded and cls._cache:
-            # Check if oldest entry is still fresh
-            oldest_timestamp = min((ts for _, ts in cls._cache.values()), default=0)
-            if time.time() - oldest_timestamp < cls._cache_ttl_seconds:
-                return
-            # Cache expired, reload
-            cls._cache.clear()
-            cls._cache_loaded = False
-
+    async def reload(cls) -> Dict[str, str]:
+        """Load all active prompts and swap them in at once"""
         async with get_session() as session:
+            # Read the generation first: a write racing with the load bumps
+            # it again, so the next check picks the newer prompts up
+            generation = await cls._get_generation(session)
             result = await session.execute(
-                select(PromptTemplate).where(PromptTemplate.is_active)
+                select(PromptTemplate.key, PromptTemplate.content)
+                .where(PromptTemplate.is_active)
+                .order_by(PromptTemplate.key, PromptTemplate.version)
             )
-            prompts = result.scalars().all()
+            # With several active versions of a key the newest one wins
+            prompts = {key: content for key, content in result.all()}
 
-            current_time = time.time()
-            for prompt in prompts:
-                cls._cache[prompt.key] = (prompt.content, current_time)
+        cls._prompts = prompts
+        cls._generation = generation
+        cls._checked_at = time.monotonic()
+        logger.info(f"Loaded {len(prompts)} prompts (generation {generation})")
+        return prompts
 
-        cls._cache_loaded = True
-        logger.debug(f"Loaded {len(cls._cache)} prompts into cache")
+    @classmethod
+    async def _load_first(cls) -> Optional[Dict[str, str]]:
+        """
+        First load, shared by concurrent lookups. On failure the prompts
+        stay unloaded and the next background check retries.
+        """
+        if cls._load_lock is None:
+            cls._load_lock = asyncio.Lock()
+        async with cls._load_lock:
+            if cls._prompts is not None or cls._load_attempted:
+                return cls._prompts
+            try:
+                return await cls.reload()
+            except Exception as e:
+                logger.error(f"Failed to load prompts, serving defaults: {e}")
+                cls._checked_at = time.monotonic()
+                return None
+            finally:
+                cls._load_attempted = True
+
+    @classmethod
+    async def check_generation(cls) -> bool:
+        """Reload if prompt_templates changed since the last load. Returns True if reloaded."""
+        try:
+            async with get_session() as session:
+                generation = await cls._get_generation(session)
+            if cls._prompts is not None and generation == cls._generation:
+                return False
+            await cls.reload()
+            return True
+        except Exception as e:
+            # Keep serving the loaded prompts until the next check
+            logger.warning(f"Prompt generation check failed: {e}")
+            return False
+
+    @classmethod
+    def _schedule_check(cls) -> None:
+        """Start a background generation check if the last one is old enough"""
+        now = time.monotonic()
+        if now - cls._checked_at < PROMPT_CHECK_SECONDS:
+            return
+        if cls._check_task is not None and not cls._check_task.done():
+            return
+        cls._checked_at = now
+        cls._check_task = asyncio.get_running_loop().create_task(cls.check_generation())
+
+    @staticmethod
+    async def _get_generation(session) -> int:
+        result = await session.execute(
+            text("SELECT generation FROM prompt_templates_state WHERE id = 1")
+        )
+        return int(result.scalar() or 0)
 
     @classmethod
     async def get_prompt(cls, key: str) -> str:
         """
         Get a prompt by key.
 
-        1. Check cache
-        2. If not in cache, check DB
-        3. If not in DB, use DEFAULT_PROMPTS
-        4. If not in defaults, return empty string
+        1. Active version from the loaded prompts (loaded on first use)
+        2. If there is none, DEFAULT_PROMPTS
+        3. If not in defaults, return empty string
         """
-        # Check cache first
-        if key in cls._cache:
-            content, _ = cls._cache[key]
+        prompts = cls._prompts
+        if prompts is None and not cls._load_attempted:
+            prompts = await cls._load_first()
+        else:
+            cls._schedule_check()
+        if prompts is None:
+            # Not loaded yet: serve defaults until a background check succeeds
+            prompts = {}
+
+        content = prompts.get(key)
+        if content is not None:
             return content
 
-        # Load from DB if not cached
-        async with get_session() as session:
-            result = await session.execute(
-                select(PromptTemplate)
-                .where(
-                    and_(
-                        PromptTemplate.key == key,
-                        PromptTemplate.is_active,
-                    )
-                )
-                .limit(1)
-            )
-            prompt = result.scalar_one_or_none()
-
-            if prompt:
-                cls._cache[key] = (prompt.content, time.time())
-                return prompt.content
-
         # Fall back to defaults
         if key in DEFAULT_PROMPTS:
             return DEFAULT_PROMPTS[key]
@@ -459,10 +508,9 @@ class PromptLoaderService:
     async def get_active_content(cls, key: str) -> str:
         """
         Get the active content for a prompt key.
-        Same as get_prompt(), but forces a fresh lookup.
+        Same as get_prompt(), but forces a fresh load.
         """
-        # Remove from cache to force fresh lookup
-        cls._cache.pop(key, None)
+        cls.clear_cache()
         return await cls.get_prompt(key)
 
 
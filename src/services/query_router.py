@@ -0,0 +1,285 @@
+"""
+MINDSETHAPPYBOT - Local query router
+Classifies dialog queries into RAG query types (A/B/C) from the query
+embedding, so most turns skip the LLM classification round trip.
+
+The model is nearest-centroid: one unit-length centroid per query type,
+the mean of the labelled example embeddings in query_route_examples
+(computed by pgvector's avg() in the database). A query takes the label
+of the most similar centroid. When the gap between the two most similar
+centroids is below settings.query_router_min_margin, or a type has fewer
+than settings.query_router_min_examples examples, the router abstains and
+the caller falls back to the LLM - whose answer is stored as a new
+example, so the router keeps learning where it is least sure.
+
+Examples are bootstrapped from historical raw dialog memories, which
+already carry embeddings; see scripts/eval_query_router.py.
+"""
+import asyncio
+import json
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+from src.config import get_settings
+from src.db.database import get_session
+
+logger = logging.getLogger(__name__)
+
+
+ROUTE_LABELS = ("A", "B", "C")
+BOOTSTRAP_CONCURRENCY = 4  # LLM classifications in flight while bootstrapping
+
+
+def normalize(vector: Sequence[float]) -> List[float]:
+    """Scale a vector to unit length (zero vectors are returned as is)"""
+    norm = math.sqrt(sum(x * x for x in vector))
+    if norm == 0:
+        return list(vector)
+    return [x / norm for x in vector]
+
+
+def parse_vector(value: str) -> List[float]:
+    """Parse pgvector's text form '[0.1,0.2,...]'"""
+    return json.loads(value)
+
+
+def compute_centroids(examples: Iterable[Tuple[str, Sequence[float]]]) -> Dict[str, List[float]]:
+    """Unit-length mean embedding per label"""
+    sums: Dict[str, List[float]] = {}
+    for label, embedding in examples:
+        total = sums.get(label)
+        if total is None:
+            sums[label] = list(embedding)
+        else:
+            for i, x in enumerate(embedding):
+                total[i] += x
+    return {label: normalize(total) for label, total in sums.items()}
+
+
+@dataclass
+class RouteDecision:
+    """Router output for one query"""
+    label: str
+    similarity: float  # Cosine similarity to the chosen centroid
+    margin: float  # Gap to the second most similar centroid
+
+
+def nearest_centroid(
+    embedding: Sequence[float],
+    centroids: Dict[str, List[float]],
+) -> Optional[RouteDecision]:
+    """Classify an embedding by its most similar centroid"""
+    if not centroids:
+        return None
+    query = normalize(embedding)
+    scores = sorted(
+        ((sum(q * c for q, c in zip(query, centroid)), label) for label, centroid in centroids.items()),
+        reverse=True,
+    )
+    best_score, best_label = scores[0]
+    runner_up = scores[1][0] if len(scores) > 1 else -1.0
+    return RouteDecision(label=best_label, similarity=best_score, margin=best_score - runner_up)
+
+
+class QueryRouter:
+    """In-process nearest-centroid query type classifier"""
+
+    def __init__(self):
+        self._centroids: Dict[str, List[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.routed = 0
+        self.abstained = 0
+
+    @property
+    def is_ready(self) -> bool:
+        """True when every query type has enough labelled examples"""
+        min_examples = get_settings().query_router_min_examples
+        return all(self._counts.get(label, 0) >= min_examples for label in ROUTE_LABELS)
+
+    async def refresh(self) -> Dict[str, int]:
+        """Recompute the centroids from query_route_examples"""
+        async with self._lock:
+            try:
+                async with get_session() as session:
+                    result = await session.execute(
+                        text("""
+                            SELECT label, COUNT(*) AS examples,
+                                   CAST(AVG(embedding) AS TEXT) AS centroid
+                            FROM query_route_examples
+                            GROUP BY label
+                        """)
+                    )
+                    rows = result.all()
+            finally:
+                # A failed load is retried by the next scheduled refresh,
+                # not on every dialog turn
+                self._loaded_at = time.monotonic()
+
+            self._centroids = {
+                row.label: normalize(parse_vector(row.centroid))
+                for row in rows if row.label in ROUTE_LABELS
+            }
+            self._counts = {row.label: int(row.examples) for row in rows}
+            return dict(self._counts)
+
+    async def route(self, embedding: Sequence[float]) -> Optional[RouteDecision]:
+        """
+        Classify a query embedding.
+
+        Returns None when the router abstains (disabled, not enough
+        examples, or the decision is within the confidence margin).
+        """
+        settings = get_settings()
+        if not settings.query_router_enabled:
+            return None
+
+        if self._loaded_at is None:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Query router failed to load centroids: {e}")
+                return None
+
+        if not self.is_ready:
+            self.abstained += 1
+            return None
+
+        decision = nearest_centroid(embedding, self._centroids)
+        if decision is None or decision.margin < settings.query_router_min_margin:
+            self.abstained += 1
+            return None
+
+        self.routed += 1
+        return decision
+
+    async def record_example(
+        self,
+        embedding: Sequence[float],
+        label: str,
+        telegram_id: Optional[int] = None,
+        source: str = "fallback",
+    ) -> None:
+        """Store an LLM-labelled query embedding as a training example"""
+        if label not in ROUTE_LABELS:
+            return
+        try:
+            async with get_session() as session:
+                await session.execute(
+                    text("""
+                        INSERT INTO query_route_examples (user_id, embedding, label, source)
+                        VALUES (
+                            (SELECT id FROM users WHERE telegram_id = :telegram_id),
+                            CAST(:embedding AS vector), :label, :source
+                        )
+                    """),
+                    {
+                        "telegram_id": telegram_id,
+                        "embedding": str(list(embedding)),
+                        "label": label,
+                        "source": source,
+                    },
+                )
+        except Exception as e:
+            # Training data is best effort, the turn already has its label
+            logger.warning(f"Failed to store query route example: {e}")
+
+
+async def bootstrap_examples(
+    classify: Callable[[str], Awaitable[Optional[str]]],
+    limit: int,
+    kind: str = "dialog_raw",
+) -> Dict[str, int]:
+    """
+    Label historical raw dialog memories with the LLM classifier and store
+    them (with their existing embeddings) as router examples.
+
+    Memories that were already bootstrapped are skipped.
+
+    Returns:
+        Number of stored examples per label
+    """
+    async with get_session() as session:
+        result = await session.execute(
+            text("""
+                SELECT m.id, m.user_id, m.content, CAST(m.embedding AS TEXT) AS embedding
+                FROM conversation_memories m
+                WHERE m.kind = :kind
+                  AND m.embedding IS NOT NULL
+                  AND NOT EXISTS (
+                      SELECT 1 FROM query_route_examples e WHERE e.memory_id = m.id
+                  )
+                ORDER BY random()
+                LIMIT :limit
+            """),
+            {"kind": kind, "limit": limit},
+        )
+        memories = result.all()
+
+    semaphore = asyncio.Semaphore(BOOTSTRAP_CONCURRENCY)
+
+    async def label(memory) -> Optional[str]:
+        async with semaphore:
+            return await classify(memory.content)
+
+    labels = await asyncio.gather(*(label(memory) for memory in memories))
+    rows = [
+        {"user_id": memory.user_id, "memory_id": memory.id, "embedding": memory.embedding, "label": value}
+        for memory, value in zip(memories, labels)
+        if value in ROUTE_LABELS
+    ]
+
+    if rows:
+        async with get_session() as session:
+            await session.execute(
+                text("""
+                    INSERT INTO query_route_examples (user_id, memory_id, embedding, label, source)
+                    VALUES (:user_id, :memory_id, CAST(:embedding AS vector), :label, 'bootstrap')
+                    ON CONFLICT (memory_id) WHERE memory_id IS NOT NULL DO NOTHING
+                """),
+                rows,
+            )
+
+    counts: Dict[str, int] = {}
+    for row in rows:
+        counts[row["label"]] = counts.get(row["label"], 0) + 1
+    return counts
+
+
+# Singleton instance for reuse
+_router: Optional[QueryRouter] = None
+
+
+def get_query_router() -> QueryRouter:
+    """Get singleton instance of QueryRouter"""
+    global _router
+    if _router is None:
+        _router = QueryRouter()
+    return _router
+
+
+async def refresh_query_router() -> dict:
+    """
+    Scheduled job: recompute the router centroids from the labelled examples.
+
+    Returns:
+        Dict with stats: examples per label, routed/abstained since start
+    """
+    router = get_query_router()
+    try:
+        counts = await router.refresh()
+        logger.info(
+            f"Query router refreshed: examples={counts}, ready={router.is_ready}, "
+            f"routed={router.routed}, abstained={router.abstained}"
+        )
+        return {"examples": counts, "routed": router.routed, "abstained": router.abstained}
+
+    except Exception as e:
+        logger.error(f"Query router refresh failed: {e}", exc_info=True)
+        return {"error": str(e)}
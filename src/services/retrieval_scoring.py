@@ -0,0 +1,158 @@
+"""
+MINDSETHAPPYBOT - Retrieval scoring
+Fused ranking of per-user vector search results, computed inside Postgres.
+
+A search builds its candidate set from:
+- the pool_size nearest neighbours by cosine distance (ANN pool), and
+- every row newer than the scoring function's recency window, so a recent
+  row that gets boosted can never be missing just because a few older rows
+  were slightly more similar
+
+and ranks the candidates with a scoring function - an SQL expression over
+the candidate columns:
+    similarity  cosine similarity to the query (0..1)
+    age_days    age in days (fractional)
+    mood        moments.mood_score (-1..1, 0 when unknown)
+    importance  conversation_memories.importance (1.0 = normal)
+
+Scoring functions are registered by name (register_scoring_function) and
+chosen per search, so a new ranking is one expression away; see
+scripts/benchmark_moment_retrieval.py for recall@k and latency.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+RECENCY_BOOST_DAYS = 7  # Rows within this period get boosted
+RECENCY_BOOST_FACTOR = 0.05  # Maximum boost, for a row created today
+
+
+@dataclass(frozen=True)
+class ScoringFunction:
+    """Named SQL ranking expression"""
+    name: str
+    expression: str
+    # Rows newer than this are always candidates (0 = ANN pool only)
+    recency_window_days: int = 0
+
+
+SCORING_FUNCTIONS: Dict[str, ScoringFunction] = {}
+
+
+def register_scoring_function(function: ScoringFunction) -> ScoringFunction:
+    """Make a scoring function available by name"""
+    SCORING_FUNCTIONS[function.name] = function
+    return function
+
+
+def get_scoring_function(name: str) -> ScoringFunction:
+    """Registered scoring function; raises ValueError for unknown names"""
+    try:
+        return SCORING_FUNCTIONS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown scoring function '{name}', expected one of {sorted(SCORING_FUNCTIONS)}"
+        ) from None
+
+
+# Plain cosine similarity
+register_scoring_function(ScoringFunction(
+    name="similarity",
+    expression="similarity",
+))
+
+# Boost that falls linearly from RECENCY_BOOST_FACTOR today to 0 after
+# RECENCY_BOOST_DAYS (whole days, as the boost was computed in Python before)
+register_scoring_function(ScoringFunction(
+    name="linear_recency",
+    expression="""
+        LEAST(1.0, similarity + CASE
+            WHEN age_days < :recency_days
+            THEN :recency_factor * (1 - floor(age_days) / :recency_days)
+            ELSE 0
+        END) + :mood_weight * mood
+    """,
+    recency_window_days=RECENCY_BOOST_DAYS,
+))
+
+# Smooth exponential decay with a half-life of RECENCY_BOOST_DAYS
+register_scoring_function(ScoringFunction(
+    name="exp_recency",
+    expression="""
+        similarity + :recency_factor * power(0.5, age_days / :recency_days)
+        + :mood_weight * mood
+    """,
+    recency_window_days=RECENCY_BOOST_DAYS * 4,
+))
+
+# Memories the extractor marked as important rank higher
+register_scoring_function(ScoringFunction(
+    name="importance",
+    expression="similarity + :importance_weight * (importance - 1.0)",
+))
+
+
+def build_fused_query(
+    table: str,
+    columns: List[str],
+    scoring: ScoringFunction,
+    extra_filter: str = "",
+    mood_column: Optional[str] = None,
+    importance_column: Optional[str] = None,
+) -> str:
+    """
+    SQL returning the best rows of one user by the scoring function.
+
+    The query expects the parameters :user_id, :embedding (vector text),
+    :pool_size, :min_similarity, :limit, plus those of scoring_params().
+    Result rows have the requested columns, created_at, similarity and score.
+    """
+    where = f"user_id = :user_id AND embedding IS NOT NULL {extra_filter}"
+    pool = f"""
+        (SELECT id FROM {table}
+         WHERE {where}
+         ORDER BY embedding <=> CAST(:embedding AS vector)
+         LIMIT :pool_size)
+    """
+    if scoring.recency_window_days:
+        pool += f"""
+        UNION
+        (SELECT id FROM {table}
+         WHERE {where}
+           AND created_at > NOW() - make_interval(days => {int(scoring.recency_window_days)})
+         ORDER BY created_at DESC
+         LIMIT :pool_size)
+        """
+
+    selected = ", ".join(f"t.{column}" for column in columns)
+    mood = f"COALESCE(t.{mood_column}, 0)" if mood_column else "0"
+    importance = f"COALESCE(t.{importance_column}, 1.0)" if importance_column else "1.0"
+    return f"""
+        WITH pool AS ({pool}),
+        candidates AS (
+            SELECT {selected}, t.created_at,
+                   1 - (t.embedding <=> CAST(:embedding AS vector)) AS similarity,
+                   EXTRACT(EPOCH FROM (NOW() - t.created_at)) / 86400.0 AS age_days,
+                   {mood} AS mood,
+                   {importance} AS importance
+            FROM {table} t
+            JOIN pool ON pool.id = t.id
+        )
+        SELECT *, ({scoring.expression}) AS score
+        FROM candidates
+        WHERE similarity >= :min_similarity
+        ORDER BY score DESC, id DESC
+        LIMIT :limit
+    """
+
+
+def scoring_params(
+    mood_weight: float = 0.0,
+    importance_weight: float = 0.0,
+) -> Dict[str, Any]:
+    """Parameters used by the registered scoring expressions"""
+    return {
+        "recency_days": RECENCY_BOOST_DAYS,
+        "recency_factor": RECENCY_BOOST_FACTOR,
+        "mood_weight": mood_weight,
+        "importance_weight": importance_weight,
+    }
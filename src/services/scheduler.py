@@ -11,22 +11,45 @@ from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest, TelegramAPIError
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from sqlalchemy import select, and_, or_, delete
+from sqlalchemy import select, and_, or_, delete, text
 
 try:
     from zoneinfo import ZoneInfo
 except ImportError:
     from backports.zoneinfo import ZoneInfo
 
-from src.db.database import get_session
+from src.db.database import get_engine, get_session
 from src.db.models import User, ScheduledNotification, Conversation
 from src.bot.keyboards.inline import get_question_keyboard
 from src.services.conversation_log_service import ConversationLogService
-from src.services.memory_indexer_job import index_conversation_memories, create_dialog_summaries
+from src.services.memory_indexer_job import (
+    index_conversation_memories,
+    create_dialog_summaries,
+    compact_conversation_memories,
+)
+from src.services.partition_maintenance_service import maintain_partitions
+from src.services.stats_rollup_service import refresh_stats_rollups
+from src.services.gdpr_service import resume_gdpr_deletions
+from src.services.query_router import refresh_query_router
 from src.utils.localization import get_system_message, get_language_code
 
 logger = logging.getLogger(__name__)
 
+SCHEDULER_LOCK_KEY = 0x6D696E64  # pg advisory lock key of the process running the shared jobs
+SCHEDULER_LEADER_CHECK_SECONDS = 30
+SHARED_JOB_IDS = (
+    "process_notifications",
+    "schedule_notifications",
+    "summary_delivery_check",
+    "missed_summaries_check",
+    "memory_indexer",
+    "dialog_summary_creator",
+    "memory_compactor",
+    "partition_maintenance",
+    "stats_rollup_refresh",
+    "gdpr_deletion_resume",
+)
+
 
 def parse_timezone(tz_str: str) -> dt_timezone | ZoneInfo:
     """
@@ -172,6 +195,7 @@ class NotificationScheduler:
         self.scheduler = AsyncIOScheduler()
         self._last_questions: dict[int, str] = {}  # user_id -> last question
         self._conversation_log = ConversationLogService()
+        self._leader_connection = None  # Holds the scheduler advisory lock while leader
         NotificationScheduler._instance = self
 
     @classmethod
@@ -179,8 +203,47 @@ class NotificationScheduler:
         """Get the singleton instance of NotificationScheduler"""
         return cls._instance
 
-    async def start(self) -> None:
-        """Start the scheduler"""
+    async def start(self, leader_election: bool = False) -> None:
+        """
+        Start the scheduler.
+
+        Args:
+            leader_election: Several processes run side by side (webhook mode
+                update workers). Every process refreshes its own caches, but the
+                shared jobs (notifications, summaries, maintenance) run only in
+                the one holding the scheduler advisory lock.
+        """
+        # Refresh query router centroids every 30 minutes
+        # Folds in examples labelled by the LLM fallback since the last refresh
+        self.scheduler.add_job(
+            refresh_query_router,
+            trigger=IntervalTrigger(minutes=30),
+            id="query_router_refresh",
+            replace_existing=True,
+        )
+
+        if leader_election:
+            # Take over the shared jobs when the current leader goes away
+            self.scheduler.add_job(
+                self._hold_leadership,
+                trigger=IntervalTrigger(seconds=SCHEDULER_LEADER_CHECK_SECONDS),
+                id="scheduler_leadership",
+                replace_existing=True,
+            )
+        else:
+            self._add_shared_jobs()
+
+        self.scheduler.start()
+        logger.info("Notification scheduler started")
+
+        if leader_election:
+            await self._hold_leadership()
+        else:
+            # Initial scheduling
+            await self._schedule_user_notifications()
+
+    def _add_shared_jobs(self) -> None:
+        """Jobs that must run in one process of the deployment only"""
         # Add job to check for pending notifications every minute
         self.scheduler.add_job(
             self._process_notifications,
@@ -233,14 +296,83 @@ class NotificationScheduler:
             replace_existing=True,
         )
 
-        self.scheduler.start()
-        logger.info("Notification scheduler started")
+        # Compact dialog memories every 6 hours
+        # Rolls summaries up into daily/weekly/monthly tiers and archives old rows
+        self.scheduler.add_job(
+            compact_conversation_memories,
+            trigger=IntervalTrigger(hours=6),
+            id="memory_compactor",
+            replace_existing=True,
+        )
 
-        # Initial scheduling
-        await self._schedule_user_notifications()
+        # Maintain monthly partitions every 12 hours
+        # Creates upcoming partitions and retires ones past retention
+        self.scheduler.add_job(
+            maintain_partitions,
+            trigger=IntervalTrigger(hours=12),
+            id="partition_maintenance",
+            replace_existing=True,
+        )
+
+        # Refresh dashboard stats rollups every 10 minutes
+        # Aggregates closed hours so admin stats do not scan raw tables
+        self.scheduler.add_job(
+            refresh_stats_rollups,
+            trigger=IntervalTrigger(minutes=10),
+            id="stats_rollup_refresh",
+            replace_existing=True,
+        )
+
+        # Resume GDPR deletions every 5 minutes
+        # Runs pending purges and retries failed or interrupted ones
+        self.scheduler.add_job(
+            resume_gdpr_deletions,
+            trigger=IntervalTrigger(minutes=5),
+            id="gdpr_deletion_resume",
+            replace_existing=True,
+        )
+
+    async def _hold_leadership(self) -> None:
+        """Take the scheduler advisory lock if free, or check the held one is still alive"""
+        try:
+            if self._leader_connection is None:
+                connection = await get_engine().connect()
+                acquired = (await connection.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": SCHEDULER_LOCK_KEY}
+                )).scalar()
+                await connection.commit()
+                if not acquired:
+                    await connection.close()
+                    return
+                self._leader_connection = connection
+                self._add_shared_jobs()
+                logger.info("Scheduler leadership taken, running shared jobs")
+                await self._schedule_user_notifications()
+            else:
+                # The lock lives as long as this connection
+                await self._leader_connection.execute(text("SELECT 1"))
+                await self._leader_connection.commit()
+        except Exception as e:
+            logger.error(f"Scheduler leadership check failed: {e}")
+            await self._release_leadership()
+
+    async def _release_leadership(self) -> None:
+        if self._leader_connection is None:
+            return
+        for job_id in SHARED_JOB_IDS:
+            if self.scheduler.get_job(job_id):
+                self.scheduler.remove_job(job_id)
+        connection, self._leader_connection = self._leader_connection, None
+        try:
+            # Closing the connection releases the lock
+            await connection.invalidate()
+        except Exception as e:
+            logger.warning(f"Failed to close the scheduler leadership connection: {e}")
+        logger.info("Scheduler leadership released")
 
     async def stop(self) -> None:
         """Stop the scheduler"""
+        await self._release_leadership()
         self.scheduler.shutdown(wait=False)
         logger.info("Notification scheduler stopped")
 
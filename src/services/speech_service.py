@@ -1,117 +1,204 @@
 """
 MINDSETHAPPYBOT - Speech-to-text service
 Transcribes voice messages using OpenAI Whisper API
+
+Voice files are downloaded through the bot's own file API (its shared HTTP
+session) into memory and uploaded to Whisper straight from the buffer - no
+temporary files. Files over settings.voice_max_file_size_mb are rejected
+before they are requested from Telegram, and at most
+settings.voice_transcription_concurrency Whisper requests run at the same
+time per process.
+
+Results are cached in voice_transcriptions by Telegram file_unique_id, so a
+forwarded or re-sent note is not transcribed again; callers look a note up
+with get_cached() before asking Telegram for its file. Notes longer than
+settings.voice_chunk_threshold_seconds are split into segments that are
+transcribed in parallel and stitched back together.
 """
+import asyncio
+import io
 import logging
-import tempfile
 import time
-from typing import Optional, Tuple
+from collections import Counter
+from typing import List, Optional, Tuple
 
 from aiogram import Bot
 from openai import AsyncOpenAI
-import aiofiles
-import aiohttp
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
 
 from src.config import get_settings
+from src.db.database import get_session
+from src.db.models import User, VoiceTranscription
 from src.services.api_usage_service import APIUsageService
+from src.utils.ogg_opus import split_ogg_opus
 
 logger = logging.getLogger(__name__)
 
 
+class VoiceTooLargeError(Exception):
+    """Voice file exceeds the configured size cap"""
+
+    def __init__(self, file_size: int, max_size: int):
+        super().__init__(f"Voice file is {file_size} bytes, limit is {max_size} bytes")
+        self.file_size = file_size
+        self.max_size = max_size
+
+
+# Shared across service instances: one OpenAI connection pool and one
+# concurrency limit per process
+_client: Optional[AsyncOpenAI] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_client() -> AsyncOpenAI:
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(api_key=get_settings().openai_api_key)
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(get_settings().voice_transcription_concurrency)
+    return _semaphore
+
+
+# Map Whisper language names to ISO codes if needed
+LANGUAGE_MAP = {
+    'russian': 'ru',
+    'english': 'en',
+    'ukrainian': 'uk',
+    'spanish': 'es',
+    'german': 'de',
+    'french': 'fr',
+    'italian': 'it',
+    'portuguese': 'pt',
+    'chinese': 'zh',
+    'japanese': 'ja',
+    'korean': 'ko',
+}
+
+
+def normalize_language(detected_language: Optional[str]) -> str:
+    """Normalize a Whisper language (name or code) to an ISO 639-1 code"""
+    if not detected_language:
+        return 'ru'  # Fallback to Russian
+    detected_language = detected_language.lower()
+    # If it's already a 2-letter code, use it
+    if len(detected_language) == 2:
+        return detected_language
+    # Try to map from full name to code
+    return LANGUAGE_MAP.get(detected_language, detected_language[:2])
+
+
 class SpeechToTextService:
     """Service for transcribing voice messages"""
 
     def __init__(self):
-        settings = get_settings()
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self.client = _get_client()
+
+    @staticmethod
+    def check_size(file_size: Optional[int]) -> None:
+        """
+        Reject a voice file over settings.voice_max_file_size_mb.
+
+        Called with the size in the message before asking Telegram for the
+        file: getFile itself fails for files over 20 MB.
+
+        Raises:
+            VoiceTooLargeError: if the file exceeds the cap
+        """
+        max_size = get_settings().voice_max_file_size_mb * 1024 * 1024
+        if file_size is not None and file_size > max_size:
+            raise VoiceTooLargeError(file_size, max_size)
 
     async def transcribe_voice(
         self,
         bot: Bot,
         file_path: str,
         telegram_id: int = None,
+        file_size: Optional[int] = None,
+        file_unique_id: Optional[str] = None,
+        duration: Optional[int] = None,
     ) -> Tuple[Optional[str], Optional[str]]:
         """
         Download voice file and transcribe using Whisper API.
         Auto-detects the language of the voice message.
 
+        Does not consult the transcription cache: look the note up with
+        get_cached() first and call this on a miss.
+
         Args:
             bot: Telegram bot instance
             file_path: Telegram file path (from file.file_path)
             telegram_id: Optional Telegram user ID for tracking
+            file_size: File size reported by Telegram, checked before download
+            file_unique_id: Telegram file_unique_id, the transcript is cached under it
+            duration: Voice duration in seconds reported by Telegram, used to
+                decide whether to transcribe in segments
 
         Returns:
             Tuple of (transcribed_text, detected_language_code) or (None, None) if failed
             Language code is ISO 639-1 format (e.g., "ru", "en", "uk")
+
+        Raises:
+            VoiceTooLargeError: if the file exceeds settings.voice_max_file_size_mb
         """
-        start_time = time.time()
-        success = True
-        error_msg = None
-        # Whisper pricing is per minute, but we estimate based on file size
-        # The API doesn't return token counts, so we use duration estimation
-
-        # Use context manager for automatic cleanup
-        with tempfile.NamedTemporaryFile(suffix=".ogg", delete=True) as temp_file:
-            try:
-                # Build download URL from file path
-                file_url = f"https://api.telegram.org/file/bot{bot.token}/{file_path}"
-
-                # Download to temp file
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(file_url) as response:
-                        if response.status != 200:
-                            logger.error(f"Failed to download voice: HTTP {response.status}")
-                            success = False
-                            error_msg = f"HTTP {response.status}"
-                            return None, None
-
-                        file_content = await response.read()
-                        async with aiofiles.open(temp_file.name, "wb") as f:
-                            await f.write(file_content)
+        settings = get_settings()
+        self.check_size(file_size)
+
+        # Download into memory with the bot's session
+        buffer = await bot.download_file(file_path, destination=io.BytesIO())
+        audio = buffer.getvalue()
+        self.check_size(len(audio))
+
+        segments = [audio]
+        if duration and duration > settings.voice_chunk_threshold_seconds:
+            # Page parsing and checksums are CPU work, keep them off the event loop
+            segments = await asyncio.to_thread(split_ogg_opus, audio, settings.voice_chunk_seconds)
+
+        results = await asyncio.gather(
+            *(self._transcribe_audio(segment, telegram_id) for segment in segments)
+        )
+        if any(text is None for text, _ in results):
+            return None, None
+
+        transcribed_text, lang_code = stitch_transcripts(results)
+        logger.info(
+            f"Transcribed voice (lang={lang_code}, segments={len(segments)}): {transcribed_text[:50]}..."
+        )
+
+        if file_unique_id and transcribed_text.strip():
+            await self._store_cached(
+                file_unique_id, telegram_id, transcribed_text, lang_code, duration, len(segments)
+            )
+        return transcribed_text, lang_code
 
+    async def _transcribe_audio(
+        self,
+        audio: bytes,
+        telegram_id: Optional[int],
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Transcribe one in-memory Ogg file; returns (None, None) on failure"""
+        async with _get_semaphore():
+            start_time = time.time()
+            success = True
+            error_msg = None
+            # Whisper pricing is per minute, but we estimate based on file size
+            # The API doesn't return token counts, so we use duration estimation
+
+            try:
                 # Transcribe using Whisper with auto-language detection
                 # Using verbose_json response format to get the detected language
-                with open(temp_file.name, "rb") as audio_file:
-                    transcript = await self.client.audio.transcriptions.create(
-                        model="whisper-1",
-                        file=audio_file,
-                        response_format="verbose_json",
-                        # No language parameter - let Whisper auto-detect
-                    )
-
-                # Extract detected language from response
-                detected_language = getattr(transcript, 'language', None)
-                transcribed_text = transcript.text
-
-                # Map Whisper language names to ISO codes if needed
-                language_map = {
-                    'russian': 'ru',
-                    'english': 'en',
-                    'ukrainian': 'uk',
-                    'spanish': 'es',
-                    'german': 'de',
-                    'french': 'fr',
-                    'italian': 'it',
-                    'portuguese': 'pt',
-                    'chinese': 'zh',
-                    'japanese': 'ja',
-                    'korean': 'ko',
-                }
-
-                # Normalize the detected language to ISO code
-                if detected_language:
-                    detected_language = detected_language.lower()
-                    # If it's already a 2-letter code, use it
-                    if len(detected_language) == 2:
-                        lang_code = detected_language
-                    else:
-                        # Try to map from full name to code
-                        lang_code = language_map.get(detected_language, detected_language[:2] if len(detected_language) >= 2 else 'ru')
-                else:
-                    lang_code = 'ru'  # Fallback to Russian
-
-                logger.info(f"Transcribed voice (lang={lang_code}): {transcribed_text[:50]}...")
-                return transcribed_text, lang_code
+                transcript = await self.client.audio.transcriptions.create(
+                    model="whisper-1",
+                    file=("voice.ogg", audio, "audio/ogg"),
+                    response_format="verbose_json",
+                    # No language parameter - let Whisper auto-detect
+                )
+                return transcript.text, normalize_language(getattr(transcript, 'language', None))
 
             except Exception as e:
                 logger.error(f"Voice transcription failed: {e}", exc_info=True)
@@ -135,3 +222,68 @@ class SpeechToTextService:
                     success=success,
                     error_message=error_msg,
                 )
+
+    async def get_cached(self, file_unique_id: str) -> Optional[Tuple[str, Optional[str]]]:
+        """Cached (transcript, language) for a voice note, counting the hit"""
+        try:
+            async with get_session() as session:
+                result = await session.execute(
+                    update(VoiceTranscription)
+                    .where(VoiceTranscription.file_unique_id == file_unique_id)
+                    .values(hits=VoiceTranscription.hits + 1)
+                    .returning(VoiceTranscription.transcript, VoiceTranscription.language)
+                )
+                row = result.one_or_none()
+                await session.commit()
+            if row is None:
+                return None
+            logger.info(f"Voice transcription cache hit for {file_unique_id} (lang={row.language})")
+            return row.transcript, row.language
+        except Exception as e:
+            # A cache failure must not block transcription
+            logger.warning(f"Voice transcription cache lookup failed: {e}")
+            return None
+
+    async def _store_cached(
+        self,
+        file_unique_id: str,
+        telegram_id: Optional[int],
+        transcript: str,
+        language: Optional[str],
+        duration: Optional[int],
+        segments: int,
+    ) -> None:
+        try:
+            async with get_session() as session:
+                user_id = None
+                if telegram_id is not None:
+                    result = await session.execute(
+                        select(User.id).where(User.telegram_id == telegram_id)
+                    )
+                    user_id = result.scalar_one_or_none()
+                await session.execute(
+                    insert(VoiceTranscription)
+                    .values(
+                        file_unique_id=file_unique_id,
+                        user_id=user_id,
+                        transcript=transcript,
+                        language=language,
+                        duration_seconds=duration,
+                        segments=segments,
+                    )
+                    .on_conflict_do_nothing(index_elements=["file_unique_id"])
+                )
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"Failed to cache voice transcription: {e}")
+
+
+def stitch_transcripts(results: List[Tuple[str, Optional[str]]]) -> Tuple[str, Optional[str]]:
+    """
+    Join segment transcripts in order. The language is the one detected
+    for most segments (the first segment's on a tie).
+    """
+    text = " ".join(part.strip() for part, _ in results if part and part.strip())
+    languages = Counter(lang for _, lang in results if lang)
+    language = max(languages, key=languages.get) if languages else None
+    return text, language
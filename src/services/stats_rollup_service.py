@@ -0,0 +1,197 @@
+"""
+MINDSETHAPPYBOT - Stats Rollup Service
+Incrementally maintained hourly aggregates for dashboard statistics.
+
+Every refresh aggregates the closed hours since the previous watermark
+(plus ROLLUP_LOOKBACK_HOURS, to pick up rows committed late) into
+stats_rollups_hourly and api_usage_rollups_hourly, recomputes the
+stats_snapshots counters and moves the watermark to the start of the
+current hour - all in one transaction.
+
+Readers combine the rollups (hours before the watermark) with the raw
+tables (rows from the watermark on), so results stay exact while the work
+per read is bounded by the refresh interval instead of table size.
+
+Totals are recounted from the raw tables on every refresh. Rows deleted
+after their hour was aggregated (moment deletion, GDPR purge) stay counted
+in their hourly bucket until rebuild() is run.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from src.db.database import get_session
+
+logger = logging.getLogger(__name__)
+
+
+ROLLUP_NAME = "dashboard"
+# Closed hours re-aggregated on every refresh to catch late commits
+ROLLUP_LOOKBACK_HOURS = 2
+
+# metric name -> table counted per hour
+COUNTED_TABLES = {
+    "moments": "moments",
+    "conversations": "conversations",
+}
+
+
+def hour_start(value: datetime) -> datetime:
+    """Start of the hour containing value"""
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def refresh_window(watermark: Optional[datetime], now: datetime) -> Tuple[Optional[datetime], datetime]:
+    """
+    Hours [since, until) a refresh aggregates: from ROLLUP_LOOKBACK_HOURS
+    before the watermark up to the start of the current hour.
+    since is None on the first run, which backfills everything.
+    """
+    since = watermark - timedelta(hours=ROLLUP_LOOKBACK_HOURS) if watermark else None
+    return since, hour_start(now)
+
+
+class StatsRollupService:
+    """Maintains and reads the dashboard rollup tables"""
+
+    @staticmethod
+    async def get_watermark(session) -> Optional[datetime]:
+        """End of the last aggregated hour, or None if the rollup never ran"""
+        result = await session.execute(
+            text("SELECT watermark FROM rollup_state WHERE name = :name"),
+            {"name": ROLLUP_NAME},
+        )
+        return result.scalar()
+
+    async def refresh(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Aggregate closed hours since the last watermark and update snapshots.
+
+        Returns:
+            Dict with stats: hours_from, buckets_updated
+        """
+        now = now or datetime.now(timezone.utc)
+
+        async with get_session() as session:
+            watermark = await self.get_watermark(session)
+            since, current_hour = refresh_window(watermark, now)
+            params = {"since": since, "until": current_hour}
+            time_filter = "created_at < :until"
+            if since is not None:
+                time_filter = "created_at >= :since AND " + time_filter
+
+            buckets_updated = 0
+            for metric, table in COUNTED_TABLES.items():
+                result = await session.execute(
+                    text(f"""
+                        INSERT INTO stats_rollups_hourly (metric, bucket_start, value)
+                        SELECT :metric, date_trunc('hour', created_at), COUNT(*)
+                        FROM {table}
+                        WHERE {time_filter}
+                        GROUP BY 2
+                        ON CONFLICT (metric, bucket_start)
+                        DO UPDATE SET value = EXCLUDED.value
+                    """),
+                    {**params, "metric": metric},
+                )
+                buckets_updated += result.rowcount or 0
+
+            result = await session.execute(
+                text(f"""
+                    INSERT INTO api_usage_rollups_hourly
+                        (bucket_start, model, operation_type, requests, total_tokens, cost_usd)
+                    SELECT date_trunc('hour', created_at), model, operation_type,
+                           COUNT(*), COALESCE(SUM(total_tokens), 0), COALESCE(SUM(cost_usd), 0)
+                    FROM api_usage
+                    WHERE {time_filter}
+                    GROUP BY 1, 2, 3
+                    ON CONFLICT (bucket_start, model, operation_type)
+                    DO UPDATE SET requests = EXCLUDED.requests,
+                                  total_tokens = EXCLUDED.total_tokens,
+                                  cost_usd = EXCLUDED.cost_usd
+                """),
+                params,
+            )
+            buckets_updated += result.rowcount or 0
+
+            await self._refresh_snapshots(session, now, current_hour)
+
+            await session.execute(
+                text("""
+                    INSERT INTO rollup_state (name, watermark, refreshed_at)
+                    VALUES (:name, :watermark, :now)
+                    ON CONFLICT (name)
+                    DO UPDATE SET watermark = EXCLUDED.watermark, refreshed_at = EXCLUDED.refreshed_at
+                """),
+                {"name": ROLLUP_NAME, "watermark": current_hour, "now": now},
+            )
+
+        return {
+            "hours_from": since.isoformat() if since else None,
+            "buckets_updated": buckets_updated,
+        }
+
+    async def _refresh_snapshots(self, session, now: datetime, until: datetime) -> None:
+        """
+        Recompute point-in-time counters. Totals count the rows created
+        before `until` (the new watermark), so deleted rows drop out;
+        readers add the rows created since.
+        """
+        totals = "".join(
+            f"""
+                    UNION ALL
+                    SELECT 'total_{metric}', COUNT(*) FROM {table}
+                    WHERE created_at < :until"""
+            for metric, table in COUNTED_TABLES.items()
+        )
+        await session.execute(
+            text(f"""
+                INSERT INTO stats_snapshots (metric, value, computed_at)
+                SELECT metric, value, :now FROM (
+                    SELECT 'total_users' AS metric, COUNT(*) AS value FROM users
+                    UNION ALL
+                    SELECT 'active_users_24h', COUNT(*) FROM users
+                    WHERE last_active_at > :day_ago
+                    UNION ALL
+                    SELECT 'active_users_7d', COUNT(*) FROM users
+                    WHERE last_active_at > :week_ago{totals}
+                ) AS counters
+                ON CONFLICT (metric)
+                DO UPDATE SET value = EXCLUDED.value, computed_at = EXCLUDED.computed_at
+            """),
+            {
+                "now": now,
+                "until": until,
+                "day_ago": now - timedelta(days=1),
+                "week_ago": now - timedelta(days=7),
+            },
+        )
+
+    async def rebuild(self) -> Dict[str, int]:
+        """Drop all rollups and aggregate everything from scratch"""
+        async with get_session() as session:
+            await session.execute(text("DELETE FROM stats_rollups_hourly"))
+            await session.execute(text("DELETE FROM api_usage_rollups_hourly"))
+            await session.execute(
+                text("DELETE FROM rollup_state WHERE name = :name"), {"name": ROLLUP_NAME}
+            )
+        return await self.refresh()
+
+
+async def refresh_stats_rollups() -> dict:
+    """
+    Scheduled job: aggregate newly closed hours into the dashboard rollups.
+
+    Returns:
+        Dict with stats: hours_from, buckets_updated
+    """
+    try:
+        stats = await StatsRollupService().refresh()
+        logger.info(f"Stats rollup refreshed: {stats['buckets_updated']} buckets updated")
+        return stats
+
+    except Exception as e:
+        logger.error(f"Stats rollup refresh failed: {e}", exc_info=True)
+        return {"error": str(e)}
@@ -1,7 +1,13 @@
 """
 MINDSETHAPPYBOT - Localization utilities
 Centralized text localization for multi-language support
+
+Lookups go through per-language catalogs compiled from the dicts below on
+first use (see localization_catalog.py).
 """
+from typing import Dict, Optional, Tuple
+
+from src.utils.localization_catalog import ButtonIndex, LanguageCatalog
 
 # Supported languages
 SUPPORTED_LANGUAGES = ['ru', 'en', 'uk', 'es', 'de', 'fr', 'pt', 'it', 'zh', 'ja', 'he']
@@ -46,6 +52,7 @@ MENU_TEXTS = {
         "filter_week": "Неделя",
         "filter_month": "Месяц",
         "random_moment": "🎲 Случайный момент",
+        "search_moments": "🔍 Поиск",
         "another_random": "🎲 Ещё случайный",
         "delete_moment": "🗑️ Удалить",
         "all_moments": "📖 Все моменты",
@@ -116,6 +123,7 @@ MENU_TEXTS = {
         "filter_week": "Week",
         "filter_month": "Month",
         "random_moment": "🎲 Random moment",
+        "search_moments": "🔍 Search",
         "another_random": "🎲 Another random",
         "delete_moment": "🗑️ Delete",
         "all_moments": "📖 All moments",
@@ -186,6 +194,7 @@ MENU_TEXTS = {
         "filter_week": "Тиждень",
         "filter_month": "Місяць",
         "random_moment": "🎲 Випадковий момент",
+        "search_moments": "🔍 Пошук",
         "another_random": "🎲 Ще випадковий",
         "delete_moment": "🗑️ Видалити",
         "all_moments": "📖 Усі моменти",
@@ -257,6 +266,7 @@ MENU_TEXTS = {
         "filter_week": "שבוע",
         "filter_month": "חודש",
         "random_moment": "🎲 רגע אקראי",
+        "search_moments": "🔍 חיפוש",
         "another_random": "🎲 עוד רגע אקראי",
         "delete_moment": "🗑️ מחק",
         "all_moments": "📖 כל הרגעים",
@@ -325,6 +335,7 @@ MENU_TEXTS = {
         "filter_week": "今週",
         "filter_month": "今月",
         "random_moment": "🎲 ランダムな瞬間",
+        "search_moments": "🔍 検索",
         "another_random": "🎲 もう一つランダム",
         "delete_moment": "🗑️ 削除",
         "all_moments": "📖 すべての瞬間",
@@ -393,6 +404,7 @@ MENU_TEXTS = {
         "filter_week": "一周",
         "filter_month": "一个月",
         "random_moment": "🎲 随机时刻",
+        "search_moments": "🔍 搜索",
         "another_random": "🎲 另一个随机",
         "delete_moment": "🗑️ 删除",
         "all_moments": "📖 所有时刻",
@@ -461,6 +473,7 @@ MENU_TEXTS = {
         "filter_week": "Settimana",
         "filter_month": "Mese",
         "random_moment": "🎲 Momento casuale",
+        "search_moments": "🔍 Cerca",
         "another_random": "🎲 Altro casuale",
         "delete_moment": "🗑️ Elimina",
         "all_moments": "📖 Tutti i momenti",
@@ -529,6 +542,7 @@ MENU_TEXTS = {
         "filter_week": "Semana",
         "filter_month": "Mês",
         "random_moment": "🎲 Momento aleatório",
+        "search_moments": "🔍 Pesquisar",
         "another_random": "🎲 Outro aleatório",
         "delete_moment": "🗑️ Deletar",
         "all_moments": "📖 Todos os momentos",
@@ -597,6 +611,7 @@ MENU_TEXTS = {
         "filter_week": "Semaine",
         "filter_month": "Mois",
         "random_moment": "🎲 Moment aléatoire",
+        "search_moments": "🔍 Rechercher",
         "another_random": "🎲 Encore un aléatoire",
         "delete_moment": "🗑️ Supprimer",
         "all_moments": "📖 Tous les moments",
@@ -665,6 +680,7 @@ MENU_TEXTS = {
         "filter_week": "Woche",
         "filter_month": "Monat",
         "random_moment": "🎲 Zufälliger Moment",
+        "search_moments": "🔍 Suchen",
         "another_random": "🎲 Noch ein Zufälliger",
         "delete_moment": "🗑️ Löschen",
         "all_moments": "📖 Alle Momente",
@@ -733,6 +749,7 @@ MENU_TEXTS = {
         "filter_week": "Semana",
         "filter_month": "Mes",
         "random_moment": "🎲 Momento aleatorio",
+        "search_moments": "🔍 Buscar",
         "another_random": "🎲 Otro aleatorio",
         "delete_moment": "🗑️ Eliminar",
         "all_moments": "📖 Todos los momentos",
@@ -785,9 +802,7 @@ MENU_TEXTS = {
 
 
 def get_menu_text(key: str, language_code: str) -> str:
-    lang = get_language_code(language_code)
-    texts = MENU_TEXTS.get(lang, MENU_TEXTS["ru"])
-    return texts.get(key, MENU_TEXTS["ru"].get(key, key))
+    return get_catalog(language_code).menu.get(key, key)
 
 
 def get_all_menu_button_texts(key: str) -> list:
@@ -798,6 +813,20 @@ def get_all_menu_button_texts(key: str) -> list:
     return texts
 
 
+def find_menu_button(text: str) -> Optional[Tuple[str, str]]:
+    """
+    Menu button pressed, by its text.
+
+    Returns (key, language) if text is the label of a menu button in any
+    supported language, None for any other text. Surrounding spaces and
+    emoji variation selectors are ignored.
+    """
+    global _button_index
+    if _button_index is None:
+        _button_index = ButtonIndex(MENU_TEXTS, SUPPORTED_LANGUAGES)
+    return _button_index.find(text)
+
+
 # Onboarding texts
 ONBOARDING_TEXTS = {
     "ru": {
@@ -1520,19 +1549,10 @@ def get_onboarding_text(key: str, language_code: str, **kwargs) -> str:
     Returns:
         Localized text or Russian fallback
     """
-    lang = get_language_code(language_code)
-    texts = ONBOARDING_TEXTS.get(lang, ONBOARDING_TEXTS["ru"])
-    text = texts.get(key, ONBOARDING_TEXTS["ru"].get(key, ""))
-    
-    # Format text with parameters if provided
-    if kwargs:
-        try:
-            return text.format(**kwargs)
-        except (KeyError, ValueError):
-            # If formatting fails, return text as-is
-            return text
-    
-    return text
+    message = get_catalog(language_code).onboarding.get(key)
+    if message is None:
+        return ""
+    return message.render(kwargs)
 
 
 # System/status messages for localization
@@ -1819,6 +1839,10 @@ SYSTEM_MESSAGES = {
             "Когда придёт время вопроса, поделись чем-то хорошим! 🌟"
         ),
         "random_moment_header": "🎲 <b>Случайный хороший момент</b>",
+        "search_prompt": "🔍 Напиши, что найти среди твоих моментов — слово, человека или место.",
+        "search_results_title": "🔍 <b>Найдено по запросу «{query}»</b>",
+        "search_no_results": "🔍 По запросу «{query}» ничего не нашлось. Попробуй другие слова.",
+        "search_expired": "⌛ Результаты поиска устарели. Начни новый поиск.",
         "moment_not_found": "😔 Момент не найден.",
         "moment_delete_title": "🗑️ <b>Удалить момент?</b>",
         "moment_delete_warning": "⚠️ Это действие необратимо!",
@@ -2177,6 +2201,10 @@ SYSTEM_MESSAGES = {
             "When it's time for a question, share something good! 🌟"
         ),
         "random_moment_header": "🎲 <b>Random Good Moment</b>",
+        "search_prompt": "🔍 Type what to look for in your moments — a word, a person or a place.",
+        "search_results_title": "🔍 <b>Results for “{query}”</b>",
+        "search_no_results": "🔍 Nothing found for “{query}”. Try other words.",
+        "search_expired": "⌛ These search results have expired. Please start a new search.",
         "moment_not_found": "😔 Moment not found.",
         "moment_delete_title": "🗑️ <b>Delete moment?</b>",
         "moment_delete_warning": "⚠️ This action cannot be undone!",
@@ -2535,6 +2563,10 @@ SYSTEM_MESSAGES = {
             "Коли прийде час запитання, поділися чимось хорошим! 🌟"
         ),
         "random_moment_header": "🎲 <b>Випадковий хороший момент</b>",
+        "search_prompt": "🔍 Напиши, що знайти серед твоїх моментів — слово, людину чи місце.",
+        "search_results_title": "🔍 <b>Знайдено за запитом «{query}»</b>",
+        "search_no_results": "🔍 За запитом «{query}» нічого не знайшлося. Спробуй інші слова.",
+        "search_expired": "⌛ Результати пошуку застаріли. Почни новий пошук.",
         "moment_not_found": "😔 Момент не знайдено.",
         "moment_delete_title": "🗑️ <b>Видалити момент?</b>",
         "moment_delete_warning": "⚠️ Ця дія незворотна!",
@@ -2758,6 +2790,10 @@ SYSTEM_MESSAGES = {
         "moments_title": "📖 <b>הרגעים הטובים שלך</b>",
         "moments_empty": "📖 עדיין אין לך רגעים שמורים.\nכשיגיע זמן השאלה, שתף משהו טוב! 🌟",
         "random_moment_header": "🎲 <b>רגע טוב אקראי</b>",
+        "search_prompt": "🔍 כתוב מה לחפש ברגעים שלך — מילה, אדם או מקום.",
+        "search_results_title": "🔍 <b>תוצאות עבור \"{query}\"</b>",
+        "search_no_results": "🔍 לא נמצא דבר עבור \"{query}\". נסה מילים אחרות.",
+        "search_expired": "⌛ תוצאות החיפוש פגו. התחל חיפוש חדש.",
         "moment_not_found": "😔 הרגע לא נמצא.",
         "moment_delete_title": "🗑️ <b>למחוק את הרגע?</b>",
         "moment_delete_warning": "⚠️ פעולה זו אינה הפיכה!",
@@ -2947,6 +2983,10 @@ SYSTEM_MESSAGES = {
         "moments_title": "📖 <b>あなたの良い瞬間</b>",
         "moments_empty": "📖 まだ保存された瞬間がありません。\n質問の時間が来たら、何か良いことを共有してください！ 🌟",
         "random_moment_header": "🎲 <b>ランダムな良い瞬間</b>",
+        "search_prompt": "🔍 瞬間の中から探したいこと（言葉、人、場所）を入力してください。",
+        "search_results_title": "🔍 <b>「{query}」の検索結果</b>",
+        "search_no_results": "🔍 「{query}」に一致する瞬間は見つかりませんでした。別の言葉で試してください。",
+        "search_expired": "⌛ 検索結果の有効期限が切れました。もう一度検索してください。",
         "moment_not_found": "😔 瞬間が見つかりませんでした。",
         "moment_delete_title": "🗑️ <b>瞬間を削除しますか？</b>",
         "moment_delete_warning": "⚠️ この操作は元に戻せません！",
@@ -3136,6 +3176,10 @@ SYSTEM_MESSAGES = {
         "moments_title": "📖 <b>你的美好时刻</b>",
         "moments_empty": "📖 你还没有保存的时刻。\n当提问时间到时，分享一些美好的事情！🌟",
         "random_moment_header": "🎲 <b>随机美好时刻</b>",
+        "search_prompt": "🔍 输入你想在时刻中查找的内容——一个词、一个人或一个地方。",
+        "search_results_title": "🔍 <b>“{query}”的搜索结果</b>",
+        "search_no_results": "🔍 没有找到与“{query}”相关的时刻。试试其他词语。",
+        "search_expired": "⌛ 搜索结果已过期。请重新搜索。",
         "moment_not_found": "😔 时刻未找到。",
         "moment_delete_title": "🗑️ <b>删除时刻？</b>",
         "moment_delete_warning": "⚠️ 此操作不可逆！",
@@ -3325,6 +3369,10 @@ SYSTEM_MESSAGES = {
         "moments_title": "📖 <b>I tuoi bei momenti</b>",
         "moments_empty": "📖 Non hai ancora momenti salvati.\nQuando arriva il momento della domanda, condividi qualcosa di buono! 🌟",
         "random_moment_header": "🎲 <b>Momento buono casuale</b>",
+        "search_prompt": "🔍 Scrivi cosa cercare tra i tuoi momenti — una parola, una persona o un luogo.",
+        "search_results_title": "🔍 <b>Risultati per «{query}»</b>",
+        "search_no_results": "🔍 Nessun risultato per «{query}». Prova con altre parole.",
+        "search_expired": "⌛ I risultati della ricerca sono scaduti. Avvia una nuova ricerca.",
         "moment_not_found": "😔 Momento non trovato.",
         "moment_delete_title": "🗑️ <b>Eliminare momento?</b>",
         "moment_delete_warning": "⚠️ Questa azione è irreversibile!",
@@ -3514,6 +3562,10 @@ SYSTEM_MESSAGES = {
         "moments_title": "📖 <b>Seus bons momentos</b>",
         "moments_empty": "📖 Você ainda não tem momentos salvos.\nQuando chegar a hora da pergunta, compartilhe algo bom! 🌟",
         "random_moment_header": "🎲 <b>Momento bom aleatório</b>",
+        "search_prompt": "🔍 Escreva o que procurar nos seus momentos — uma palavra, uma pessoa ou um lugar.",
+        "search_results_title": "🔍 <b>Resultados para “{query}”</b>",
+        "search_no_results": "🔍 Nada encontrado para “{query}”. Tente outras palavras.",
+        "search_expired": "⌛ Os resultados da pesquisa expiraram. Comece uma nova pesquisa.",
         "moment_not_found": "😔 Momento não encontrado.",
         "moment_delete_title": "🗑️ <b>Excluir momento?</b>",
         "moment_delete_warning": "⚠️ Esta ação é irreversível!",
@@ -3703,6 +3755,10 @@ SYSTEM_MESSAGES = {
         "moments_title": "📖 <b>Tes bons moments</b>",
         "moments_empty": "📖 Tu n'as pas encore de moments enregistrés.\nQuand viendra le temps de la question, partage quelque chose de bien ! 🌟",
         "random_moment_header": "🎲 <b>Moment bon aléatoire</b>",
+        "search_prompt": "🔍 Écris ce que tu cherches dans tes moments — un mot, une personne ou un lieu.",
+        "search_results_title": "🔍 <b>Résultats pour « {query} »</b>",
+        "search_no_results": "🔍 Rien trouvé pour « {query} ». Essaie d'autres mots.",
+        "search_expired": "⌛ Les résultats de recherche ont expiré. Lance une nouvelle recherche.",
         "moment_not_found": "😔 Moment non trouvé.",
         "moment_delete_title": "🗑️ <b>Supprimer le moment ?</b>",
         "moment_delete_warning": "⚠️ Cette action est irréversible !",
@@ -3892,6 +3948,10 @@ SYSTEM_MESSAGES = {
         "moments_title": "📖 <b>Deine schönen Momente</b>",
         "moments_empty": "📖 Du hast noch keine gespeicherten Momente.\nWenn die Zeit für die Frage kommt, teile etwas Schönes! 🌟",
         "random_moment_header": "🎲 <b>Zufälliger schöner Moment</b>",
+        "search_prompt": "🔍 Schreib, wonach du in deinen Momenten suchen möchtest — ein Wort, eine Person oder einen Ort.",
+        "search_results_title": "🔍 <b>Ergebnisse für „{query}“</b>",
+        "search_no_results": "🔍 Nichts gefunden für „{query}“. Versuch es mit anderen Wörtern.",
+        "search_expired": "⌛ Die Suchergebnisse sind abgelaufen. Starte eine neue Suche.",
         "moment_not_found": "😔 Moment nicht gefunden.",
         "moment_delete_title": "🗑️ <b>Moment löschen?</b>",
         "moment_delete_warning": "⚠️ Diese Aktion ist unwiderruflich!",
@@ -4081,6 +4141,10 @@ SYSTEM_MESSAGES = {
         "moments_title": "📖 <b>Tus buenos momentos</b>",
         "moments_empty": "📖 No tienes momentos guardados por ahora.\n¡Cuando llegue el momento de la pregunta, comparte algo bueno! 🌟",
         "random_moment_header": "🎲 <b>Momento bueno aleatorio</b>",
+        "search_prompt": "🔍 Escribe qué buscar entre tus momentos: una palabra, una persona o un lugar.",
+        "search_results_title": "🔍 <b>Resultados para «{query}»</b>",
+        "search_no_results": "🔍 No se encontró nada para «{query}». Prueba con otras palabras.",
+        "search_expired": "⌛ Los resultados de búsqueda han caducado. Empieza una nueva búsqueda.",
         "moment_not_found": "😔 Momento no encontrado.",
         "moment_delete_title": "🗑️ <b>¿Eliminar momento?</b>",
         "moment_delete_warning": "⚠️ ¡Esta acción es irreversible!",
@@ -4139,27 +4203,44 @@ def get_system_message(key: str, language_code: str, formal: bool = False, **kwa
     Returns:
         Localized and formatted message
     """
+    message = get_catalog(language_code).system_message(key, formal)
+    if message is None:
+        return key
+    return message.render(kwargs)
+
+
+_catalogs: Dict[str, LanguageCatalog] = {}
+_button_index: Optional[ButtonIndex] = None
+MAX_CATALOG_ALIASES = 64  # Raw language codes ("en-US", "pt-br", ...) remembered per catalog lookup
+
+
+def get_catalog(language_code: str) -> LanguageCatalog:
+    """
+    Compiled texts of the user's language, built on first use.
+
+    Catalogs are also remembered under the raw language code, so the usual
+    lookup skips get_language_code.
+    """
+    catalog = _catalogs.get(language_code)
+    if catalog is not None:
+        return catalog
+
     lang = get_language_code(language_code)
-    texts = SYSTEM_MESSAGES.get(lang, SYSTEM_MESSAGES["ru"])
-
-    # Try formal version first if requested
-    if formal:
-        formal_key = f"{key}_formal"
-        if formal_key in texts:
-            message = texts[formal_key]
-        else:
-            message = texts.get(key, SYSTEM_MESSAGES["ru"].get(key, key))
-    else:
-        message = texts.get(key, SYSTEM_MESSAGES["ru"].get(key, key))
-
-    # Format with kwargs if any
-    if kwargs:
-        try:
-            return message.format(**kwargs)
-        except (KeyError, ValueError):
-            return message
-
-    return message
+    catalog = _catalogs.get(lang)
+    if catalog is None:
+        catalog = LanguageCatalog(
+            lang,
+            MENU_TEXTS.get(lang, {}),
+            ONBOARDING_TEXTS.get(lang, {}),
+            SYSTEM_MESSAGES.get(lang, {}),
+            MENU_TEXTS["ru"],
+            ONBOARDING_TEXTS["ru"],
+            SYSTEM_MESSAGES["ru"],
+        )
+        _catalogs[lang] = catalog
+    if language_code and len(_catalogs) < MAX_CATALOG_ALIASES:
+        _catalogs[language_code] = catalog
+    return catalog
 
 
 def detect_language_from_text(text: str) -> str:
@@ -0,0 +1,105 @@
+"""
+MINDSETHAPPYBOT - Compiled localization catalogs
+Per-language lookup tables built from the text dicts in localization.py.
+
+The dicts in localization.py stay the source of truth (translation scripts
+edit them in place). What a lookup needs is compiled from them once per
+language, on first use of that language:
+- the Russian fallback folded in, so a lookup is a single dict read
+- formal variants ("<key>_formal") resolved into a separate table
+- messages without replacement fields marked, so they are returned
+  without a str.format call even when parameters are passed
+
+The reverse index (ButtonIndex) maps every menu button text to its
+(key, language) for matching reply keyboard presses in O(1).
+"""
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+
+class Message:
+    """A localized text with its formatter prepared"""
+    __slots__ = ("text", "has_fields")
+
+    def __init__(self, text: str):
+        self.text = text
+        # Without braces format() could only return the text unchanged
+        self.has_fields = "{" in text or "}" in text
+
+    def render(self, kwargs: Mapping[str, object]) -> str:
+        """Text formatted with kwargs; as-is if a parameter is missing or the text is malformed"""
+        if not kwargs or not self.has_fields:
+            return self.text
+        try:
+            return self.text.format(**kwargs)
+        except (KeyError, ValueError):
+            return self.text
+
+
+def _compile(texts: Mapping[str, str], fallback: Mapping[str, str]) -> Dict[str, Message]:
+    messages = {}
+    for key, text in fallback.items():
+        messages[key] = Message(text)
+    for key, text in texts.items():
+        messages[key] = Message(text)
+    return messages
+
+
+class LanguageCatalog:
+    """All texts of one language, with the fallback language folded in"""
+
+    def __init__(
+        self,
+        language: str,
+        menu: Mapping[str, str],
+        onboarding: Mapping[str, str],
+        system: Mapping[str, str],
+        fallback_menu: Mapping[str, str],
+        fallback_onboarding: Mapping[str, str],
+        fallback_system: Mapping[str, str],
+    ):
+        self.language = language
+        self.menu: Dict[str, str] = {**fallback_menu, **menu}
+        self.onboarding = _compile(onboarding, fallback_onboarding)
+        self.system = _compile(system, fallback_system)
+        # Formal lookups prefer the language's own "<key>_formal" text
+        self.system_formal = dict(self.system)
+        for key, text in system.items():
+            if key.endswith("_formal"):
+                self.system_formal[key[:-len("_formal")]] = Message(text)
+
+    def system_message(self, key: str, formal: bool = False) -> Optional[Message]:
+        return (self.system_formal if formal else self.system).get(key)
+
+
+BUTTON_TEXT_SLACK = 4  # Extra characters (spaces, variation selectors) tolerated around a button text
+
+
+def normalize_button_text(text: str) -> str:
+    """Button text as matched: without surrounding spaces and emoji variation selectors"""
+    return text.replace("\ufe0f", "").strip()
+
+
+class ButtonIndex:
+    """
+    Menu button texts of all languages mapped to (key, language).
+
+    Languages are indexed in the given order and the first one wins, so a
+    text shared by several languages (language names with flags) resolves
+    to the first of them - with the same key.
+    """
+
+    def __init__(self, menu_texts: Mapping[str, Mapping[str, str]], languages: Iterable[str]):
+        self._buttons: Dict[str, Tuple[str, str]] = {}
+        for language in languages:
+            for key, text in menu_texts.get(language, {}).items():
+                self._buttons.setdefault(normalize_button_text(text), (key, language))
+        # Longer texts are free text and skip normalization entirely
+        self.max_length = max(map(len, self._buttons), default=0) + BUTTON_TEXT_SLACK
+
+    def find(self, text: str) -> Optional[Tuple[str, str]]:
+        if len(text) > self.max_length:
+            return None
+        return self._buttons.get(normalize_button_text(text))
+
+    def __len__(self) -> int:
+        return len(self._buttons)
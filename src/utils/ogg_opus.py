@@ -0,0 +1,137 @@
+"""
+MINDSETHAPPYBOT - Ogg Opus utilities
+Splits Telegram voice notes (Ogg-encapsulated Opus) into shorter,
+independently decodable segments without re-encoding.
+
+Each segment is a complete Ogg stream: the header pages (OpusHead,
+OpusTags) followed by a run of audio pages. Cuts are made only at page
+boundaries that do not continue a packet, page sequence numbers are
+renumbered and page CRCs recomputed. Audio is never decoded.
+"""
+import struct
+from dataclasses import dataclass
+from typing import List
+
+OGG_CAPTURE = b"OggS"
+OGG_HEADER = struct.Struct("<4sBBqIIIB")  # capture, version, flags, granule, serial, sequence, crc, segments
+FLAG_CONTINUED = 0x01
+FLAG_BOS = 0x02
+FLAG_EOS = 0x04
+OPUS_SAMPLE_RATE = 48000  # Opus granule positions are always in 48 kHz samples
+
+
+def _crc_table() -> List[int]:
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else (crc << 1)
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def ogg_crc(data: bytes) -> int:
+    """Ogg page checksum (CRC-32, polynomial 0x04C11DB7, no reflection)"""
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_TABLE[((crc >> 24) & 0xFF) ^ byte]
+    return crc
+
+
+@dataclass
+class OggPage:
+    """One Ogg page; body is the segment table plus packet data"""
+    flags: int
+    granule: int
+    serial: int
+    sequence: int
+    segment_table: bytes
+    data: bytes
+
+    def to_bytes(self, sequence: int, flags: int) -> bytes:
+        header = OGG_HEADER.pack(
+            OGG_CAPTURE, 0, flags, self.granule, self.serial, sequence, 0, len(self.segment_table)
+        )
+        page = bytearray(header + self.segment_table + self.data)
+        struct.pack_into("<I", page, 22, ogg_crc(page))
+        return bytes(page)
+
+
+def parse_pages(data: bytes) -> List[OggPage]:
+    """Parse an Ogg stream into pages. Raises ValueError on malformed input."""
+    pages = []
+    offset = 0
+    while offset < len(data):
+        if len(data) - offset < OGG_HEADER.size:
+            raise ValueError("Truncated Ogg page header")
+        capture, _, flags, granule, serial, sequence, _, count = OGG_HEADER.unpack_from(data, offset)
+        if capture != OGG_CAPTURE:
+            raise ValueError(f"Missing Ogg capture pattern at offset {offset}")
+        table_start = offset + OGG_HEADER.size
+        segment_table = data[table_start:table_start + count]
+        body_start = table_start + count
+        body_end = body_start + sum(segment_table)
+        if len(segment_table) != count or body_end > len(data):
+            raise ValueError("Truncated Ogg page body")
+        pages.append(OggPage(flags, granule, serial, sequence, segment_table, data[body_start:body_end]))
+        offset = body_end
+    return pages
+
+
+def duration_seconds(data: bytes) -> float:
+    """Length of an Ogg Opus stream, from the last granule position"""
+    pages = parse_pages(data)
+    return max((page.granule for page in pages), default=0) / OPUS_SAMPLE_RATE
+
+
+def split_ogg_opus(data: bytes, segment_seconds: float) -> List[bytes]:
+    """
+    Split an Ogg Opus stream into streams of about segment_seconds each.
+
+    Returns [data] unchanged if the input is not an Ogg stream or is short
+    enough to need no split.
+    """
+    if not data.startswith(OGG_CAPTURE):
+        return [data]
+    try:
+        pages = parse_pages(data)
+    except ValueError:
+        return [data]
+
+    # OpusHead and OpusTags pages carry granule position 0
+    header_count = 0
+    while header_count < len(pages) and pages[header_count].granule == 0:
+        header_count += 1
+    headers, audio = pages[:header_count], pages[header_count:]
+    if not headers or not audio:
+        return [data]
+
+    segment_samples = int(segment_seconds * OPUS_SAMPLE_RATE)
+    groups: List[List[OggPage]] = [[]]
+    cut_at = segment_samples
+    for page in audio:
+        # Never cut in front of a page that continues a packet
+        if groups[-1] and page.granule > cut_at and not page.flags & FLAG_CONTINUED:
+            groups.append([])
+            cut_at = (page.granule // segment_samples + 1) * segment_samples
+        groups[-1].append(page)
+
+    if len(groups) == 1:
+        return [data]
+
+    segments = []
+    for group in groups:
+        stream = headers + group
+        out = bytearray()
+        for sequence, page in enumerate(stream):
+            flags = page.flags & ~(FLAG_BOS | FLAG_EOS)
+            if sequence == 0:
+                flags |= FLAG_BOS
+            if sequence == len(stream) - 1:
+                flags |= FLAG_EOS
+            out += page.to_bytes(sequence, flags)
+        segments.append(bytes(out))
+    return segments
@@ -0,0 +1,55 @@
+"""
+MINDSETHAPPYBOT - Shared fixtures for unit tests
+A stand-in for get_session that records executed statements
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+
+class FakeDatabase:
+    """
+    Stands in for get_session: every session is the database itself and
+    executed statements are recorded with their parameters. While fail is
+    set, opening a session raises as if the database were down.
+
+    Tests serve query results by overriding result() (or replacing it on
+    the instance); the default answers as a statement touching one row.
+    """
+
+    def __init__(self):
+        self.statements = []
+        self.connects = 0
+        self.fail = False
+
+    @asynccontextmanager
+    async def session(self):
+        self.connects += 1
+        if self.fail:
+            raise ConnectionError("database is down")
+        yield self
+
+    async def execute(self, statement, params=None):
+        self.statements.append((str(statement), params or {}))
+        await asyncio.sleep(0)  # Let concurrent callers interleave, as with a real round trip
+        return self.result(statement, params or {})
+
+    def result(self, statement, params):
+        return SimpleNamespace(rowcount=1)
+
+    async def commit(self):
+        pass
+
+
+@pytest.fixture
+def fake_database(monkeypatch):
+    """Install a FakeDatabase (a new one by default) as a module's get_session"""
+
+    def install(module, database=None):
+        database = database if database is not None else FakeDatabase()
+        monkeypatch.setattr(module, "get_session", database.session)
+        return database
+
+    return install
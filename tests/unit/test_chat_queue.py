@@ -0,0 +1,184 @@
+"""
+MINDSETHAPPYBOT - Unit tests for the per-chat update queue middleware
+Tests per-chat ordering, cross-chat concurrency and coalescing of rapid texts
+"""
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message, Update
+
+from src.bot.middlewares.chat_queue import ChatQueueMiddleware
+from src.utils.localization import MENU_TEXTS
+
+
+def make_update(update_id, chat_id, text):
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    })
+
+
+class Recorder:
+    """Dispatcher with the middleware and handlers recording what they saw (no requests are sent)"""
+
+    def __init__(self, coalesce_seconds=0.0, handler_seconds=0.02):
+        self.handled = []
+        self.running = set()
+        self.overlapped_chats = False
+        self.max_running = 0
+        self.middleware = ChatQueueMiddleware(coalesce_seconds)
+        self.bot = Bot("123:abc")
+        self.dispatcher = Dispatcher()
+        self.dispatcher.update.outer_middleware(self.middleware)
+        router = Router()
+
+        @router.message(Command("wait"))
+        async def enter_state(message: Message, state: FSMContext):
+            await state.set_state("waiting")
+            await self._record(message)
+
+        @router.message()
+        async def any_message(message: Message):
+            await self._record(message)
+
+        self.handler_seconds = handler_seconds
+        self.dispatcher.include_router(router)
+
+    async def _record(self, message):
+        chat = message.chat.id
+        if chat in self.running:
+            self.overlapped_chats = True
+        self.running.add(chat)
+        self.max_running = max(self.max_running, len(self.running))
+        await asyncio.sleep(self.handler_seconds)
+        self.running.discard(chat)
+        self.handled.append((chat, message.message_id, message.text))
+
+    async def feed(self, *updates, gap=0.0):
+        tasks = []
+        for update in updates:
+            tasks.append(asyncio.create_task(self.dispatcher.feed_update(self.bot, update)))
+            if gap:
+                await asyncio.sleep(gap)
+        await asyncio.gather(*tasks)
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+
+class TestChatSerialization:
+    """Tests for ordering within a chat and concurrency across chats"""
+
+    @pytest.mark.asyncio
+    async def test_one_chat_in_order_chats_in_parallel(self, recorder):
+        """Test that a chat's updates never overlap while different chats do"""
+        updates = []
+        for index in range(5):
+            for chat in (1, 2, 3):
+                updates.append(make_update(len(updates) + 1, chat, f"/cmd {index}"))
+        await recorder.feed(*updates)
+
+        assert not recorder.overlapped_chats
+        assert recorder.max_running == 3
+        for chat in (1, 2, 3):
+            ids = [message_id for handled_chat, message_id, text in recorder.handled if handled_chat == chat]
+            assert ids == sorted(ids) and len(ids) == 5
+        assert recorder.middleware._chats == {}
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self, recorder):
+        """Test that cancelling a queued update does not stall the chat"""
+        first = asyncio.create_task(recorder.dispatcher.feed_update(recorder.bot, make_update(1, 1, "/a")))
+        second = asyncio.create_task(recorder.dispatcher.feed_update(recorder.bot, make_update(2, 1, "/b")))
+        third = asyncio.create_task(recorder.dispatcher.feed_update(recorder.bot, make_update(3, 1, "/c")))
+        await asyncio.sleep(0)
+        second.cancel()
+        await asyncio.gather(first, third, return_exceptions=True)
+
+        assert [text for chat, message_id, text in recorder.handled] == ["/a", "/c"]
+        assert recorder.middleware._chats == {}
+
+
+class TestCoalescing:
+    """Tests for merging rapid-fire text messages"""
+
+    @pytest.mark.asyncio
+    async def test_queued_texts_are_merged(self, recorder):
+        """Test that texts queued behind a running update are handled as one message"""
+        await recorder.feed(
+            make_update(1, 1, "/start"),
+            make_update(2, 1, "first"),
+            make_update(3, 1, "second"),
+            make_update(4, 1, "third"),
+        )
+
+        assert recorder.handled == [(1, 1, "/start"), (1, 4, "first\nsecond\nthird")]
+        assert recorder.middleware.coalesced == 2
+
+    @pytest.mark.asyncio
+    async def test_window_collects_follow_ups(self):
+        """Test that texts arriving within the window join the first one"""
+        recorder = Recorder(coalesce_seconds=0.1)
+        await recorder.feed(make_update(1, 1, "one"), make_update(2, 1, "two"), gap=0.03)
+        await recorder.feed(make_update(3, 1, "later"))
+
+        assert [text for chat, message_id, text in recorder.handled] == ["one\ntwo", "later"]
+
+    @pytest.mark.asyncio
+    async def test_commands_and_buttons_are_not_merged(self, recorder):
+        """Test that a command or menu button splits texts around it, keeping order"""
+        button = MENU_TEXTS["en"]["menu_stats"]
+        await recorder.feed(
+            make_update(1, 1, "/start"),
+            make_update(2, 1, "a"),
+            make_update(3, 1, "/help"),
+            make_update(4, 1, "b"),
+            make_update(5, 1, button),
+            make_update(6, 1, "c"),
+        )
+
+        texts = [text for chat, message_id, text in recorder.handled]
+        assert texts == ["/start", "a", "/help", "b", button, "c"]
+
+    @pytest.mark.asyncio
+    async def test_other_chats_are_not_merged(self, recorder):
+        """Test that texts of different chats stay separate"""
+        await recorder.feed(make_update(1, 1, "/start"), make_update(2, 1, "a"), make_update(3, 2, "b"))
+
+        assert sorted(text for chat, message_id, text in recorder.handled) == ["/start", "a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_fsm_input_is_not_merged(self, recorder):
+        """Test that answers inside an FSM flow are handled one by one"""
+        await recorder.feed(
+            make_update(1, 1, "/wait"),
+            make_update(2, 1, "answer"),
+            make_update(3, 1, "another"),
+        )
+
+        assert [text for chat, message_id, text in recorder.handled] == ["/wait", "answer", "another"]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_merge_cancels_merged_updates(self):
+        """Test that updates merged into a cancelled message are not reported as handled"""
+        recorder = Recorder(coalesce_seconds=0.05, handler_seconds=10)
+        owner = asyncio.create_task(recorder.dispatcher.feed_update(recorder.bot, make_update(1, 1, "a")))
+        merged = asyncio.create_task(recorder.dispatcher.feed_update(recorder.bot, make_update(2, 1, "b")))
+        await asyncio.sleep(0.1)
+        assert recorder.middleware.coalesced == 1
+        owner.cancel()
+        results = await asyncio.gather(owner, merged, return_exceptions=True)
+
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+        assert recorder.middleware._chats == {}
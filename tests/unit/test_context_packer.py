@@ -0,0 +1,76 @@
+"""
+MINDSETHAPPYBOT - Unit tests for the RAG context packer
+Tests token estimation and budgeted selection of retrieved items
+"""
+import pytest
+
+from src.services import context_packer
+from src.services.context_packer import PackCandidate, count_tokens, estimate_tokens, pack_context
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    """Use the script-based estimate so results don't depend on tokenizer files"""
+    monkeypatch.setattr(context_packer, "_encoding", None)
+    monkeypatch.setattr(context_packer, "_encoding_loaded", True)
+    count_tokens.cache_clear()
+    yield
+    count_tokens.cache_clear()
+
+
+def candidate(source, words, score):
+    return PackCandidate(source=source, item=f"{source}:{words}:{score}", text="word " * words, score=score)
+
+
+class TestEstimateTokens:
+    """Tests for estimate_tokens"""
+
+    def test_cjk_counts_more_than_latin(self):
+        """Test that CJK text is charged about a token per character"""
+        assert estimate_tokens("你好世界你好世界") == 8
+        assert estimate_tokens("abcdefgh") == 2
+
+    def test_cyrillic_between_latin_and_cjk(self):
+        """Test that other scripts cost more than ASCII per character"""
+        assert estimate_tokens("привет") == 2
+
+
+class TestPackContext:
+    """Tests for pack_context"""
+
+    def test_budget_is_respected(self):
+        """Test that packed tokens never exceed the budget"""
+        candidates = [candidate("kb_chunks", 40, 0.9 - i * 0.01) for i in range(10)]
+        result = pack_context(candidates, budget=100)
+        assert result.tokens <= 100
+        assert result.dropped == 10 - len(result.selected["kb_chunks"])
+
+    def test_minimums_come_first(self):
+        """Test that each source's minimum is taken before higher-value items"""
+        candidates = [candidate("kb_chunks", 5, 0.95), candidate("kb_chunks", 5, 0.9), candidate("moments", 40, 0.5)]
+        result = pack_context(candidates, budget=60, minimums={"moments": 1})
+        assert result.selected["moments"] == ["moments:40:0.5"]
+
+    def test_value_per_token_wins(self):
+        """Test that a short relevant item beats a long slightly better one"""
+        candidates = [candidate("kb_chunks", 60, 0.8), candidate("dialog_memories", 10, 0.7)]
+        result = pack_context(candidates, budget=30)
+        assert list(result.selected) == ["dialog_memories"]
+
+    def test_weights_and_headers(self):
+        """Test that source weights steer selection and headers are charged once"""
+        candidates = [candidate("kb_chunks", 10, 0.6), candidate("moments", 10, 0.7)]
+        result = pack_context(
+            candidates,
+            budget=25,
+            weights={"kb_chunks": 2.0},
+            headers={"kb_chunks": "=== KB ==="},
+        )
+        assert list(result.selected) == ["kb_chunks"]
+        assert result.tokens == count_tokens("word " * 10) + context_packer.ITEM_OVERHEAD_TOKENS + count_tokens("=== KB ===")
+
+    def test_selected_in_score_order(self):
+        """Test that items of a source are returned best first"""
+        candidates = [candidate("moments", 10, 0.5), candidate("moments", 10, 0.9)]
+        result = pack_context(candidates, budget=100)
+        assert result.selected["moments"] == ["moments:10:0.9", "moments:10:0.5"]
@@ -0,0 +1,171 @@
+"""
+MINDSETHAPPYBOT - Unit tests for the conversation context cache
+Tests hydration, appends, filtering of cached turns and database fallback
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from src.services.conversation_cache import ConversationContextCache, CachedTurn, MAX_TURNS_PER_USER
+
+
+def make_turn(turn_id, message_type, minutes_ago, metadata=None):
+    return CachedTurn(
+        id=turn_id,
+        message_type=message_type,
+        content=f"turn {turn_id}",
+        metadata=metadata,
+        created_at=datetime.now(timezone.utc) - timedelta(minutes=minutes_ago),
+    )
+
+
+def make_conversation(conv_id, message_type, metadata=None):
+    return SimpleNamespace(
+        id=conv_id,
+        message_type=message_type,
+        content=f"turn {conv_id}",
+        message_metadata=metadata,
+        created_at=datetime.now(timezone.utc),
+    )
+
+
+class TestConversationContextCache:
+    """Tests for ConversationContextCache"""
+
+    @pytest.mark.asyncio
+    async def test_hydrates_once_then_serves_from_memory(self):
+        """Test that only the first read hits the database"""
+        cache = ConversationContextCache()
+        cache._load_recent = AsyncMock(return_value=[
+            make_turn(1, "free_dialog", 30),
+            make_turn(2, "bot_reply", 29),
+        ])
+
+        first = await cache.get_turns(42)
+        second = await cache.get_turns(42)
+
+        assert [t.id for t in first] == [2, 1]
+        assert [t.id for t in second] == [2, 1]
+        cache._load_recent.assert_awaited_once_with(42)
+
+    @pytest.mark.asyncio
+    async def test_append_after_hydration_is_visible(self):
+        """Test that appended rows are returned newest first"""
+        cache = ConversationContextCache()
+        cache._load_recent = AsyncMock(return_value=[make_turn(1, "bot_reply", 5)])
+        await cache.get_turns(42)
+
+        cache.append(42, make_conversation(2, "bot_reply", {"answer_fingerprint": "abc"}))
+
+        turns = await cache.get_turns(42, message_types=("bot_reply",), limit=1)
+        assert turns[0].id == 2
+        assert turns[0].metadata == {"answer_fingerprint": "abc"}
+
+    @pytest.mark.asyncio
+    async def test_append_for_uncached_user_is_ignored(self):
+        """Test that appends don't create partial buffers"""
+        cache = ConversationContextCache()
+        cache.append(42, make_conversation(1, "bot_reply"))
+        cache._load_recent = AsyncMock(return_value=[])
+
+        assert await cache.get_turns(42) == []
+
+    @pytest.mark.asyncio
+    async def test_filters_by_type_and_since(self):
+        """Test message type and age filters"""
+        cache = ConversationContextCache()
+        cache._load_recent = AsyncMock(return_value=[
+            make_turn(1, "free_dialog", 60 * 30),
+            make_turn(2, "bot_question", 20),
+            make_turn(3, "free_dialog", 10),
+        ])
+
+        turns = await cache.get_turns(
+            42,
+            message_types=("free_dialog", "bot_reply"),
+            since=datetime.now(timezone.utc) - timedelta(hours=24),
+        )
+        assert [t.id for t in turns] == [3]
+
+    @pytest.mark.asyncio
+    async def test_embeddings_are_not_cached(self):
+        """Test that large reply embeddings are stripped from metadata"""
+        cache = ConversationContextCache()
+        cache._load_recent = AsyncMock(return_value=[])
+        await cache.get_turns(42)
+
+        cache.append(42, make_conversation(1, "bot_reply", {"reply_embedding": [0.1] * 10, "rag_mode": "A"}))
+
+        turns = await cache.get_turns(42)
+        assert turns[0].metadata == {"rag_mode": "A"}
+
+    @pytest.mark.asyncio
+    async def test_invalidate_forces_rehydration(self):
+        """Test that invalidate drops the buffer"""
+        cache = ConversationContextCache()
+        cache._load_recent = AsyncMock(return_value=[])
+        await cache.get_turns(42)
+
+        cache.invalidate(42)
+        await cache.get_turns(42)
+
+        assert cache._load_recent.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_reads_past_a_full_buffer_query_the_database(self):
+        """Test that a read needing turns older than a full buffer falls back to the database"""
+        cache = ConversationContextCache()
+        cache._load_recent = AsyncMock(return_value=[
+            make_turn(index, "bot_question", MAX_TURNS_PER_USER - index) for index in range(MAX_TURNS_PER_USER)
+        ])
+        older = [make_turn(0, "free_dialog", 60 * 24 * 30)]
+        cache._query_turns = AsyncMock(return_value=older)
+
+        assert await cache.get_turns(42, message_types=("free_dialog", "bot_reply"), limit=1) == older
+        cache._query_turns.assert_awaited_once_with(42, {"free_dialog", "bot_reply"}, 1, None)
+
+        recent = await cache.get_turns(42, since=datetime.now(timezone.utc) - timedelta(minutes=10))
+        assert len(recent) == 9
+        assert len(await cache.get_turns(42, message_types=("bot_question",), limit=5)) == 5
+        assert cache._query_turns.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_buffer_with_all_turns_answers_misses(self):
+        """Test that a user with fewer turns than the buffer holds never hits the database"""
+        cache = ConversationContextCache()
+        cache._load_recent = AsyncMock(return_value=[make_turn(1, "bot_question", 60 * 24 * 30)])
+        cache._query_turns = AsyncMock()
+
+        assert await cache.get_turns(42, message_types=("free_dialog", "bot_reply"), limit=1) == []
+        cache._query_turns.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_appends_past_capacity_stop_covering_old_turns(self):
+        """Test that once turns fall out of the buffer, unanswered reads go to the database"""
+        cache = ConversationContextCache()
+        cache._load_recent = AsyncMock(return_value=[make_turn(0, "free_dialog", 60)])
+        cache._query_turns = AsyncMock(return_value=[])
+        await cache.get_turns(42)
+
+        for conv_id in range(1, MAX_TURNS_PER_USER + 1):
+            cache.append(42, make_conversation(conv_id, "bot_question"))
+
+        await cache.get_turns(42, message_types=("free_dialog",), limit=1)
+        cache._query_turns.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_disabled_cache_always_queries_the_database(self):
+        """Test that a disabled cache buffers nothing and answers every read from the database"""
+        cache = ConversationContextCache(enabled=False)
+        cache._load_recent = AsyncMock(return_value=[])
+        turns = [make_turn(1, "free_dialog", 5)]
+        cache._query_turns = AsyncMock(return_value=turns)
+
+        assert await cache.get_turns(42, message_types=("free_dialog",), limit=3) == turns
+        cache.append(42, make_conversation(2, "bot_reply"))
+        await cache.get_turns(42)
+
+        cache._load_recent.assert_not_awaited()
+        assert cache._query_turns.await_count == 2
+        assert cache._buffers == {}
@@ -0,0 +1,208 @@
+"""
+MINDSETHAPPYBOT - Unit tests for batched GDPR deletion
+Tests purge step ordering, resuming after a failure and blocking of
+tombstoned users
+"""
+import re
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from aiogram.types import Message
+from sqlalchemy.sql.elements import TextClause
+
+from src.bot.middlewares import blocked_user
+from src.bot.middlewares.blocked_user import BlockedUserMiddleware
+from src.services import gdpr_service
+from src.services.gdpr_service import PURGE_STEPS, GDPRService
+from tests.unit.conftest import FakeDatabase
+
+BATCH_SIZE = 2
+
+
+class PurgeDatabase(FakeDatabase):
+    """
+    Keeps the rows each table holds for the user being deleted and the
+    gdpr_deletions record, and applies the purge's statements to them.
+    Statements touching a table in fail_on raise.
+    """
+
+    def __init__(self, rows, current_step=None):
+        super().__init__()
+        self.rows = dict(rows)
+        self.deletion = SimpleNamespace(
+            id=1, user_id=7, status="pending", current_step=current_step, progress={},
+            attempts=0, error=None, started_at=None, updated_at=None, completed_at=None,
+        )
+        self.user_deleted = False
+        self.fail_on = set()
+        self.purged = []  # (table, rows) per batch, in order
+
+    async def get(self, model, deletion_id):
+        return self.deletion
+
+    def result(self, statement, params):
+        sql = str(statement)
+        if not isinstance(statement, TextClause):
+            if sql.startswith("DELETE FROM users"):
+                self.user_deleted = True
+                return SimpleNamespace(rowcount=1)
+            # update(GDPRDeletion) after a failure
+            values = statement.compile().params
+            self.deletion.status = values["status"]
+            self.deletion.error = values["error"]
+            return SimpleNamespace(rowcount=1)
+
+        if "UPDATE gdpr_deletions" in sql:
+            table = params["table"]
+            self.deletion.current_step = table
+            self.deletion.progress = {
+                **self.deletion.progress,
+                table: self.deletion.progress.get(table, 0) + params["affected"],
+            }
+            return SimpleNamespace(rowcount=1)
+
+        table = re.search(r"(?:DELETE FROM|UPDATE) (\w+)", sql).group(1)
+        if table in self.fail_on:
+            raise ConnectionError(f"lost connection while purging {table}")
+        affected = min(params["batch_size"], self.rows.get(table, 0))
+        self.rows[table] = self.rows.get(table, 0) - affected
+        self.purged.append((table, affected))
+        return SimpleNamespace(rowcount=affected)
+
+
+class FakeSystemLog:
+    async def log(self, *args, **kwargs):
+        pass
+
+
+@pytest.fixture
+def make_database(fake_database, monkeypatch):
+    def make(rows, current_step=None):
+        return fake_database(gdpr_service, PurgeDatabase(rows, current_step))
+
+    monkeypatch.setattr(gdpr_service, "get_settings", lambda: SimpleNamespace(gdpr_delete_batch_size=BATCH_SIZE))
+    monkeypatch.setattr(gdpr_service, "SystemLogService", FakeSystemLog)
+    monkeypatch.setattr(gdpr_service, "DELETE_BATCH_PAUSE_SECONDS", 0)
+    return make
+
+
+class TestRunDeletion:
+    """Tests for GDPRService.run_deletion"""
+
+    @pytest.mark.asyncio
+    async def test_steps_run_in_order_then_user_row(self, make_database):
+        """Test that every table is purged in PURGE_STEPS order, in batches, before the user row"""
+        database = make_database({"conversations": 5, "moments": 1, "api_usage": 2})
+
+        assert await GDPRService().run_deletion(1) is True
+
+        purged_tables = []
+        for table, _ in database.purged:
+            if not purged_tables or purged_tables[-1] != table:
+                purged_tables.append(table)
+        assert purged_tables == [table for table, _ in PURGE_STEPS]
+        assert [rows for table, rows in database.purged if table == "conversations"] == [2, 2, 1]
+        assert database.user_deleted
+        assert database.deletion.status == "completed"
+        assert database.deletion.current_step is None
+        assert database.deletion.progress["conversations"] == 5
+        assert database.deletion.progress["api_usage"] == 2
+        assert database.deletion.progress["users"] == 1
+
+    @pytest.mark.asyncio
+    async def test_api_usage_is_anonymized(self, make_database):
+        """Test that api_usage rows are kept with user_id cleared"""
+        database = make_database({"api_usage": 1})
+        await GDPRService().run_deletion(1)
+
+        api_usage = [sql for sql, params in database.statements if "api_usage" in sql]
+        assert api_usage and all("SET user_id = NULL" in sql for sql in api_usage)
+
+    @pytest.mark.asyncio
+    async def test_failure_is_resumed_from_its_step(self, make_database):
+        """Test that a failed deletion keeps its progress and resumes from its last recorded step"""
+        database = make_database({"conversations": 3, "moments": 3, "feedback": 1})
+        database.fail_on = {"moments"}
+        steps = [table for table, _ in PURGE_STEPS]
+        last_recorded = steps[steps.index("moments") - 1]
+
+        assert await GDPRService().run_deletion(1) is False
+        assert database.deletion.status == "failed"
+        assert database.deletion.current_step == last_recorded
+        assert database.rows["conversations"] == 0
+        assert not database.user_deleted
+
+        # The recorded step is finished already; the retry moves past it to the failed one
+        database.fail_on = set()
+        database.purged = []
+        assert await GDPRService().run_deletion(1) is True
+
+        assert database.purged[0][0] == last_recorded
+        assert [table for table, rows in database.purged if rows] == ["moments", "moments", "feedback"]
+        assert database.deletion.progress["conversations"] == 3
+        assert database.deletion.progress["moments"] == 3
+        assert database.deletion.attempts == 2
+        assert database.deletion.status == "completed"
+
+    @pytest.mark.asyncio
+    async def test_resume_skips_finished_steps(self, make_database):
+        """Test that a deletion interrupted mid-way does not revisit earlier tables"""
+        database = make_database({"moments": 3, "user_stats": 1}, current_step="user_stats")
+
+        assert await GDPRService().run_deletion(1) is True
+
+        steps = [table for table, _ in PURGE_STEPS]
+        purged = {table for table, _ in database.purged}
+        assert purged == set(steps[steps.index("user_stats"):])
+        assert database.rows["moments"] == 3
+
+    @pytest.mark.asyncio
+    async def test_completed_deletion_is_not_run_again(self, make_database):
+        """Test that a completed deletion is left alone"""
+        database = make_database({"moments": 1})
+        database.deletion.status = "completed"
+
+        assert await GDPRService().run_deletion(1) is False
+        assert database.purged == []
+
+
+class TestBlockedUserMiddleware:
+    """Tests for BlockedUserMiddleware with tombstoned users"""
+
+    @staticmethod
+    def make_message():
+        return Message.model_validate({
+            "message_id": 1,
+            "date": 0,
+            "chat": {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+            "text": "hello",
+        })
+
+    @staticmethod
+    def patch_user(fake_database, row):
+        database = fake_database(blocked_user)
+        database.result = lambda statement, params: SimpleNamespace(one_or_none=lambda: row)
+
+    @pytest.mark.asyncio
+    async def test_tombstoned_user_is_ignored(self, fake_database):
+        """Test that a user with a pending deletion never reaches the handlers"""
+        self.patch_user(fake_database, SimpleNamespace(is_blocked=False, deleted_at=datetime.now(timezone.utc)))
+        handled = []
+
+        async def handler(event, data):
+            handled.append(event)
+
+        assert await BlockedUserMiddleware()(handler, self.make_message(), {}) is None
+        assert handled == []
+
+    @pytest.mark.asyncio
+    async def test_active_user_passes(self, fake_database):
+        """Test that a user who is neither blocked nor deleted is handled"""
+        self.patch_user(fake_database, SimpleNamespace(is_blocked=False, deleted_at=None))
+
+        async def handler(event, data):
+            return "handled"
+
+        assert await BlockedUserMiddleware()(handler, self.make_message(), {}) == "handled"
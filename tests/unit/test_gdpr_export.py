@@ -0,0 +1,41 @@
+"""
+MINDSETHAPPYBOT - Unit tests for GDPR export files
+Tests that spooled export files report their size and upload in chunks
+"""
+import asyncio
+import tempfile
+
+from src.services.gdpr_service import SpooledExportFile
+
+
+def read_all(export_file):
+    async def collect():
+        return [chunk async for chunk in export_file.read(None)]
+    return asyncio.run(collect())
+
+
+class TestSpooledExportFile:
+    """Tests for SpooledExportFile"""
+
+    def test_reads_whole_file_in_chunks(self):
+        """Test that the upload yields the spooled bytes in chunk_size pieces"""
+        spool = tempfile.SpooledTemporaryFile(max_size=16)
+        spool.write(b"x" * 100)
+        export_file = SpooledExportFile(spool, filename="export.json")
+        export_file.chunk_size = 40
+
+        chunks = read_all(export_file)
+
+        assert export_file.size == 100
+        assert [len(chunk) for chunk in chunks] == [40, 40, 20]
+        export_file.close()
+
+    def test_can_be_read_twice(self):
+        """Test that a retried upload starts again from the beginning"""
+        spool = tempfile.SpooledTemporaryFile()
+        spool.write(b"{}")
+        export_file = SpooledExportFile(spool, filename="export.json")
+
+        assert read_all(export_file) == [b"{}"]
+        assert read_all(export_file) == [b"{}"]
+        export_file.close()
@@ -0,0 +1,59 @@
+"""
+MINDSETHAPPYBOT - Unit tests for the in-process knowledge base index
+Tests top-k search over the normalized embedding matrix
+"""
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.services.kb_memory_index import KnowledgeBaseIndex, _Snapshot, _build_matrix
+
+
+def loaded_index(embeddings):
+    index = KnowledgeBaseIndex()
+    index._snapshot = _Snapshot(
+        version=1,
+        chunk_ids=np.arange(len(embeddings), dtype=np.int64) + 100,
+        item_ids=np.arange(len(embeddings), dtype=np.int64) // 2,
+        contents=[f"chunk {i}" for i in range(len(embeddings))],
+        matrix=_build_matrix([str(embedding) for embedding in embeddings]),
+    )
+    # No version check in tests
+    index._checked_at = time.monotonic()
+    return index
+
+
+class TestKnowledgeBaseIndex:
+    """Tests for KnowledgeBaseIndex.search"""
+
+    def test_rows_are_normalized(self):
+        """Test that stored embeddings have unit length"""
+        matrix = _build_matrix(["[3, 4]", "[0, 2]"])
+        assert matrix.dtype == np.float32
+        assert np.allclose(np.linalg.norm(matrix, axis=1), 1.0)
+
+    def test_top_k_in_similarity_order(self):
+        """Test that the most similar chunks come first with cosine similarities"""
+        index = loaded_index([[1, 0, 0], [0, 1, 0], [1, 1, 0], [0, 0, 1]])
+        hits = index.search([2, 0.1, 0], limit=2)
+        assert [hit[0] for hit in hits] == [100, 102]
+        assert hits[0][1] == 0
+        assert hits[0][2] == "chunk 0"
+        assert hits[0][3] == pytest.approx(2 / np.linalg.norm([2, 0.1]), rel=1e-5)
+
+    def test_limit_larger_than_index(self):
+        """Test that asking for more chunks than exist returns all of them"""
+        index = loaded_index([[1, 0], [0, 1]])
+        assert len(index.search([1, 1], limit=10)) == 2
+
+    def test_empty_index(self):
+        """Test that a loaded but empty knowledge base returns no chunks"""
+        assert loaded_index([]).search([1, 0], limit=5) == []
+
+    def test_not_loaded_returns_none(self):
+        """Test that searching before the first load asks the caller to use Postgres"""
+        index = KnowledgeBaseIndex()
+        index._checked_at = time.monotonic()
+        assert index.search([1, 0], limit=5) is None
@@ -0,0 +1,59 @@
+"""
+MINDSETHAPPYBOT - Unit tests for the knowledge base indexer
+Tests content-defined chunking and incremental chunk planning
+"""
+import hashlib
+
+from src.knowledge_indexer import CHUNK_SIZE, chunk_document, chunk_hash, plan_chunks
+
+
+def make_document(count):
+    return "\n\n".join(f"Paragraph {i}. " + "words " * (20 + (i * 7) % 60) for i in range(count))
+
+
+def stored(chunks):
+    return {index: (100 + index, chunk_hash(chunk)) for index, chunk in enumerate(chunks)}
+
+
+class TestChunkDocument:
+    """Tests for chunk_document"""
+
+    def test_empty_content(self):
+        """Test that blank content produces no chunks"""
+        assert chunk_document("  \n\n ") == []
+
+    def test_chunks_respect_size(self):
+        """Test that no chunk exceeds CHUNK_SIZE, even for long paragraphs"""
+        text = make_document(40) + "\n\n" + "x" * (CHUNK_SIZE * 3)
+        chunks = chunk_document(text)
+        assert chunks
+        assert all(len(chunk) <= CHUNK_SIZE for chunk in chunks)
+
+    def test_edit_changes_few_chunks(self):
+        """Test that inserting a paragraph at the start leaves later chunks intact"""
+        text = make_document(60)
+        before = chunk_document(text)
+        after = chunk_document("A brand new introduction. " * 10 + "\n\n" + text)
+        unchanged = set(before) & set(after)
+        assert len(unchanged) >= len(before) - 3
+
+
+class TestPlanChunks:
+    """Tests for chunk hashing and plan_chunks"""
+
+    def test_hash_matches_sql(self):
+        """Test that chunk_hash is sha256 hex of the UTF-8 text, as in the migration"""
+        assert chunk_hash("Привет") == hashlib.sha256("Привет".encode("utf-8")).hexdigest()
+
+    def test_unchanged_chunks_are_skipped(self):
+        """Test that re-indexing identical content writes nothing"""
+        chunks = ["a", "b", "c"]
+        planned, unchanged = plan_chunks(chunks, stored(chunks))
+        assert planned == []
+        assert unchanged == 3
+
+    def test_moved_chunks_reuse_embeddings(self):
+        """Test that shifted chunks point at the stored row with the same text"""
+        planned, unchanged = plan_chunks(["new", "a", "b"], stored(["a", "b"]))
+        assert unchanged == 0
+        assert [(c.index, c.source_id) for c in planned] == [(0, None), (1, 100), (2, 101)]
@@ -0,0 +1,104 @@
+"""
+MINDSETHAPPYBOT - Unit tests for compiled localization catalogs
+Tests that catalog lookups match the dict fallbacks and the button reverse index
+"""
+import pytest
+
+from src.utils.localization import (
+    MENU_TEXTS,
+    ONBOARDING_TEXTS,
+    SUPPORTED_LANGUAGES,
+    SYSTEM_MESSAGES,
+    find_menu_button,
+    get_catalog,
+    get_menu_text,
+    get_onboarding_text,
+    get_system_message,
+)
+from src.utils.localization_catalog import Message
+
+
+def reference_system_message(key, lang, formal=False, **kwargs):
+    """Lookup as done before catalogs were compiled"""
+    texts = SYSTEM_MESSAGES.get(lang, SYSTEM_MESSAGES["ru"])
+    if formal and f"{key}_formal" in texts:
+        message = texts[f"{key}_formal"]
+    else:
+        message = texts.get(key, SYSTEM_MESSAGES["ru"].get(key, key))
+    if kwargs:
+        try:
+            return message.format(**kwargs)
+        except (KeyError, ValueError):
+            return message
+    return message
+
+
+ALL_SYSTEM_KEYS = sorted({key for texts in SYSTEM_MESSAGES.values() for key in texts})
+ALL_MENU_KEYS = sorted({key for texts in MENU_TEXTS.values() for key in texts})
+ALL_ONBOARDING_KEYS = sorted({key for texts in ONBOARDING_TEXTS.values() for key in texts})
+FORMAT_ARGS = {"start": "09:00", "end": "21:00", "count": 3, "first_name": "Maria", "name": "Maria"}
+
+
+class TestCatalogLookups:
+    """Tests that compiled lookups return what the dict fallbacks returned"""
+
+    @pytest.mark.parametrize("lang", SUPPORTED_LANGUAGES)
+    def test_system_messages_match(self, lang):
+        """Test that every system message, informal and formal, matches the reference"""
+        for key in ALL_SYSTEM_KEYS + ["no_such_key"]:
+            for formal in (False, True):
+                assert get_system_message(key, lang, formal=formal) == reference_system_message(key, lang, formal)
+                assert (
+                    get_system_message(key, lang, formal=formal, **FORMAT_ARGS)
+                    == reference_system_message(key, lang, formal, **FORMAT_ARGS)
+                )
+
+    @pytest.mark.parametrize("lang", SUPPORTED_LANGUAGES)
+    def test_menu_and_onboarding_match(self, lang):
+        """Test that menu and onboarding texts fall back to Russian as before"""
+        for key in ALL_MENU_KEYS + ["no_such_key"]:
+            expected = MENU_TEXTS[lang].get(key, MENU_TEXTS["ru"].get(key, key))
+            assert get_menu_text(key, lang) == expected
+        for key in ALL_ONBOARDING_KEYS + ["no_such_key"]:
+            expected = ONBOARDING_TEXTS[lang].get(key, ONBOARDING_TEXTS["ru"].get(key, ""))
+            assert get_onboarding_text(key, lang) == expected
+
+    def test_raw_language_codes_share_catalog(self):
+        """Test that regional and unsupported codes resolve to the normalized catalog"""
+        assert get_catalog("en-US") is get_catalog("en")
+        assert get_catalog("xx") is get_catalog("ru")
+        assert get_catalog(None) is get_catalog("ru")
+
+
+class TestMessage:
+    """Tests for Message.render"""
+
+    def test_missing_parameter_returns_text(self):
+        """Test that a missing format parameter leaves the text unformatted"""
+        assert Message("Hi {name}").render({"other": 1}) == "Hi {name}"
+
+    def test_text_without_fields_is_not_formatted(self):
+        """Test that texts without braces are returned as-is"""
+        message = Message("Saved!")
+        assert not message.has_fields
+        assert message.render({"name": "x"}) == "Saved!"
+
+
+class TestFindMenuButton:
+    """Tests for the menu button reverse index"""
+
+    @pytest.mark.parametrize("lang", SUPPORTED_LANGUAGES)
+    def test_every_button_is_found(self, lang):
+        """Test that each menu text resolves to its key"""
+        for key, text in MENU_TEXTS[lang].items():
+            found = find_menu_button(text)
+            assert found is not None
+            assert found[0] == key
+
+    def test_language_of_button(self):
+        """Test that the language of a pressed button is reported"""
+        assert find_menu_button(MENU_TEXTS["de"]["menu_stats"]) == ("menu_stats", "de")
+
+    def test_free_text(self):
+        """Test that ordinary messages are not buttons"""
+        assert find_menu_button("Today I walked in the park") is None
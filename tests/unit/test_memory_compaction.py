@@ -0,0 +1,129 @@
+"""
+MINDSETHAPPYBOT - Unit tests for memory compaction helpers
+Tests period bucketing, rollup input selection and late children
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.services.memory_compaction_service import (
+    COMPACTION_TIERS,
+    CompactionChild,
+    MemoryCompactionService,
+    period_bounds,
+    group_by_period,
+    select_rollup_inputs,
+)
+from src.services.conversation_memory_service import RAW_DIALOG_KIND, DIALOG_SUMMARY_KIND
+
+
+def make_child(child_id, created_at, kind=RAW_DIALOG_KIND, conversation_ids=None):
+    return CompactionChild(
+        id=child_id,
+        content=f"memory {child_id}",
+        kind=kind,
+        source_conversation_ids=conversation_ids or [child_id],
+        created_at=created_at,
+    )
+
+
+class TestPeriodBounds:
+    """Tests for period_bounds function"""
+
+    def test_day(self):
+        """Test that a day period covers midnight to midnight UTC"""
+        start, end = period_bounds(datetime(2026, 3, 4, 15, 30, tzinfo=timezone.utc), "day")
+        assert start == datetime(2026, 3, 4, tzinfo=timezone.utc)
+        assert end == datetime(2026, 3, 5, tzinfo=timezone.utc)
+
+    def test_week_starts_on_monday(self):
+        """Test that a week period starts on Monday"""
+        # 2026-03-04 is a Wednesday
+        start, end = period_bounds(datetime(2026, 3, 4, 15, 30, tzinfo=timezone.utc), "week")
+        assert start == datetime(2026, 3, 2, tzinfo=timezone.utc)
+        assert end == datetime(2026, 3, 9, tzinfo=timezone.utc)
+
+    def test_month_end_of_year(self):
+        """Test that December rolls over into the next year"""
+        start, end = period_bounds(datetime(2026, 12, 31, 23, 0, tzinfo=timezone.utc), "month")
+        assert start == datetime(2026, 12, 1, tzinfo=timezone.utc)
+        assert end == datetime(2027, 1, 1, tzinfo=timezone.utc)
+
+
+class TestGroupByPeriod:
+    """Tests for group_by_period function"""
+
+    def test_open_period_is_skipped(self):
+        """Test that the period containing `now` is not rolled up yet"""
+        now = datetime(2026, 3, 4, 12, 0, tzinfo=timezone.utc)
+        children = [
+            make_child(1, datetime(2026, 3, 3, 9, 0, tzinfo=timezone.utc)),
+            make_child(2, datetime(2026, 3, 3, 20, 0, tzinfo=timezone.utc)),
+            make_child(3, datetime(2026, 3, 4, 8, 0, tzinfo=timezone.utc)),
+        ]
+        groups = group_by_period(children, "day", now)
+        assert list(groups) == [datetime(2026, 3, 3, tzinfo=timezone.utc)]
+        assert [c.id for c in groups[datetime(2026, 3, 3, tzinfo=timezone.utc)]] == [1, 2]
+
+
+class TestSelectRollupInputs:
+    """Tests for select_rollup_inputs function"""
+
+    def test_raw_covered_by_summary_is_skipped(self):
+        """Test that raw snippets already in a summary are not sent twice"""
+        created = datetime(2026, 3, 3, tzinfo=timezone.utc)
+        children = [
+            make_child(1, created, conversation_ids=[10]),
+            make_child(2, created, conversation_ids=[11]),
+            make_child(3, created, kind=DIALOG_SUMMARY_KIND, conversation_ids=[10, 12]),
+        ]
+        assert [c.id for c in select_rollup_inputs(children)] == [2, 3]
+
+
+class TestRollupTier:
+    """Tests for MemoryCompactionService.rollup_tier"""
+
+    @pytest.mark.asyncio
+    async def test_late_children_join_existing_rollup(self, monkeypatch):
+        """Test that a period with a rollup gets its late children attached without an LLM call"""
+        service = MemoryCompactionService()
+        tier = COMPACTION_TIERS[0]
+        rolled_up_day = datetime.now(timezone.utc) - timedelta(days=3)
+        new_day = datetime.now(timezone.utc) - timedelta(days=2)
+        children = [make_child(1, rolled_up_day), make_child(2, new_day)]
+        rolled_up_start = group_by_period(children[:1], "day", datetime.now(timezone.utc))
+        generated = []
+        attached = []
+        stored = []
+
+        async def load_children(user_id, tier, before):
+            return children
+
+        async def find_rollups(user_id, tier, period_starts):
+            return {start: 50 for start in rolled_up_start}
+
+        async def attach_children(user_id, rollup_id, period_children):
+            attached.append((rollup_id, [c.id for c in period_children]))
+
+        async def generate(period_children, tier, period_start):
+            generated.append([c.id for c in period_children])
+            return "summary"
+
+        async def create_embedding(content):
+            return [0.1]
+
+        async def store_rollup(user_id, tier, period_start, content, embedding, period_children):
+            stored.append([c.id for c in period_children])
+            return 51
+
+        monkeypatch.setattr(service, "_load_children", load_children)
+        monkeypatch.setattr(service, "_find_rollups", find_rollups)
+        monkeypatch.setattr(service, "_attach_children", attach_children)
+        monkeypatch.setattr(service, "_generate_rollup_text", generate)
+        monkeypatch.setattr(service, "_store_rollup", store_rollup)
+        monkeypatch.setattr(service.memory_service.embedding_service, "create_embedding", create_embedding)
+
+        assert await service.rollup_tier(7, tier) == 1
+        assert attached == [(50, [1])]
+        assert generated == [[2]]
+        assert stored == [[2]]
@@ -0,0 +1,57 @@
+"""
+MINDSETHAPPYBOT - Unit tests for conversation memory batch deduplication
+Tests the in-memory dedup step of the bulk memory upsert path
+"""
+from src.services.conversation_memory_service import (
+    ConversationMemoryService,
+    MemoryCandidate,
+    RAW_DIALOG_KIND,
+)
+
+
+def make_candidate(content, embedding, kind="fact"):
+    return MemoryCandidate(
+        content=content,
+        kind=kind,
+        importance=1.0,
+        source_conversation_ids=[1],
+        embedding=embedding,
+        metadata={},
+    )
+
+
+class TestDedupeCandidates:
+    """Tests for ConversationMemoryService.dedupe_candidates"""
+
+    def test_exact_fingerprint_repeat_is_dropped(self):
+        """Test that normalized-identical content is kept only once"""
+        kept = ConversationMemoryService.dedupe_candidates([
+            make_candidate("My dog is called Rex", [1.0, 0.0]),
+            make_candidate("my dog is called rex!", [0.0, 1.0]),
+        ])
+        assert [c.content for _, c in kept] == ["My dog is called Rex"]
+
+    def test_near_duplicate_embedding_is_dropped(self):
+        """Test that candidates above the similarity threshold are dropped"""
+        kept = ConversationMemoryService.dedupe_candidates([
+            make_candidate("I work as a nurse", [1.0, 0.0], kind=RAW_DIALOG_KIND),
+            make_candidate("User's job is nurse", [0.999, 0.01]),
+            make_candidate("User likes hiking", [0.0, 1.0]),
+        ])
+        assert [c.content for _, c in kept] == ["I work as a nurse", "User likes hiking"]
+
+    def test_candidates_without_embedding_are_skipped(self):
+        """Test that candidates whose embedding failed are not stored"""
+        kept = ConversationMemoryService.dedupe_candidates([
+            make_candidate("User likes tea", None),
+            make_candidate("User likes coffee", [1.0, 0.0]),
+        ])
+        assert [c.content for _, c in kept] == ["User likes coffee"]
+
+    def test_fingerprint_is_returned_with_candidate(self):
+        """Test that the computed fingerprint is passed on for the upsert"""
+        kept = ConversationMemoryService.dedupe_candidates([
+            make_candidate("User likes tea", [1.0, 0.0]),
+        ])
+        fingerprint, _ = kept[0]
+        assert fingerprint == ConversationMemoryService.compute_fingerprint("User likes tea")
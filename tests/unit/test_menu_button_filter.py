@@ -0,0 +1,51 @@
+"""
+MINDSETHAPPYBOT - Unit tests for the menu button filter
+Tests matching reply keyboard button presses through the localized button index
+"""
+from datetime import datetime
+
+import pytest
+from aiogram.types import Chat, Message, User
+
+from src.bot.filters import MenuButtonFilter
+from src.utils.localization import MENU_TEXTS, SUPPORTED_LANGUAGES, find_menu_button
+
+MENU_KEYS = ["menu_moments", "menu_stats", "menu_settings", "menu_talk", "menu_feedback", "menu_pause"]
+
+
+def make_message(text=None):
+    return Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(id=1, type="private"),
+        from_user=User(id=1, is_bot=False, first_name="Test"),
+        text=text,
+    )
+
+
+class TestMenuButtonFilter:
+    """Tests for MenuButtonFilter"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("lang", SUPPORTED_LANGUAGES)
+    async def test_buttons_in_every_language(self, lang):
+        """Test that each main menu button passes with its key"""
+        button_filter = MenuButtonFilter(MENU_KEYS)
+        for key in MENU_KEYS:
+            assert await button_filter(make_message(MENU_TEXTS[lang][key])) == {"menu_button": key}
+
+    @pytest.mark.asyncio
+    async def test_free_text_and_other_buttons(self):
+        """Test that free text, non-text messages and buttons outside the table do not pass"""
+        button_filter = MenuButtonFilter(MENU_KEYS)
+        assert await button_filter(make_message("Had a lovely walk today")) is False
+        assert await button_filter(make_message("x" * 5000)) is False
+        assert await button_filter(make_message()) is False
+        assert await button_filter(make_message(MENU_TEXTS["en"]["settings_timezone"])) is False
+
+    def test_normalized_text_matches(self):
+        """Test that extra spaces and dropped emoji variation selectors still match"""
+        text = MENU_TEXTS["ru"]["menu_settings"]
+        assert "\ufe0f" in text
+        assert find_menu_button(f"  {text} ") == ("menu_settings", "ru")
+        assert find_menu_button(text.replace("\ufe0f", "")) == ("menu_settings", "ru")
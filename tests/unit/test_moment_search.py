@@ -0,0 +1,40 @@
+"""
+MINDSETHAPPYBOT - Unit tests for moment search
+Tests reciprocal rank fusion and search session paging
+"""
+from src.services.moment_search_service import (
+    SEARCH_PAGE_SIZE,
+    SearchSession,
+    reciprocal_rank_fusion,
+)
+
+
+class TestReciprocalRankFusion:
+    """Tests for reciprocal_rank_fusion"""
+
+    def test_items_in_both_rankings_win(self):
+        """Test that an item ranked by both lists beats items ranked by one"""
+        fused = reciprocal_rank_fusion([[1, 2, 3], [4, 3, 5]])
+        assert fused[0] == 3
+
+    def test_single_ranking_order_is_kept(self):
+        """Test that fusing one ranking returns it unchanged"""
+        assert reciprocal_rank_fusion([[7, 3, 9]]) == [7, 3, 9]
+
+    def test_ties_keep_first_appearance(self):
+        """Test that equal scores keep the order in which ids were first seen"""
+        assert reciprocal_rank_fusion([[1], [2]]) == [1, 2]
+
+    def test_empty_rankings(self):
+        """Test that no candidates fuse to an empty list"""
+        assert reciprocal_rank_fusion([[], []]) == []
+
+
+class TestSearchSession:
+    """Tests for SearchSession paging"""
+
+    def test_total_pages(self):
+        """Test that total_pages rounds up and is at least 1"""
+        assert SearchSession("q", [], semantic=True).total_pages == 1
+        ids = list(range(SEARCH_PAGE_SIZE + 1))
+        assert SearchSession("q", ids, semantic=True).total_pages == 2
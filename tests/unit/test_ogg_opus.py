@@ -0,0 +1,89 @@
+"""
+MINDSETHAPPYBOT - Unit tests for Ogg Opus splitting
+Tests page checksums and splitting voice notes into decodable segments
+"""
+from src.utils.ogg_opus import (
+    FLAG_BOS,
+    FLAG_CONTINUED,
+    FLAG_EOS,
+    OPUS_SAMPLE_RATE,
+    OggPage,
+    duration_seconds,
+    ogg_crc,
+    parse_pages,
+    split_ogg_opus,
+)
+
+SERIAL = 1234
+
+
+def build_stream(seconds, continued_at=()):
+    """Ogg Opus stream with header pages and one audio page per second"""
+    pages = [
+        OggPage(FLAG_BOS, 0, SERIAL, 0, bytes([19]), b"OpusHead" + bytes(11)),
+        OggPage(0, 0, SERIAL, 1, bytes([16]), b"OpusTags" + bytes(8)),
+    ]
+    for second in range(1, seconds + 1):
+        flags = FLAG_CONTINUED if second in continued_at else 0
+        pages.append(OggPage(flags, second * OPUS_SAMPLE_RATE, SERIAL, second + 1, bytes([4]), b"\x00" * 4))
+    return b"".join(
+        page.to_bytes(index, page.flags | (FLAG_EOS if index == len(pages) - 1 else 0))
+        for index, page in enumerate(pages)
+    )
+
+
+class TestOggCrc:
+    """Tests for ogg_crc"""
+
+    def test_check_value(self):
+        """Test the CRC-32 (poly 0x04C11DB7, init 0, unreflected) check value"""
+        assert ogg_crc(b"123456789") == 0x89A1897F
+
+    def test_written_pages_verify(self):
+        """Test that serialized pages carry a checksum over the zeroed CRC field"""
+        data = build_stream(3)
+        page = bytearray(data[:47])  # OpusHead page: 27 header + 1 lacing + 19 body
+        stored = int.from_bytes(page[22:26], "little")
+        page[22:26] = b"\x00\x00\x00\x00"
+        assert ogg_crc(bytes(page)) == stored
+
+
+class TestSplitOggOpus:
+    """Tests for split_ogg_opus"""
+
+    def test_short_stream_is_not_split(self):
+        """Test that a stream shorter than a segment is returned unchanged"""
+        data = build_stream(5)
+        assert split_ogg_opus(data, 10) == [data]
+
+    def test_non_ogg_input_is_returned_unchanged(self):
+        """Test that input without the Ogg capture pattern is passed through"""
+        assert split_ogg_opus(b"not ogg", 10) == [b"not ogg"]
+
+    def test_segments_are_complete_streams(self):
+        """Test that every segment repeats the headers and is renumbered and flagged"""
+        segments = split_ogg_opus(build_stream(25), 10)
+
+        assert len(segments) == 3
+        for segment in segments:
+            pages = parse_pages(segment)
+            assert pages[0].data.startswith(b"OpusHead")
+            assert pages[1].data.startswith(b"OpusTags")
+            assert [page.sequence for page in pages] == list(range(len(pages)))
+            assert pages[0].flags & FLAG_BOS
+            assert not any(page.flags & FLAG_BOS for page in pages[1:])
+            assert pages[-1].flags & FLAG_EOS
+            assert not any(page.flags & FLAG_EOS for page in pages[:-1])
+
+    def test_all_audio_is_kept_in_order(self):
+        """Test that the segments together carry every audio page once"""
+        segments = split_ogg_opus(build_stream(25), 10)
+        granules = [page.granule for segment in segments for page in parse_pages(segment)[2:]]
+        assert granules == [second * OPUS_SAMPLE_RATE for second in range(1, 26)]
+        assert duration_seconds(segments[-1]) == 25
+
+    def test_never_cuts_before_continued_page(self):
+        """Test that a page continuing a packet stays with the previous page"""
+        segments = split_ogg_opus(build_stream(25, continued_at={11}), 10)
+        first_pages = parse_pages(segments[0])
+        assert first_pages[-1].granule == 11 * OPUS_SAMPLE_RATE
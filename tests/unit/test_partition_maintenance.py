@@ -0,0 +1,60 @@
+"""
+MINDSETHAPPYBOT - Unit tests for partition maintenance helpers
+Tests month arithmetic, partition naming and retention selection
+"""
+from datetime import datetime, timezone
+
+from src.services.partition_maintenance_service import (
+    add_months,
+    month_start,
+    partition_name,
+    parse_partition_month,
+    expired_months,
+)
+
+
+def utc(year, month, day=1, hour=0):
+    return datetime(year, month, day, hour, tzinfo=timezone.utc)
+
+
+class TestMonthArithmetic:
+    """Tests for month_start and add_months"""
+
+    def test_month_start(self):
+        """Test that month_start truncates to the first instant of the month"""
+        assert month_start(utc(2026, 10, 19, 15)) == utc(2026, 10)
+
+    def test_add_months_across_year(self):
+        """Test that add_months rolls over year boundaries in both directions"""
+        assert add_months(utc(2026, 11), 3) == utc(2027, 2)
+        assert add_months(utc(2026, 2), -3) == utc(2025, 11)
+
+
+class TestPartitionNames:
+    """Tests for partition_name and parse_partition_month"""
+
+    def test_round_trip(self):
+        """Test that a generated name parses back to its month"""
+        name = partition_name("api_usage", utc(2026, 3))
+        assert name == "api_usage_p202603"
+        assert parse_partition_month("api_usage", name) == utc(2026, 3)
+
+    def test_ignores_other_partitions(self):
+        """Test that default partitions and other tables are not parsed"""
+        assert parse_partition_month("api_usage", "api_usage_default") is None
+        assert parse_partition_month("conversations", "api_usage_p202603") is None
+
+
+class TestExpiredMonths:
+    """Tests for expired_months function"""
+
+    def test_keeps_retention_window(self):
+        """Test that the current month plus retention_months previous months are kept"""
+        months = [utc(2026, m) for m in range(5, 12)]
+        expired = expired_months(months, retention_months=3, now=utc(2026, 10, 19))
+        assert expired == [utc(2026, 5), utc(2026, 6)]
+
+    def test_zero_retention_keeps_everything(self):
+        """Test that retention 0 disables retirement"""
+        months = [utc(2020, 1), utc(2026, 10)]
+        assert expired_months(months, retention_months=0, now=utc(2026, 10, 19)) == []
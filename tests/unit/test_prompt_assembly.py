@@ -0,0 +1,138 @@
+"""
+MINDSETHAPPYBOT - Unit tests for the prompt assembly cache
+Tests compiled system prompt caching, prompt layout and cached token extraction
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from src.services.personalization_service import (
+    EMPATHETIC_RESPONSE_PROMPT,
+    MOMENT_RESPONSE_PROMPT,
+    PROMPT_PROTECTION,
+    PersonalizationService,
+)
+from src.services.prompt_assembly import (
+    PromptAssemblyCache,
+    PromptKey,
+    cached_prompt_tokens,
+    get_prompt_cache,
+    normalize_gender,
+)
+
+
+def _key(template="t", layers=("a",), language=None, gender="unknown", formal=False):
+    return PromptKey(template=template, layers=layers, language=language, gender=gender, formal=formal)
+
+
+def _user(gender="unknown", formal=False):
+    return SimpleNamespace(gender=gender, formal_address=formal)
+
+
+@pytest.fixture
+def service():
+    get_prompt_cache().clear()
+    # _system_prompt needs no OpenAI client or RAG service
+    return PersonalizationService.__new__(PersonalizationService)
+
+
+class TestPromptAssemblyCache:
+    """Tests for PromptAssemblyCache"""
+
+    def test_compiles_once_per_key(self):
+        """Test that a prompt is compiled on the first lookup and reused after"""
+        cache = PromptAssemblyCache()
+        calls = []
+
+        def compile():
+            calls.append(1)
+            return "prompt"
+
+        assert cache.get_or_compile(_key(), compile) == ("prompt", False)
+        assert cache.get_or_compile(_key(), compile) == ("prompt", True)
+        assert len(calls) == 1
+        assert cache.hit_rate == 0.5
+
+    def test_changed_layer_is_a_new_entry(self):
+        """Test that an edited prompt layer does not reuse the old compiled prompt"""
+        cache = PromptAssemblyCache()
+        cache.get_or_compile(_key(layers=("v1",)), lambda: "one")
+
+        assert cache.get_or_compile(_key(layers=("v2",)), lambda: "two") == ("two", False)
+
+    def test_evicts_least_recently_used(self):
+        """Test that the cache keeps at most max_size prompts, dropping the oldest"""
+        cache = PromptAssemblyCache(max_size=2)
+        cache.get_or_compile(_key(template="a"), lambda: "a")
+        cache.get_or_compile(_key(template="b"), lambda: "b")
+        cache.get_or_compile(_key(template="a"), lambda: "a")
+        cache.get_or_compile(_key(template="c"), lambda: "c")
+
+        assert len(cache) == 2
+        assert cache.get_or_compile(_key(template="a"), lambda: "a")[1] is True
+        assert cache.get_or_compile(_key(template="b"), lambda: "b")[1] is False
+
+    def test_normalize_gender(self):
+        """Test that unknown and missing genders share one variant"""
+        assert normalize_gender("female") == "female"
+        assert normalize_gender(None) == "unknown"
+        assert normalize_gender("other") == "unknown"
+
+
+class TestSystemPromptLayout:
+    """Tests for PersonalizationService._system_prompt"""
+
+    LAYERS = (PROMPT_PROTECTION, MOMENT_RESPONSE_PROMPT)
+
+    def test_prefix_is_shared_by_all_users(self, service):
+        """Test that prompts of different users start with the same invariant prefix"""
+        prefix = "\n\n".join(self.LAYERS)
+        prompts = [
+            service._system_prompt("moment_response", self.LAYERS, user)[0]
+            for user in (_user("male", False), _user("female", True), None)
+        ]
+        prompts.append(service._system_prompt("moment_response", self.LAYERS, _user(), override_language="en")[0])
+
+        assert len(set(prompts)) == 4
+        assert all(prompt.startswith(prefix) for prompt in prompts)
+
+    def test_user_section_follows_prefix(self, service):
+        """Test that language, gender and address form come after the persona"""
+        prompt, _ = service._system_prompt("moment_response", self.LAYERS, _user("female", True))
+
+        persona = prompt.index(MOMENT_RESPONSE_PROMPT)
+        assert persona < prompt.index("CRITICAL LANGUAGE RULE")
+        assert persona < prompt.index("Пользователь — женщина")
+        assert persona < prompt.index("«вы»")
+
+    def test_override_language(self, service):
+        """Test that override_language replaces the detect-the-language instruction"""
+        prompt, _ = service._system_prompt("moment_response", self.LAYERS, None, override_language="de")
+
+        assert "You MUST respond ONLY in German/Deutsch." in prompt
+        assert "SAME LANGUAGE as the user's message" not in prompt
+
+    def test_same_user_variant_hits_cache(self, service):
+        """Test that users with the same language, gender and address form share a prompt"""
+        first = service._system_prompt("empathetic_response", (EMPATHETIC_RESPONSE_PROMPT,), _user("male"))
+        second = service._system_prompt("empathetic_response", (EMPATHETIC_RESPONSE_PROMPT,), _user("male"))
+        other = service._system_prompt("empathetic_response", (EMPATHETIC_RESPONSE_PROMPT,), _user("male", True))
+
+        assert first[1] is False
+        assert second == (first[0], True)
+        assert other[1] is False
+
+
+class TestCachedPromptTokens:
+    """Tests for cached_prompt_tokens"""
+
+    def test_reads_prompt_tokens_details(self):
+        """Test that cached tokens are read from the usage details"""
+        usage = SimpleNamespace(prompt_tokens=1500, prompt_tokens_details=SimpleNamespace(cached_tokens=1280))
+        assert cached_prompt_tokens(usage) == 1280
+
+    def test_missing_details(self):
+        """Test that usage without details counts as no cached tokens"""
+        assert cached_prompt_tokens(SimpleNamespace(prompt_tokens=10)) == 0
+        assert cached_prompt_tokens(SimpleNamespace(prompt_tokens_details=None)) == 0
+        assert cached_prompt_tokens(SimpleNamespace(prompt_tokens_details=SimpleNamespace(cached_tokens=None))) == 0
@@ -0,0 +1,108 @@
+"""
+MINDSETHAPPYBOT - Unit tests for the prompt loader cache
+Tests loading, generation checks and default fallback of PromptLoaderService
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import prompt_loader_service
+from src.services.prompt_loader_service import DEFAULT_PROMPTS, PromptLoaderService
+
+
+@pytest.fixture
+def database(fake_database):
+    """Serves a generation and the active prompt rows, counting loads"""
+    database = fake_database(prompt_loader_service)
+    database.generation = 1
+    database.rows = []
+    database.loads = 0
+
+    def load():
+        database.loads += 1
+        return list(database.rows)
+
+    database.result = lambda statement, params: SimpleNamespace(scalar=lambda: database.generation, all=load)
+    PromptLoaderService.clear_cache()
+    PromptLoaderService._check_task = None
+    PromptLoaderService._load_lock = None
+    yield database
+    PromptLoaderService.clear_cache()
+
+
+class TestPromptLoaderCache:
+    """Tests for PromptLoaderService lookups"""
+
+    @pytest.mark.asyncio
+    async def test_loads_once_then_reads_from_memory(self, database):
+        """Test that all active prompts are loaded by the first lookup only"""
+        database.rows = [("prompt_protection", "custom protection"), ("greeting", "hi")]
+
+        assert await PromptLoaderService.get_prompt("prompt_protection") == "custom protection"
+        assert await PromptLoaderService.get_prompt("greeting") == "hi"
+        assert database.loads == 1
+
+    @pytest.mark.asyncio
+    async def test_default_and_unknown_keys(self, database):
+        """Test that keys without an active version use defaults, unknown keys are empty"""
+        assert await PromptLoaderService.get_prompt("dialog_system_main") == DEFAULT_PROMPTS["dialog_system_main"]
+        assert await PromptLoaderService.get_prompt("no_such_prompt") == ""
+
+    @pytest.mark.asyncio
+    async def test_newest_active_version_wins(self, database):
+        """Test that with several active versions of a key the last loaded one is used"""
+        database.rows = [("greeting", "v1"), ("greeting", "v2")]
+        assert await PromptLoaderService.get_prompt("greeting") == "v2"
+
+    @pytest.mark.asyncio
+    async def test_generation_change_reloads(self, database):
+        """Test that a moved generation swaps in the new prompts"""
+        database.rows = [("greeting", "old")]
+        await PromptLoaderService.get_prompt("greeting")
+
+        assert await PromptLoaderService.check_generation() is False
+
+        database.generation = 2
+        database.rows = [("greeting", "new")]
+        assert await PromptLoaderService.check_generation() is True
+        assert await PromptLoaderService.get_prompt("greeting") == "new"
+
+    @pytest.mark.asyncio
+    async def test_stale_check_runs_in_background(self, database):
+        """Test that a lookup after PROMPT_CHECK_SECONDS schedules a generation check"""
+        await PromptLoaderService.get_prompt("greeting")
+        database.generation = 5
+        database.rows = [("greeting", "edited")]
+        PromptLoaderService._checked_at = time.monotonic() - prompt_loader_service.PROMPT_CHECK_SECONDS
+
+        assert await PromptLoaderService.get_prompt("greeting") == ""
+        await PromptLoaderService._check_task
+        assert await PromptLoaderService.get_prompt("greeting") == "edited"
+
+    @pytest.mark.asyncio
+    async def test_database_down_serves_defaults(self, database):
+        """Test that a failed first load falls back to defaults and is retried in the background"""
+        database.fail = True
+        assert await PromptLoaderService.get_prompt("prompt_protection") == DEFAULT_PROMPTS["prompt_protection"]
+        assert await PromptLoaderService.get_prompt("prompt_protection") == DEFAULT_PROMPTS["prompt_protection"]
+        # Lookups in between do not hit the database
+        assert database.connects == 1
+
+        database.fail = False
+        database.rows = [("prompt_protection", "custom")]
+        PromptLoaderService._checked_at = time.monotonic() - prompt_loader_service.PROMPT_CHECK_SECONDS
+        assert await PromptLoaderService.get_prompt("prompt_protection") == DEFAULT_PROMPTS["prompt_protection"]
+        await PromptLoaderService._check_task
+        assert await PromptLoaderService.get_prompt("prompt_protection") == "custom"
+
+    @pytest.mark.asyncio
+    async def test_concurrent_first_lookups_load_once(self, database):
+        """Test that lookups racing on an empty cache share one load"""
+        database.rows = [("greeting", "hi")]
+
+        results = await asyncio.gather(*(PromptLoaderService.get_prompt("greeting") for _ in range(5)))
+
+        assert results == ["hi"] * 5
+        assert database.loads == 1
@@ -0,0 +1,69 @@
+"""
+MINDSETHAPPYBOT - Unit tests for the local query router
+Tests nearest-centroid classification and when the router abstains
+"""
+import pytest
+
+from src.config import get_settings
+from src.services.query_router import QueryRouter, compute_centroids, nearest_centroid, normalize
+
+
+CENTROIDS = {
+    "A": [1.0, 0.0, 0.0],
+    "B": [0.0, 1.0, 0.0],
+    "C": [0.0, 0.0, 1.0],
+}
+
+
+def loaded_router(examples_per_label):
+    router = QueryRouter()
+    router._centroids = CENTROIDS
+    router._counts = {label: examples_per_label for label in CENTROIDS}
+    router._loaded_at = 0.0
+    return router
+
+
+class TestCentroids:
+    """Tests for compute_centroids and nearest_centroid"""
+
+    def test_centroids_are_unit_means(self):
+        """Test that a centroid is the normalized mean of its examples"""
+        centroids = compute_centroids([("A", [2.0, 0.0]), ("A", [0.0, 2.0]), ("B", [0.0, 3.0])])
+        assert centroids["A"] == pytest.approx(normalize([1.0, 1.0]))
+        assert centroids["B"] == pytest.approx([0.0, 1.0])
+
+    def test_nearest_centroid_label_and_margin(self):
+        """Test that the closest centroid wins and the margin is the gap to the runner-up"""
+        decision = nearest_centroid([0.8, 0.6, 0.0], CENTROIDS)
+        assert decision.label == "A"
+        assert decision.similarity == pytest.approx(0.8)
+        assert decision.margin == pytest.approx(0.2)
+
+    def test_no_centroids(self):
+        """Test that an untrained router has no decision"""
+        assert nearest_centroid([1.0, 0.0], {}) is None
+
+
+class TestQueryRouter:
+    """Tests for QueryRouter.route"""
+
+    @pytest.mark.asyncio
+    async def test_confident_query_is_routed(self):
+        """Test that a clear-cut query gets a local label"""
+        router = loaded_router(get_settings().query_router_min_examples)
+        decision = await router.route([0.1, 0.9, 0.1])
+        assert decision.label == "B"
+        assert router.routed == 1
+
+    @pytest.mark.asyncio
+    async def test_ambiguous_query_abstains(self):
+        """Test that a query between two centroids falls back to the LLM"""
+        router = loaded_router(get_settings().query_router_min_examples)
+        assert await router.route([0.7, 0.7, 0.0]) is None
+        assert router.abstained == 1
+
+    @pytest.mark.asyncio
+    async def test_too_few_examples_abstains(self):
+        """Test that the router is not used before every type has enough examples"""
+        router = loaded_router(get_settings().query_router_min_examples - 1)
+        assert await router.route([1.0, 0.0, 0.0]) is None
@@ -0,0 +1,49 @@
+"""
+MINDSETHAPPYBOT - Unit tests for the random moment deck
+Tests that picks don't repeat within a round and deck maintenance
+"""
+from src.services.moment_service import RandomMomentDeck
+
+
+def draw_all(deck, telegram_id):
+    picks = []
+    while (moment_id := deck.pop(telegram_id)) is not None:
+        picks.append(moment_id)
+    return picks
+
+
+class TestRandomMomentDeck:
+    """Tests for RandomMomentDeck"""
+
+    def test_round_has_no_repeats(self):
+        """Test that every moment is drawn exactly once per round"""
+        deck = RandomMomentDeck()
+        deck.fill(1, list(range(50)))
+        assert sorted(draw_all(deck, 1)) == list(range(50))
+
+    def test_empty_deck_returns_none(self):
+        """Test that a user without a deck gets None"""
+        assert RandomMomentDeck().pop(1) is None
+
+    def test_new_round_does_not_start_with_last_pick(self):
+        """Test that reshuffling never repeats the last moment back to back"""
+        deck = RandomMomentDeck()
+        for _ in range(20):
+            deck.fill(1, [1, 2])
+            last = draw_all(deck, 1)[-1]
+            deck.fill(1, [1, 2])
+            assert deck.pop(1) != last
+
+    def test_add_and_discard(self):
+        """Test that created moments join the deck and deleted ones leave it"""
+        deck = RandomMomentDeck()
+        deck.fill(1, [1, 2, 3])
+        deck.add(1, 4)
+        deck.discard(1, 2)
+        assert sorted(draw_all(deck, 1)) == [1, 3, 4]
+
+    def test_add_without_deck_is_ignored(self):
+        """Test that adding to a user without a deck doesn't create one"""
+        deck = RandomMomentDeck()
+        deck.add(1, 4)
+        assert deck.pop(1) is None
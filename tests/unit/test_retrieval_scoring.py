@@ -0,0 +1,58 @@
+"""
+MINDSETHAPPYBOT - Unit tests for retrieval scoring
+Tests the scoring function registry and the fused query builder
+"""
+import pytest
+
+from src.services.retrieval_scoring import (
+    SCORING_FUNCTIONS,
+    ScoringFunction,
+    build_fused_query,
+    get_scoring_function,
+    register_scoring_function,
+)
+
+
+class TestScoringRegistry:
+    """Tests for scoring function registration"""
+
+    def test_builtin_functions(self):
+        """Test that the configurable built-in rankings are registered"""
+        assert {"similarity", "linear_recency", "exp_recency", "importance"} <= set(SCORING_FUNCTIONS)
+
+    def test_unknown_function(self):
+        """Test that a misconfigured name fails loudly"""
+        with pytest.raises(ValueError):
+            get_scoring_function("no_such_scoring")
+
+    def test_register_custom_function(self):
+        """Test that a new ranking can be plugged in by name"""
+        function = register_scoring_function(ScoringFunction("test_mood_only", "mood"))
+        try:
+            assert get_scoring_function("test_mood_only") is function
+        finally:
+            del SCORING_FUNCTIONS["test_mood_only"]
+
+
+class TestBuildFusedQuery:
+    """Tests for build_fused_query"""
+
+    def test_recency_window_adds_recent_candidates(self):
+        """Test that rankings with a recency window also pool recent rows"""
+        sql = build_fused_query("moments", ["id"], get_scoring_function("linear_recency"))
+        assert "UNION" in sql
+        assert "make_interval(days => 7)" in sql
+
+    def test_plain_similarity_uses_ann_pool_only(self):
+        """Test that a ranking without recency only pools nearest neighbours"""
+        sql = build_fused_query("moments", ["id"], get_scoring_function("similarity"))
+        assert "UNION" not in sql
+        assert "LIMIT :pool_size" in sql
+
+    def test_optional_columns(self):
+        """Test that mood and importance default to neutral values"""
+        sql = build_fused_query("conversation_memories", ["id", "kind"], get_scoring_function("importance"),
+                                extra_filter="AND kind = ANY(:kinds)", importance_column="importance")
+        assert "COALESCE(t.importance, 1.0) AS importance" in sql
+        assert "0 AS mood" in sql
+        assert sql.count("AND kind = ANY(:kinds)") == 1
@@ -0,0 +1,89 @@
+"""
+MINDSETHAPPYBOT - Unit tests for speech-to-text helpers
+Tests language normalization, the voice file size cap, the transcription
+cache lookup and transcript stitching
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import speech_service
+from src.services.speech_service import (
+    SpeechToTextService,
+    VoiceTooLargeError,
+    normalize_language,
+    stitch_transcripts,
+)
+
+
+class TestNormalizeLanguage:
+    """Tests for normalize_language"""
+
+    def test_iso_code_is_kept(self):
+        """Test that two-letter codes pass through lowercased"""
+        assert normalize_language("EN") == "en"
+
+    def test_language_name_is_mapped(self):
+        """Test that Whisper language names map to ISO codes"""
+        assert normalize_language("ukrainian") == "uk"
+
+    def test_missing_language_falls_back_to_russian(self):
+        """Test that an undetected language falls back to ru"""
+        assert normalize_language(None) == "ru"
+
+
+class TestSizeCap:
+    """Tests for the voice file size cap"""
+
+    def test_oversized_file_is_rejected_before_download(self):
+        """Test that a file over the cap raises without being downloaded"""
+
+        class NoDownloadBot:
+            async def download_file(self, *args, **kwargs):
+                raise AssertionError("file must not be downloaded")
+
+        service = SpeechToTextService()
+        with pytest.raises(VoiceTooLargeError):
+            asyncio.run(service.transcribe_voice(NoDownloadBot(), "voice/file.oga", file_size=10 ** 9))
+
+    def test_check_size(self):
+        """Test that the size reported in the message is checked against the cap"""
+        SpeechToTextService.check_size(None)
+        SpeechToTextService.check_size(1024)
+        with pytest.raises(VoiceTooLargeError) as error:
+            SpeechToTextService.check_size(10 ** 9)
+        assert error.value.file_size == 10 ** 9
+
+
+class TestTranscriptionCache:
+    """Tests for SpeechToTextService.get_cached"""
+
+    @staticmethod
+    def patch_row(fake_database, row):
+        database = fake_database(speech_service)
+        database.result = lambda statement, params: SimpleNamespace(one_or_none=lambda: row)
+
+    def test_hit_returns_transcript_and_language(self, fake_database):
+        """Test that a cached note is answered from voice_transcriptions"""
+        self.patch_row(fake_database, SimpleNamespace(transcript="hello", language="en"))
+        assert asyncio.run(SpeechToTextService().get_cached("unique")) == ("hello", "en")
+
+    def test_miss_returns_none(self, fake_database):
+        """Test that an unknown note is a miss"""
+        self.patch_row(fake_database, None)
+        assert asyncio.run(SpeechToTextService().get_cached("unique")) is None
+
+
+class TestStitchTranscripts:
+    """Tests for stitch_transcripts"""
+
+    def test_segments_joined_in_order(self):
+        """Test that segment texts are joined with single spaces"""
+        text, _ = stitch_transcripts([(" first part ", "ru"), ("second part", "ru")])
+        assert text == "first part second part"
+
+    def test_majority_language_wins(self):
+        """Test that the language detected for most segments is returned"""
+        _, language = stitch_transcripts([("a", "en"), ("b", "ru"), ("c", "ru")])
+        assert language == "ru"
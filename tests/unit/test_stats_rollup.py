@@ -0,0 +1,100 @@
+"""
+MINDSETHAPPYBOT - Unit tests for the dashboard stats rollups
+Tests the refresh window, the watermark handling of a refresh and the
+rollup/raw split of the admin dashboard counts
+"""
+import importlib.util
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import stats_rollup_service
+from src.services.stats_rollup_service import (
+    ROLLUP_LOOKBACK_HOURS,
+    StatsRollupService,
+    refresh_window,
+)
+
+ADMIN_APP_PATH = Path(__file__).resolve().parents[2] / "admin" / "app.py"
+
+
+def load_admin_app():
+    spec = importlib.util.spec_from_file_location("admin_app", ADMIN_APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestRefreshWindow:
+    """Tests for refresh_window function"""
+
+    def test_first_run_backfills(self):
+        """Test that without a watermark everything up to the current hour is aggregated"""
+        now = datetime(2026, 3, 4, 15, 42, tzinfo=timezone.utc)
+        assert refresh_window(None, now) == (None, datetime(2026, 3, 4, 15, tzinfo=timezone.utc))
+
+    def test_lookback_before_watermark(self):
+        """Test that closed hours just before the watermark are aggregated again"""
+        watermark = datetime(2026, 3, 4, 12, tzinfo=timezone.utc)
+        now = datetime(2026, 3, 4, 15, 42, tzinfo=timezone.utc)
+        since, until = refresh_window(watermark, now)
+        assert since == watermark - timedelta(hours=ROLLUP_LOOKBACK_HOURS)
+        assert until == datetime(2026, 3, 4, 15, tzinfo=timezone.utc)
+
+
+class TestRefresh:
+    """Tests for StatsRollupService.refresh"""
+
+    @pytest.mark.asyncio
+    async def test_watermark_moves_to_current_hour(self, fake_database):
+        """Test that buckets, totals and the new watermark share the refresh window"""
+        database = fake_database(stats_rollup_service)
+        watermark = datetime(2026, 3, 4, 12, tzinfo=timezone.utc)
+        database.result = lambda statement, params: SimpleNamespace(rowcount=1, scalar=lambda: watermark)
+        now = datetime(2026, 3, 4, 15, 42, tzinfo=timezone.utc)
+        current_hour = datetime(2026, 3, 4, 15, tzinfo=timezone.utc)
+
+        stats = await StatsRollupService().refresh(now)
+
+        assert stats["hours_from"] == datetime(2026, 3, 4, 10, tzinfo=timezone.utc).isoformat()
+        buckets = [params for sql, params in database.statements if "INSERT INTO stats_rollups_hourly" in sql]
+        assert {params["until"] for params in buckets} == {current_hour}
+        snapshot_sql, snapshot_params = next(
+            (sql, params) for sql, params in database.statements if "INSERT INTO stats_snapshots" in sql
+        )
+        # Totals are counted from the raw tables, not summed from the buckets
+        assert "FROM moments" in snapshot_sql and "FROM stats_rollups_hourly" not in snapshot_sql
+        assert snapshot_params["until"] == current_hour
+        state = next(params for sql, params in database.statements if "INSERT INTO rollup_state" in sql)
+        assert state["watermark"] == current_hour
+
+
+class TestDashboardWindows:
+    """Tests for the admin dashboard rollup/raw split"""
+
+    def test_fresh_watermark(self):
+        """Test that rows before a recent watermark come from the buckets"""
+        admin = load_admin_app()
+        now = datetime(2026, 3, 4, 15, 42, tzinfo=timezone.utc)
+        watermark = datetime(2026, 3, 4, 15, tzinfo=timezone.utc)
+
+        windows = admin._stats_windows(now, watermark)
+
+        assert windows["today"] == datetime(2026, 3, 4, tzinfo=timezone.utc)
+        assert windows["week_ago"] == datetime(2026, 2, 25, 15, tzinfo=timezone.utc)
+        assert windows["today_raw"] == watermark
+        assert windows["week_raw"] == watermark
+
+    def test_lagging_watermark(self):
+        """Test that a watermark before today does not count earlier raw rows as today's"""
+        admin = load_admin_app()
+        now = datetime(2026, 3, 4, 15, 42, tzinfo=timezone.utc)
+        watermark = datetime(2026, 3, 3, 20, tzinfo=timezone.utc)
+
+        windows = admin._stats_windows(now, watermark)
+
+        assert windows["today_raw"] == datetime(2026, 3, 4, tzinfo=timezone.utc)
+        assert windows["week_raw"] == watermark
+        assert windows["watermark"] == watermark
@@ -0,0 +1,214 @@
+"""
+MINDSETHAPPYBOT - Unit tests for webhook mode
+Tests the webhook server checks, update ordering keys and the update worker
+"""
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.bot import update_queue, webhook
+from src.bot.middlewares.chat_queue import ChatQueueMiddleware
+from src.bot.update_queue import UpdateWorker, update_chat_id
+from src.bot.webhook import SECRET_HEADER, create_webhook_app
+
+
+def make_update(update_id, chat_id, text="hi"):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+
+class FakeDispatcher:
+    """Records fed updates; updates of chat_id 13 fail, those with text "slow" hang"""
+
+    def __init__(self):
+        self.fed = []
+
+    async def feed_raw_update(self, bot, update):
+        message = update["message"]
+        if message["text"] == "slow":
+            await asyncio.sleep(3600)
+        self.fed.append(update["update_id"])
+        if message["chat"]["id"] == 13:
+            raise RuntimeError("handler failed")
+
+
+@pytest.fixture
+def database(fake_database):
+    return fake_database(update_queue)
+
+
+def make_worker(max_attempts=3, drain_seconds=1):
+    return UpdateWorker(
+        bot=None,
+        dispatcher=FakeDispatcher(),
+        concurrency=4,
+        lease_seconds=30,
+        max_attempts=max_attempts,
+        drain_seconds=drain_seconds,
+    )
+
+
+class TestUpdateChatId:
+    """Tests for the per-chat ordering key"""
+
+    def test_message_chat(self):
+        """Test that messages are keyed by their chat"""
+        assert update_chat_id(make_update(1, -100123)) == -100123
+
+    def test_callback_query_uses_message_chat(self):
+        """Test that a button press is ordered with the messages of its chat"""
+        update = {
+            "update_id": 2,
+            "callback_query": {"id": "q", "from": {"id": 7}, "message": {"chat": {"id": 42}}},
+        }
+        assert update_chat_id(update) == 42
+
+    def test_sender_without_chat(self):
+        """Test that updates without a chat fall back to the sender, then to 0"""
+        assert update_chat_id({"update_id": 3, "inline_query": {"id": "q", "from": {"id": 9}}}) == 9
+        assert update_chat_id({"update_id": 4, "poll": {"id": "p"}}) == 0
+
+
+class TestWebhookServer:
+    """Tests for the ingest endpoint"""
+
+    @pytest.mark.asyncio
+    async def test_secret_and_payload_checks(self, monkeypatch):
+        """Test that only well-formed updates with the right secret are queued"""
+        queued = []
+
+        async def enqueue(update):
+            queued.append(update["update_id"])
+            return True
+
+        monkeypatch.setattr(webhook, "enqueue_update", enqueue)
+        async with TestClient(TestServer(create_webhook_app("/hook", "secret"))) as client:
+            assert (await client.post("/hook", json=make_update(1, 5))).status == 401
+            wrong = {SECRET_HEADER: "wrong"}
+            assert (await client.post("/hook", json=make_update(1, 5), headers=wrong)).status == 401
+            right = {SECRET_HEADER: "secret"}
+            assert (await client.post("/hook", data="not json", headers=right)).status == 400
+            assert (await client.post("/hook", json={"message": {}}, headers=right)).status == 400
+            assert (await client.post("/hook", json=make_update(2, 5), headers=right)).status == 200
+            assert (await client.get("/health")).status == 200
+        assert queued == [2]
+
+    @pytest.mark.asyncio
+    async def test_queue_failure_makes_telegram_retry(self, monkeypatch):
+        """Test that an update that could not be stored is not acknowledged"""
+        async def enqueue(update):
+            raise ConnectionError("database is down")
+
+        monkeypatch.setattr(webhook, "enqueue_update", enqueue)
+        async with TestClient(TestServer(create_webhook_app("/hook", "secret"))) as client:
+            response = await client.post("/hook", json=make_update(1, 5), headers={SECRET_HEADER: "secret"})
+            assert response.status == 503
+
+
+class TestUpdateWorker:
+    """Tests for UpdateWorker handling, dropping and draining"""
+
+    @pytest.mark.asyncio
+    async def test_handled_and_failed_updates_are_removed(self, database):
+        """Test that an update leaves the queue after handling, even when its handler fails"""
+        worker = make_worker()
+        await worker._handle(1, make_update(1, 5), attempts=1)
+        await worker._handle(2, make_update(2, 13), attempts=1)
+
+        assert worker.dispatcher.fed == [1, 2]
+        deleted = [params["update_id"] for sql, params in database.statements if "DELETE" in sql]
+        assert deleted == [1, 2]
+        assert worker.handled == 2
+
+    @pytest.mark.asyncio
+    async def test_update_crashing_workers_is_dropped(self, database):
+        """Test that an update that started more than max_attempts claims is not handled again"""
+        worker = make_worker(max_attempts=3)
+        await worker._handle(1, make_update(1, 5), attempts=4)
+
+        assert worker.dispatcher.fed == []
+        assert any("DELETE" in sql for sql, params in database.statements)
+
+    @pytest.mark.asyncio
+    async def test_stop_hands_back_unfinished_updates(self, database, monkeypatch):
+        """Test that updates still running after the drain timeout return to the queue"""
+        worker = make_worker(drain_seconds=0.1)
+        claims = [[
+            (1, 5, make_update(1, 5), 1),
+            (2, 6, make_update(2, 6, "slow"), 1),
+            (3, 6, make_update(3, 6, "slow"), 0),
+        ]]
+
+        async def claim(limit):
+            return claims.pop() if claims else []
+
+        async def claim_follow_ups(chats):
+            return []
+
+        monkeypatch.setattr(worker, "claim", claim)
+        monkeypatch.setattr(worker, "claim_follow_ups", claim_follow_ups)
+        task = asyncio.create_task(worker.run())
+        await asyncio.sleep(0.05)
+        worker.stop()
+        await task
+
+        assert worker.dispatcher.fed == [1]
+        handed_back = [params for sql, params in database.statements if "locked_by = NULL" in sql]
+        assert handed_back[0]["update_ids"] == [2, 3]
+        # Only the first update of the chat's run counted an attempt, so only it gets one back
+        assert handed_back[0]["charged"] == [2]
+        assert worker._charged == set()
+
+    @pytest.mark.asyncio
+    async def test_text_queued_after_the_claim_is_coalesced(self, database, monkeypatch):
+        """Test that a text queued while its chat is in flight joins the running message"""
+        monkeypatch.setattr(update_queue, "UPDATE_POLL_SECONDS", 0.02)
+        handled = []
+        dispatcher = Dispatcher()
+        dispatcher.update.outer_middleware(ChatQueueMiddleware(coalesce_seconds=0.3))
+        router = Router()
+
+        @router.message()
+        async def any_message(message: Message):
+            handled.append(message.text)
+
+        dispatcher.include_router(router)
+        worker = make_worker()
+        worker.bot = Bot("123:abc")
+        worker.dispatcher = dispatcher
+        claims = [[(1, 5, make_update(1, 5, "one"), 1)]]
+        queued = []
+        follow_up_chats = []
+
+        async def claim(limit):
+            return claims.pop() if claims else []
+
+        async def claim_follow_ups(chats):
+            follow_up_chats.append(chats)
+            return [queued.pop()] if queued else []
+
+        monkeypatch.setattr(worker, "claim", claim)
+        monkeypatch.setattr(worker, "claim_follow_ups", claim_follow_ups)
+        task = asyncio.create_task(worker.run())
+        await asyncio.sleep(0.1)
+        # Arrives after the chat was claimed, while "one" waits for follow-ups
+        queued.append((2, 5, make_update(2, 5, "two"), 0))
+        await asyncio.sleep(0.5)
+        worker.stop()
+        await task
+
+        assert handled == ["one\ntwo"]
+        assert [5] in follow_up_chats
+        deleted = [params["update_id"] for sql, params in database.statements if "DELETE FROM telegram_updates" in sql]
+        assert sorted(deleted) == [1, 2]